@@ -0,0 +1 @@
+../solutions/export_ap_csv.py
\ No newline at end of file
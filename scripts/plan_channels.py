@@ -0,0 +1 @@
+../solutions/plan_channels.py
\ No newline at end of file
@@ -0,0 +1 @@
+../solutions/run_pods.py
\ No newline at end of file
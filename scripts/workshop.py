@@ -0,0 +1 @@
+../solutions/workshop.py
\ No newline at end of file
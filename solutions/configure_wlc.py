@@ -2,15 +2,33 @@
 Example script to read wireless access points from NetBox, generate a RESTCONF
 message-body, and push to a WLC.
 """
+import argparse
+import asyncio
 import os
 import pathlib
 import sys
 from dotenv import dotenv_values
 import pynetbox
-from helpers import (create_request_session,
-                     get_ap_wlc_associations,
-                     provision_ap_on_wlc,
-                     provision_ap_radios)
+from helpers import (AsyncNetBoxReader,
+                     flush_events,
+                     CapabilityCache,
+                     RequestSessionPool,
+                     RunDeadline,
+                     print_deferred_report,
+                     WlcResolver,
+                     create_netbox_api,
+                     configure_pod,
+                     configure_pod_async,
+                     configure_pod_streaming,
+                     configure_pods_scheduled,
+                     print_scheduler_summary,
+                     reconcile_wlcs,
+                     print_reconcile_summary,
+                     load_pod_inventory,
+                     wait_for_convergence,
+                     print_convergence_summary,
+                     add_profile_arguments,
+                     start_profiling_from_args)
 
 # Read the environment variables created by the "prepare_lab.sh" script
 SCRIPT_PATH = pathlib.PurePath(os.path.dirname(os.path.abspath(__file__)))
@@ -25,53 +43,133 @@ NETBOX_URL = WORKSHOP_ENV["NETBOX_URL"]
 # Set the NetBox token to the environment variable created during setup.
 NETBOX_TOKEN = WORKSHOP_ENV["NETBOX_TOKEN"]
 
-# Initialize the pynetbox API object
-netbox = pynetbox.api(url=NETBOX_URL, token=NETBOX_TOKEN)
-
 # Collect WLC username and password from environment
 WLC_USERNAME = WORKSHOP_ENV["WLC_USERNAME"]
 WLC_PASSWORD = WORKSHOP_ENV["WLC_PASSWORD"]
 
-# Initialize the pynetbox API object
+# Initialize the pynetbox API object; list pages are fetched concurrently
 try:
-    netbox = pynetbox.api(url=NETBOX_URL, token=NETBOX_TOKEN)
+    netbox = create_netbox_api(url=NETBOX_URL, token=NETBOX_TOKEN)
 except pynetbox.RequestError:
     sys.exit("Unable to connect to NetBox.  Terminating.")
 
 if __name__ == "__main__":
-    try:
-        access_points = netbox.dcim.devices.filter(role="ap",
-                                                   cf_workshop_pod_number=POD_NUMBER)
-    except pynetbox.RequestError:
-        print("NetBox error happened when trying to query APs. Terminating.")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reconcile",
+                        action="store_true",
+                        help="After provisioning, remove APs that are no longer in "
+                             "NetBox from the WLCs of this pod")
+    parser.add_argument("--dry-run",
+                        action="store_true",
+                        dest="dry_run",
+                        help="With --reconcile: skip provisioning and only report "
+                             "orphaned WLC entries")
+    parser.add_argument("--wait",
+                        action="store_true",
+                        help="After provisioning, wait for the APs to join and "
+                             "apply their radio settings")
+    parser.add_argument("--wait-timeout",
+                        dest="wait_timeout",
+                        default=600,
+                        type=int,
+                        help="Seconds to wait for convergence.  Default: 600")
+    parser.add_argument("--refresh-capabilities",
+                        action="store_true",
+                        dest="refresh_capabilities",
+                        help="Discover the WLC capabilities again instead of using "
+                             "the cache")
+    parser.add_argument("--batch",
+                        action="store_true",
+                        help="Provision the APs of WLCs with a known software version "
+                             "in batches of merge requests instead of one AP at a time")
+    parser.add_argument("--deadline",
+                        type=float,
+                        help="Seconds the whole run may take; work left at the deadline "
+                             "is skipped and reported")
+    provision_mode = parser.add_mutually_exclusive_group()
+    provision_mode.add_argument("--schedule",
+                                action="store_true",
+                                help="Provision through the fair scheduler: a queue per WLC, "
+                                     "new APs before changed radios before refreshes")
+    provision_mode.add_argument("--stream",
+                                action="store_true",
+                                help="Push the APs to their WLCs as they are read from "
+                                     "NetBox, through bounded per-WLC queues")
+    provision_mode.add_argument("--async-netbox",
+                                action="store_true",
+                                dest="async_netbox",
+                                help="Read NetBox with concurrent asyncio requests and push "
+                                     "APs to the WLCs while the remaining reads are in flight")
+    add_profile_arguments(parser)
+    script_args = parser.parse_known_args()[0]
+    start_profiling_from_args(script_args, "configure")
 
     print("*" * 78)
 
-    for ap in access_points:
-        print(f"Processing AP {ap.name}... ")
-        ap_interfaces = netbox.dcim.interfaces.filter(device_id=ap.id)
-        ap_mgmt_interface = netbox.dcim.interfaces.get(device_id=ap.id, mgmt_only=True)
-        ap_mgmt_mac = ap_mgmt_interface.mac_address
-
-        wlc_associations = get_ap_wlc_associations(netbox_api=netbox,
-                                                   netbox_ap_object=ap)
-
-        for wlc in wlc_associations:
-            wlc_session = create_request_session(host=wlc["wlc_dns"],
-                                                 username=WLC_USERNAME,
-                                                 password=WLC_PASSWORD)
-
-            print(f"\tAssociating AP with WLC '{wlc['wlc_name']}'... ", end="")
-
-            # Provision the AP using RESTCONF
-            provision_ap_on_wlc(request_session=wlc_session,
-                                ap_name=ap.name,
-                                ap_mac=ap_mgmt_mac)
-
-            # Provision the AP radios using RESTCONF
-            provision_ap_radios(request_session=wlc_session,
-                                ap_name=ap.name,
-                                ap_mac=ap_mgmt_mac,
-                                ap_interfaces=ap_interfaces)
-
-        print("*" * 78)
+    wlc_resolver = WlcResolver(netbox)
+    session_pool = RequestSessionPool(username=WLC_USERNAME, password=WLC_PASSWORD,
+                                      deadline=RunDeadline(script_args.deadline)
+                                      if script_args.deadline else None)
+    # With --batch, picks batched or per-AP provisioning for each WLC
+    capability_cache = CapabilityCache(session_pool,
+                                       refresh=script_args.refresh_capabilities)
+    # A reconcile dry run only reports orphaned WLC entries
+    provision = not (script_args.reconcile and script_args.dry_run)
+    try:
+        if provision:
+            if script_args.schedule:
+                pod_results, scheduler_stats = configure_pods_scheduled(
+                    netbox_api=netbox,
+                    pod_numbers=[POD_NUMBER],
+                    wlc_resolver=wlc_resolver,
+                    session_pool=session_pool,
+                    capability_cache=capability_cache,
+                    batch=script_args.batch)
+                print_scheduler_summary(scheduler_stats)
+                pod_outcome = pod_results[0]
+            elif script_args.stream:
+                pod_outcome = configure_pod_streaming(netbox_api=netbox,
+                                                      pod_number=POD_NUMBER,
+                                                      wlc_resolver=wlc_resolver,
+                                                      session_pool=session_pool)
+            elif script_args.async_netbox:
+                netbox_reader = AsyncNetBoxReader(url=NETBOX_URL, token=NETBOX_TOKEN)
+                try:
+                    pod_outcome = asyncio.run(configure_pod_async(netbox_reader=netbox_reader,
+                                                                  pod_number=POD_NUMBER,
+                                                                  session_pool=session_pool))
+                finally:
+                    netbox_reader.close()
+            else:
+                pod_outcome = configure_pod(netbox_api=netbox,
+                                            pod_number=POD_NUMBER,
+                                            wlc_resolver=wlc_resolver,
+                                            session_pool=session_pool,
+                                            capability_cache=capability_cache,
+                                            batch=script_args.batch)
+            flush_events()
+            print(f"APs: {pod_outcome['access_points']}  "
+                  f"Failed: {pod_outcome['failed']}  "
+                  f"Deferred: {pod_outcome['deferred']}")
+
+        if script_args.reconcile:
+            print_reconcile_summary(reconcile_wlcs(netbox_api=netbox,
+                                                   wlc_resolver=wlc_resolver,
+                                                   session_pool=session_pool,
+                                                   pod_numbers=[POD_NUMBER],
+                                                   dry_run=script_args.dry_run,
+                                                   capability_cache=capability_cache),
+                                    dry_run=script_args.dry_run)
+
+        if script_args.wait:
+            print_convergence_summary(
+                wait_for_convergence(access_points=load_pod_inventory(netbox, POD_NUMBER),
+                                     wlc_resolver=wlc_resolver,
+                                     session_pool=session_pool,
+                                     deadline_seconds=script_args.wait_timeout,
+                                     capability_cache=capability_cache))
+    except pynetbox.RequestError:
+        print("NetBox error happened when trying to query APs. Terminating.")
+    finally:
+        session_pool.close()
+        print_deferred_report(session_pool)
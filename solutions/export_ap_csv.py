@@ -0,0 +1,63 @@
+"""
+Export the access points in NetBox to a file the importer accepts, e.g. for
+nightly backups or to diff the inventory between runs.
+"""
+import argparse
+import os
+import pathlib
+import sys
+from dotenv import dotenv_values
+import pynetbox
+from helpers import (create_netbox_api,
+                     export_inventory,
+                     add_profile_arguments,
+                     start_profiling_from_args)
+from helpers.input_formats import INPUT_FORMATS
+
+# Read the environment variables created by the "prepare_lab.sh" script
+SCRIPT_PATH = pathlib.PurePath(os.path.dirname(os.path.abspath(__file__)))
+WORKSHOP_ENV = dotenv_values(os.path.join(SCRIPT_PATH.parent, "workshop-env"))
+
+# Set the NetBox URL to the environment variable created during setup.
+NETBOX_URL = WORKSHOP_ENV["NETBOX_URL"]
+
+# Set the NetBox token to the environment variable created during setup.
+NETBOX_TOKEN = WORKSHOP_ENV["NETBOX_TOKEN"]
+
+DEFAULT_OUTPUT_FILE = "netbox-export.csv"
+DEFAULT_PAGE_SIZE = 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output-file",
+                        dest="output_file",
+                        default=DEFAULT_OUTPUT_FILE,
+                        help=f"Output file name.  Default: {DEFAULT_OUTPUT_FILE}")
+    parser.add_argument("--format",
+                        choices=INPUT_FORMATS,
+                        dest="output_format",
+                        help="Output file format.  Default: from the output file extension, "
+                             "csv if unknown")
+    parser.add_argument("-p", "--pod",
+                        dest="pod",
+                        help="Only export the APs of this pod.  Default: all APs")
+    parser.add_argument("--page-size",
+                        dest="page_size",
+                        default=DEFAULT_PAGE_SIZE,
+                        type=int,
+                        help=f"Devices read per NetBox request.  Default: {DEFAULT_PAGE_SIZE}")
+    add_profile_arguments(parser)
+    script_args = parser.parse_known_args()[0]
+    start_profiling_from_args(script_args, "export")
+
+    try:
+        export_inventory(netbox_api=create_netbox_api(url=NETBOX_URL, token=NETBOX_TOKEN),
+                         output_file=script_args.output_file,
+                         pod_number=script_args.pod,
+                         file_format=script_args.output_format,
+                         page_size=script_args.page_size)
+    except pynetbox.RequestError as err:
+        sys.exit(f"NetBox error happened during the export: {err}")
+    except ImportError as err:
+        sys.exit(str(err))
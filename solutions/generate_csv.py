@@ -2,17 +2,24 @@
 Cisco Live, DEVWKS-2275: "Supercharge Your Wireless Network with Programmability!"
 
 Create an AP import .csv file with random AP data to be imported in
-workshop code.
+workshop code.  The file can also be written as JSON Lines, Parquet, or
+Arrow, with typed values.
 """
 import csv
+import math
 import string
 import random
 import os
 import pathlib
 import argparse
 from dotenv import dotenv_values
-from helpers.rf_channel_map import (allowed_channel_numbers_24ghz,
-                                    netbox_channel_to_cisco_wlc_translation)
+from helpers.rf_channel_map import allowed_channel_numbers_24ghz
+from helpers.channel_planner import (DEFAULT_INTERFERENCE_RADIUS,
+                                     build_position_neighbors,
+                                     plan_csv_rows,
+                                     planning_channels)
+from helpers.input_formats import INPUT_FORMATS, write_records
+from helpers.profiling import add_profile_arguments, start_profiling_from_args
 
 SCRIPT_PATH = pathlib.PurePath(os.path.dirname(os.path.abspath(__file__)))
 CSV_PATH = os.path.join(SCRIPT_PATH.parent, "scripts")
@@ -26,6 +33,13 @@ POD_NUMBER = WORKSHOP_ENV.get("POD_NUMBER", os.environ.get("POD_NUMBER"))
 
 FLOOR_AP_LOCATIONS = ("N", "S", "E", "W", "C")
 
+# Random 5GHz channels are drawn from the 20MHz channels pre-flight accepts
+RADIO1_CHANNEL_NUMBERS = tuple(planning_channels("5", 20))
+
+# AP density used when placing APs for channel planning
+DEFAULT_AP_SPACING = 20.0
+DEFAULT_FLOORS = 3
+
 DEVICE_TYPES = (
     "air-ap-2802e-b-k9",
     "air-ap-1815w-b-k9",
@@ -71,16 +85,20 @@ def generate_random_mac_address():
     return mac_address
 
 
-print("*" * 78)
-def create_access_point():
+def create_access_point(sequence=None, sequence_digits=3):
     """
     Generator to build a unique access point definition with random data.
+
+    :param sequence: Optional sequence number ending the device name, which
+        makes the names of a file unique; a random number by default
+    :param sequence_digits: Digits the sequence number is zero-padded to
     """
     # pylint: disable=line-too-long
-    yield "device_name", f"AP{random.randint(1, 20)}{random.choice(FLOOR_AP_LOCATIONS)}{random.randint(100, 1000)}"
+    name_suffix = random.randint(100, 1000) if sequence is None else f"{sequence:0{sequence_digits}d}"
+    yield "device_name", f"AP{random.randint(1, 20)}{random.choice(FLOOR_AP_LOCATIONS)}{name_suffix}"
     yield "device_role", "ap"
     yield "device_type", random.choice(DEVICE_TYPES)
-    yield "serial_number", f"Y{''.join(generate_random_string(2, char_only=True))}{generate_random_string(10)}"
+    yield "serial", f"Y{''.join(generate_random_string(2, char_only=True))}{generate_random_string(10)}"
     yield "asset_tag", generate_random_string(12)
     yield "site", "san-sdcc"
     yield "location", random.choice(NETBOX_LOCATIONS)
@@ -100,29 +118,80 @@ def create_access_point():
     yield "radio1_band", "5"
     yield "radio1_rf_role", "ap"
     yield "radio1_enabled", str(bool(random.getrandbits(1))).upper()
-    yield "radio1_channel_number", random.choice(list(netbox_channel_to_cisco_wlc_translation.values()))
+    yield "radio1_channel_number", random.choice(RADIO1_CHANNEL_NUMBERS)
     yield "radio1_channel_width", 20
     yield "radio1_tx_power", random.randint(9, 18)
 
-def generate_csv_file(ap_count=DEFAULT_AP_COUNT, output_file=DEFAULT_OUTPUT_FILE):
+def generate_ap_positions(ap_list, ap_spacing=DEFAULT_AP_SPACING, floors=DEFAULT_FLOORS):
+    """
+    Place each AP at a random position inside its NetBox location.  Each
+    location is a square area sized for the AP density, and locations are
+    placed far enough apart that they do not interfere with each other.
+
+    :param ap_list: List of AP dicts from create_access_point()
+    :param ap_spacing: Average distance between APs on a floor, in meters
+    :param floors: Number of floors per location
+    :return: Dict of device name to (x, y, floor)
+    """
+    aps_per_location = {}
+    for ap_data in ap_list:
+        aps_per_location.setdefault(ap_data["location"], []).append(ap_data["device_name"])
+
+    positions = {}
+    location_offset = 0.0
+    for location_aps in aps_per_location.values():
+        side = ap_spacing * math.sqrt(max(1, len(location_aps) / floors))
+        for device_name in location_aps:
+            positions[device_name] = (location_offset + random.uniform(0, side),
+                                      random.uniform(0, side),
+                                      random.randrange(floors))
+        location_offset += side + 10 * DEFAULT_INTERFERENCE_RADIUS
+    return positions
+
+
+def generate_csv_file(ap_count=DEFAULT_AP_COUNT, output_file=DEFAULT_OUTPUT_FILE,
+                      plan_channels=False, positions_file=None, output_format=None):
     """
     Build a specified number of access points and write them to a CSV file.
 
     :param ap_count: Number of access points to create
     :param output_file: CSV output file
+    :param plan_channels: Place the APs at random positions and plan their
+        channels for low co-channel interference instead of picking random
+        channels
+    :param positions_file: Optional CSV file to save the AP positions to,
+        for later re-planning with plan_channels.py
+    :param output_format: "csv", "jsonl", "parquet", or "arrow"; default:
+        from the output file extension, CSV if unknown
     :return: None
     """
+    print("*" * 78)
     ap_list = []
-    for _ in range(0, ap_count):
-        ap_data = dict(create_access_point())
+    # Random names can repeat; the importer needs them unique, so each name
+    # ends in its sequence number, padded to the same width for any count
+    sequence_digits = max(3, len(str(ap_count)))
+    for sequence in range(1, ap_count + 1):
+        ap_data = dict(create_access_point(sequence=sequence, sequence_digits=sequence_digits))
         print(f"  Creating AP '{ap_data.get('device_name')}'")
         ap_list.append(ap_data)
 
-    with open(output_file, 'w', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=dict(create_access_point()).keys())
-        writer.writeheader()
-        for row in ap_list:
-            writer.writerow(row)
+    if plan_channels or positions_file:
+        positions = generate_ap_positions(ap_list)
+        if positions_file:
+            with open(positions_file, 'w', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(("device_name", "x", "y", "floor"))
+                for device_name, (x, y, floor) in positions.items():
+                    writer.writerow((device_name, f"{x:.1f}", f"{y:.1f}", floor))
+
+        if plan_channels:
+            for plan in plan_csv_rows(ap_list, build_position_neighbors(positions)):
+                print(f"  Planned {plan['radio']} ({plan['band']}GHz) for "
+                      f"{plan['access_points']} APs: "
+                      f"{plan['overlapping_pairs']} overlapping neighbor pairs")
+
+    write_records(ap_list, output_file, columns=dict(create_access_point()).keys(),
+                  file_format=output_format)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -138,5 +207,22 @@ if __name__ == "__main__":
                         dest="device_count",
                         help="Number of devices to create",
                         type=int)
+    parser.add_argument("--plan-channels",
+                        action="store_true",
+                        dest="plan_channels",
+                        help="Plan channels for low co-channel interference "
+                             "instead of picking them at random")
+    parser.add_argument("--positions-file",
+                        dest="positions_file",
+                        help="Save the generated AP positions to this CSV file")
+    parser.add_argument("--format",
+                        choices=INPUT_FORMATS,
+                        dest="output_format",
+                        help="Output file format.  Default: from the output file "
+                             "extension, csv if unknown")
+    add_profile_arguments(parser)
     args, _ = parser.parse_known_args()
-    generate_csv_file(ap_count=args.device_count, output_file=args.output_file)
+    start_profiling_from_args(args, "generate")
+    generate_csv_file(ap_count=args.device_count, output_file=args.output_file,
+                      plan_channels=args.plan_channels, positions_file=args.positions_file,
+                      output_format=args.output_format)
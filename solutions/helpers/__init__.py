@@ -1,33 +1,183 @@
 """
 Package init for helper functions
+
+Helper modules pull in heavy dependencies (pynetbox, jinja2,
+requests_toolbelt), so exported names are resolved lazily on first access
+instead of importing every module when the package is imported.  The
+same names are imported under TYPE_CHECKING for static tools.
 """
+import importlib
+from typing import TYPE_CHECKING
+
+# Exported name -> helper module that defines it
+_LAZY_EXPORTS = {
+    "generate_device_details": "import_helpers",
+    "update_interfaces": "import_helpers",
+    "create_or_update_device": "import_helpers",
+    "import_csv_file": "import_helpers",
+    "apply_wlc_associations": "import_helpers",
+    "TransformedRow": "transform",
+    "map_device_fields": "transform",
+    "map_interface_fields": "transform",
+    "transform_rows": "transform",
+    "transform_input_file": "transform",
+    "FingerprintStore": "fingerprints",
+    "default_store_file": "fingerprints",
+    "export_inventory": "export",
+    "sync_radio_state": "state_sync",
+    "AsyncNetBoxReader": "netbox_async",
+    "configure_pod_async": "pod_helpers",
+    "configure_pod_streaming": "pipeline",
+    "iter_pod_inventory": "netbox_reads",
+    "WorkshopDaemon": "daemon",
+    "DaemonClient": "daemon",
+    "serve_daemon": "daemon",
+    "TelemetryCollector": "telemetry",
+    "TelemetryIndex": "telemetry",
+    "TelemetrySimulator": "telemetry",
+    "evaluate_telemetry": "telemetry",
+    "print_sync_summary": "state_sync",
+    "iter_export_rows": "export",
+    "read_records": "input_formats",
+    "read_record_batches": "input_formats",
+    "write_records": "input_formats",
+    "provision_ap_on_wlc": "wlc_helpers",
+    "provision_ap_radios": "wlc_helpers",
+    "provision_ap_on_pooled_wlc": "wlc_helpers",
+    "provision_aps_batched": "wlc_helpers",
+    "get_ap_wlc_associations": "wlc_helpers",
+    "WlcResolver": "wlc_helpers",
+    "create_request_session": "request_helpers",
+    "RequestSessionPool": "request_helpers",
+    "CircuitBreaker": "request_helpers",
+    "CircuitOpenError": "request_helpers",
+    "DeadlineExceededError": "request_helpers",
+    "RunDeadline": "request_helpers",
+    "print_deferred_report": "request_helpers",
+    "RestconfReadCache": "restconf_cache",
+    "print_read_cache_summary": "restconf_cache",
+    "validate_ap_name": "wlc_test_helpers",
+    # "validate_ap_tags": "wlc_test_helpers",
+    "validate_ap_radios": "wlc_test_helpers",
+    "print_validation_summary": "wlc_test_helpers",
+    "write_validation_reports": "wlc_test_helpers",
+    "CheckResult": "validation",
+    "summarize_results": "validation",
+    "write_json_report": "validation",
+    "write_junit_report": "validation",
+    "AccessPoint": "inventory",
+    "ApRadio": "inventory",
+    "WirelessController": "inventory",
+    "access_point_from_netbox": "inventory",
+    "normalize_mac": "inventory",
+    "configure_pod": "pod_helpers",
+    "test_pod": "pod_helpers",
+    "parse_pod_list": "pod_helpers",
+    "run_pods": "pod_helpers",
+    "configure_pods_scheduled": "pod_helpers",
+    "FairScheduler": "scheduler",
+    "schedule_provisioning": "scheduler",
+    "print_scheduler_summary": "scheduler",
+    "print_pod_summary": "pod_helpers",
+    "wait_for_convergence": "convergence",
+    "print_convergence_summary": "convergence",
+    "reconcile_wlc": "reconcile",
+    "reconcile_wlcs": "reconcile",
+    "print_reconcile_summary": "reconcile",
+    "CapabilityCache": "capabilities",
+    "WlcCapabilities": "capabilities",
+    "discover_capabilities": "capabilities",
+    "create_netbox_api": "netbox_reads",
+    "iter_record_pages": "netbox_reads",
+    "fetch_records": "netbox_reads",
+    "fetch_interfaces_by_device": "netbox_reads",
+    "load_pod_inventory": "netbox_reads",
+    "build_position_neighbors": "channel_planner",
+    "build_adjacency_neighbors": "channel_planner",
+    "plan_channels": "channel_planner",
+    "plan_csv_rows": "channel_planner",
+    "co_channel_interference": "channel_planner",
+    "PreflightReport": "preflight",
+    "preflight_csv_file": "preflight",
+    "print_preflight_report": "preflight",
+    "RadioArrays": "rf_analytics",
+    "load_radio_arrays": "rf_analytics",
+    "build_rf_report": "rf_analytics",
+    "print_rf_report": "rf_analytics",
+    "flush_events": "events",
+    "profile_phase": "profiling",
+    "start_profiling": "profiling",
+    "stop_profiling": "profiling",
+    "add_profile_arguments": "profiling",
+    "start_profiling_from_args": "profiling",
+    # "get_rf_channel_value": "rf_channel_map",
+    # "parse_netbox_rf_channel": "rf_channel_map",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+if TYPE_CHECKING:
+    # Static tools (pylint, IDEs, type checkers) see the exports here;
+    # at run time they are resolved by __getattr__ below
+    from .import_helpers import (generate_device_details, update_interfaces,
+                                 create_or_update_device, import_csv_file, apply_wlc_associations)
+    from .transform import (TransformedRow, map_device_fields, map_interface_fields,
+                            transform_rows, transform_input_file)
+    from .fingerprints import FingerprintStore, default_store_file
+    from .export import export_inventory, iter_export_rows
+    from .state_sync import sync_radio_state, print_sync_summary
+    from .netbox_async import AsyncNetBoxReader
+    from .pod_helpers import (configure_pod_async, configure_pod, test_pod, parse_pod_list,
+                              run_pods, configure_pods_scheduled, print_pod_summary)
+    from .pipeline import configure_pod_streaming
+    from .netbox_reads import (iter_pod_inventory, create_netbox_api, iter_record_pages,
+                               fetch_records, fetch_interfaces_by_device, load_pod_inventory)
+    from .daemon import WorkshopDaemon, DaemonClient, serve_daemon
+    from .telemetry import (TelemetryCollector, TelemetryIndex, TelemetrySimulator,
+                            evaluate_telemetry)
+    from .input_formats import read_records, read_record_batches, write_records
+    from .wlc_helpers import (provision_ap_on_wlc, provision_ap_radios, provision_ap_on_pooled_wlc,
+                              provision_aps_batched, get_ap_wlc_associations, WlcResolver)
+    from .request_helpers import (create_request_session, RequestSessionPool, CircuitBreaker,
+                                  CircuitOpenError, DeadlineExceededError, RunDeadline,
+                                  print_deferred_report)
+    from .restconf_cache import RestconfReadCache, print_read_cache_summary
+    from .wlc_test_helpers import (validate_ap_name, validate_ap_radios, print_validation_summary,
+                                   write_validation_reports)
+    from .validation import (CheckResult, summarize_results, write_json_report,
+                             write_junit_report)
+    from .inventory import (AccessPoint, ApRadio, WirelessController, access_point_from_netbox,
+                            normalize_mac)
+    from .scheduler import FairScheduler, schedule_provisioning, print_scheduler_summary
+    from .convergence import wait_for_convergence, print_convergence_summary
+    from .reconcile import reconcile_wlc, reconcile_wlcs, print_reconcile_summary
+    from .capabilities import CapabilityCache, WlcCapabilities, discover_capabilities
+    from .channel_planner import (build_position_neighbors, build_adjacency_neighbors,
+                                  plan_channels, plan_csv_rows, co_channel_interference)
+    from .preflight import PreflightReport, preflight_csv_file, print_preflight_report
+    from .rf_analytics import RadioArrays, load_radio_arrays, build_rf_report, print_rf_report
+    from .events import flush_events
+    from .profiling import (profile_phase, start_profiling, stop_profiling, add_profile_arguments,
+                            start_profiling_from_args)
+
+
+def __getattr__(name):
+    """
+    Import the helper module defining an exported name on first access.
+
+    :param name: Attribute name requested from the package
+    :return: The exported object
+    """
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    helper_module = importlib.import_module(f".{_LAZY_EXPORTS[name]}", __name__)
+    exported_value = getattr(helper_module, name)
+
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = exported_value
+    return exported_value
+
 
-from .request_helpers import create_request_session
-
-from .import_helpers import (generate_device_details,
-                             update_interfaces,
-                             create_or_update_device)
-
-from .wlc_helpers import (provision_ap_on_wlc,
-                          provision_ap_radios,
-                          get_ap_wlc_associations)
-
-from .wlc_test_helpers import (validate_ap_name,
-                               # validate_ap_tags,
-                               validate_ap_radios)
-
-# from .rf_channel_map import (get_rf_channel_value,
-#                              parse_netbox_rf_channel)
-
-__all__ = [
-    "generate_device_details",
-    "update_interfaces",
-    "create_or_update_device",
-    "provision_ap_on_wlc",
-    "provision_ap_radios",
-    "get_ap_wlc_associations",
-    "create_request_session",
-    "validate_ap_name",
-    # "validate_ap_tags",
-    "validate_ap_radios"
-]
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
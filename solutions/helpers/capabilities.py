@@ -0,0 +1,235 @@
+"""
+Discover and cache what each WLC's RESTCONF API supports.
+
+Discovery reads the software version, the RESTCONF capabilities, the YANG
+library, and whether NETCONF is enabled, then picks a provisioning strategy
+and batch size for the controller.  Results are cached on disk per host and
+software version:
+
+    <cache dir>/<host>/index.json      software version last seen, and when
+    <cache dir>/<host>/<version>.json  capabilities of that version
+
+While the index is younger than the TTL, a run uses the cached capabilities
+without contacting the controller.  Once it is older, a single version
+request decides whether the cached capabilities still apply or the
+controller was upgraded and must be discovered again.
+"""
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from requests.exceptions import HTTPError
+from .events import emit
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                                os.path.expanduser("~/.cache")),
+                                 "devwks-2275", "capabilities")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+VERSION_URL = "data/Cisco-IOS-XE-native:native/version"
+RESTCONF_CAPABILITIES_URL = "data/ietf-restconf-monitoring:restconf-state/capabilities"
+YANG_LIBRARY_URL = "data/ietf-yang-library:modules-state"
+NETCONF_URL = "data/Cisco-IOS-XE-native:native/netconf-yang"
+
+YANG_PATCH_CAPABILITY = "urn:ietf:params:restconf:capability:yang-patch:1.0"
+FIELDS_CAPABILITY = "urn:ietf:params:restconf:capability:fields:1.0"
+
+# List entries per batched request, by minimum software version.  Older
+# releases get smaller batches to keep each config transaction short.
+BATCH_SIZE_BY_VERSION = (
+    ((17, 9), 200),
+    ((17, 3), 100),
+    ((0,), 25),
+)
+
+STRATEGY_BATCHED_MERGE = "batched-merge"
+STRATEGY_PER_AP = "per-ap"
+
+
+@dataclass(slots=True, frozen=True)
+class WlcCapabilities:
+    """
+    RESTCONF features of one WLC software version, and the provisioning
+    strategy chosen for it.
+    """
+    host: str
+    version: str
+    yang_patch: bool
+    fields: bool
+    netconf: bool
+    strategy: str
+    batch_size: int
+    modules: dict = field(default_factory=dict)
+    discovered: float = 0.0
+
+
+def parse_version(version):
+    """
+    :param version: Software version string, e.g. "17.9"
+    :return: Tuple of version numbers, e.g. (17, 9)
+    """
+    return tuple(int(number) for number in re.findall(r"\d+", str(version)))
+
+
+def choose_batch_size(version):
+    """
+    :param version: Software version string
+    :return: Batch size for the version from BATCH_SIZE_BY_VERSION
+    """
+    version_numbers = parse_version(version)
+    for minimum_version, batch_size in BATCH_SIZE_BY_VERSION:
+        if version_numbers >= minimum_version:
+            return batch_size
+    return BATCH_SIZE_BY_VERSION[-1][1]
+
+
+def _get_json(request_session, url):
+    """
+    GET a RESTCONF resource, returning None if it does not exist.
+    """
+    try:
+        return request_session.get(url=url).json()
+    except HTTPError as err:
+        if err.response is not None and err.response.status_code in (400, 404):
+            return None
+        raise
+
+
+def fetch_wlc_version(request_session):
+    """
+    :param request_session: Request session reference to RESTCONF endpoint
+    :return: Software version string, or "unknown"
+    """
+    version_data = _get_json(request_session, VERSION_URL) or {}
+    return str(next(iter(version_data.values()), "unknown"))
+
+
+def discover_capabilities(request_session, host, version=None):
+    """
+    Discover the RESTCONF capabilities, YANG modules, and NETCONF state of
+    a WLC.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param host: WLC host name
+    :param version: Software version, if already known
+    :return: WlcCapabilities
+    """
+    version = version or fetch_wlc_version(request_session)
+
+    capabilities_data = _get_json(request_session, RESTCONF_CAPABILITIES_URL) or {}
+    capability_uris = set(next(iter(capabilities_data.values()), {}).get("capability", ()))
+
+    library_data = _get_json(request_session, YANG_LIBRARY_URL) or {}
+    modules = {module.get("name"): module.get("revision", "")
+               for module in next(iter(library_data.values()), {}).get("module", ())}
+
+    netconf = _get_json(request_session, NETCONF_URL) is not None
+
+    return WlcCapabilities(host=host,
+                           version=version,
+                           yang_patch=YANG_PATCH_CAPABILITY in capability_uris,
+                           fields=FIELDS_CAPABILITY in capability_uris,
+                           netconf=netconf,
+                           # Without a known version, keep to the proven per-AP path
+                           strategy=STRATEGY_BATCHED_MERGE if version != "unknown"
+                           else STRATEGY_PER_AP,
+                           batch_size=choose_batch_size(version),
+                           modules=modules,
+                           discovered=time.time())
+
+
+class CapabilityCache:
+    """
+    In-memory and on-disk cache of WlcCapabilities per WLC host.  Safe to
+    share between threads.
+    """
+    def __init__(self, session_pool, cache_dir=DEFAULT_CACHE_DIR,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, refresh=False):
+        """
+        :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+        :param cache_dir: Directory of the on-disk cache
+        :param ttl_seconds: Seconds a host's cached version is trusted
+            without asking the controller
+        :param refresh: Discover every controller again, ignoring the cache
+        """
+        self.session_pool = session_pool
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.refresh = refresh
+        self._capabilities = {}
+        self._lock = threading.Lock()
+
+    def _host_dir(self, host):
+        return os.path.join(self.cache_dir, re.sub(r"[^A-Za-z0-9._-]", "_", host))
+
+    def _read_json(self, file_name):
+        try:
+            with open(file_name, "r", encoding="utf-8") as json_file:
+                return json.load(json_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, file_name, data):
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        # Write a temporary file first so concurrent runs never read a
+        # partially written cache file
+        temp_file_name = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file_name, "w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, indent=2)
+        os.replace(temp_file_name, file_name)
+
+    def _load(self, host):
+        """
+        Load the capabilities of a host from disk, or discover them.
+        """
+        host_dir = self._host_dir(host)
+        index_file = os.path.join(host_dir, "index.json")
+        index = None if self.refresh else self._read_json(index_file)
+
+        def version_file(version):
+            return os.path.join(host_dir, f"{re.sub(r'[^A-Za-z0-9._-]', '_', version)}.json")
+
+        # Fresh index: no requests at all
+        if index and time.time() - index.get("checked", 0) < self.ttl_seconds:
+            if cached := self._read_json(version_file(index["version"])):
+                return WlcCapabilities(**cached), "cache"
+
+        request_session = self.session_pool.get(host)
+        version = fetch_wlc_version(request_session)
+        cached = None if self.refresh else self._read_json(version_file(version))
+        if cached:
+            capabilities, source = WlcCapabilities(**cached), "cache-revalidated"
+        else:
+            capabilities = discover_capabilities(request_session, host, version)
+            self._write_json(version_file(version), asdict(capabilities))
+            source = "discovered"
+
+        self._write_json(index_file, {"version": version, "checked": time.time()})
+        return capabilities, source
+
+    def get(self, host):
+        """
+        Get the capabilities of a WLC host, discovering them on a cold cache.
+
+        :param host: WLC host name, as used by the session pool
+        :return: WlcCapabilities
+        """
+        with self._lock:
+            if host in self._capabilities:
+                return self._capabilities[host]
+
+        capabilities, source = self._load(host)
+        emit("wlc.capabilities", wlc_host=host, source=source, version=capabilities.version,
+             yang_patch=capabilities.yang_patch, fields=capabilities.fields,
+             netconf=capabilities.netconf, strategy=capabilities.strategy,
+             batch_size=capabilities.batch_size,
+             text=f"WLC {host}: version {capabilities.version}, "
+                  f"strategy {capabilities.strategy} (batch {capabilities.batch_size}), "
+                  f"YANG Patch {'yes' if capabilities.yang_patch else 'no'}, "
+                  f"fields {'yes' if capabilities.fields else 'no'}, "
+                  f"NETCONF {'yes' if capabilities.netconf else 'no'} [{source}]")
+
+        with self._lock:
+            return self._capabilities.setdefault(host, capabilities)
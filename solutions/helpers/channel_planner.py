@@ -0,0 +1,275 @@
+"""
+RF channel planning for access point radios.
+
+Channels are assigned to keep co-channel interference between neighboring
+APs low.  Neighbors come either from AP positions - found with a grid
+spatial index, weighted by distance - or from an explicit adjacency list.
+Channels are then assigned greedily, busiest AP first, picking for each AP
+the allowed channel that overlaps the least with its already planned
+neighbors, followed by a refinement pass.
+
+Allowed channels and widths come from rf_channel_map, and the planned
+channel numbers are values the CSV importer accepts for the chosen width.
+"""
+import math
+from .rf_channel_map import (allowed_channel_numbers_24ghz,
+                             allowed_channel_numbers_5ghz,
+                             allowed_channel_width_5ghz,
+                             channel_center_frequencies,
+                             denied_channel_numbers_5ghz,
+                             netbox_channel_width_translation)
+
+DEFAULT_INTERFERENCE_RADIUS = 30.0
+DEFAULT_FLOOR_HEIGHT = 4.0
+
+
+def is_primary_channel_5ghz(channel_number):
+    """
+    Is the channel a 20MHz 5GHz channel (36, 40, ... 144, 149, ... 165)?
+
+    :param channel_number: Channel number
+    :return: True for 20MHz primary channels
+    """
+    if channel_number >= 149:
+        return (channel_number - 149) % 4 == 0
+    return (channel_number - 36) % 4 == 0
+
+
+def planning_channels(band, channel_width=None):
+    """
+    Get the channels available to the planner for a band and width, with the
+    20MHz sub-channels each one occupies.  Bonded channels overlapping a
+    denied channel are not offered.
+
+    :param band: "2.4" or "5"
+    :param channel_width: Channel width in MHz (5GHz only)
+    :return: Dict of channel number to frozenset of occupied 20MHz channels
+    :raises ValueError: If the band or width is not supported
+    """
+    if str(band) == "2.4":
+        # 1, 6, and 11 do not overlap each other
+        return {channel: frozenset((channel,)) for channel in allowed_channel_numbers_24ghz}
+
+    if str(band) != "5":
+        raise ValueError(f"Unsupported band '{band}'")
+
+    channel_width = int(channel_width or 20)
+    if channel_width not in allowed_channel_width_5ghz:
+        raise ValueError(f"Unsupported 5GHz channel width '{channel_width}'")
+
+    if channel_width == 20:
+        return {channel: frozenset((channel,)) for channel in allowed_channel_numbers_5ghz
+                if is_primary_channel_5ghz(channel)}
+
+    candidates = {}
+    for bonded_channels, center_channel in netbox_channel_width_translation[channel_width].items():
+        occupied = frozenset(c for c in bonded_channels if is_primary_channel_5ghz(c))
+        if center_channel in channel_center_frequencies and \
+                center_channel not in denied_channel_numbers_5ghz and \
+                not occupied & set(denied_channel_numbers_5ghz):
+            candidates[center_channel] = occupied
+    return candidates
+
+
+def build_position_neighbors(positions, radius=DEFAULT_INTERFERENCE_RADIUS,
+                             floor_height=DEFAULT_FLOOR_HEIGHT):
+    """
+    Find APs within interference range of each other using a uniform grid
+    spatial index, so only APs in adjacent grid cells are compared.
+
+    :param positions: Dict of AP name to (x, y) or (x, y, floor) in meters
+    :param radius: Interference radius in meters
+    :param floor_height: Distance between floors in meters
+    :return: Dict of AP name to list of (neighbor name, weight) tuples. The
+        weight is 1 for co-located APs, falling to 0 at the radius.
+    """
+    points = {}
+    grid = {}
+    for ap_name, position in positions.items():
+        x, y = float(position[0]), float(position[1])
+        z = float(position[2]) * floor_height if len(position) > 2 else 0.0
+        points[ap_name] = (x, y, z)
+        cell = (math.floor(x / radius), math.floor(y / radius), math.floor(z / radius))
+        grid.setdefault(cell, []).append(ap_name)
+
+    neighbors = {ap_name: [] for ap_name in points}
+    radius_squared = radius ** 2
+    cell_offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+    for (cell_x, cell_y, cell_z), cell_aps in grid.items():
+        nearby_aps = [other for dx, dy, dz in cell_offsets
+                      for other in grid.get((cell_x + dx, cell_y + dy, cell_z + dz), ())]
+        for ap_name in cell_aps:
+            x, y, z = points[ap_name]
+            ap_neighbors = neighbors[ap_name]
+            for other in nearby_aps:
+                if other == ap_name:
+                    continue
+                other_x, other_y, other_z = points[other]
+                distance_squared = (x - other_x) ** 2 + (y - other_y) ** 2 + (z - other_z) ** 2
+                if distance_squared < radius_squared:
+                    ap_neighbors.append((other, 1.0 - math.sqrt(distance_squared) / radius))
+    return neighbors
+
+
+def build_adjacency_neighbors(adjacency_pairs, ap_names=()):
+    """
+    Build the neighbor map from an explicit list of neighboring AP pairs,
+    e.g. from RF neighbor reports.  Pairs are treated as symmetric.
+
+    :param adjacency_pairs: Iterable of (AP name, neighbor name) or
+        (AP name, neighbor name, weight) tuples
+    :param ap_names: Optional AP names to include even without neighbors
+    :return: Dict of AP name to list of (neighbor name, weight) tuples
+    """
+    weights = {}
+    for pair in adjacency_pairs:
+        ap_name, neighbor_name = pair[0], pair[1]
+        if ap_name == neighbor_name:
+            continue
+        weight = float(pair[2]) if len(pair) > 2 and pair[2] not in ("", None) else 1.0
+        edge = (ap_name, neighbor_name) if ap_name < neighbor_name else (neighbor_name, ap_name)
+        weights[edge] = max(weight, weights.get(edge, 0.0))
+
+    neighbors = {ap_name: [] for ap_name in ap_names}
+    for (ap_name, neighbor_name), weight in weights.items():
+        neighbors.setdefault(ap_name, []).append((neighbor_name, weight))
+        neighbors.setdefault(neighbor_name, []).append((ap_name, weight))
+    return neighbors
+
+
+def _channel_conflicts(channels):
+    """
+    For each candidate channel, list the candidate channels it overlaps.
+    """
+    return {channel: [other for other, other_occupied in channels.items()
+                      if occupied & other_occupied]
+            for channel, occupied in channels.items()}
+
+
+def plan_channels(neighbors, band, channel_width=None, refinement_passes=1):
+    """
+    Assign a channel to every AP, minimizing the summed weight of neighbors
+    whose channel overlaps.
+
+    :param neighbors: Dict of AP name to list of (neighbor name, weight)
+    :param band: "2.4" or "5"
+    :param channel_width: Channel width in MHz (5GHz only)
+    :param refinement_passes: Extra passes re-choosing each AP's channel
+        with every neighbor already planned
+    :return: Dict of AP name to planned channel number
+    """
+    channels = planning_channels(band, channel_width)
+    channel_order = sorted(channels)
+    conflicts = _channel_conflicts(channels)
+    usage = dict.fromkeys(channel_order, 0)
+    assignment = {}
+
+    def best_channel(ap_name):
+        cost = dict.fromkeys(channel_order, 0.0)
+        for neighbor_name, weight in neighbors[ap_name]:
+            neighbor_channel = assignment.get(neighbor_name)
+            if neighbor_channel is not None:
+                for conflicting_channel in conflicts[neighbor_channel]:
+                    cost[conflicting_channel] += weight
+        # Lowest interference, then the least used channel to spread load
+        return min(channel_order, key=lambda channel: (cost[channel], usage[channel]))
+
+    # Plan the most constrained APs (highest neighbor weight) first
+    ap_order = sorted(neighbors,
+                      key=lambda ap_name: sum(weight for _, weight in neighbors[ap_name]),
+                      reverse=True)
+    for ap_name in ap_order:
+        assignment[ap_name] = best_channel(ap_name)
+        usage[assignment[ap_name]] += 1
+
+    for _ in range(refinement_passes):
+        for ap_name in ap_order:
+            usage[assignment.pop(ap_name)] -= 1
+            assignment[ap_name] = best_channel(ap_name)
+            usage[assignment[ap_name]] += 1
+
+    return assignment
+
+
+def co_channel_interference(assignment, neighbors, band, channel_width=None):
+    """
+    Sum the weight of neighboring AP pairs whose planned channels overlap.
+
+    :param assignment: Dict of AP name to channel number
+    :param neighbors: Dict of AP name to list of (neighbor name, weight)
+    :param band: "2.4" or "5"
+    :param channel_width: Channel width in MHz (5GHz only)
+    :return: Tuple of (overlapping pair count, summed overlap weight)
+    """
+    channels = planning_channels(band, channel_width)
+    pair_count = 0
+    total_weight = 0.0
+    for ap_name, ap_neighbors in neighbors.items():
+        occupied = channels[assignment[ap_name]]
+        for neighbor_name, weight in ap_neighbors:
+            if ap_name < neighbor_name and occupied & channels[assignment[neighbor_name]]:
+                pair_count += 1
+                total_weight += weight
+    return pair_count, total_weight
+
+
+def apply_channel_plan(csv_rows, assignment, radio_name, channel_width=None):
+    """
+    Write planned channels into import CSV rows for one radio.
+
+    :param csv_rows: List of CSV row dicts, updated in place
+    :param assignment: Dict of AP (device) name to channel number
+    :param radio_name: Radio column prefix, e.g. "radio1"
+    :param channel_width: Channel width in MHz, default 20 for 5GHz.  2.4GHz
+        radios keep an empty width so the importer applies its default.
+    :return: Number of rows updated
+    """
+    updated_rows = 0
+    for csv_row in csv_rows:
+        if (channel := assignment.get(csv_row.get("device_name"))) is None:
+            continue
+        csv_row[f"{radio_name}_channel_number"] = channel
+        if str(csv_row.get(f"{radio_name}_band")) == "2.4":
+            csv_row[f"{radio_name}_channel_width"] = ""
+        else:
+            csv_row[f"{radio_name}_channel_width"] = int(channel_width or 20)
+        updated_rows += 1
+    return updated_rows
+
+
+def plan_csv_rows(csv_rows, neighbors, channel_width_5ghz=20,
+                  radio_names=("radio0", "radio1", "radio2", "radio3")):
+    """
+    Plan the channels of every radio column of import CSV rows.  Each radio
+    column is planned per band, between the APs using that band on it.
+
+    :param csv_rows: List of CSV row dicts, updated in place
+    :param neighbors: Dict of AP name to list of (neighbor name, weight)
+    :param channel_width_5ghz: Channel width used for 5GHz radios
+    :param radio_names: Radio column prefixes to plan
+    :return: List of dicts describing each planned radio/band: radio, band,
+        width, APs planned, overlapping pairs, and overlap weight
+    """
+    plan_summary = []
+    for radio_name in radio_names:
+        aps_by_band = {}
+        for csv_row in csv_rows:
+            if band := str(csv_row.get(f"{radio_name}_band") or ""):
+                aps_by_band.setdefault(band, set()).add(csv_row["device_name"])
+
+        for band, band_aps in aps_by_band.items():
+            channel_width = channel_width_5ghz if band == "5" else None
+            band_neighbors = {
+                ap_name: [(other, weight) for other, weight in neighbors.get(ap_name, ())
+                          if other in band_aps]
+                for ap_name in band_aps
+            }
+            assignment = plan_channels(band_neighbors, band, channel_width)
+            apply_channel_plan(csv_rows, assignment, radio_name, channel_width)
+            overlap_pairs, overlap_weight = co_channel_interference(assignment, band_neighbors,
+                                                                    band, channel_width)
+            plan_summary.append({"radio": radio_name, "band": band,
+                                 "width": channel_width, "access_points": len(band_aps),
+                                 "overlapping_pairs": overlap_pairs,
+                                 "overlap_weight": overlap_weight})
+    return plan_summary
@@ -0,0 +1,303 @@
+"""
+Wait for provisioned APs to join their WLCs and apply their radio settings.
+
+Each controller is polled with one bulk request for its AP operational data
+per interval - not one request per AP - and every target AP on it is
+checked against that snapshot:
+
+    - joined: the AP Ethernet MAC is in the WLC "ap-name-mac-map"
+    - radios: every NetBox radio has an entry in "radio-oper-data" with the
+      provisioned channel, width, and tx power level, where the WLC reports
+      them
+
+Poll intervals adapt: while APs keep converging the minimum interval is
+used, and the interval backs off while nothing changes.  Controllers are
+polled concurrently, and each stops at convergence or the deadline.
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import RequestException
+from .events import emit, flush_events
+from .inventory import normalize_mac
+from .profiling import profile_phase
+
+AP_OPER_URL = "data/Cisco-IOS-XE-wireless-access-point-oper:access-point-oper-data"
+
+# Only the lists and leaves the convergence check reads (RESTCONF "fields")
+AP_OPER_FIELDS = ("ap-name-mac-map(wtp-name;wtp-mac;eth-mac);"
+                  "radio-oper-data(wtp-mac;radio-slot-id;admin-state;oper-state;"
+                  "phy-ht-cfg/cfg-data(curr-freq;chan-width);"
+                  "radio-band-info/phy-tx-pwr-cfg/cfg-data/current-tx-power-level)")
+
+DEFAULT_DEADLINE_SECONDS = 600
+DEFAULT_MIN_INTERVAL = 2.0
+DEFAULT_MAX_INTERVAL = 30.0
+DEFAULT_BACKOFF = 1.5
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    :param values: List of numbers
+    :param percent: Percentile, 0-100
+    :return: Percentile value, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _first_value(entry, *path):
+    """
+    Follow a path of keys through nested dicts, taking the first element of
+    any list on the way.  Returns None when any step is missing.
+    """
+    value = entry
+    for key in path:
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def index_ap_oper_data(oper_data):
+    """
+    Index a bulk AP operational data snapshot by AP Ethernet MAC.
+
+    :param oper_data: "access-point-oper-data" dict from the WLC
+    :return: Dict of AP Ethernet MAC to dict of radio slot ID to radio
+        state dict (oper_state, admin_state, channel, channel_width, tx_power)
+    """
+    radio_macs = {}
+    for ap_entry in oper_data.get("ap-name-mac-map", ()):
+        if ap_entry.get("eth-mac") and ap_entry.get("wtp-mac"):
+            radio_macs[normalize_mac(ap_entry["wtp-mac"])] = normalize_mac(ap_entry["eth-mac"])
+
+    # Joined APs without radio data yet still count as joined
+    ap_states = {eth_mac: {} for eth_mac in radio_macs.values()}
+    for radio_entry in oper_data.get("radio-oper-data", ()):
+        eth_mac = radio_macs.get(normalize_mac(radio_entry.get("wtp-mac")))
+        if eth_mac is None:
+            continue
+        channel_width = _first_value(radio_entry, "phy-ht-cfg", "cfg-data", "chan-width")
+        width_digits = re.search(r"\d+", str(channel_width)) if channel_width else None
+        tx_power = _first_value(radio_entry, "radio-band-info", "phy-tx-pwr-cfg", "cfg-data",
+                                "current-tx-power-level")
+        channel = _first_value(radio_entry, "phy-ht-cfg", "cfg-data", "curr-freq")
+        ap_states[eth_mac][int(radio_entry.get("radio-slot-id", -1))] = {
+            "oper_state": radio_entry.get("oper-state"),
+            "admin_state": radio_entry.get("admin-state"),
+            "channel": int(channel) if channel is not None else None,
+            "channel_width": int(width_digits.group()) if width_digits else None,
+            "tx_power": int(tx_power) if tx_power is not None else None,
+        }
+    return ap_states
+
+
+def ap_converged(ap, radio_states):
+    """
+    Check an AP against its WLC operational state.  Values the WLC does not
+    report are not compared.
+
+    :param ap: AccessPoint
+    :param radio_states: Dict of slot ID to radio state for the AP, or None
+        if the AP has not joined
+    :return: True if the AP joined and every radio matches NetBox
+    """
+    if radio_states is None:
+        return False
+    for radio in ap.radios:
+        radio_state = radio_states.get(radio.slot_id)
+        if radio_state is None:
+            return False
+        if not radio.enabled:
+            continue
+        for setting in ("channel", "channel_width", "tx_power"):
+            wlc_value = radio_state[setting]
+            # 2.4GHz width is reported as 20MHz but kept as 22 for NetBox
+            if setting == "channel_width" and radio.radio_band == "24":
+                continue
+            if wlc_value is not None and wlc_value != getattr(radio, setting):
+                return False
+    return True
+
+
+@profile_phase("validate")
+def fetch_ap_oper_data(request_session, use_fields=True):
+    """
+    Read the AP operational data of a WLC.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param use_fields: Request only the needed lists and leaves in one
+        request.  Without it, the two lists are read separately.
+    :return: "access-point-oper-data" dict with the "ap-name-mac-map" and
+        "radio-oper-data" lists
+    """
+    if use_fields:
+        restconf_result = request_session.get(url=AP_OPER_URL, params={"fields": AP_OPER_FIELDS})
+        return next(iter(restconf_result.json().values()), {})
+
+    oper_data = {}
+    for list_name in ("ap-name-mac-map", "radio-oper-data"):
+        restconf_result = request_session.get(url=f"{AP_OPER_URL}/{list_name}")
+        oper_data[list_name] = next(iter(restconf_result.json().values()), [])
+    return oper_data
+
+
+def wait_for_wlc(request_session, wlc_name, access_points,
+                 deadline_seconds=DEFAULT_DEADLINE_SECONDS,
+                 min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 backoff=DEFAULT_BACKOFF, use_fields=True, clock=time.monotonic,
+                 sleep=time.sleep):
+    """
+    Poll one WLC until all of its target APs converged or the deadline passed.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param wlc_name: Name of the WLC, used in the event log
+    :param access_points: AccessPoint records expected on the WLC
+    :param deadline_seconds: Seconds to wait before giving up
+    :param min_interval: Poll interval while APs keep converging
+    :param max_interval: Longest poll interval
+    :param backoff: Interval multiplier after a poll without progress
+    :param use_fields: Use one RESTCONF "fields" request per poll
+    :param clock: Monotonic clock function
+    :param sleep: Sleep function
+    :return: Dict with the WLC name, target, converged and pending AP counts,
+        pending AP names, polls, poll errors, and time-to-converge
+        percentiles in seconds
+    """
+    start_time = clock()
+    deadline = start_time + deadline_seconds
+    pending = {ap.mac: ap for ap in access_points if ap.mac}
+    converge_times = []
+    polls = poll_errors = 0
+    interval = min_interval
+
+    while pending:
+        polls += 1
+        try:
+            ap_states = index_ap_oper_data(fetch_ap_oper_data(request_session, use_fields))
+        except RequestException as err:
+            poll_errors += 1
+            ap_states = None
+            emit("converge.error", level="error", wlc=wlc_name, error=str(err),
+                 text=f"\tPolling WLC '{wlc_name}' failed: {err}")
+
+        newly_converged = []
+        if ap_states is not None:
+            elapsed = clock() - start_time
+            newly_converged = [ap_mac for ap_mac, ap in pending.items()
+                               if ap_converged(ap, ap_states.get(ap_mac))]
+            for ap_mac in newly_converged:
+                ap = pending.pop(ap_mac)
+                converge_times.append(elapsed)
+                emit("ap.converged", ap=ap.name, ap_mac=ap_mac, wlc=wlc_name,
+                     seconds=round(elapsed, 1),
+                     text=f"\tAP {ap.name} converged on '{wlc_name}' after {elapsed:.1f}s")
+
+        if not pending:
+            break
+        # Poll again soon while APs are converging; back off while idle
+        interval = min_interval if newly_converged else min(max_interval, interval * backoff)
+        remaining = deadline - clock()
+        if remaining <= 0:
+            break
+        sleep(min(interval, remaining))
+
+    result = {"wlc": wlc_name,
+              "targets": len(converge_times) + len(pending),
+              "converged": len(converge_times),
+              "pending": len(pending),
+              "pending_aps": sorted(ap.name for ap in pending.values()),
+              "polls": polls,
+              "poll_errors": poll_errors,
+              "seconds": clock() - start_time}
+    for percent in (50, 90, 99):
+        result[f"p{percent}"] = percentile(converge_times, percent)
+    result["max"] = max(converge_times, default=None)
+    return result
+
+
+def wait_for_convergence(access_points, wlc_resolver, session_pool,
+                         deadline_seconds=DEFAULT_DEADLINE_SECONDS,
+                         min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                         use_fields=True, capability_cache=None):
+    """
+    Wait for APs to converge on every WLC they are associated with.  All
+    controllers are polled at the same time.
+
+    :param access_points: Iterable of AccessPoint records
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param deadline_seconds: Seconds to wait before giving up
+    :param min_interval: Poll interval while APs keep converging
+    :param max_interval: Longest poll interval
+    :param use_fields: Use one RESTCONF "fields" request per poll
+    :param capability_cache: Optional CapabilityCache; when given, "fields"
+        requests are only used on WLCs that support them
+    :return: List of per-WLC result dicts from wait_for_wlc(), by WLC name
+    """
+    aps_by_wlc = {}
+    for ap in access_points:
+        for wlc_id in ap.wlc_ids:
+            aps_by_wlc.setdefault(wlc_resolver.resolve(wlc_id), []).append(ap)
+    if not aps_by_wlc:
+        return []
+
+    # Never wait past the deadline of the whole run
+    if session_pool.deadline is not None:
+        deadline_seconds = min(deadline_seconds, session_pool.deadline.remaining())
+
+    emit("converge.start", wlcs=len(aps_by_wlc), deadline=deadline_seconds,
+         text=f"Waiting up to {deadline_seconds}s for APs to converge on "
+              f"{len(aps_by_wlc)} WLC(s)...")
+
+    def wlc_use_fields(wlc):
+        if capability_cache is None:
+            return use_fields
+        try:
+            return use_fields and capability_cache.get(wlc.dns_name).fields
+        except RequestException:
+            return use_fields
+
+    with ThreadPoolExecutor(max_workers=len(aps_by_wlc)) as executor:
+        results = executor.map(
+            lambda wlc: wait_for_wlc(request_session=session_pool.get(wlc.dns_name),
+                                     wlc_name=wlc.name,
+                                     access_points=aps_by_wlc[wlc],
+                                     deadline_seconds=deadline_seconds,
+                                     min_interval=min_interval,
+                                     max_interval=max_interval,
+                                     use_fields=wlc_use_fields(wlc)),
+            sorted(aps_by_wlc, key=lambda wlc: wlc.name))
+        return list(results)
+
+
+def print_convergence_summary(results):
+    """
+    Print the convergence result and time-to-converge percentiles of each WLC.
+
+    :param results: List of per-WLC result dicts
+    :return: None
+    """
+    def seconds_text(seconds):
+        return "-" if seconds is None else f"{seconds:.1f}"
+
+    flush_events()
+    print("*" * 78)
+    print(f"{'WLC':<24} {'APs':>5} {'Joined':>6} {'Pending':>7} {'p50 s':>6} {'p90 s':>6} "
+          f"{'p99 s':>6} {'max s':>6} {'Polls':>5}")
+    for result in results:
+        print(f"{result['wlc']:<24} {result['targets']:>5} {result['converged']:>6} "
+              f"{result['pending']:>7} {seconds_text(result['p50']):>6} "
+              f"{seconds_text(result['p90']):>6} {seconds_text(result['p99']):>6} "
+              f"{seconds_text(result['max']):>6} {result['polls']:>5}")
+        if result["pending_aps"]:
+            print(f"    Not converged: {', '.join(result['pending_aps'][:20])}"
+                  f"{' ...' if len(result['pending_aps']) > 20 else ''}")
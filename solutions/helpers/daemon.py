@@ -0,0 +1,470 @@
+"""
+Long-running workshop daemon and its client.
+
+Every script run pays for reading workshop-env, creating the NetBox
+client, resolving the WLCs, discovering WLC capabilities, and new TLS
+handshakes to every controller.  The daemon pays for them once: it keeps
+the NetBox client, WlcResolver cache, RequestSessionPool (with its
+keep-alive connections and circuit breakers), CapabilityCache, fingerprint
+stores, and the compiled Jinja2 templates warm across jobs.
+
+Jobs are submitted over a small JSON HTTP API, on a local TCP port or a
+Unix socket:
+
+    POST /jobs              {"kind": "configure", "options": {"pods": "1-4"}}
+                            -> 202 {"id": "...", "status": "queued", ...}
+    GET  /jobs              -> list of jobs, without their logs
+    GET  /jobs/<id>?since=N -> the job, with its log lines from line N on
+    GET  /health            -> {"status": "ok", "jobs": N}
+
+Jobs ("import", "configure", "test") run one at a time in submission
+order, so a job's log holds exactly its own event text and two jobs never
+write to the same APs at once.  Finished jobs are kept up to a limit.
+"""
+import collections
+import http.client
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .events import emit, get_event_log
+
+DEFAULT_DAEMON_ADDRESS = "127.0.0.1:8275"
+DEFAULT_KEPT_JOBS = 200
+DEFAULT_JOB_LOG_LINES = 10000
+DEFAULT_POLL_INTERVAL = 0.5
+
+JOB_KINDS = ("import", "configure", "test")
+FINISHED_STATES = ("done", "failed")
+
+
+class _JobLogSink:
+    """
+    Event log sink appending event text to the log of the running job.
+    """
+    def __init__(self):
+        self.lines = None
+
+    def write(self, event, text):  # pylint: disable=unused-argument
+        """
+        :param event: Event dict
+        :param text: Human readable text of the event
+        """
+        if self.lines is not None and text is not None:
+            self.lines.extend(text.split("\n"))
+
+    def flush(self):
+        """
+        Nothing is buffered.
+        """
+
+    def close(self):
+        """
+        Stop collecting.
+        """
+        self.lines = None
+
+
+class WorkshopDaemon:
+    """
+    Warm clients and caches, and the queue of submitted jobs.
+    """
+    def __init__(self, workshop_env, kept_jobs=DEFAULT_KEPT_JOBS,
+                 log_lines=DEFAULT_JOB_LOG_LINES):
+        """
+        :param workshop_env: Dict of workshop environment variables, with
+            NETBOX_URL, NETBOX_TOKEN, WLC_USERNAME, and WLC_PASSWORD
+        :param kept_jobs: Finished jobs kept for status queries
+        :param log_lines: Log lines kept per job
+        """
+        # pylint: disable=import-outside-toplevel
+        from .capabilities import CapabilityCache
+        from .netbox_reads import create_netbox_api
+        from .request_helpers import RequestSessionPool
+        from .wlc_helpers import WlcResolver
+
+        self.workshop_env = workshop_env
+        self.netbox_api = create_netbox_api(url=workshop_env["NETBOX_URL"],
+                                            token=workshop_env["NETBOX_TOKEN"])
+        self.wlc_resolver = WlcResolver(self.netbox_api)
+        self.session_pool = RequestSessionPool(username=workshop_env["WLC_USERNAME"],
+                                               password=workshop_env["WLC_PASSWORD"])
+        self.capability_cache = CapabilityCache(self.session_pool)
+        self._fingerprint_stores = {}
+        self._kept_jobs = kept_jobs
+        self._log_lines = log_lines
+        self._jobs = collections.OrderedDict()
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="daemon-job")
+        self._log_sink = _JobLogSink()
+        get_event_log().sinks.append(self._log_sink)
+
+    def submit(self, kind, options=None):
+        """
+        Queue a job.
+
+        :param kind: One of JOB_KINDS
+        :param options: Dict of job options, see the _run_<kind> methods
+        :return: Job dict, without its log
+        :raises ValueError: If the job kind is unknown
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'; expected one of {', '.join(JOB_KINDS)}")
+        with self._lock:
+            job = {"id": str(next(self._job_ids)), "kind": kind, "options": dict(options or {}),
+                   "status": "queued", "submitted": time.time(), "started": None,
+                   "finished": None, "result": None, "error": None,
+                   "log": collections.deque(maxlen=self._log_lines), "log_start": 0}
+            self._jobs[job["id"]] = job
+            # Forget the oldest finished jobs
+            for job_id in [job_id for job_id, old_job in self._jobs.items()
+                           if old_job["status"] in FINISHED_STATES][
+                    :max(0, len(self._jobs) - self._kept_jobs)]:
+                del self._jobs[job_id]
+        emit("daemon.job", job=job["id"], kind=kind, status="queued",
+             text=f"Job {job['id']} ({kind}) queued")
+        self._executor.submit(self._run, job)
+        return self.job(job["id"], since=None)
+
+    def job(self, job_id, since=0):
+        """
+        :param job_id: Job ID
+        :param since: First log line to return, or None to leave out the log
+        :return: Job dict, or None if there is no such job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job_view = {key: value for key, value in job.items()
+                        if key not in ("log", "log_start")}
+            if since is not None:
+                # Lines dropped from the bounded log are counted in log_start
+                first = max(0, since - job["log_start"])
+                job_view["log"] = list(itertools.islice(job["log"], first, None))
+                job_view["next_line"] = job["log_start"] + len(job["log"])
+        return job_view
+
+    def jobs(self):
+        """
+        :return: List of job dicts, without their logs, oldest first
+        """
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [job for job in map(lambda job_id: self.job(job_id, since=None), job_ids) if job]
+
+    def _run(self, job):
+        with self._lock:
+            job.update(status="running", started=time.time())
+        lines = _BoundedLog(job, self._lock)
+        self._log_sink.lines = lines
+        try:
+            job["result"] = getattr(self, f"_run_{job['kind']}")(**job["options"])
+            status, error = "done", None
+        except Exception as err:  # pylint: disable=broad-except
+            # Any failure ends this job only; the daemon keeps serving
+            status, error = "failed", f"{type(err).__name__}: {err}"
+        finally:
+            get_event_log().flush()
+            self._log_sink.lines = None
+        with self._lock:
+            job.update(status=status, error=error, finished=time.time())
+        emit("daemon.job", job=job["id"], kind=job["kind"], status=status, error=error,
+             text=f"Job {job['id']} ({job['kind']}) {status}"
+                  f"{': ' + error if error else ''} in {job['finished'] - job['started']:.1f}s")
+
+    def _pod_numbers(self, pods):
+        # pylint: disable=import-outside-toplevel
+        from .pod_helpers import parse_pod_list
+        return parse_pod_list(pods or self.workshop_env["POD_NUMBER"])
+
+    def _run_import(self, csv_file, input_format=None, skip_preflight=False,
+                    preflight_only=False, full_import=False, transform_workers=None):
+        """
+        Import a file that the daemon can read.
+
+        :return: Dict with the "preflight" report, if one was made, and
+            whether the file was "imported"
+        """
+        # pylint: disable=import-outside-toplevel
+        from .fingerprints import FingerprintStore, default_store_file
+        from .import_helpers import import_csv_file
+        from .preflight import preflight_csv_file
+
+        result = {"preflight": None, "imported": False}
+        wlc_ids = None
+        if not skip_preflight:
+            report = preflight_csv_file(netbox_api=self.netbox_api, csv_file=csv_file,
+                                        file_format=input_format)
+            result["preflight"] = {"csv_file": report.csv_file, "rows": report.rows,
+                                   "issues": [asdict(issue) for issue in report.issues]}
+            if report.errors or preflight_only:
+                return result
+            wlc_ids = report.wlc_ids
+
+        pod_number = self.workshop_env["POD_NUMBER"]
+        store_file = default_store_file(self.workshop_env["NETBOX_URL"], pod_number)
+        if full_import or store_file not in self._fingerprint_stores:
+            self._fingerprint_stores[store_file] = FingerprintStore(store_file,
+                                                                    refresh=full_import)
+        import_csv_file(netbox_api=self.netbox_api,
+                        csv_file=csv_file,
+                        workshop_pod_number=pod_number,
+                        wlc_ids=wlc_ids,
+                        transform_workers=transform_workers,
+                        file_format=input_format,
+                        fingerprint_store=self._fingerprint_stores[store_file])
+        result["imported"] = True
+        return result
+
+    def _run_configure(self, pods=None, stream=False, max_concurrency=4, batch=False):
+        """
+        Provision the APs of the pods with the warm WLC sessions.  With
+        batch, WLCs that support it are provisioned in batches of APs.
+
+        :return: Dict with the per-pod "pods" results
+        """
+        # pylint: disable=import-outside-toplevel
+        from .pod_helpers import run_pods
+        return {"pods": run_pods(pod_action="stream" if stream else "configure",
+                                 netbox_api=self.netbox_api,
+                                 pod_numbers=self._pod_numbers(pods),
+                                 wlc_resolver=self.wlc_resolver,
+                                 session_pool=self.session_pool,
+                                 max_concurrency=max_concurrency,
+                                 action_options=None if stream else
+                                 {"capability_cache": self.capability_cache,
+                                  "batch": batch})}
+
+    def _run_test(self, pods=None, stream=False, max_concurrency=4):
+        """
+        Validate the APs of the pods with the warm WLC sessions.
+
+        :return: Dict with the per-pod "pods" results and every check
+            "results", as dicts
+        """
+        # pylint: disable=import-outside-toplevel
+        from .pod_helpers import run_pods
+        pod_results = run_pods(pod_action="test",
+                               netbox_api=self.netbox_api,
+                               pod_numbers=self._pod_numbers(pods),
+                               wlc_resolver=self.wlc_resolver,
+                               session_pool=self.session_pool,
+                               max_concurrency=max_concurrency,
+                               action_options={"stream": stream})
+        check_results = [asdict(result) for pod_result in pod_results
+                         for result in pod_result.pop("results", [])]
+        return {"pods": pod_results, "results": check_results}
+
+    def close(self):
+        """
+        Finish the queued jobs and close the WLC sessions.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+        get_event_log().sinks.remove(self._log_sink)
+        self.session_pool.close()
+
+
+class _BoundedLog:
+    """
+    Appends lines to a job's bounded log under the daemon lock, counting
+    the lines that fall off the front.
+    """
+    def __init__(self, job, lock):
+        self._job = job
+        self._lock = lock
+
+    def extend(self, lines):
+        """
+        :param lines: Lines to append
+        """
+        with self._lock:
+            log = self._job["log"]
+            for line in lines:
+                if len(log) == log.maxlen:
+                    self._job["log_start"] += 1
+                log.append(line)
+
+
+class _DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the daemon.
+    """
+    server_version = "WorkshopDaemon/1.0"
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Job status, job list, and health.
+        """
+        url = urlparse(self.path)
+        path_parts = [part for part in url.path.split("/") if part]
+        daemon = self.server.workshop_daemon
+        if path_parts == ["health"]:
+            self._send_json(200, {"status": "ok", "jobs": len(daemon.jobs())})
+        elif path_parts == ["jobs"]:
+            self._send_json(200, daemon.jobs())
+        elif len(path_parts) == 2 and path_parts[0] == "jobs":
+            since = parse_qs(url.query).get("since", ["0"])[0]
+            job = daemon.job(path_parts[1], since=int(since) if since.isdigit() else 0)
+            if job is None:
+                self._send_json(404, {"error": f"No job '{path_parts[1]}'"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": f"Unknown path '{url.path}'"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Job submission.
+        """
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"Unknown path '{self.path}'"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            job = self.server.workshop_daemon.submit(request["kind"], request.get("options"))
+        except (ValueError, KeyError, TypeError) as err:
+            self._send_json(400, {"error": f"Invalid job request: {err}"})
+            return
+        self._send_json(202, job)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        emit("daemon.request", client=self.address_string(), request=format % args)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    workshop_daemon = None
+
+
+class _ThreadingDaemonHTTPServer(ThreadingHTTPServer):
+    workshop_daemon = None
+
+
+def serve_daemon(daemon, address=DEFAULT_DAEMON_ADDRESS):
+    """
+    Serve the daemon API until interrupted.
+
+    :param daemon: WorkshopDaemon
+    :param address: "host:port", or the path of a Unix socket
+    :return: None
+    """
+    if "/" in address:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = _ThreadingUnixHTTPServer(address, _DaemonRequestHandler)
+        os.chmod(address, 0o600)
+    else:
+        host, _, port = address.rpartition(":")
+        server = _ThreadingDaemonHTTPServer((host or "127.0.0.1", int(port)),
+                                            _DaemonRequestHandler)
+    server.workshop_daemon = daemon
+    emit("daemon.listen", address=address, text=f"Workshop daemon listening on {address}")
+    get_event_log().flush()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if "/" in address and os.path.exists(address):
+            os.unlink(address)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient:
+    """
+    Submit jobs to a WorkshopDaemon and follow them.  Uses only the
+    standard library, so clients start in milliseconds.
+    """
+    def __init__(self, address=DEFAULT_DAEMON_ADDRESS, timeout=30.0):
+        """
+        :param address: "host:port", or the path of a Unix socket
+        :param timeout: Seconds to wait for each API response
+        """
+        self.address = address
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        if "/" in self.address:
+            connection = _UnixHTTPConnection(self.address, timeout=self.timeout)
+        else:
+            host, _, port = self.address.rpartition(":")
+            connection = http.client.HTTPConnection(host or "127.0.0.1", int(port),
+                                                    timeout=self.timeout)
+        try:
+            payload = json.dumps(body).encode("utf-8") if body is not None else None
+            connection.request(method, path, body=payload,
+                               headers={"Content-Type": "application/json"} if payload else {})
+            response = connection.getresponse()
+            response_body = json.loads(response.read() or b"null")
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"Daemon error {response.status}: "
+                               f"{(response_body or {}).get('error')}")
+        return response_body
+
+    def submit(self, kind, options=None):
+        """
+        :return: Job dict of the queued job
+        """
+        return self._request("POST", "/jobs", {"kind": kind, "options": options or {}})
+
+    def job(self, job_id, since=0):
+        """
+        :return: Job dict with the log lines from line "since" on
+        """
+        return self._request("GET", f"/jobs/{job_id}?since={since}")
+
+    def run(self, kind, options=None, poll_interval=DEFAULT_POLL_INTERVAL, log_stream=None):
+        """
+        Submit a job and wait for it, writing its log as it grows.
+
+        :param kind: One of JOB_KINDS
+        :param options: Dict of job options
+        :param poll_interval: Seconds between status requests
+        :param log_stream: Stream the job log is written to, or None
+        :return: Finished job dict
+        """
+        job = self.submit(kind, options)
+        next_line = 0
+        while True:
+            job = self.job(job["id"], since=next_line)
+            if log_stream is not None and job["log"]:
+                log_stream.write("\n".join(job["log"]) + "\n")
+                log_stream.flush()
+            next_line = job["next_line"]
+            if job["status"] in FINISHED_STATES:
+                return job
+            time.sleep(poll_interval)
@@ -0,0 +1,296 @@
+"""
+Structured event log used by the helpers instead of printing progress.
+
+Helpers call emit() with an event name, an optional line of human readable
+text, and any structured fields.  The event log hands every event to its
+sinks under a single lock, so output stays whole-line and ordered even when
+several threads emit at once:
+
+    - TextSink: the familiar verbose text output, line by line, or in
+      buffered chunks for the runners that flush before printing
+    - ProgressSink: a compact, single line progress counter
+    - JsonlSink: one JSON object per event, for diagnosing runs afterwards
+"""
+import atexit
+import io
+import json
+import sys
+import threading
+import time
+
+# Events that mark one unit of work (a device or AP) as finished
+PROGRESS_EVENTS = ("device.done", "ap.done")
+
+# Text buffered by the runners configured with configure_event_log()
+DEFAULT_TEXT_BUFFER_SIZE = 64 * 1024
+
+
+class TextSink:
+    """
+    Write the text of each event to a stream.  With a buffer size, text is
+    collected in a buffer and written when the buffer is large or old
+    enough, instead of one terminal write per line.  A timer writes text
+    left in the buffer after the flush interval, so output does not stall
+    while the helpers wait without emitting, e.g. for AP convergence.
+
+    Scripts that print() between helper calls need the default of writing
+    every line at once, or their output would be reordered; only runners
+    that call flush_events() before printing should buffer.
+    """
+    def __init__(self, stream=None, buffer_size=0, flush_interval=0.2):
+        """
+        :param stream: Output stream.  Default: sys.stdout at write time
+        :param buffer_size: Characters to collect before writing; 0 writes
+            every line at once
+        :param flush_interval: Maximum seconds to hold buffered text
+        """
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = io.StringIO()
+        self._last_flush = time.monotonic()
+        # The flush timer runs outside the EventLog lock
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def write(self, event, text):  # pylint: disable=unused-argument
+        """
+        :param event: Event dict
+        :param text: Human readable text of the event, or None
+        """
+        if text is None:
+            return
+        with self._lock:
+            self._buffer.write(text)
+            self._buffer.write("\n")
+            if self._buffer.tell() >= self.buffer_size or \
+                    time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_timer(self):
+        with self._lock:
+            self._timer = None
+            if self._buffer.tell():
+                self.flush()
+
+    def flush(self):
+        """
+        Write any buffered text to the stream.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            stream = self.stream or sys.stdout
+            stream.write(self._buffer.getvalue())
+            stream.flush()
+            self._buffer = io.StringIO()
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Flush the buffer.  The stream is left open.
+        """
+        self.flush()
+
+
+class ProgressSink:
+    """
+    Render a single, redrawn progress line counting finished units of work
+    and failures.  Redraws are limited to one per refresh interval.
+    """
+    def __init__(self, stream=None, refresh_interval=0.1):
+        """
+        :param stream: Output stream.  Default: sys.stderr at write time
+        :param refresh_interval: Minimum seconds between redraws
+        """
+        self.stream = stream
+        self.refresh_interval = refresh_interval
+        self.completed = 0
+        self.failed = 0
+        self.errors = 0
+        self._start_time = time.monotonic()
+        self._last_render = 0.0
+
+    def write(self, event, text):  # pylint: disable=unused-argument
+        """
+        :param event: Event dict
+        :param text: Human readable text of the event (ignored)
+        """
+        if event["event"] in PROGRESS_EVENTS:
+            self.completed += 1
+            if event.get("status") not in ("OK", "SKIPPED"):
+                self.failed += 1
+        elif event.get("level") == "error":
+            self.errors += 1
+
+        if time.monotonic() - self._last_render >= self.refresh_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Redraw the progress line.
+        """
+        stream = self.stream or sys.stderr
+        elapsed = time.monotonic() - self._start_time
+        rate = self.completed / elapsed if elapsed else 0.0
+        stream.write(f"\r{self.completed} done, {self.failed} failed, "
+                     f"{self.errors} errors - {elapsed:.1f}s ({rate:.1f}/s)  ")
+        stream.flush()
+        self._last_render = time.monotonic()
+
+    def close(self):
+        """
+        Draw the final progress line and end it.
+        """
+        self.flush()
+        (self.stream or sys.stderr).write("\n")
+
+
+class JsonlSink:
+    """
+    Append every event as one JSON object per line to a file, using a large
+    write buffer.
+    """
+    def __init__(self, file_name, buffer_size=1024 * 1024):
+        """
+        :param file_name: JSON Lines output file
+        :param buffer_size: Write buffer size in bytes
+        """
+        # pylint: disable=consider-using-with
+        self._file = open(file_name, "a", encoding="utf-8", buffering=buffer_size)
+
+    def write(self, event, text):
+        """
+        :param event: Event dict
+        :param text: Human readable text of the event, stored if present
+        """
+        if text is not None:
+            event = dict(event, text=text)
+        self._file.write(json.dumps(event, default=str))
+        self._file.write("\n")
+
+    def flush(self):
+        """
+        Flush the write buffer to the file.
+        """
+        self._file.flush()
+
+    def close(self):
+        """
+        Flush and close the file.
+        """
+        self._file.close()
+
+
+class EventLog:
+    """
+    Dispatch events to one or more sinks.  Safe to share between threads.
+    """
+    def __init__(self, sinks=None):
+        """
+        :param sinks: List of sinks.  Default: a single TextSink
+        """
+        self.sinks = list(sinks) if sinks is not None else [TextSink()]
+        self._lock = threading.Lock()
+
+    def emit(self, event, text=None, **fields):
+        """
+        Record an event.
+
+        :param event: Event name, e.g. "ap.start"
+        :param text: Optional human readable line(s) for the text output
+        :param fields: Structured event fields
+        :return: None
+        """
+        event_record = {"ts": time.time(),
+                        "event": event,
+                        "thread": threading.current_thread().name}
+        event_record.update(fields)
+        with self._lock:
+            for sink in self.sinks:
+                sink.write(event_record, text)
+
+    def flush(self):
+        """
+        Flush every sink.
+        """
+        with self._lock:
+            for sink in self.sinks:
+                sink.flush()
+
+    def close(self):
+        """
+        Flush and close every sink.
+        """
+        with self._lock:
+            for sink in self.sinks:
+                sink.close()
+            self.sinks = []
+
+
+_event_log = EventLog()
+
+
+def get_event_log():
+    """
+    :return: The EventLog used by the helpers
+    """
+    return _event_log
+
+
+def set_event_log(event_log):
+    """
+    Replace the EventLog used by the helpers.  The previous log is flushed.
+
+    :param event_log: New EventLog
+    :return: The previous EventLog
+    """
+    global _event_log  # pylint: disable=global-statement
+    previous_log = _event_log
+    previous_log.flush()
+    _event_log = event_log
+    return previous_log
+
+
+def configure_event_log(output="text", jsonl_file=None):
+    """
+    Build and install the EventLog for a run.
+
+    :param output: Console output: "text" (verbose, buffered), "progress",
+        or "none"
+    :param jsonl_file: Optional JSON Lines file receiving every event
+    :return: The installed EventLog
+    """
+    sinks = []
+    if output == "text":
+        sinks.append(TextSink(buffer_size=DEFAULT_TEXT_BUFFER_SIZE))
+    elif output == "progress":
+        sinks.append(ProgressSink())
+    if jsonl_file:
+        sinks.append(JsonlSink(jsonl_file))
+
+    event_log = EventLog(sinks)
+    set_event_log(event_log)
+    return event_log
+
+
+def emit(event, text=None, **fields):
+    """
+    Record an event on the current EventLog.  See EventLog.emit().
+    """
+    _event_log.emit(event, text, **fields)
+
+
+def flush_events():
+    """
+    Flush the current EventLog, e.g. before printing a final summary.
+    """
+    _event_log.flush()
+
+
+atexit.register(lambda: _event_log.close())  # pylint: disable=unnecessary-lambda
@@ -0,0 +1,188 @@
+"""
+Export the AP inventory from NetBox to an import file.
+
+The export is the reverse of the importer: devices are read one page at a
+time in ID order, the interfaces of each page with bulk queries, and every
+device is turned back into a row with the importer's columns.  Rows are
+streamed to the output file, so memory use stays constant however large
+the fleet is.  While one page is written, the next one is already read.
+
+Radio settings are translated back from the NetBox "rf_channel" value.
+The channel number exported is the one NetBox holds - the center channel
+of bonded 40-160MHz channels - which the importer maps to the same
+"rf_channel" again, so an export imports back to identical NetBox data.
+Values NetBox does not hold, such as the width of 2.4GHz radios imported
+without one, are exported empty.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from .events import emit
+from .input_formats import detect_format, write_records
+from .netbox_reads import DEFAULT_PAGE_SIZE, fetch_interfaces_by_device, iter_record_pages
+from .transform import DCIM_NATIVE_FIELDS, DEVICE_CUSTOM_FIELD_MAP, DEVICE_KEY_FIELD_MAP
+
+EXPORT_DEVICE_FIELDS = ("id", "name", "serial", "asset_tag", "role", "device_type", "site",
+                        "location", "platform", "custom_fields")
+EXPORT_INTERFACE_FIELDS = ("id", "name", "device", "mac_address", "rf_channel",
+                           "rf_channel_width", "rf_role", "tx_power", "enabled")
+
+# Interface column suffixes, in the column order of generate_csv.py
+RADIO_COLUMN_SUFFIXES = ("mac", "band", "rf_role", "enabled", "channel_number",
+                         "channel_width", "tx_power")
+WIRED_COLUMN_SUFFIXES = ("mac",)
+
+# Interfaces of generated files first, in their order; then the others the
+# importer accepts
+EXPORT_INTERFACE_NAMES = ("wired", "radio0", "radio1", "radio2", "radio3", "wired1", "wired2")
+
+EXPORT_COLUMNS = (tuple(DEVICE_KEY_FIELD_MAP) + tuple(DEVICE_CUSTOM_FIELD_MAP) +
+                  tuple(f"{interface_name}_{suffix}"
+                        for interface_name in EXPORT_INTERFACE_NAMES
+                        for suffix in (RADIO_COLUMN_SUFFIXES if interface_name.startswith("radio")
+                                       else WIRED_COLUMN_SUFFIXES)))
+
+
+def _choice_value(value):
+    """
+    :param value: NetBox choice field value, as a dict or a plain value
+    :return: The choice value, or None
+    """
+    return value.get("value") if isinstance(value, dict) else value
+
+
+def rf_channel_columns(rf_channel, rf_channel_width):
+    """
+    Translate a NetBox "rf_channel" value back to the importer's columns.
+
+    :param rf_channel: NetBox "rf_channel" value, e.g. "5g-38-5190-40"
+    :param rf_channel_width: NetBox "rf_channel_width" value, or None
+    :return: Dict of band, channel_number, and channel_width column values
+    """
+    radio_band, channel_number, _, _ = rf_channel.split("-")
+    width = ""
+    if rf_channel_width not in (None, ""):
+        width = int(float(rf_channel_width))
+    return {"band": radio_band.rstrip("g"), "channel_number": int(channel_number),
+            "channel_width": width}
+
+
+def interface_columns(interface):
+    """
+    :param interface: Dict of a NetBox interface
+    :return: Dict of column suffix to value for the interface
+    """
+    columns = {"mac": interface.get("mac_address") or ""}
+    if not str(interface.get("name", "")).startswith("radio"):
+        return columns
+
+    columns.update({"rf_role": _choice_value(interface.get("rf_role")) or "",
+                    "enabled": interface.get("enabled"),
+                    "tx_power": interface.get("tx_power"),
+                    "band": "", "channel_number": "", "channel_width": ""})
+    if rf_channel := _choice_value(interface.get("rf_channel")):
+        columns.update(rf_channel_columns(rf_channel, interface.get("rf_channel_width")))
+    return columns
+
+
+def device_row(device, interfaces):
+    """
+    Build the import row of a NetBox AP.
+
+    :param device: Dict of a NetBox device
+    :param interfaces: Iterable of dicts of the device's interfaces
+    :return: Dict of column to value, for every column in EXPORT_COLUMNS
+    """
+    row = dict.fromkeys(EXPORT_COLUMNS, "")
+    # NetBox before 4.0 names the device role "device_role"
+    device = dict(device, role=device.get("role") or device.get("device_role"))
+    for csv_field, dcim_object_attr in DEVICE_KEY_FIELD_MAP.items():
+        value = device.get(dcim_object_attr)
+        if dcim_object_attr in DCIM_NATIVE_FIELDS:
+            row[csv_field] = value or ""
+        elif isinstance(value, dict):
+            row[csv_field] = value.get("slug") or ""
+
+    custom_fields = device.get("custom_fields") or {}
+    for csv_field, custom_field in DEVICE_CUSTOM_FIELD_MAP.items():
+        if isinstance(wlc := custom_fields.get(custom_field), dict):
+            row[csv_field] = wlc.get("name") or wlc.get("display") or ""
+
+    for interface in interfaces:
+        interface_name = interface.get("name")
+        if interface_name not in EXPORT_INTERFACE_NAMES:
+            continue
+        for suffix, value in interface_columns(interface).items():
+            row[f"{interface_name}_{suffix}"] = "" if value is None else value
+    return row
+
+
+def _read_page(netbox_api, devices):
+    """
+    Read the interfaces of a page of devices and build their rows.
+    """
+    interfaces_by_device = fetch_interfaces_by_device(netbox_api,
+                                                      (device.id for device in devices),
+                                                      fields=EXPORT_INTERFACE_FIELDS)
+    return [device_row(dict(device),
+                       (dict(interface) for interface in
+                        sorted(interfaces_by_device.get(device.id, ()),
+                               key=lambda interface: interface.id)))
+            for device in devices]
+
+
+def iter_export_rows(netbox_api, pod_number=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Read the APs of all pods, or of one pod, as import rows.  The next page
+    is read while the rows of the current one are consumed.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Optional workshop pod number
+    :param page_size: Devices per page
+    :return: Generator of row dicts, in NetBox ID order
+    """
+    device_filter = {"role": "ap"}
+    if pod_number is not None:
+        device_filter["cf_workshop_pod_number"] = pod_number
+    pages = iter_record_pages(netbox_api.dcim.devices, fields=EXPORT_DEVICE_FIELDS,
+                              page_size=page_size, **device_filter)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        def read_next_page():
+            devices = next(pages, None)
+            return None if devices is None else _read_page(netbox_api, devices)
+
+        pending_page = executor.submit(read_next_page)
+        while (rows := pending_page.result()) is not None:
+            pending_page = executor.submit(read_next_page)
+            yield from rows
+
+
+def export_inventory(netbox_api, output_file, pod_number=None, file_format=None,
+                     page_size=DEFAULT_PAGE_SIZE):
+    """
+    Export the APs of all pods, or of one pod, to an import file.
+
+    :param netbox_api: pynetbox API object reference
+    :param output_file: Output file name
+    :param pod_number: Optional workshop pod number
+    :param file_format: One of input_formats.INPUT_FORMATS, or None to use
+        the file extension
+    :param page_size: Devices per page
+    :return: Number of APs exported
+    :raises ImportError: If a Parquet or Arrow file is written without pyarrow
+    """
+    file_format = detect_format(output_file, file_format)
+    exported = 0
+
+    def counted_rows():
+        nonlocal exported
+        for row in iter_export_rows(netbox_api, pod_number=pod_number, page_size=page_size):
+            exported += 1
+            yield row
+
+    emit("export.start", output_file=output_file, file_format=file_format, pod=pod_number,
+         text=f"Exporting {'all APs' if pod_number is None else f'the APs of pod {pod_number}'}"
+              f" to {output_file} ({file_format})...")
+    write_records(counted_rows(), output_file, columns=EXPORT_COLUMNS, file_format=file_format)
+    emit("export.done", output_file=output_file, devices=exported,
+         text=f"Exported {exported} APs to {output_file}")
+    return exported
@@ -0,0 +1,176 @@
+"""
+Skip unchanged rows when the same import file is imported again.
+
+Every transformed row has a fingerprint (transform.payload_fingerprint()):
+a hash over its normalized NetBox payloads, so the same AP gives the same
+fingerprint whether it was read from CSV strings or typed JSON Lines,
+Parquet, or Arrow values.  After a device and its interfaces are written,
+the fingerprint is stored locally together with the device ID and the
+NetBox "last_updated" time:
+
+    {"AP0001": {"hash": "...", "id": 42, "last_updated": "2026-..."}, ...}
+
+On the next import, one bulk read of the pod's devices and interfaces
+(IDs and "last_updated" only) tells which stored entries still describe
+NetBox.  A row is skipped without any further API calls when its
+fingerprint matches the store and nobody changed the device or its
+interfaces in NetBox since it was written.
+"""
+import json
+import os
+import re
+import threading
+from .events import emit
+from .netbox_reads import DEVICE_ID_CHUNK_SIZE, fetch_interfaces_by_device, fetch_records
+
+DEFAULT_STORE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                                os.path.expanduser("~/.cache")),
+                                 "devwks-2275", "fingerprints")
+
+DEVICE_STATE_FIELDS = ("id", "name", "last_updated")
+INTERFACE_STATE_FIELDS = ("id", "device", "last_updated")
+
+
+def default_store_file(netbox_url, pod_number):
+    """
+    :param netbox_url: NetBox base URL
+    :param pod_number: Workshop pod number
+    :return: Path of the fingerprint store of a NetBox instance and pod
+    """
+    netbox_name = re.sub(r"[^A-Za-z0-9._-]", "_", re.sub(r"^\w+://", "", netbox_url.rstrip("/")))
+    return os.path.join(DEFAULT_STORE_DIR, f"{netbox_name}-pod{pod_number}.json")
+
+
+def fetch_device_state(netbox_api, pod_number=None, device_ids=None):
+    """
+    Read the ID and latest change time of devices, counting changes to
+    their interfaces as changes to the device.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Read the devices of this workshop pod
+    :param device_ids: Or read these devices
+    :return: Dict of device name to (device ID, latest "last_updated" of the
+        device and its interfaces)
+    """
+    if device_ids is None:
+        devices = fetch_records(netbox_api.dcim.devices, fields=DEVICE_STATE_FIELDS,
+                                cf_workshop_pod_number=pod_number)
+    else:
+        device_ids = list(device_ids)
+        devices = [device
+                   for chunk_start in range(0, len(device_ids), DEVICE_ID_CHUNK_SIZE)
+                   for device in fetch_records(
+                       netbox_api.dcim.devices, fields=DEVICE_STATE_FIELDS,
+                       id=device_ids[chunk_start:chunk_start + DEVICE_ID_CHUNK_SIZE])]
+
+    interfaces_by_device = fetch_interfaces_by_device(netbox_api,
+                                                      (device.id for device in devices),
+                                                      fields=INTERFACE_STATE_FIELDS)
+    device_state = {}
+    for device in devices:
+        # ISO 8601 times in the same zone compare correctly as strings
+        last_updated = max([str(device.last_updated or "")] +
+                           [str(interface.last_updated or "")
+                            for interface in interfaces_by_device.get(device.id, ())])
+        device_state[str(device.name)] = (device.id, last_updated)
+    return device_state
+
+
+class FingerprintStore:
+    """
+    Local store of the fingerprint, device ID, and "last_updated" time of
+    every imported device.  Safe to share between threads.
+    """
+    def __init__(self, file_name, refresh=False):
+        """
+        :param file_name: JSON file of the store; created on save()
+        :param refresh: Ignore the stored fingerprints, so every row is
+            imported and the store rebuilt
+        """
+        self.file_name = file_name
+        self._entries = {}
+        self._lock = threading.Lock()
+        if refresh:
+            return
+        try:
+            with open(file_name, "r", encoding="utf-8") as store_file:
+                self._entries = json.load(store_file)
+        except (OSError, ValueError):
+            # Missing or unreadable: every row is imported
+            self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def unchanged(self, device_name, fingerprint, device_state):
+        """
+        :param device_name: Device name of the row
+        :param fingerprint: Fingerprint of the row
+        :param device_state: Dict from fetch_device_state()
+        :return: True if the row matches the store and NetBox still holds
+            what was written
+        """
+        with self._lock:
+            entry = self._entries.get(device_name)
+        if entry is None or fingerprint is None or entry["hash"] != fingerprint:
+            return False
+        return device_state.get(device_name) == (entry["id"], entry["last_updated"])
+
+    def record(self, device_name, fingerprint, device_id, last_updated):
+        """
+        Store the fingerprint of a written device.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries[device_name] = {"hash": fingerprint, "id": device_id,
+                                          "last_updated": last_updated}
+
+    def forget(self, device_name):
+        """
+        Drop a device, e.g. after a failed write, so its next row is imported.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(device_name, None)
+
+    def save(self):
+        """
+        Write the store to its file.
+
+        :return: None
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        with self._lock:
+            entries = dict(self._entries)
+        # Write a temporary file first so an interrupted save never leaves a
+        # partially written store
+        temp_file_name = f"{self.file_name}.{os.getpid()}.tmp"
+        with open(temp_file_name, "w", encoding="utf-8") as store_file:
+            json.dump(entries, store_file, indent=1, sort_keys=True)
+        os.replace(temp_file_name, self.file_name)
+
+
+def record_written_devices(netbox_api, fingerprint_store, written):
+    """
+    Store the fingerprints of written devices with their new "last_updated"
+    times, read back with one bulk query, and save the store.
+
+    :param netbox_api: pynetbox API object reference
+    :param fingerprint_store: FingerprintStore
+    :param written: Dict of device name to (device ID, fingerprint)
+    :return: None
+    """
+    device_state = fetch_device_state(netbox_api,
+                                      device_ids=[device_id for device_id, _ in written.values()])
+    for device_name, (device_id, fingerprint) in written.items():
+        state_id, last_updated = device_state.get(device_name, (None, None))
+        if state_id == device_id:
+            fingerprint_store.record(device_name, fingerprint, device_id, last_updated)
+        else:
+            fingerprint_store.forget(device_name)
+    fingerprint_store.save()
+    emit("fingerprint.save", devices=len(fingerprint_store),
+         text=f"Fingerprints of {len(fingerprint_store)} devices saved to "
+              f"{fingerprint_store.file_name}")
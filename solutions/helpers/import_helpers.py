@@ -2,10 +2,49 @@
 CSV import helper functions - decouple tasks from the main entrypoint.
 """
 from pynetbox.core.query import RequestError
-from .rf_channel_map import get_rf_channel_value
+from .events import emit
+from .fingerprints import fetch_device_state, record_written_devices
+from .profiling import profile_phase
+from .transform import (map_device_fields,
+                        map_interface_fields,
+                        transform_input_file)
 
 
-def generate_device_details(netbox_api, csv_row, workshop_pod_number):
+def apply_wlc_associations(netbox_api, device_details, wlc_names, wlc_ids=None):
+    """
+    Add the WLC association custom fields to a device, resolving the WLC
+    names to NetBox device IDs.
+
+    NOTE: WLC association is case-sensitive; must match the name of the WLC
+    as defined in NetBox.
+
+    :param netbox_api: pynetbox API object reference
+    :param device_details: Device attributes dict from map_device_fields()
+    :param wlc_names: Dict of custom field to (CSV column, WLC name)
+    :param wlc_ids: Optional dict of WLC name to NetBox device ID, e.g. from
+        the pre-flight check.  WLCs are looked up in NetBox when not given.
+    :return: The device attributes dict
+    """
+    custom_fields = device_details.setdefault("custom_fields", {})
+    for dcim_custom_object_attr, (csv_field, wlc_name) in wlc_names.items():
+        if wlc_ids is not None:
+            associated_wlc_id = wlc_ids.get(wlc_name)
+        else:
+            associated_wlc = netbox_api.dcim.devices.get(name=wlc_name)
+            associated_wlc_id = associated_wlc.id if associated_wlc else None
+
+        if associated_wlc_id is not None:
+            custom_fields.update({dcim_custom_object_attr: associated_wlc_id})
+        else:
+            emit("device.wlc_error", level="error",
+                 text=f"ERROR: During import of field '{csv_field}'\n"
+                      f"\tDesired WLC association '{wlc_name}' is not a valid "
+                      f"NetBox device name.",
+                 field=csv_field, wlc_name=wlc_name)
+    return device_details
+
+
+def generate_device_details(netbox_api, csv_row, workshop_pod_number, wlc_ids=None):
     """
     Given a row from the CSV file, create a dictionary suitable for import into
     NetBox to create a device.
@@ -13,78 +52,19 @@ def generate_device_details(netbox_api, csv_row, workshop_pod_number):
     :param netbox_api: pynetbox API object reference
     :param csv_row: The current row of the CSV file to process
     :param workshop_pod_number: Workshop Pod Number for device custom field
+    :param wlc_ids: Optional dict of WLC name to NetBox device ID, e.g. from
+        the pre-flight check.  WLCs are looked up in NetBox when not given.
     :return: Dict containing NetBox attributes required for device creation.
     """
-    # Map CSV columns to DCIM attributes
-    device_key_field_map = {
-        "device_name": "name",
-        "serial": "serial",
-        "asset_tag": "asset_tag",
-        "device_type": "device_type",
-        "device_role": "role",
-        "platform": "platform",
-        "site": "site",
-        "location": "location",
-    }
-
-    # Map CSV columns to DCIM custom fields
-    device_custom_field_map = {
-        "primary_wlc": "wlc_primary_association",
-        "secondary_wlc": "wlc_secondary_association",
-        "tertiary_wlc": "wlc_tertiary_association",
-    }
-
-    # DCIM key fields will NOT use a NetBox object reference via "slug" value
-    dcim_native_fields = ("name", "serial", "asset_tag")
-
-    print(f"Processing device '{csv_row['device_name']}'...")
-
-    # For each expected / valid CSV field and associated DCIM field, check if
-    # there is a CSV value and update the device_details dictionary.
-    # If the associated DCIM field is a key field, use the raw value and don't
-    # set the value to the NetBox 'slug'
-    device_details = {}
-    for csv_field, dcim_object_attr in device_key_field_map.items():
-        if csv_attr := csv_row.get(csv_field):
-            if dcim_object_attr in dcim_native_fields:
-                device_details.update({dcim_object_attr: csv_attr})
-            else:
-                device_details.update({dcim_object_attr: {"slug": csv_attr}})
-            csv_row.pop(csv_field)
-
-    # Perform the same iteration as above, but for each custom field.  This is
-    # specifically designed ONLY for WLC association objects for our use case,
-    # so get the associated NetBox object ID for the WLC name.
-    #
-    # NOTE: WLC association is case-sensitive; must match the name of the WLC
-    # as defined in NetBox.
-
-    # Set the custom field value for workshop_pod_number
-    custom_fields = {"workshop_pod_number": int(workshop_pod_number)}
-
-    for csv_field, dcim_custom_object_attr in device_custom_field_map.items():
-        if csv_attr := csv_row.get(csv_field):
-            associated_wlc = netbox_api.dcim.devices.get(name=csv_attr)
-            try:
-                custom_fields.update({dcim_custom_object_attr: associated_wlc.id})
-            except AttributeError:
-                print(
-                    f"ERROR: During import of field '{csv_field}'\n"
-                    f"\tDesired WLC association '{csv_attr}' is not a valid NetBox device name."
-                )
-            csv_row.pop(csv_field)
-
-    # Add the custom fields to the device_details dictionary
-    device_details.update({"custom_fields": custom_fields})
-
-    # Input validation: remove keys that don't have values so no unexpected
-    # values are imported
-    device_details = {k: v for k, v in device_details.items() if v}
+    emit("device.start", text=f"Processing device '{csv_row['device_name']}'...",
+         device=csv_row["device_name"])
 
-    return device_details
+    device_details, wlc_names = map_device_fields(csv_row, workshop_pod_number)
+    return apply_wlc_associations(netbox_api, device_details, wlc_names, wlc_ids)
 
 
-def update_interfaces(netbox_api, device_object, csv_row):
+@profile_phase("netbox_write")
+def update_interfaces(netbox_api, device_object, csv_row, interface_fields=None):
     """
     Given a device name and a row from a CSV file, generate a dictionary
     with attributes required to create (or update) an interface associated
@@ -93,63 +73,28 @@ def update_interfaces(netbox_api, device_object, csv_row):
     :param netbox_api: pynetbox API object reference
     :param device_object: pynetbox object reference for the current device
     :param csv_row: The current row of the CSV to process
+    :param interface_fields: Optional dict of interface name to attributes,
+        already mapped from the row by map_interface_fields()
     :return: Dict containing NetBox attributes required for interface creation.
     """
-
-    # Anything in this list will be checked against the CSV row values by
-    # appending the expected field name to an interface prefix.
-    valid_interface_names = (
-        "wired",
-        "wired1",
-        "wired2",
-        "radio0",
-        "radio1",
-        "radio2",
-        "radio3",
-    )
-
-    interface_key_field_map = {
-        "mac": "mac_address",
-        "band": "band",
-        "channel_number": "channel",
-        "rf_role": "rf_role",
-        "tx_power": "tx_power",
-        "channel_width": "rf_channel_width",
-        "enabled": "enabled"
-    }
+    if interface_fields is None:
+        interface_fields = map_interface_fields(csv_row)
 
     # Get the device interfaces
     device_interfaces = netbox_api.dcim.interfaces.filter(device_id=device_object.id)
 
-    # Initialize an empty list to store all interface details
-    interfaces = []
-
-    # Process each interface
-    for current_interface in device_interfaces:
-
-        # Valid interface name? Proceed!
-        if current_interface.name in valid_interface_names:
-            interface_details = {"id": current_interface.id}
+    # Add the NetBox ID of each interface that has CSV values
+    interfaces = [{"id": current_interface.id, **interface_fields[current_interface.name]}
+                  for current_interface in device_interfaces
+                  if current_interface.name in interface_fields]
 
-            # Convert the CSV fields to NetBox attributes.
-            for csv_field, dcim_object_attr in interface_key_field_map.items():
-
-                # If there is a CSV column matching the field, process it:
-                if csv_attr := csv_row.get(f"{current_interface}_{csv_field}"):
-                    interface_details.update({dcim_object_attr: csv_attr})
-                    csv_row.pop(f"{current_interface}_{csv_field}")
-
-            # Is this a radio interface? If so, convert the RF params
-            # to a value that NetBox expects.
-            if current_interface.name.lower().startswith("radio"):
-                get_rf_channel_value(interface_details)
-
-            interfaces.append(interface_details)
     iface_result = netbox_api.dcim.interfaces.update(interfaces)
-    print(f"\t\tInterfaces updated: {iface_result}")
+    emit("interfaces.update", text=f"\t\tInterfaces updated: {iface_result}",
+         device=device_object.name, interfaces=len(interfaces))
     return interfaces
 
 
+@profile_phase("netbox_write")
 def create_or_update_device(netbox_api, device_detail_dict):
     """
     Create a new device in NetBox.  If the device already exists and the
@@ -163,29 +108,126 @@ def create_or_update_device(netbox_api, device_detail_dict):
         an error occurred during device creation/update.
     """
     device_object = None
+    device_name = device_detail_dict.get("name")
 
+    # Text of the step in progress, completed with the step result
+    step_event, step_text = "device.lookup", "\tChecking if device exists... "
     try:
-        print("\tChecking if device exists... ", end="")
         device_id = netbox_api.dcim.devices.get(name=device_detail_dict["name"])
 
         # Device exists and update is enabled (default):
         if device_id:
-            print("YES\n\t\tUpdating device... ", end="")
+            emit(step_event, text=f"{step_text}YES", device=device_name, exists=True)
+            step_event, step_text = "device.update", "\t\tUpdating device... "
             device_detail_dict.update({"id": device_id.id})
             nb_result = netbox_api.dcim.devices.update([device_detail_dict])
-            print("OK")
 
         # No device exists, create
         else:
-            print("NO\n\t\tCreating device... ", end="")
+            emit(step_event, text=f"{step_text}NO", device=device_name, exists=False)
+            step_event, step_text = "device.create", "\t\tCreating device... "
             nb_result = netbox_api.dcim.devices.create([device_detail_dict])
-            print("OK")
 
     except RequestError as err_msg:  # Catch pynetbox API errors
-        print(f"FAILED\n\t\tNetBox API error: {err_msg}")
+        emit(step_event, level="error", status="FAILED", device=device_name,
+             error=str(err_msg),
+             text=f"{step_text}FAILED\n\t\tNetBox API error: {err_msg}")
     except KeyError as err_msg:  # Device name doesn't exist
-        print(f"FAILED: Missing Key {err_msg} in device detail dictionary")
+        emit(step_event, level="error", status="FAILED", device=device_name,
+             error=f"Missing key {err_msg}",
+             text=f"{step_text}FAILED: Missing Key {err_msg} in device detail dictionary")
     else:
+        emit(step_event, text=f"{step_text}OK", status="OK", device=device_name)
         device_object = nb_result[0]
 
     return device_object
+
+
+def import_csv_file(netbox_api, csv_file, workshop_pod_number, wlc_ids=None,
+                    transform_workers=None, file_format=None, fingerprint_store=None):
+    """
+    Create or update a NetBox device, and its interfaces, for every row of a
+    CSV import file - or a JSON Lines, Parquet, or Arrow file with the same
+    columns.  The rows are transformed to NetBox payloads in a process pool,
+    ahead of the NetBox requests.
+
+    :param netbox_api: pynetbox API object reference
+    :param csv_file: Path of the file to import
+    :param workshop_pod_number: Workshop Pod Number for device custom field
+    :param wlc_ids: Optional dict of WLC name to NetBox device ID, e.g. from
+        the pre-flight check
+    :param transform_workers: Worker processes for the CSV transform;
+        default: one per CPU
+    :param file_format: One of input_formats.INPUT_FORMATS, or None to use
+        the file extension
+    :param fingerprint_store: Optional FingerprintStore.  Rows unchanged
+        since the last import are skipped, and the store is updated with the
+        devices written.
+    :return: None
+    :raises FileNotFoundError: If the file does not exist
+    :raises ImportError: If a Parquet or Arrow file is imported without pyarrow
+    """
+    emit("import.start", text="*" * 78, csv_file=csv_file)
+
+    # One bulk read tells which stored fingerprints still describe NetBox
+    device_state = {}
+    if fingerprint_store is not None and len(fingerprint_store):
+        device_state = fetch_device_state(netbox_api, pod_number=workshop_pod_number)
+    # Device name -> (device ID, fingerprint) of the devices written
+    written = {}
+    skipped = 0
+
+    for transformed in transform_input_file(csv_file, workshop_pod_number,
+                                            file_format=file_format,
+                                            max_workers=transform_workers):
+        device_name = transformed.device_name
+        if fingerprint_store is not None and not transformed.error and \
+                fingerprint_store.unchanged(device_name, transformed.fingerprint, device_state):
+            skipped += 1
+            emit("device.done", device=device_name, status="SKIPPED")
+            continue
+
+        emit("device.start", text=f"Processing device '{device_name}'...",
+             device=device_name)
+
+        current_device = None
+        if transformed.error:
+            emit("device.transform", level="error", status="FAILED", device=device_name,
+                 row=transformed.row, error=transformed.error,
+                 text=f"\tFAILED to read CSV row {transformed.row}: {transformed.error}")
+        else:
+            # Complete the payload with the NetBox IDs of the WLCs
+            device_detail = apply_wlc_associations(netbox_api=netbox_api,
+                                                   device_details=transformed.device_details,
+                                                   wlc_names=transformed.wlc_names,
+                                                   wlc_ids=wlc_ids)
+
+            # Create or update with the generated device details
+            current_device = create_or_update_device(netbox_api=netbox_api,
+                                                     device_detail_dict=device_detail)
+        if current_device is not None:
+            # The device was created or updated, now update the
+            # interface details.
+            emit("interfaces.start", text="\t\tUpdating interfaces for this device...",
+                 device=device_name)
+            update_interfaces(netbox_api=netbox_api,
+                              device_object=current_device,
+                              csv_row=None,
+                              interface_fields=transformed.interfaces)
+
+        if fingerprint_store is not None:
+            if current_device is not None:
+                written[device_name] = (current_device.id, transformed.fingerprint)
+            else:
+                fingerprint_store.forget(device_name)
+
+        emit("device.done", text="*" * 78, device=device_name,
+             status="OK" if current_device is not None else "FAILED")
+
+    if fingerprint_store is not None:
+        emit("import.fingerprints", skipped=skipped, written=len(written),
+             text=f"Unchanged devices skipped: {skipped}, devices written: {len(written)}")
+        if written:
+            record_written_devices(netbox_api, fingerprint_store, written)
+        else:
+            fingerprint_store.save()
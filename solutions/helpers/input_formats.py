@@ -0,0 +1,226 @@
+"""
+Read and write AP inventory files in the formats the importer accepts:
+
+    csv      UTF-8 CSV with a header row, as created by generate_csv.py
+    jsonl    JSON Lines, one JSON object per AP
+    parquet  Apache Parquet
+    arrow    Apache Arrow IPC file (Feather v2)
+
+JSON Lines, Parquet, and Arrow files carry typed values - numbers for
+channels, widths and tx power, booleans for enabled - so rows do not have
+to be parsed from strings.  Parquet and Arrow files are read one record
+batch at a time.  They need pyarrow, which is only imported when one of
+those formats is used.
+
+The format is taken from the file extension unless given explicitly;
+unknown extensions are treated as CSV.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+INPUT_FORMATS = ("csv", "jsonl", "parquet", "arrow")
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+# Rows per record batch read from a file
+DEFAULT_BATCH_SIZE = 10000
+
+# Typed columns; every other column is a string
+INTEGER_COLUMN_SUFFIXES = ("_channel_number", "_channel_width", "_tx_power")
+BOOLEAN_COLUMN_SUFFIXES = ("_enabled",)
+TRUE_VALUES = ("true", "1", "yes")
+
+
+def _import_pyarrow():
+    """
+    Import pyarrow, with an install hint when it is missing.
+    """
+    # pylint: disable=import-outside-toplevel
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as err:
+        raise ImportError(f"Parquet and Arrow files need pyarrow ({err}).  "
+                          "Install it with: pip install pyarrow") from err
+    return pyarrow
+
+
+def detect_format(file_name, file_format=None):
+    """
+    :param file_name: Inventory file name
+    :param file_format: Explicit format, or None to use the file extension
+    :return: One of INPUT_FORMATS
+    :raises ValueError: If an explicit format is not supported
+    """
+    if file_format:
+        if file_format not in INPUT_FORMATS:
+            raise ValueError(f"Unsupported format '{file_format}', "
+                             f"expected one of {', '.join(INPUT_FORMATS)}")
+        return file_format
+    return FORMAT_EXTENSIONS.get(os.path.splitext(file_name)[1].lower(), "csv")
+
+
+def column_type(column):
+    """
+    :param column: Column name
+    :return: "int", "bool", or "str"
+    """
+    if column.endswith(INTEGER_COLUMN_SUFFIXES):
+        return "int"
+    if column.endswith(BOOLEAN_COLUMN_SUFFIXES):
+        return "bool"
+    return "str"
+
+
+def typed_value(column, value):
+    """
+    Convert a value to the type of its column.  Empty values become None.
+
+    :param column: Column name
+    :param value: Value, e.g. a string read from a CSV file
+    :return: int, bool, str, or None
+    """
+    if value is None or value == "":
+        return None
+    value_type = column_type(column)
+    if value_type == "int":
+        return int(value)
+    if value_type == "bool":
+        return value if isinstance(value, bool) else str(value).lower() in TRUE_VALUES
+    return str(value)
+
+
+def _csv_batches(file_name, batch_size):
+    with open(file_name, "r", encoding="utf-8-sig") as csv_file:
+        reader = csv.DictReader(csv_file)
+        while batch := list(islice(reader, batch_size)):
+            yield batch
+
+
+def _jsonl_batches(file_name, batch_size):
+    with open(file_name, "r", encoding="utf-8") as jsonl_file:
+        records = (json.loads(line) for line in jsonl_file if line.strip())
+        while batch := list(islice(records, batch_size)):
+            yield batch
+
+
+def _arrow_batches(file_name, file_format, batch_size):
+    pyarrow = _import_pyarrow()
+    if file_format == "parquet":
+        record_batches = pyarrow.parquet.ParquetFile(file_name).iter_batches(
+            batch_size=batch_size)
+    else:
+        reader = pyarrow.ipc.open_file(file_name)
+        record_batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+
+    for record_batch in record_batches:
+        for offset in range(0, record_batch.num_rows, batch_size):
+            yield record_batch.slice(offset, batch_size).to_pylist()
+
+
+def read_record_batches(file_name, file_format=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read an inventory file as batches of row dicts.
+
+    :param file_name: Inventory file name
+    :param file_format: One of INPUT_FORMATS, or None to use the file extension
+    :param batch_size: Maximum rows per batch
+    :return: Generator of lists of row dicts.  CSV values are strings; the
+        other formats have typed values, with None for empty values.
+    :raises FileNotFoundError: If the file does not exist
+    :raises ImportError: If a Parquet or Arrow file is read without pyarrow
+    """
+    file_format = detect_format(file_name, file_format)
+    if file_format == "csv":
+        yield from _csv_batches(file_name, batch_size)
+    elif file_format == "jsonl":
+        yield from _jsonl_batches(file_name, batch_size)
+    else:
+        yield from _arrow_batches(file_name, file_format, batch_size)
+
+
+def read_records(file_name, file_format=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read the rows of an inventory file.  See read_record_batches().
+
+    :return: Generator of row dicts
+    """
+    for batch in read_record_batches(file_name, file_format, batch_size):
+        yield from batch
+
+
+def read_columns(file_name, file_format=None):
+    """
+    Read the column names of an inventory file without reading its rows.
+
+    :param file_name: Inventory file name
+    :param file_format: One of INPUT_FORMATS, or None to use the file extension
+    :return: List of column names, or None for JSON Lines files, which have
+        no header; use the keys of the rows instead
+    """
+    file_format = detect_format(file_name, file_format)
+    if file_format == "csv":
+        with open(file_name, "r", encoding="utf-8-sig") as csv_file:
+            return next(csv.reader(csv_file), [])
+    if file_format == "jsonl":
+        return None
+
+    pyarrow = _import_pyarrow()
+    if file_format == "parquet":
+        return list(pyarrow.parquet.read_schema(file_name).names)
+    return list(pyarrow.ipc.open_file(file_name).schema.names)
+
+
+def write_records(records, file_name, columns, file_format=None):
+    """
+    Write rows to an inventory file, streaming them from the iterable.  For
+    the typed formats, values are converted to the type of their column.
+
+    :param records: Iterable of row dicts
+    :param file_name: Output file name
+    :param columns: Column names, in file order
+    :param file_format: One of INPUT_FORMATS, or None to use the file extension
+    :return: None
+    :raises ImportError: If a Parquet or Arrow file is written without pyarrow
+    """
+    file_format = detect_format(file_name, file_format)
+    columns = list(columns)
+
+    if file_format == "csv":
+        with open(file_name, "w", encoding="utf-8-sig", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(records)
+        return
+
+    typed_records = ({column: typed_value(column, record.get(column)) for column in columns}
+                     for record in records)
+    if file_format == "jsonl":
+        with open(file_name, "w", encoding="utf-8") as jsonl_file:
+            for record in typed_records:
+                jsonl_file.write(json.dumps(record) + "\n")
+        return
+
+    pyarrow = _import_pyarrow()
+    arrow_types = {"int": pyarrow.int64(), "bool": pyarrow.bool_(), "str": pyarrow.string()}
+    schema = pyarrow.schema([(column, arrow_types[column_type(column)]) for column in columns])
+    # Rows are converted and written one record batch at a time, so memory
+    # use does not grow with the number of rows
+    if file_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(file_name, schema)
+    else:
+        writer = pyarrow.ipc.new_file(file_name, schema)
+    with writer:
+        while batch := list(islice(typed_records, DEFAULT_BATCH_SIZE)):
+            writer.write_batch(pyarrow.RecordBatch.from_pylist(batch, schema=schema))
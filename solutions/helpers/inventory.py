@@ -0,0 +1,140 @@
+"""
+Compact access point, radio, and WLC records built from NetBox data.
+
+pynetbox Record objects carry the full API response, nested records, and
+lazy attribute machinery.  The provisioning and test loops only need a
+handful of values per AP, so they are copied once into slotted dataclasses:
+MAC addresses are stored normalized and radio channels are stored already
+translated to the values the WLC expects.
+"""
+import re
+from dataclasses import dataclass
+from .rf_channel_map import parse_netbox_rf_channel
+
+WLC_ASSOCIATION_FIELDS = ("wlc_primary_association",
+                          "wlc_secondary_association",
+                          "wlc_tertiary_association")
+
+
+@dataclass(slots=True, frozen=True)
+class ApRadio:
+    """
+    A single AP radio with its RF settings translated for the WLC.
+    """
+    name: str
+    slot_id: int
+    radio_band: str
+    channel: int
+    channel_width: int
+    tx_power: int | None
+    enabled: bool
+    mac: str | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class AccessPoint:
+    """
+    An access point, its radios, and the NetBox IDs of its associated WLCs
+    in primary, secondary, tertiary order.
+    """
+    id: int
+    name: str
+    mac: str | None
+    radios: tuple
+    wlc_ids: tuple = ()
+
+
+@dataclass(slots=True, frozen=True)
+class WirelessController:
+    """
+    A WLC and the DNS name used to reach its RESTCONF API.
+    """
+    id: int
+    name: str
+    dns_name: str
+
+
+def normalize_mac(mac_address):
+    """
+    Normalize a MAC address to lowercase, colon separated format
+    (aa:bb:cc:dd:ee:ff) regardless of the input separators.
+
+    :param mac_address: MAC address string, or None
+    :return: Normalized MAC address string, or None if no MAC was given
+    :raises ValueError: If the value does not contain 12 hex digits
+    """
+    if not mac_address:
+        return None
+    mac_digits = re.sub(r"[^0-9a-fA-F]", "", str(mac_address)).lower()
+    if len(mac_digits) != 12:
+        raise ValueError(f"Invalid MAC address '{mac_address}'")
+    return ":".join(mac_digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def radio_from_netbox_interface(interface):
+    """
+    Build an ApRadio from a NetBox radio interface.
+
+    :param interface: pynetbox interface Record
+    :return: ApRadio, or None if the interface is not a radio with an
+        RF channel assigned
+    """
+    if not str(interface.name).lower().startswith("radio") or not interface.rf_channel:
+        return None
+
+    rf_details = parse_netbox_rf_channel(interface.rf_channel.value)
+    return ApRadio(name=interface.name,
+                   slot_id=int(str(interface.name).lower().replace("radio", "")),
+                   radio_band=rf_details["radio_band"],
+                   channel=int(rf_details["channel"]),
+                   channel_width=rf_details["channel_width"],
+                   tx_power=int(interface.tx_power) if interface.tx_power is not None else None,
+                   enabled=bool(interface.enabled),
+                   mac=normalize_mac(interface.mac_address))
+
+
+def as_ap_radios(ap_radios):
+    """
+    Accept ApRadio records or the NetBox interfaces of an AP, as passed by
+    the workshop exercises.
+
+    :param ap_radios: Iterable of ApRadio records and/or pynetbox interface
+        Records
+    :return: List of ApRadio records.  NetBox interfaces that are not radios
+        with an RF channel assigned are skipped.
+    """
+    radios = []
+    for radio in ap_radios:
+        if not isinstance(radio, ApRadio):
+            radio = radio_from_netbox_interface(radio)
+        if radio is not None:
+            radios.append(radio)
+    return radios
+
+
+def access_point_from_netbox(netbox_ap_object, ap_interfaces):
+    """
+    Build an AccessPoint from a NetBox device and all of its interfaces.
+    The management-only interface provides the AP Ethernet MAC.
+
+    :param netbox_ap_object: Access point object reference from NetBox
+    :param ap_interfaces: Iterable of the AP's NetBox interface Records
+    :return: AccessPoint
+    """
+    ap_mac = None
+    radios = []
+    for interface in ap_interfaces:
+        if interface.mgmt_only and ap_mac is None:
+            ap_mac = normalize_mac(interface.mac_address)
+        elif radio := radio_from_netbox_interface(interface):
+            radios.append(radio)
+
+    custom_fields = netbox_ap_object.custom_fields or {}
+    wlc_ids = tuple(custom_fields[field]["id"] for field in WLC_ASSOCIATION_FIELDS
+                    if custom_fields.get(field))
+
+    return AccessPoint(id=netbox_ap_object.id,
+                       name=netbox_ap_object.name,
+                       mac=ap_mac,
+                       radios=tuple(sorted(radios, key=lambda r: r.slot_id)),
+                       wlc_ids=wlc_ids)
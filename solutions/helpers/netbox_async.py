@@ -0,0 +1,216 @@
+"""
+Asyncio NetBox read client for the read-heavy provisioning paths.
+
+pynetbox is synchronous, so every lookup it makes waits out the full NetBox
+round trip before the next one starts.  AsyncNetBoxReader issues the same
+REST reads from coroutines instead: requests run on a pooled HTTP session
+in worker threads, an asyncio semaphore bounds how many are in flight, and
+callers gather as many as they like.  Only the reads the helpers need are
+covered - devices, interfaces, and IP addresses, with pagination - and the
+results feed the same AccessPoint and WirelessController records as
+netbox_reads, so everything downstream is unchanged.
+
+Records are returned as JsonRecord dicts that also allow attribute access,
+which is what inventory.access_point_from_netbox() reads from pynetbox
+Records.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from pynetbox import RequestError
+from .inventory import WirelessController, access_point_from_netbox
+from .netbox_reads import (AP_DEVICE_FIELDS,
+                           AP_INTERFACE_FIELDS,
+                           DEFAULT_PAGE_SIZE,
+                           DEVICE_ID_CHUNK_SIZE)
+from .profiling import profile_phase
+
+DEFAULT_ASYNC_CONCURRENCY = 16
+
+WLC_DEVICE_FIELDS = ("id", "name", "primary_ip4")
+
+
+class JsonRecord(dict):
+    """
+    A NetBox JSON object that also allows attribute access to its fields,
+    e.g. interface.rf_channel.value.  Missing fields read as None.
+    """
+    def __getattr__(self, name):
+        return _wrap(self.get(name))
+
+
+def _wrap(value):
+    if isinstance(value, dict) and not isinstance(value, JsonRecord):
+        return JsonRecord(value)
+    return value
+
+
+class AsyncNetBoxReader:
+    """
+    Concurrent NetBox REST reads for asyncio code.  Create it and await its
+    methods inside one event loop; close() it when done.
+    """
+    def __init__(self, url, token, max_concurrency=DEFAULT_ASYNC_CONCURRENCY,
+                 page_size=DEFAULT_PAGE_SIZE):
+        """
+        :param url: NetBox URL
+        :param token: NetBox API token
+        :param max_concurrency: Requests in flight at the same time; also the
+            size of the HTTP connection pool
+        :param page_size: Records per list page
+        """
+        self.base_url = url.rstrip("/") + "/api/"
+        self.page_size = page_size
+        self._session = requests.Session()
+        self._session.headers.update({"Authorization": f"Token {token}",
+                                      "Accept": "application/json"})
+        self._session.mount(self.base_url, HTTPAdapter(pool_connections=1,
+                                                       pool_maxsize=max_concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="netbox-async")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # WLC ID -> task resolving it, so concurrent lookups share one read
+        self._wlc_tasks = {}
+
+    def _get(self, path, params):
+        with profile_phase("netbox_fetch"):
+            response = self._session.get(self.base_url + path, params=params)
+        if not response.ok:
+            raise RequestError(response)
+        return response.json()
+
+    async def get(self, path, **params):
+        """
+        :param path: API path below /api/, e.g. "dcim/devices/"
+        :param params: Query parameters
+        :return: Decoded JSON response
+        :raises pynetbox.RequestError: On an error response
+        """
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._get, path, params)
+
+    async def list(self, path, fields=None, **filters):
+        """
+        Read every record of a filtered list.  The first page gives the
+        total count, then the remaining pages are read concurrently.
+
+        Like netbox_reads.fetch_records() - pynetbox's threaded offset
+        paging - and unlike the keyset paging of iter_record_pages(): a
+        keyset page needs the last ID of the page before, so the pages
+        could only be read one after another, which is what this client
+        exists to avoid.  Offset pages may shift if records are created or
+        deleted during the read, the same trade-off fetch_records() makes.
+
+        :param path: API path below /api/, e.g. "dcim/devices/"
+        :param fields: Optional field names to request instead of full objects
+        :param filters: NetBox query filters
+        :return: List of JsonRecord, in page order
+        """
+        query_params = dict(filters, limit=self.page_size)
+        if fields:
+            query_params["fields"] = ",".join(fields)
+        first_page = await self.get(path, offset=0, **query_params)
+        pages = await asyncio.gather(*(self.get(path, offset=offset, **query_params)
+                                       for offset in range(self.page_size,
+                                                           first_page["count"],
+                                                           self.page_size)))
+        return [JsonRecord(record) for page in (first_page, *pages)
+                for record in page["results"]]
+
+    async def ap_devices(self, pod_number=None):
+        """
+        :param pod_number: Optional workshop pod number
+        :return: List of AP device JsonRecords, sorted by name
+        """
+        device_filter = {"role": "ap"}
+        if pod_number is not None:
+            device_filter["cf_workshop_pod_number"] = pod_number
+        devices = await self.list("dcim/devices/", fields=AP_DEVICE_FIELDS, **device_filter)
+        return sorted(devices, key=lambda device: str(device.name))
+
+    async def interfaces(self, device_ids, fields=AP_INTERFACE_FIELDS):
+        """
+        :param device_ids: NetBox device IDs, at most one query string's worth
+        :param fields: Interface fields to request; must include "device"
+        :return: Dict of device ID to list of interface JsonRecords, by ID
+        """
+        interfaces_by_device = {device_id: [] for device_id in device_ids}
+        for interface in await self.list("dcim/interfaces/", fields=fields,
+                                         device_id=list(device_ids)):
+            interfaces_by_device.setdefault(interface.device.id, []).append(interface)
+        for interfaces in interfaces_by_device.values():
+            interfaces.sort(key=lambda interface: interface.id)
+        return interfaces_by_device
+
+    async def iter_pod_inventory(self, pod_number=None, chunk_size=DEVICE_ID_CHUNK_SIZE):
+        """
+        Read the APs of a pod (or all pods), yielding them as soon as the
+        interfaces of each chunk of devices are in, so callers can start
+        working on the first APs while the others are still read.
+
+        :param pod_number: Optional workshop pod number
+        :param chunk_size: Devices per interface query
+        :return: Async generator of lists of AccessPoint records
+        """
+        devices = await self.ap_devices(pod_number)
+
+        async def read_chunk(chunk):
+            return chunk, await self.interfaces([device.id for device in chunk])
+
+        chunk_reads = [asyncio.ensure_future(read_chunk(devices[i:i + chunk_size]))
+                       for i in range(0, len(devices), chunk_size)]
+        try:
+            for chunk_read in asyncio.as_completed(chunk_reads):
+                chunk, interfaces_by_device = await chunk_read
+                yield [access_point_from_netbox(device, interfaces_by_device[device.id])
+                       for device in chunk]
+        finally:
+            for chunk_read in chunk_reads:
+                chunk_read.cancel()
+
+    async def load_pod_inventory(self, pod_number=None):
+        """
+        :param pod_number: Optional workshop pod number
+        :return: List of AccessPoint records, sorted by name
+        """
+        access_points = [ap async for chunk in self.iter_pod_inventory(pod_number)
+                         for ap in chunk]
+        return sorted(access_points, key=lambda ap: str(ap.name))
+
+    async def _read_wlc(self, wlc_id):
+        wlc_object = JsonRecord(await self.get(f"dcim/devices/{wlc_id}/",
+                                               fields=",".join(WLC_DEVICE_FIELDS)))
+        if not wlc_object.primary_ip4:
+            raise ValueError(f"WLC '{wlc_object.name}' has no primary IPv4 address in NetBox")
+        wlc_mgmt_ip = await self.get(f"ipam/ip-addresses/{wlc_object.primary_ip4.id}/")
+        return WirelessController(id=wlc_object.id, name=wlc_object.name,
+                                  dns_name=wlc_mgmt_ip["dns_name"])
+
+    async def resolve_wlc(self, wlc_id):
+        """
+        Async counterpart of WlcResolver.resolve(); each WLC is read once.
+
+        :param wlc_id: NetBox device ID of the WLC
+        :return: WirelessController record
+        :raises pynetbox.RequestError: If NetBox could not be read
+        :raises ValueError: If the WLC has no primary IPv4 address
+        """
+        if wlc_id not in self._wlc_tasks:
+            self._wlc_tasks[wlc_id] = asyncio.ensure_future(self._read_wlc(wlc_id))
+        try:
+            return await asyncio.shield(self._wlc_tasks[wlc_id])
+        except Exception:
+            # Read it again next time rather than caching the failure
+            self._wlc_tasks.pop(wlc_id, None)
+            raise
+
+    def close(self):
+        """
+        Close the HTTP session and stop the worker threads.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+        self._session.close()
@@ -0,0 +1,180 @@
+"""
+Bulk NetBox reads for the provisioning, validation, and analytics paths.
+
+Reads are made with a threaded pynetbox client, so once the first page of a
+list is in, the remaining pages are fetched concurrently.  Pages are large,
+and only the fields the caller actually uses are requested (NetBox 4
+"fields" selection; older NetBox versions ignore it and return full objects).
+
+Interfaces are fetched for many devices at once, in chunks of device IDs,
+instead of one query per device.
+
+NOTE: Records returned with a field selection only have those fields.
+Reading any other attribute makes pynetbox fetch the full object, one
+request per record - add the field to the selection instead.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import pynetbox
+from .inventory import access_point_from_netbox
+from .profiling import profile_phase
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_READ_WORKERS = 8
+
+# Device IDs per interface query, keeping the query string a sane length
+DEVICE_ID_CHUNK_SIZE = 200
+
+# Fields used to build AccessPoint records
+AP_DEVICE_FIELDS = ("id", "name", "custom_fields")
+AP_INTERFACE_FIELDS = ("id", "name", "device", "mac_address", "mgmt_only",
+                       "rf_channel", "tx_power", "enabled")
+
+
+def create_netbox_api(url, token, max_workers=DEFAULT_READ_WORKERS):
+    """
+    Initialize a pynetbox API object that fetches list pages concurrently.
+
+    :param url: NetBox URL
+    :param token: NetBox API token
+    :param max_workers: Concurrent page requests per list query
+    :return: pynetbox API object
+    """
+    return pynetbox.api(url=url, token=token, threading=True, max_workers=max_workers)
+
+
+def fetch_records(endpoint, fields=None, page_size=DEFAULT_PAGE_SIZE, **filters):
+    """
+    Fetch every record of a filtered list query.
+
+    :param endpoint: pynetbox Endpoint, e.g. netbox_api.dcim.devices
+    :param fields: Optional field names to request instead of full objects
+    :param page_size: Records per page
+    :param filters: NetBox query filters
+    :return: List of pynetbox Records.  With a threaded API object, pages are
+        not guaranteed to arrive in order.
+    """
+    query_params = dict(filters, limit=page_size)
+    if fields:
+        query_params["fields"] = ",".join(fields)
+    with profile_phase("netbox_fetch"):
+        return list(endpoint.filter(**query_params))
+
+
+def iter_record_pages(endpoint, fields=None, page_size=DEFAULT_PAGE_SIZE, **filters):
+    """
+    Read a filtered list query one page at a time, in ID order.  Pages are
+    selected by the last ID seen rather than an offset, so records created
+    or deleted during the read do not shift records between pages.
+
+    :param endpoint: pynetbox Endpoint, e.g. netbox_api.dcim.devices
+    :param fields: Optional field names to request; must include "id"
+    :param page_size: Records per page
+    :param filters: NetBox query filters
+    :return: Generator of lists of pynetbox Records
+    """
+    query_params = dict(filters, limit=page_size, ordering="id")
+    if fields:
+        query_params["fields"] = ",".join(fields)
+    last_id = 0
+    while True:
+        # An explicit offset makes pynetbox return this page only
+        with profile_phase("netbox_fetch"):
+            page = list(endpoint.filter(id__gt=last_id, offset=0, **query_params))
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
+def fetch_ap_devices(netbox_api, pod_number=None, fields=AP_DEVICE_FIELDS):
+    """
+    Fetch the access point devices of all pods, or of one workshop pod.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Optional workshop pod number
+    :param fields: Device fields to request
+    :return: List of pynetbox device Records, sorted by name
+    """
+    device_filter = {"role": "ap"}
+    if pod_number is not None:
+        device_filter["cf_workshop_pod_number"] = pod_number
+    return sorted(fetch_records(netbox_api.dcim.devices, fields=fields, **device_filter),
+                  key=lambda device: str(device.name))
+
+
+def fetch_interfaces_by_device(netbox_api, device_ids, fields=AP_INTERFACE_FIELDS,
+                               chunk_size=DEVICE_ID_CHUNK_SIZE,
+                               max_workers=DEFAULT_READ_WORKERS):
+    """
+    Fetch the interfaces of many devices with one query per chunk of device
+    IDs, running the chunk queries concurrently.
+
+    :param netbox_api: pynetbox API object reference
+    :param device_ids: Iterable of NetBox device IDs
+    :param fields: Interface fields to request; must include "device"
+    :param chunk_size: Device IDs per query
+    :param max_workers: Chunk queries run at the same time
+    :return: Dict of device ID to list of interface Records
+    """
+    device_ids = list(dict.fromkeys(device_ids))
+    chunks = [device_ids[i:i + chunk_size] for i in range(0, len(device_ids), chunk_size)]
+
+    interfaces_by_device = {device_id: [] for device_id in device_ids}
+    if not chunks:
+        return interfaces_by_device
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        for interfaces in executor.map(
+                lambda chunk: fetch_records(netbox_api.dcim.interfaces, fields=fields,
+                                            device_id=chunk),
+                chunks):
+            for interface in interfaces:
+                interfaces_by_device.setdefault(interface.device.id, []).append(interface)
+    return interfaces_by_device
+
+
+def load_pod_inventory(netbox_api, pod_number=None):
+    """
+    Load the access points of a workshop pod (or all pods) with their radios
+    and WLC associations, using bulk, trimmed reads.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Optional workshop pod number
+    :return: List of AccessPoint records, sorted by name
+    """
+    ap_devices = fetch_ap_devices(netbox_api, pod_number=pod_number)
+    interfaces_by_device = fetch_interfaces_by_device(netbox_api,
+                                                      (device.id for device in ap_devices))
+
+    # Interfaces arrive unordered from concurrent pages; order them by ID so
+    # the first management interface is picked consistently
+    return [access_point_from_netbox(device,
+                                     sorted(interfaces_by_device.get(device.id, ()),
+                                            key=lambda interface: interface.id))
+            for device in ap_devices]
+
+
+def iter_pod_inventory(netbox_api, pod_number=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Stream the access points of a workshop pod (or all pods) one page of
+    devices at a time, so only a page of records is held in memory and the
+    first APs are available after one page of reads.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Optional workshop pod number
+    :param page_size: Devices per page
+    :return: Generator of lists of AccessPoint records, in NetBox ID order
+    """
+    device_filter = {"role": "ap"}
+    if pod_number is not None:
+        device_filter["cf_workshop_pod_number"] = pod_number
+    for ap_devices in iter_record_pages(netbox_api.dcim.devices, fields=AP_DEVICE_FIELDS,
+                                        page_size=page_size, **device_filter):
+        interfaces_by_device = fetch_interfaces_by_device(netbox_api,
+                                                          (device.id for device in ap_devices))
+        yield [access_point_from_netbox(device,
+                                        sorted(interfaces_by_device.get(device.id, ()),
+                                               key=lambda interface: interface.id))
+               for device in ap_devices]
@@ -0,0 +1,160 @@
+"""
+Streaming provisioning: NetBox pages flow straight into WLC pushes.
+
+    NetBox device pages --> enrichment --> per-WLC push queues --> pushers
+      (keyset paging)      (interfaces,      (bounded)           (threads per
+                            WLC lookups)                           WLC)
+
+One reader thread pages through the pod's devices, adds their interfaces
+and WLC associations, and hands every AP to the queue of each of its WLCs.
+The queues are bounded: when a controller is slow its queue fills up, the
+reader blocks on it, and no further NetBox pages are read until the
+controller catches up.  Memory therefore stays at one page plus the queue
+buffers however large the pod is, and the first AP is pushed after a single
+page of reads instead of after the whole inventory.
+"""
+import queue
+import threading
+import time
+from pynetbox.core.query import RequestError
+from requests.exceptions import RequestException
+from .events import emit
+from .netbox_reads import iter_pod_inventory
+from .wlc_helpers import provision_ap_on_pooled_wlc
+
+DEFAULT_STREAM_PAGE_SIZE = 100
+DEFAULT_QUEUE_SIZE = 50
+DEFAULT_PUSHERS_PER_WLC = 2
+
+# Put on a push queue once per pusher when the reader is done
+_END_OF_STREAM = None
+
+
+class _ApTracker:
+    """
+    Results of the APs in flight; an AP is done once every WLC it was
+    queued for reported back, and is then forgotten.
+    """
+    def __init__(self, pod_number):
+        self.pod_number = pod_number
+        self.outcome = {"access_points": 0, "failed": 0, "deferred": 0}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, ap, wlc_count):
+        """
+        Start tracking an AP.
+
+        :param ap: AccessPoint record
+        :param wlc_count: Number of WLCs the AP is queued for; it is done
+            after this many report() calls
+        """
+        with self._lock:
+            self.outcome["access_points"] += 1
+            self._pending[ap.id] = [wlc_count, True]
+
+    def report(self, ap, provisioned):
+        """
+        :param provisioned: True, False, or None if the push was deferred
+        """
+        with self._lock:
+            pending = self._pending[ap.id]
+            pending[0] -= 1
+            if provisioned is False:
+                pending[1] = False
+            elif provisioned is None and pending[1] is True:
+                pending[1] = None
+            if pending[0]:
+                return
+            del self._pending[ap.id]
+            status = {True: "OK", False: "FAILED", None: "DEFERRED"}[pending[1]]
+            if status == "FAILED":
+                self.outcome["failed"] += 1
+            elif status == "DEFERRED":
+                self.outcome["deferred"] += 1
+        emit("ap.done", text="*" * 78, ap=ap.name, pod=self.pod_number, status=status)
+
+
+def configure_pod_streaming(netbox_api, pod_number, wlc_resolver, session_pool,
+                            page_size=DEFAULT_STREAM_PAGE_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                            pushers_per_wlc=DEFAULT_PUSHERS_PER_WLC):
+    """
+    Provision every access point of a workshop pod as it streams in from
+    NetBox, with bounded per-WLC queues throttling the NetBox reads.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Workshop pod number to provision
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param page_size: Devices read per NetBox page
+    :param queue_size: APs buffered per WLC before the reader waits
+    :param pushers_per_wlc: Threads pushing to each WLC
+    :return: Dict with the number of APs processed, failed, and deferred,
+        like configure_pod(), plus "first_push_seconds" (until the first AP
+        was provisioned), and "peak_queued" (most APs buffered for one WLC)
+    """
+    start_time = time.perf_counter()
+    tracker = _ApTracker(pod_number)
+    push_queues = {}
+    pushers = []
+    first_push = []
+    peak_queued = [0]
+
+    def pusher(wlc, push_queue):
+        while (ap := push_queue.get()) is not _END_OF_STREAM:
+            try:
+                provisioned = provision_ap_on_pooled_wlc(session_pool, ap, wlc_name=wlc.name,
+                                                         wlc_host=wlc.dns_name)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                # A dead pusher would leave the reader blocked on a full queue
+                emit("ap.error", level="error", ap=ap.name, wlc=wlc.name,
+                     error=f"{type(err).__name__}: {err}",
+                     text=f"\tProvisioning AP {ap.name} on WLC '{wlc.name}' failed: "
+                          f"{type(err).__name__}: {err}")
+                provisioned = False
+            if not first_push:
+                first_push.append(time.perf_counter() - start_time)
+            tracker.report(ap, provisioned)
+
+    def queue_for(wlc):
+        if wlc.dns_name not in push_queues:
+            push_queue = push_queues[wlc.dns_name] = queue.Queue(maxsize=max(1, queue_size))
+            for _ in range(max(1, pushers_per_wlc)):
+                thread = threading.Thread(target=pusher, args=(wlc, push_queue),
+                                          name=f"push-{wlc.name}", daemon=True)
+                thread.start()
+                pushers.append(thread)
+        return push_queues[wlc.dns_name]
+
+    try:
+        for access_points in iter_pod_inventory(netbox_api, pod_number, page_size=page_size):
+            for ap in access_points:
+                try:
+                    wlcs = [wlc_resolver.resolve(wlc_id) for wlc_id in ap.wlc_ids]
+                except (RequestError, RequestException, ValueError) as err:
+                    # e.g. a WLC without a primary IP; fail this AP only
+                    emit("ap.error", level="error", ap=ap.name, error=str(err),
+                         text=f"\tLooking up the WLCs of AP {ap.name} failed: {err}")
+                    tracker.add(ap, 1)
+                    tracker.report(ap, False)
+                    continue
+                if not wlcs:
+                    tracker.add(ap, 1)
+                    tracker.report(ap, True)
+                    continue
+                tracker.add(ap, len(wlcs))
+                for wlc in wlcs:
+                    push_queue = queue_for(wlc)
+                    # Blocks while the WLC's queue is full: backpressure
+                    push_queue.put(ap)
+                    peak_queued[0] = max(peak_queued[0], push_queue.qsize())
+    finally:
+        for push_queue in push_queues.values():
+            for _ in range(max(1, pushers_per_wlc)):
+                push_queue.put(_END_OF_STREAM)
+        for thread in pushers:
+            thread.join()
+
+    return dict(tracker.outcome,
+                first_push_seconds=first_push[0] if first_push else None,
+                peak_queued=peak_queued[0])
@@ -0,0 +1,446 @@
+"""
+Helper functions to configure and test the access points of workshop pods.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pynetbox.core.query import RequestError
+from requests.exceptions import RequestException
+from .capabilities import STRATEGY_BATCHED_MERGE
+from .events import emit, flush_events
+from .netbox_reads import iter_pod_inventory, load_pod_inventory
+from .pipeline import configure_pod_streaming
+from .scheduler import DEFAULT_PER_WLC_LIMIT, DEFAULT_WORKERS, schedule_provisioning
+from .wlc_helpers import (get_ap_wlc_associations,
+                          provision_ap_on_pooled_wlc,
+                          provision_aps_batched)
+from .wlc_test_helpers import (fetch_wlc_ap_configs,
+                               report_ap_name,
+                               report_ap_radios)
+
+
+def parse_pod_list(pod_spec):
+    """
+    Convert a pod list specification such as "1-5,8,10-12" to a sorted list
+    of unique pod numbers.
+
+    :param pod_spec: Comma separated pod numbers and/or ranges
+    :return: Sorted list of pod numbers
+    :raises ValueError: If the specification contains an invalid entry
+    """
+    pod_numbers = set()
+    for pod_entry in str(pod_spec).split(","):
+        pod_entry = pod_entry.strip()
+        if not pod_entry:
+            continue
+        if "-" in pod_entry:
+            range_start, range_end = (int(x) for x in pod_entry.split("-", 1))
+            if range_start > range_end:
+                raise ValueError(f"Invalid pod range '{pod_entry}'")
+            pod_numbers.update(range(range_start, range_end + 1))
+        else:
+            pod_numbers.add(int(pod_entry))
+    return sorted(pod_numbers)
+
+
+def provision_batched_wlcs(access_points, wlc_resolver, session_pool, capability_cache):
+    """
+    Provision APs in batches on every WLC whose capabilities allow batched
+    merge requests.  Other WLCs are left for the per-AP path.
+
+    :param access_points: AccessPoint records to provision
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param capability_cache: CapabilityCache of the WLC capabilities
+    :return: Dict of (WLC DNS name, AP MAC) to True if the AP was provisioned
+        on that WLC, otherwise False
+    """
+    aps_by_wlc = {}
+    for ap in access_points:
+        for wlc_id in ap.wlc_ids:
+            aps_by_wlc.setdefault(wlc_resolver.resolve(wlc_id), []).append(ap)
+
+    provisioned = {}
+    for wlc in sorted(aps_by_wlc, key=lambda wlc: wlc.name):
+        try:
+            capabilities = capability_cache.get(wlc.dns_name)
+        except RequestException as err:
+            emit("wlc.capabilities", level="error", wlc=wlc.name, error=str(err),
+                 text=f"Reading the capabilities of WLC '{wlc.name}' failed, "
+                      f"provisioning one AP at a time: {err}")
+            continue
+        if capabilities.strategy != STRATEGY_BATCHED_MERGE:
+            continue
+
+        for ap_mac, ap_provisioned in provision_aps_batched(
+                request_session=session_pool.get(wlc.dns_name),
+                access_points=aps_by_wlc[wlc],
+                batch_size=capabilities.batch_size,
+                wlc_name=wlc.name).items():
+            provisioned[(wlc.dns_name, ap_mac)] = ap_provisioned
+    return provisioned
+
+
+def configure_pod(netbox_api, pod_number, wlc_resolver, session_pool, capability_cache=None,
+                  batch=False):
+    """
+    Provision every access point of a workshop pod on its associated WLCs.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Workshop pod number to provision
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param capability_cache: Optional CapabilityCache of the WLC capabilities
+    :param batch: With a capability cache, provision the APs of WLCs that
+        support it in batches of merge requests.  Default: every AP is
+        provisioned with its own requests.
+    :return: Dict with the number of APs processed, failed, and deferred
+        because their WLC's circuit breaker is open or the run deadline passed
+    """
+    access_points = load_pod_inventory(netbox_api, pod_number)
+    outcome = {"access_points": len(access_points), "failed": 0, "deferred": 0}
+
+    batched = {}
+    if batch and capability_cache is not None:
+        batched = provision_batched_wlcs(access_points, wlc_resolver, session_pool,
+                                         capability_cache)
+
+    for ap in access_points:
+        emit("ap.start", text=f"Processing AP {ap.name}... ", ap=ap.name, ap_mac=ap.mac)
+
+        wlc_associations = get_ap_wlc_associations(netbox_api=netbox_api,
+                                                   netbox_ap_object=ap,
+                                                   wlc_resolver=wlc_resolver)
+
+        ap_provisioned = True
+        ap_deferred = False
+        for wlc in wlc_associations:
+            # Already provisioned as part of a batch
+            if (wlc["wlc_dns"], ap.mac) in batched:
+                ap_provisioned &= batched[(wlc["wlc_dns"], ap.mac)]
+                continue
+
+            provisioned = provision_ap_on_pooled_wlc(session_pool, ap,
+                                                     wlc_name=wlc["wlc_name"],
+                                                     wlc_host=wlc["wlc_dns"])
+            if provisioned is None:
+                ap_deferred = True
+            else:
+                ap_provisioned &= provisioned
+        if not ap_provisioned:
+            outcome["failed"] += 1
+        elif ap_deferred:
+            outcome["deferred"] += 1
+
+        emit("ap.done", text="*" * 78, ap=ap.name, pod=pod_number,
+             status="FAILED" if not ap_provisioned else "DEFERRED" if ap_deferred else "OK")
+
+    return outcome
+
+
+def configure_pods_scheduled(netbox_api, pod_numbers, wlc_resolver, session_pool,
+                             capability_cache=None, batch=False, workers=DEFAULT_WORKERS,
+                             per_wlc_limit=DEFAULT_PER_WLC_LIMIT):
+    """
+    Provision the access points of several pods through one fair scheduler
+    instead of pod by pod, so a large pod cannot hold up the others and new
+    APs are provisioned before routine refreshes on every WLC.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_numbers: Iterable of workshop pod numbers
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param capability_cache: Optional CapabilityCache, see configure_pod()
+    :param batch: Provision in batches where supported, see configure_pod()
+    :param workers: Worker threads shared by all WLCs
+    :param per_wlc_limit: Maximum tasks running on one WLC at a time
+    :return: Tuple of (list of per-pod result dicts like run_pods(), with
+        the seconds until the last AP of the pod finished, SchedulerStats)
+    """
+    pod_results = []
+    pod_aps = {}
+    for pod_number in pod_numbers:
+        pod_result = {"pod": pod_number, "access_points": 0, "failed": 0, "deferred": 0,
+                      "status": "OK", "error": None, "seconds": 0.0}
+        try:
+            pod_aps[pod_number] = load_pod_inventory(netbox_api, pod_number)
+        except RequestError as err:
+            pod_result.update({"status": "ERROR", "error": f"NetBox API error: {err}"})
+        except RequestException as err:
+            pod_result.update({"status": "ERROR", "error": str(err)})
+        pod_results.append(pod_result)
+
+    provisioned, finish_times, stats = schedule_provisioning(
+        access_points=[ap for access_points in pod_aps.values() for ap in access_points],
+        wlc_resolver=wlc_resolver,
+        session_pool=session_pool,
+        capability_cache=capability_cache,
+        batch=batch,
+        workers=workers,
+        per_wlc_limit=per_wlc_limit)
+
+    ap_failed = {}
+    ap_deferred = {}
+    for (_, ap_mac), ap_provisioned in provisioned.items():
+        # None: deferred by the circuit breaker or run deadline
+        ap_failed[ap_mac] = ap_failed.get(ap_mac, False) or ap_provisioned is False
+        ap_deferred[ap_mac] = ap_deferred.get(ap_mac, False) or ap_provisioned is None
+    for pod_result in pod_results:
+        if pod_result["status"] == "ERROR":
+            continue
+        access_points = pod_aps[pod_result["pod"]]
+        pod_result["access_points"] = len(access_points)
+        # APs without a MAC address are not scheduled and count as failed
+        pod_result["failed"] = sum(not ap.mac or ap_failed.get(ap.mac, False)
+                                   for ap in access_points)
+        pod_result["deferred"] = sum(ap_deferred.get(ap.mac, False)
+                                     and not ap_failed.get(ap.mac, False)
+                                     for ap in access_points)
+        pod_result["seconds"] = max((finish_times.get(ap.mac, 0.0) for ap in access_points),
+                                    default=0.0)
+        if pod_result["failed"] or not pod_result["access_points"]:
+            pod_result["status"] = "FAILED"
+        elif pod_result["deferred"]:
+            pod_result["status"] = "DEFERRED"
+    return pod_results, stats
+
+
+async def configure_pod_async(netbox_reader, pod_number, session_pool,
+                              push_workers=DEFAULT_WORKERS):
+    """
+    Provision every access point of a workshop pod with NetBox reads and
+    WLC pushes overlapped: APs are pushed as soon as their chunk of
+    interfaces and their WLCs are read, while the remaining NetBox reads
+    are still in flight.  WLC pushes keep using the synchronous request
+    sessions, in worker threads.
+
+    :param netbox_reader: AsyncNetBoxReader
+    :param pod_number: Workshop pod number to provision
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param push_workers: WLC pushes running at the same time
+    :return: Dict with the number of APs processed, failed, and deferred,
+        like configure_pod()
+    """
+    outcome = {"access_points": 0, "failed": 0, "deferred": 0}
+    loop = asyncio.get_running_loop()
+
+    def push(wlc, ap):
+        # None marks the AP as deferred rather than failed
+        return provision_ap_on_pooled_wlc(session_pool, ap, wlc_name=wlc.name,
+                                          wlc_host=wlc.dns_name)
+
+    async def configure_ap(ap, executor):
+        try:
+            wlcs = await asyncio.gather(*(netbox_reader.resolve_wlc(wlc_id)
+                                          for wlc_id in ap.wlc_ids))
+        except (RequestError, ValueError) as err:
+            outcome["failed"] += 1
+            emit("ap.done", level="error", text=f"\tLooking up the WLCs of AP {ap.name} "
+                                                f"failed: {err}\n" + "*" * 78,
+                 ap=ap.name, pod=pod_number, status="FAILED", error=str(err))
+            return
+        wlc_results = await asyncio.gather(*(loop.run_in_executor(executor, push, wlc, ap)
+                                             for wlc in wlcs))
+        ap_provisioned = False not in wlc_results
+        if not ap_provisioned:
+            outcome["failed"] += 1
+        elif None in wlc_results:
+            outcome["deferred"] += 1
+        emit("ap.done", text="*" * 78, ap=ap.name, pod=pod_number,
+             status="FAILED" if not ap_provisioned else
+             "DEFERRED" if None in wlc_results else "OK")
+
+    with ThreadPoolExecutor(max_workers=max(1, push_workers),
+                            thread_name_prefix="wlc-push") as executor:
+        ap_tasks = []
+        async for access_points in netbox_reader.iter_pod_inventory(pod_number):
+            outcome["access_points"] += len(access_points)
+            ap_tasks.extend(asyncio.ensure_future(configure_ap(ap, executor))
+                            for ap in access_points)
+        await asyncio.gather(*ap_tasks)
+    return outcome
+
+
+def test_pod(netbox_api, pod_number, wlc_resolver, session_pool, stream=False):
+    """
+    Validate the WLC configuration of every access point of a workshop pod.
+    The AP name and radio configuration of each WLC is read in bulk, once
+    per WLC, and every AP is checked against it.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Workshop pod number to test
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param stream: Test the APs page by page as they are read from NetBox,
+        in NetBox ID order, instead of reading the whole pod first
+    :return: Dict with the number of APs tested and failed, and the list of
+        CheckResult for every check performed
+    """
+    outcome = {"access_points": 0, "failed": 0, "deferred": 0, "results": []}
+    # WLC DNS name -> (AP name configs, AP radio configs), keyed by AP MAC
+    wlc_configs = {}
+
+    def read_wlc_configs(wlc):
+        if wlc["wlc_dns"] not in wlc_configs:
+            try:
+                wlc_configs[wlc["wlc_dns"]] = fetch_wlc_ap_configs(
+                    session_pool.get(wlc["wlc_dns"]))
+            except RequestException as err:
+                # Every AP on the WLC fails its checks, as with per-AP reads
+                emit("http.error", level="error", wlc=wlc["wlc_name"], error=str(err),
+                     text=f"Reading the AP configuration of WLC '{wlc['wlc_name']}' "
+                          f"failed: {err}")
+                wlc_configs[wlc["wlc_dns"]] = ({}, {})
+        return wlc_configs[wlc["wlc_dns"]]
+
+    if stream:
+        access_points = (ap for page in iter_pod_inventory(netbox_api, pod_number)
+                         for ap in page)
+    else:
+        access_points = load_pod_inventory(netbox_api, pod_number)
+    for ap in access_points:
+        outcome["access_points"] += 1
+        emit("ap.start", text=f"Testing AP {ap.name} association to WLC... ",
+             ap=ap.name, ap_mac=ap.mac)
+
+        wlc_associations = get_ap_wlc_associations(netbox_api=netbox_api,
+                                                   netbox_ap_object=ap,
+                                                   wlc_resolver=wlc_resolver)
+
+        ap_validated = True
+        ap_deferred = False
+        for wlc in wlc_associations:
+            if skip_reason := session_pool.skip_reason(wlc["wlc_dns"]):
+                session_pool.defer("ap", ap.name, wlc["wlc_dns"], skip_reason)
+                ap_deferred = True
+                continue
+            spec_configs, slot_configs = read_wlc_configs(wlc)
+
+            emit("wlc.test", text=f"    Testing WLC '{wlc['wlc_name']}'... ",
+                 ap=ap.name, wlc=wlc["wlc_name"])
+            for wlc_results in (report_ap_name(wlc_name=wlc["wlc_name"],
+                                               ap_name=ap.name,
+                                               ap_mac=ap.mac,
+                                               spec_config=spec_configs.get(ap.mac)),
+                                report_ap_radios(wlc_name=wlc["wlc_name"],
+                                                 ap_name=ap.name,
+                                                 ap_mac=ap.mac,
+                                                 ap_radios=ap.radios,
+                                                 slot_configs_by_id=slot_configs.get(ap.mac))):
+                ap_validated &= all(r.passed for r in wlc_results)
+                outcome["results"].extend(wlc_results)
+        if not ap_validated:
+            outcome["failed"] += 1
+        elif ap_deferred:
+            outcome["deferred"] += 1
+
+        emit("ap.done", text="*" * 78, ap=ap.name, pod=pod_number,
+             status="FAILED" if not ap_validated else "DEFERRED" if ap_deferred else "OK")
+
+    if outcome["access_points"] == 0:
+        emit("pod.empty", level="error", pod=pod_number,
+             text="FAILED: No access points have been defined in NetBox - nothing to test!\n")
+
+    return outcome
+
+
+POD_ACTIONS = {
+    "configure": configure_pod,
+    "stream": configure_pod_streaming,
+    "test": test_pod,
+}
+
+
+def run_pod(pod_action, netbox_api, pod_number, wlc_resolver, session_pool,
+            action_options=None):
+    """
+    Run a pod action and time it.  Errors are captured in the result so one
+    failed pod does not abort the other pods.
+
+    :param pod_action: Name of the action in POD_ACTIONS
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Workshop pod number
+    :param wlc_resolver: WlcResolver shared across pods
+    :param session_pool: RequestSessionPool shared across pods
+    :param action_options: Optional dict of extra keyword arguments for the
+        action, e.g. {"capability_cache": ..., "batch": True} for "configure"
+    :return: Dict containing the pod number, outcome, and elapsed seconds
+    """
+    pod_result = {"pod": pod_number, "access_points": 0, "failed": 0, "deferred": 0,
+                  "status": "OK", "error": None}
+    start_time = time.perf_counter()
+    try:
+        pod_result.update(POD_ACTIONS[pod_action](netbox_api=netbox_api,
+                                                  pod_number=pod_number,
+                                                  wlc_resolver=wlc_resolver,
+                                                  session_pool=session_pool,
+                                                  **(action_options or {})))
+    except RequestError as err:
+        pod_result.update({"status": "ERROR", "error": f"NetBox API error: {err}"})
+    except (RequestException, ValueError) as err:
+        # NetBox unreachable, or NetBox data the action cannot use, e.g. a
+        # WLC without a primary IP
+        pod_result.update({"status": "ERROR", "error": str(err)})
+    else:
+        if pod_result["failed"] or not pod_result["access_points"]:
+            pod_result["status"] = "FAILED"
+        elif pod_result["deferred"]:
+            pod_result["status"] = "DEFERRED"
+    pod_result["seconds"] = time.perf_counter() - start_time
+    return pod_result
+
+
+def run_pods(pod_action, netbox_api, pod_numbers, wlc_resolver, session_pool,
+             max_concurrency=4, action_options=None):
+    """
+    Run a pod action for several pods concurrently.  All pods share the same
+    NetBox client, WLC resolver, and WLC session pool.
+
+    :param pod_action: Name of the action in POD_ACTIONS
+    :param netbox_api: pynetbox API object reference
+    :param pod_numbers: Iterable of workshop pod numbers
+    :param wlc_resolver: WlcResolver shared across pods
+    :param session_pool: RequestSessionPool shared across pods
+    :param max_concurrency: Maximum number of pods processed at the same time
+    :param action_options: Optional dict of extra keyword arguments for the
+        action
+    :return: List of per-pod result dicts, ordered by pod number
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        pod_results = executor.map(
+            lambda pod_number: run_pod(pod_action=pod_action,
+                                       netbox_api=netbox_api,
+                                       pod_number=pod_number,
+                                       wlc_resolver=wlc_resolver,
+                                       session_pool=session_pool,
+                                       action_options=action_options),
+            pod_numbers
+        )
+        return list(pod_results)
+
+
+def print_pod_summary(pod_results, total_seconds):
+    """
+    Print a table with the per-pod timings and outcomes.
+
+    :param pod_results: List of per-pod result dicts from run_pods()
+    :param total_seconds: Wall clock time for the whole run
+    :return: None
+    """
+    flush_events()
+    print("*" * 78)
+    print(f"{'Pod':>5} {'APs':>6} {'Failed':>7} {'Deferred':>8} {'Seconds':>9}  Status")
+    for pod_result in pod_results:
+        print(f"{pod_result['pod']:>5} {pod_result['access_points']:>6} "
+              f"{pod_result['failed']:>7} {pod_result.get('deferred', 0):>8} "
+              f"{pod_result['seconds']:>9.2f}  "
+              f"{pod_result['status']}"
+              f"{' - ' + pod_result['error'] if pod_result['error'] else ''}")
+
+    failed_pods = [r["pod"] for r in pod_results if r["status"] != "OK"]
+    print("*" * 78)
+    print(f"Pods: {len(pod_results)}  "
+          f"APs: {sum(r['access_points'] for r in pod_results)}  "
+          f"Failed pods: {len(failed_pods)}  "
+          f"Elapsed: {total_seconds:.2f}s "
+          f"(sum of pod times {sum(r['seconds'] for r in pod_results):.2f}s)")
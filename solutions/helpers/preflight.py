@@ -0,0 +1,345 @@
+"""
+Pre-flight validation of an AP import CSV file.
+
+The whole file is checked before any device is created or updated, so a bad
+row is reported up front instead of when NetBox rejects it half way through
+an import:
+
+    - schema: required columns present, unknown columns reported
+    - required values, MAC address format, tx power and enabled values
+    - channel and channel width legality against rf_channel_map
+    - duplicate device names, serials, and MAC addresses
+    - WLC names, checked against a single prefetch of the named WLCs
+
+The prefetched WLC IDs are kept in the report and can be passed on to the
+import, so it does not look every WLC up again for each row.
+
+JSON Lines, Parquet, and Arrow files are checked the same way; their typed
+values (numbers, booleans) are accepted where the CSV has strings.
+"""
+import re
+from dataclasses import dataclass, field
+from .channel_planner import planning_channels
+from .events import flush_events
+from .input_formats import read_columns, read_records
+from .rf_channel_map import (allowed_channel_numbers_24ghz,
+                             default_channel_width_24ghz,
+                             netbox_channel_width_translation)
+
+# Device columns, and those every row must have a value for
+DEVICE_COLUMNS = ("device_name", "device_role", "device_type", "serial", "asset_tag",
+                  "site", "location", "platform")
+REQUIRED_COLUMNS = ("device_name", "device_role", "device_type", "serial", "site")
+WLC_COLUMNS = ("primary_wlc", "secondary_wlc", "tertiary_wlc")
+
+# Interface column prefixes and suffixes, as used by map_interface_fields()
+INTERFACE_NAMES = ("wired", "wired1", "wired2", "radio0", "radio1", "radio2", "radio3")
+INTERFACE_FIELDS = ("mac", "band", "channel_number", "rf_role", "tx_power",
+                    "channel_width", "enabled")
+
+# Columns that commonly hold a value meant for another column
+COLUMN_SUGGESTIONS = {"serial_number": "serial", "name": "device_name", "role": "device_role"}
+
+# aa:bb:cc:dd:ee:ff, aa-bb-cc-dd-ee-ff, aabbccddeeff, or aabb.ccdd.eeff
+MAC_PATTERN = re.compile(r"^(?:[0-9a-f]{2}([:-]?)(?:[0-9a-f]{2}\1){4}[0-9a-f]{2}"
+                         r"|[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4})$", re.IGNORECASE)
+
+BOOLEAN_VALUES = ("true", "false", "1", "0", "yes", "no")
+
+# Issues printed per severity in the report
+DEFAULT_REPORT_LIMIT = 50
+
+
+@dataclass(slots=True, frozen=True)
+class PreflightIssue:
+    """
+    One problem found in the CSV file.  Row numbers count the header as
+    line 1, matching what a spreadsheet or text editor shows.
+    """
+    severity: str
+    row: int | None
+    device_name: str | None
+    column: str | None
+    message: str
+
+
+@dataclass(slots=True)
+class PreflightReport:
+    """
+    Outcome of the pre-flight validation of a CSV file.
+    """
+    csv_file: str
+    rows: int = 0
+    issues: list = field(default_factory=list)
+    wlc_ids: dict = field(default_factory=dict)
+
+    @property
+    def errors(self):
+        """
+        Issues that would make the import fail or import wrong data
+        """
+        return [issue for issue in self.issues if issue.severity == "error"]
+
+    @property
+    def warnings(self):
+        """
+        Issues that do not stop the import
+        """
+        return [issue for issue in self.issues if issue.severity == "warning"]
+
+
+def known_columns():
+    """
+    :return: Set of every column name the importer reads
+    """
+    interface_columns = {f"{interface_name}_{interface_field}"
+                         for interface_name in INTERFACE_NAMES
+                         for interface_field in INTERFACE_FIELDS}
+    return set(DEVICE_COLUMNS) | set(WLC_COLUMNS) | interface_columns
+
+
+def netbox_channel_number(band, channel_number, channel_width):
+    """
+    Get the NetBox channel the importer assigns for a CSV channel and width:
+    bonded 5GHz widths use the center channel of the bonded channels.
+
+    :param band: "2.4" or "5"
+    :param channel_number: Channel number (int)
+    :param channel_width: Channel width (int), or None
+    :return: NetBox channel number, or None if the channel is not part of
+        any bonded channel group of the width
+    """
+    if band == "2.4" or channel_width == 20:
+        return channel_number
+    for channel_tuple, translated_channel in \
+            netbox_channel_width_translation.get(channel_width, {}).items():
+        if channel_number in channel_tuple:
+            return translated_channel
+    return None
+
+
+def check_radio_channel(band, channel_value, width_value):
+    """
+    Check the channel and channel width of a radio.
+
+    :param band: Radio band value from the CSV
+    :param channel_value: Channel number value from the CSV
+    :param width_value: Channel width value from the CSV
+    :return: Error message, or None if the channel and width are legal
+    """
+    band = str(band)
+    if band not in ("2.4", "5"):
+        return f"Unsupported band '{band}', expected 2.4 or 5"
+    try:
+        channel_number = int(channel_value)
+        channel_width = int(width_value) if width_value else None
+    except ValueError:
+        return f"Channel '{channel_value}' and width '{width_value}' must be numbers"
+
+    if band == "2.4":
+        if channel_width not in (None, default_channel_width_24ghz):
+            return f"2.4GHz channel width must be empty or {default_channel_width_24ghz}, " \
+                   f"not {channel_width}"
+        if channel_number not in allowed_channel_numbers_24ghz:
+            return f"2.4GHz channel {channel_number} is not allowed, " \
+                   f"use one of {allowed_channel_numbers_24ghz}"
+        return None
+
+    if channel_width is None:
+        return "5GHz radios need a channel width"
+    try:
+        legal_channels = planning_channels("5", channel_width)
+    except ValueError as err:
+        return str(err)
+    if netbox_channel_number(band, channel_number, channel_width) not in legal_channels:
+        return f"5GHz channel {channel_number} is not allowed at {channel_width}MHz, " \
+               f"use one of {tuple(sorted(legal_channels))}"
+    return None
+
+
+def check_csv_row(csv_row, row_number, columns):
+    """
+    Check the values of one CSV row.
+
+    :param csv_row: CSV row dict
+    :param row_number: Line number of the row in the file
+    :param columns: Column names present in the file
+    :return: List of PreflightIssue
+    """
+    device_name = csv_row.get("device_name") or None
+    issues = []
+
+    def add_error(column, message):
+        issues.append(PreflightIssue(severity="error", row=row_number,
+                                     device_name=device_name, column=column,
+                                     message=message))
+
+    for column in REQUIRED_COLUMNS:
+        if column in columns and not csv_row.get(column):
+            add_error(column, "Value is required")
+
+    for interface_name in INTERFACE_NAMES:
+        mac_column = f"{interface_name}_mac"
+        if (mac_value := csv_row.get(mac_column)) and not MAC_PATTERN.match(str(mac_value)):
+            add_error(mac_column, f"Invalid MAC address '{mac_value}'")
+
+        if (tx_power := csv_row.get(f"{interface_name}_tx_power")) and \
+                not str(tx_power).lstrip("-").isdigit():
+            add_error(f"{interface_name}_tx_power", f"TX power '{tx_power}' must be a number")
+
+        if (enabled := csv_row.get(f"{interface_name}_enabled")) and \
+                str(enabled).lower() not in BOOLEAN_VALUES:
+            add_error(f"{interface_name}_enabled", f"Enabled '{enabled}' must be TRUE or FALSE")
+
+        if band := csv_row.get(f"{interface_name}_band"):
+            channel_column = f"{interface_name}_channel_number"
+            if not csv_row.get(channel_column):
+                add_error(channel_column, "Radios with a band need a channel number")
+            elif message := check_radio_channel(band, csv_row[channel_column],
+                                                csv_row.get(f"{interface_name}_channel_width")):
+                add_error(channel_column, message)
+    return issues
+
+
+def find_duplicates(csv_rows, key_columns, description):
+    """
+    Report values used by more than one row, e.g. duplicate device names.
+
+    :param csv_rows: List of (row number, CSV row dict) tuples
+    :param key_columns: Columns sharing one set of unique values
+    :param description: Name of the value in messages, e.g. "MAC address"
+    :return: List of PreflightIssue
+    """
+    first_rows = {}
+    issues = []
+    for row_number, csv_row in csv_rows:
+        for column in key_columns:
+            if not (value := csv_row.get(column)):
+                continue
+            # Compare MAC addresses by their digits only
+            key = re.sub(r"[^0-9a-f]", "", str(value).lower()) if column.endswith("_mac") \
+                else value
+            if key in first_rows:
+                issues.append(PreflightIssue(
+                    severity="error", row=row_number, device_name=csv_row.get("device_name"),
+                    column=column,
+                    message=f"Duplicate {description} '{value}', first used on "
+                            f"row {first_rows[key]}"))
+            else:
+                first_rows[key] = row_number
+    return issues
+
+
+def prefetch_wlc_ids(netbox_api, wlc_names):
+    """
+    Look up the NetBox device IDs of every WLC named in the file with one
+    NetBox query.
+
+    :param netbox_api: pynetbox API object reference
+    :param wlc_names: Iterable of WLC names
+    :return: Dict of WLC name to NetBox device ID
+    """
+    if not (wlc_names := sorted(set(wlc_names))):
+        return {}
+    return {device.name: device.id
+            for device in netbox_api.dcim.devices.filter(name=wlc_names)}
+
+
+def preflight_csv_rows(netbox_api, csv_rows, columns, csv_file=""):
+    """
+    Validate the rows of an import CSV file.
+
+    :param netbox_api: pynetbox API object reference, or None to skip the
+        WLC name check
+    :param csv_rows: List of CSV row dicts
+    :param columns: Column names of the file
+    :param csv_file: File name, for the report
+    :return: PreflightReport
+    """
+    report = PreflightReport(csv_file=csv_file, rows=len(csv_rows))
+    columns = list(columns or ())
+
+    for column in REQUIRED_COLUMNS:
+        if column not in columns:
+            report.issues.append(PreflightIssue(severity="error", row=1, device_name=None,
+                                                column=column,
+                                                message="Required column is missing"))
+    unknown_columns = set(columns) - known_columns()
+    for column in sorted(unknown_columns):
+        suggestion = COLUMN_SUGGESTIONS.get(column)
+        report.issues.append(PreflightIssue(
+            severity="error" if suggestion else "warning", row=1, device_name=None,
+            column=column,
+            message=f"Unknown column is not imported, rename it to '{suggestion}'"
+            if suggestion else "Unknown column is not imported"))
+
+    # Data rows start on line 2, after the header
+    numbered_rows = list(enumerate(csv_rows, start=2))
+    for row_number, csv_row in numbered_rows:
+        report.issues.extend(check_csv_row(csv_row, row_number, columns))
+
+    report.issues.extend(find_duplicates(numbered_rows, ("device_name",), "device name"))
+    report.issues.extend(find_duplicates(numbered_rows, ("serial",), "serial"))
+    report.issues.extend(find_duplicates(numbered_rows,
+                                         [f"{name}_mac" for name in INTERFACE_NAMES],
+                                         "MAC address"))
+
+    if netbox_api is not None:
+        report.wlc_ids = prefetch_wlc_ids(netbox_api, (csv_row[column]
+                                                       for _, csv_row in numbered_rows
+                                                       for column in WLC_COLUMNS
+                                                       if csv_row.get(column)))
+        for row_number, csv_row in numbered_rows:
+            for column in WLC_COLUMNS:
+                if (wlc_name := csv_row.get(column)) and wlc_name not in report.wlc_ids:
+                    report.issues.append(PreflightIssue(
+                        severity="error", row=row_number,
+                        device_name=csv_row.get("device_name"), column=column,
+                        message=f"WLC '{wlc_name}' is not a NetBox device name "
+                                "(names are case-sensitive)"))
+
+    report.issues.sort(key=lambda issue: (issue.row or 0, issue.column or ""))
+    return report
+
+
+def preflight_csv_file(netbox_api, csv_file, file_format=None):
+    """
+    Validate an import CSV file, or a JSON Lines, Parquet, or Arrow file with
+    the same columns.
+
+    :param netbox_api: pynetbox API object reference, or None to skip the
+        WLC name check
+    :param csv_file: Path of the file
+    :param file_format: One of input_formats.INPUT_FORMATS, or None to use
+        the file extension
+    :return: PreflightReport
+    :raises FileNotFoundError: If the file does not exist
+    :raises ImportError: If a Parquet or Arrow file is checked without pyarrow
+    """
+    csv_rows = list(read_records(csv_file, file_format))
+    columns = read_columns(csv_file, file_format)
+    if columns is None:
+        # JSON Lines has no header; every key used by any row is a column
+        columns = list(dict.fromkeys(column for csv_row in csv_rows for column in csv_row))
+    return preflight_csv_rows(netbox_api, csv_rows, columns, csv_file)
+
+
+def print_preflight_report(report, limit=DEFAULT_REPORT_LIMIT):
+    """
+    Print the issues of a pre-flight report and its totals.
+
+    :param report: PreflightReport
+    :param limit: Maximum number of errors and of warnings printed
+    :return: None
+    """
+    flush_events()
+    print("*" * 78)
+    print(f"Pre-flight check of '{report.csv_file}': {report.rows} rows")
+    for issues in (report.errors, report.warnings):
+        for issue in issues[:limit]:
+            device_text = f" ({issue.device_name})" if issue.device_name else ""
+            print(f"  {issue.severity.upper():<7} row {issue.row}{device_text} "
+                  f"{issue.column}: {issue.message}")
+        if len(issues) > limit:
+            print(f"  ... {len(issues) - limit} more")
+    print(f"Errors: {len(report.errors)}  Warnings: {len(report.warnings)}")
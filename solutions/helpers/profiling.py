@@ -0,0 +1,373 @@
+"""
+Per-run CPU and memory profiling, split by phase.
+
+The helpers mark their work with named phases:
+
+    netbox_fetch   NetBox reads
+    netbox_write   NetBox device and interface writes
+    transform      CSV rows to NetBox payloads
+    render         Jinja2 RESTCONF payload rendering
+    push           RESTCONF configuration requests to the WLCs
+    validate       WLC configuration checks
+
+and everything else on the main thread counts as "run".  While a run is
+profiled, each phase gets its own cProfile statistics - collected in every
+thread that enters the phase and merged at the end - and tracemalloc
+snapshots.  At the end of the run, the run directory holds:
+
+    <phase>.prof      cProfile stats, for pstats, snakeviz, etc.
+    <phase>.snapshot  tracemalloc snapshot taken at the end of the phase
+    summary.txt       per-phase totals, top functions, and top allocations
+
+Without an active profile, phases cost a single attribute lookup.
+
+NOTE: Phase wall times are inclusive of nested phases, and memory deltas
+are approximate while several threads allocate at the same time.  Python
+3.12 and later only allow one active cProfile profiler at a time; there,
+phases entered while another thread is profiled are timed but not
+profiled.  Work done in worker processes (the parallel CSV transform) is
+not visible to the profiler, so the transform runs in-process while
+profiling.
+"""
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from .events import emit
+
+# Next to the capability and fingerprint caches, not in the working directory
+DEFAULT_PROFILE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                                  os.path.expanduser("~/.cache")),
+                                   "devwks-2275", "profiles")
+DEFAULT_TOP_N = 25
+
+# Minimum seconds between two tracemalloc snapshots of the same phase;
+# snapshots are expensive and some phases run once per AP
+DEFAULT_SNAPSHOT_INTERVAL = 10.0
+
+# Stack frames recorded per allocation
+DEFAULT_TRACE_FRAMES = 1
+
+RUN_PHASE = "run"
+
+
+class _ActiveProfiler:  # pylint: disable=too-few-public-methods
+    """
+    Holds the RunProfiler of the run being profiled, or None.
+    """
+    __slots__ = ("profiler",)
+
+    def __init__(self):
+        self.profiler = None
+
+
+_ACTIVE = _ActiveProfiler()
+
+
+class RunProfiler:
+    """
+    cProfile and tracemalloc profile of one run, split by phase.  Phases may
+    be entered from any thread, and nest; time spent in a nested phase is
+    profiled as that phase only.
+    """
+    def __init__(self, run_dir, top_n=DEFAULT_TOP_N,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL,
+                 trace_frames=DEFAULT_TRACE_FRAMES):
+        """
+        :param run_dir: Directory the profile files are written to
+        :param top_n: Functions and allocation sites listed per phase
+        :param snapshot_interval: Minimum seconds between two tracemalloc
+            snapshots of a phase
+        :param trace_frames: Stack frames recorded per allocation
+        """
+        self.run_dir = run_dir
+        self.top_n = top_n
+        self.snapshot_interval = snapshot_interval
+        self.trace_frames = trace_frames
+        # (phase, thread ID) -> cProfile.Profile
+        self._profiles = {}
+        # Phase -> dict of activations, seconds, and memory delta
+        self._totals = {}
+        # Phase -> latest tracemalloc.Snapshot, and the time it was taken
+        self._snapshots = {}
+        self._snapshot_times = {}
+        self._start_snapshot = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _profile(self, phase):
+        key = (phase, threading.get_ident())
+        with self._lock:
+            if key not in self._profiles:
+                self._profiles[key] = cProfile.Profile()
+            return self._profiles[key]
+
+    @staticmethod
+    def _enable(entry):
+        """
+        Enable the profiler of a stack entry, if another thread's profiler
+        does not prevent it.
+        """
+        try:
+            entry["profile"].enable()
+            entry["enabled"] = True
+        except ValueError:
+            entry["enabled"] = False
+
+    @staticmethod
+    def _disable(entry):
+        if entry["enabled"]:
+            entry["profile"].disable()
+
+    def start(self):
+        """
+        Start tracing memory allocations and profiling the calling thread as
+        the "run" phase.
+
+        :return: self
+        """
+        tracemalloc.start(self.trace_frames)
+        self._start_snapshot = tracemalloc.take_snapshot()
+        self.enter(RUN_PHASE)
+        return self
+
+    def enter(self, phase):
+        """
+        Enter a phase on the calling thread.
+
+        :param phase: Phase name
+        :return: None
+        """
+        stack = self._stack()
+        # Re-entering the current phase only nests deeper
+        if stack and stack[-1]["phase"] == phase:
+            stack[-1]["depth"] += 1
+            return
+        if stack:
+            self._disable(stack[-1])
+        stack.append({"phase": phase, "profile": self._profile(phase), "depth": 0,
+                      "start": time.perf_counter(),
+                      "memory": tracemalloc.get_traced_memory()[0]})
+        self._enable(stack[-1])
+
+    def exit(self):
+        """
+        Leave the innermost phase of the calling thread.
+
+        :return: None
+        """
+        stack = self._stack()
+        entry = stack[-1]
+        if entry["depth"]:
+            entry["depth"] -= 1
+            return
+        self._disable(entry)
+        stack.pop()
+
+        phase = entry["phase"]
+        now = time.monotonic()
+        with self._lock:
+            totals = self._totals.setdefault(phase, {"activations": 0, "seconds": 0.0,
+                                                     "memory": 0})
+            totals["activations"] += 1
+            totals["seconds"] += time.perf_counter() - entry["start"]
+            totals["memory"] += tracemalloc.get_traced_memory()[0] - entry["memory"]
+            last_snapshot_time = self._snapshot_times.get(phase)
+            take_snapshot = phase != RUN_PHASE and (
+                last_snapshot_time is None or now - last_snapshot_time >= self.snapshot_interval)
+            if take_snapshot:
+                self._snapshot_times[phase] = now
+        if take_snapshot:
+            snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                self._snapshots[phase] = snapshot
+
+        if stack:
+            self._enable(stack[-1])
+
+    def finish(self):
+        """
+        Stop profiling and write the profile files and summary.
+
+        :return: Path of the summary file
+        """
+        stack = self._stack()
+        while stack:
+            stack[-1]["depth"] = 0
+            self.exit()
+        self._snapshots[RUN_PHASE] = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        os.makedirs(self.run_dir, exist_ok=True)
+        summary_file = os.path.join(self.run_dir, "summary.txt")
+        with open(summary_file, "w", encoding="utf-8") as summary:
+            summary.write(f"{'Phase':<14} {'Entries':>8} {'Seconds':>10} {'Memory KiB':>11}\n")
+            for phase, totals in sorted(self._totals.items()):
+                summary.write(f"{phase:<14} {totals['activations']:>8} "
+                              f"{totals['seconds']:>10.3f} {totals['memory'] / 1024:>11.1f}\n")
+
+            for phase in sorted(self._totals):
+                summary.write("\n" + "*" * 78 + f"\nPhase: {phase}\n")
+                self._write_phase_stats(phase, summary)
+                self._write_phase_memory(phase, summary)
+        return summary_file
+
+    def _write_phase_stats(self, phase, summary):
+        """
+        Merge the cProfile stats of every thread of a phase, save them, and
+        write the top functions by cumulative time to the summary.
+        """
+        phase_profiles = [profile for (profile_phase, _), profile in self._profiles.items()
+                          if profile_phase == phase]
+        stats_text = io.StringIO()
+        stats = None
+        for profile in phase_profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile, stream=stats_text)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # A profile that never recorded a call has no stats
+                continue
+        if stats is None:
+            return
+        stats.dump_stats(os.path.join(self.run_dir, f"{phase}.prof"))
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        summary.write(f"\nTop {self.top_n} functions by cumulative time:\n")
+        summary.write(stats_text.getvalue())
+
+    def _write_phase_memory(self, phase, summary):
+        """
+        Save the latest snapshot of a phase and write the allocation sites
+        that grew the most since the start of the run to the summary.
+        """
+        snapshot = self._snapshots.get(phase)
+        if snapshot is None:
+            return
+        snapshot.dump(os.path.join(self.run_dir, f"{phase}.snapshot"))
+        ignored = (tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, __file__),
+                   tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                   tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"))
+        growth = snapshot.filter_traces(ignored).compare_to(
+            self._start_snapshot.filter_traces(ignored), "lineno")
+        summary.write(f"\nTop {self.top_n} allocation sites by growth since the run "
+                      "started:\n")
+        for statistic in growth[:self.top_n]:
+            summary.write(f"  {statistic}\n")
+
+
+@contextmanager
+def profile_phase(phase):
+    """
+    Mark a block of code, or a function when used as a decorator, as a
+    profiling phase.  Does nothing unless a run is being profiled.
+
+    :param phase: Phase name, e.g. "render"
+    """
+    profiler = _ACTIVE.profiler
+    if profiler is None:
+        yield
+        return
+    profiler.enter(phase)
+    try:
+        yield
+    finally:
+        profiler.exit()
+
+
+def profiling_active():
+    """
+    :return: True while a run is being profiled
+    """
+    return _ACTIVE.profiler is not None
+
+
+def default_run_dir(label):
+    """
+    :param label: Name of the profiled command, e.g. "configure"
+    :return: New run directory name under DEFAULT_PROFILE_DIR
+    """
+    return os.path.join(DEFAULT_PROFILE_DIR, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+
+def start_profiling(run_dir=None, label="run", top_n=DEFAULT_TOP_N):
+    """
+    Profile the rest of the run.  The profile is written when
+    stop_profiling() is called, or when the interpreter exits.
+
+    :param run_dir: Directory for the profile files; default: a new
+        directory under DEFAULT_PROFILE_DIR
+    :param label: Name of the profiled command, used in the default run
+        directory name
+    :param top_n: Functions and allocation sites listed per phase
+    :return: RunProfiler
+    """
+    if _ACTIVE.profiler is not None:
+        return _ACTIVE.profiler
+    _ACTIVE.profiler = RunProfiler(run_dir or default_run_dir(label), top_n=top_n).start()
+    atexit.register(stop_profiling)
+    return _ACTIVE.profiler
+
+
+def stop_profiling():
+    """
+    Stop profiling the run and write its profile files.
+
+    :return: Path of the summary file, or None if no run was profiled
+    """
+    profiler, _ACTIVE.profiler = _ACTIVE.profiler, None
+    if profiler is None:
+        return None
+    summary_file = profiler.finish()
+    emit("profile.written", run_dir=profiler.run_dir, summary=summary_file,
+         text=f"Profile written to {profiler.run_dir} (summary: {summary_file})")
+    return summary_file
+
+
+def add_profile_arguments(parser):
+    """
+    Add the --profile, --profile-dir, and --profile-top options to an
+    argument parser.
+
+    :param parser: argparse.ArgumentParser
+    :return: None
+    """
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="Profile CPU and memory per phase of the run")
+    parser.add_argument("--profile-dir",
+                        dest="profile_dir",
+                        help="Directory for the profile files.  Default: a new directory "
+                             f"under {DEFAULT_PROFILE_DIR}/")
+    parser.add_argument("--profile-top",
+                        dest="profile_top",
+                        default=DEFAULT_TOP_N,
+                        type=int,
+                        help="Functions and allocation sites listed per phase in the "
+                             f"profile summary.  Default: {DEFAULT_TOP_N}")
+
+
+def start_profiling_from_args(script_args, label):
+    """
+    Start profiling if --profile was given.
+
+    :param script_args: Parsed arguments from add_profile_arguments()
+    :param label: Name of the profiled command
+    :return: RunProfiler, or None if the run is not profiled
+    """
+    if not script_args.profile:
+        return None
+    return start_profiling(run_dir=script_args.profile_dir, label=label,
+                           top_n=script_args.profile_top)
@@ -0,0 +1,317 @@
+"""
+Remove AP configuration left on a WLC for APs no longer in NetBox.
+
+Provisioning only adds and updates entries, so an AP deleted from NetBox, or
+replaced with a new MAC address, stays configured on its controllers.  For
+each WLC, the AP config tables are read in bulk (one GET per table), their
+MAC keys compared as sets against the NetBox APs associated with the WLC,
+and the orphaned entries deleted in batches.
+
+Batches are sent as a single YANG Patch (RFC 8072) request; controllers
+that do not accept YANG Patch get one DELETE per entry instead.  With a
+CapabilityCache, controllers known not to support YANG Patch or the "fields"
+query parameter are never sent them.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from requests.exceptions import HTTPError, RequestException
+from .events import emit, flush_events
+from .inventory import normalize_mac
+from .netbox_reads import load_pod_inventory
+
+DEFAULT_DELETE_BATCH_SIZE = 100
+
+YANG_PATCH_CONTENT_TYPE = "application/yang-patch+json"
+
+# HTTP status codes meaning the controller does not support YANG Patch.  400
+# is left out: it reports a malformed or rejected edit, not the media type.
+YANG_PATCH_UNSUPPORTED_STATUS = (405, 406, 415, 501)
+
+
+@dataclass(slots=True, frozen=True)
+class WlcConfigTable:
+    """
+    A WLC configuration list keyed by AP MAC address.
+    """
+    name: str
+    container_url: str
+    list_name: str
+    key: str
+
+
+# Radio configs first, so an interrupted run never leaves radio config for
+# an AP whose name entry is already gone
+RECONCILE_TABLES = (
+    WlcConfigTable(name="ap-specific-configs",
+                   container_url="data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data/"
+                                 "ap-specific-configs",
+                   list_name="ap-specific-config",
+                   key="ap-ethernet-mac-addr"),
+    WlcConfigTable(name="ap-spec-configs",
+                   container_url="data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data/"
+                                 "ap-spec-configs",
+                   list_name="ap-spec-config",
+                   key="ap-eth-mac-addr"),
+    WlcConfigTable(name="ap-tags",
+                   container_url="data/Cisco-IOS-XE-wireless-ap-cfg:ap-cfg-data/ap-tags",
+                   list_name="ap-tag",
+                   key="ap-mac"),
+)
+
+def fetch_wlc_keys(request_session, table, use_fields=False):
+    """
+    Read every entry key of a WLC config table with one request.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param table: WlcConfigTable
+    :param use_fields: Ask for the key leaf only (RESTCONF "fields" query
+        parameter), for controllers known to support it
+    :return: Dict of normalized AP MAC to the key as stored on the WLC.
+        Keys that are not MAC addresses are reported and left out, so they
+        are never deleted.
+    """
+    params = {"fields": f"{table.list_name}/{table.key}"} if use_fields else None
+    try:
+        restconf_result = request_session.get(url=table.container_url, params=params)
+    except HTTPError as err:
+        # An empty list is not present at all
+        if err.response is not None and err.response.status_code == 404:
+            return {}
+        raise
+
+    container = next(iter(restconf_result.json().values()), {})
+    wlc_keys = {}
+    for entry in container.get(table.list_name, ()):
+        if wlc_key := entry.get(table.key):
+            try:
+                wlc_keys[normalize_mac(wlc_key)] = wlc_key
+            except ValueError as err:
+                emit("reconcile.invalid_key", level="error", table=table.name, key=wlc_key,
+                     error=str(err),
+                     text=f"\tSkipping {table.name} entry '{wlc_key}' of "
+                          f"{getattr(request_session, 'base_url', 'the WLC')}: {err}")
+    return wlc_keys
+
+
+def find_orphans(wlc_keys, expected_macs):
+    """
+    Find the WLC entries whose AP MAC is not expected on the controller.
+
+    :param wlc_keys: Dict of normalized AP MAC to WLC key, from fetch_wlc_keys()
+    :param expected_macs: Set of normalized AP MACs from NetBox
+    :return: Sorted list of WLC keys to delete
+    """
+    return sorted(wlc_keys[mac] for mac in wlc_keys.keys() - expected_macs)
+
+
+def _yang_patch_delete(request_session, table, wlc_keys):
+    """
+    Delete a batch of table entries with one YANG Patch request.
+    """
+    patch_body = {
+        "ietf-yang-patch:yang-patch": {
+            "patch-id": f"reconcile-{table.name}",
+            "edit": [{"edit-id": str(index),
+                      "operation": "delete",
+                      "target": f"/{table.list_name}={wlc_key}"}
+                     for index, wlc_key in enumerate(wlc_keys, start=1)],
+        }
+    }
+    request_session.patch(url=table.container_url, json=patch_body,
+                          headers={"Content-Type": YANG_PATCH_CONTENT_TYPE})
+
+
+def delete_entries(request_session, table, wlc_keys, batch_size=DEFAULT_DELETE_BATCH_SIZE,
+                   use_yang_patch=True):
+    """
+    Delete entries of a WLC config table in batches.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param table: WlcConfigTable
+    :param wlc_keys: WLC keys of the entries to delete
+    :param batch_size: Entries per YANG Patch request
+    :param use_yang_patch: Try YANG Patch before falling back to one DELETE
+        per entry
+    :return: Tuple of (deleted count, list of keys that failed to delete)
+    """
+    deleted = 0
+    failed_keys = []
+    for batch_start in range(0, len(wlc_keys), batch_size):
+        batch = wlc_keys[batch_start:batch_start + batch_size]
+
+        # A WLC that rejected YANG Patch is remembered on its session
+        if use_yang_patch and getattr(request_session, "yang_patch_supported", True):
+            try:
+                _yang_patch_delete(request_session, table, batch)
+                deleted += len(batch)
+                continue
+            except HTTPError as err:
+                if err.response is None or \
+                        err.response.status_code not in YANG_PATCH_UNSUPPORTED_STATUS:
+                    raise
+                request_session.yang_patch_supported = False
+
+        for wlc_key in batch:
+            try:
+                request_session.delete(url=f"{table.container_url}/{table.list_name}={wlc_key}")
+                deleted += 1
+            except HTTPError as err:
+                # Already gone is as good as deleted
+                if err.response is not None and err.response.status_code == 404:
+                    deleted += 1
+                else:
+                    failed_keys.append(wlc_key)
+    return deleted, failed_keys
+
+
+def reconcile_wlc(request_session, wlc_name, expected_macs, dry_run=False,
+                  batch_size=DEFAULT_DELETE_BATCH_SIZE, use_fields=False, use_yang_patch=True):
+    """
+    Remove the entries of every reconciled table for APs that are not
+    expected on a WLC.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param wlc_name: Name of the WLC, used in the event log
+    :param expected_macs: Set of normalized MACs of the NetBox APs
+        associated with the WLC
+    :param dry_run: Only report the orphaned entries
+    :param batch_size: Entries per batched delete
+    :param use_fields: Read only the key leaf of each entry
+    :param use_yang_patch: Delete batches with YANG Patch requests
+    :return: Dict with the WLC name, orphans per table, deleted and failed
+        counts, and any error
+    """
+    outcome = {"wlc": wlc_name, "expected": len(expected_macs), "orphans": {},
+               "deleted": 0, "failed": 0, "error": None}
+    try:
+        for table in RECONCILE_TABLES:
+            orphans = find_orphans(fetch_wlc_keys(request_session, table, use_fields),
+                                   expected_macs)
+            outcome["orphans"][table.name] = len(orphans)
+            emit("reconcile.orphans", wlc=wlc_name, table=table.name, orphans=len(orphans),
+                 text=f"\t{wlc_name} {table.name}: {len(orphans)} orphaned entries"
+                      f"{' (dry run)' if dry_run and orphans else ''}")
+            if dry_run or not orphans:
+                continue
+
+            deleted, failed_keys = delete_entries(request_session, table, orphans, batch_size,
+                                                  use_yang_patch)
+            outcome["deleted"] += deleted
+            outcome["failed"] += len(failed_keys)
+            emit("reconcile.delete", wlc=wlc_name, table=table.name, deleted=deleted,
+                 failed=failed_keys, status="FAILED" if failed_keys else "OK",
+                 **({"level": "error"} if failed_keys else {}),
+                 text=f"\t\tDeleted {deleted}, failed {len(failed_keys)}"
+                      f"{': ' + ', '.join(failed_keys) if failed_keys else ''}")
+    except RequestException as err:
+        outcome["error"] = str(err)
+        emit("reconcile.error", level="error", wlc=wlc_name, error=str(err),
+             text=f"\tFAILED to reconcile WLC '{wlc_name}': {err}")
+    return outcome
+
+
+def expected_macs_by_wlc(access_points):
+    """
+    Group the AP MACs from NetBox by the WLC device IDs they are
+    associated with.
+
+    :param access_points: Iterable of AccessPoint records
+    :return: Dict of NetBox WLC device ID to set of normalized AP MACs
+    """
+    expected_macs = {}
+    for ap in access_points:
+        for wlc_id in ap.wlc_ids:
+            wlc_macs = expected_macs.setdefault(wlc_id, set())
+            if ap.mac:
+                wlc_macs.add(ap.mac)
+    return expected_macs
+
+
+def reconcile_wlcs(netbox_api, wlc_resolver, session_pool, pod_numbers=None, wlc_names=(),
+                   dry_run=False, max_concurrency=4, batch_size=DEFAULT_DELETE_BATCH_SIZE,
+                   capability_cache=None):
+    """
+    Reconcile the WLCs of the selected pods, plus any WLCs named explicitly.
+
+    The expected APs of a WLC are taken from every pod in NetBox, so APs of
+    other pods sharing the controller are never removed.  A WLC without any
+    APs left in NetBox is only reconciled - emptied - when named explicitly.
+
+    :param netbox_api: pynetbox API object reference
+    :param wlc_resolver: WlcResolver used to look up WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param pod_numbers: Pods whose WLCs are reconciled; None for every WLC
+        with APs in NetBox
+    :param wlc_names: Additional WLC device names to reconcile
+    :param dry_run: Only report the orphaned entries
+    :param max_concurrency: Maximum number of WLCs reconciled at the same time
+    :param batch_size: Entries per batched delete
+    :param capability_cache: Optional CapabilityCache; decides per WLC
+        whether "fields" and YANG Patch requests are used
+    :return: List of per-WLC outcome dicts, ordered by WLC name
+    """
+    expected_macs = expected_macs_by_wlc(load_pod_inventory(netbox_api))
+
+    if pod_numbers is None:
+        wlc_ids = set(expected_macs)
+    else:
+        wlc_ids = {wlc_id for pod_number in pod_numbers
+                   for ap in load_pod_inventory(netbox_api, pod_number)
+                   for wlc_id in ap.wlc_ids}
+
+    wlcs = {wlc.id: wlc for wlc in map(wlc_resolver.resolve, wlc_ids)}
+    for wlc_name in wlc_names:
+        if (wlc := wlc_resolver.resolve_name(wlc_name)) is None:
+            emit("reconcile.error", level="error", wlc=wlc_name,
+                 text=f"FAILED: WLC '{wlc_name}' is not a NetBox device name")
+            continue
+        wlcs[wlc.id] = wlc
+
+    def reconcile_one(wlc):
+        if skip_reason := session_pool.skip_reason(wlc.dns_name):
+            session_pool.defer("reconcile", wlc.name, wlc.dns_name, skip_reason)
+            return {"wlc": wlc.name, "expected": len(expected_macs.get(wlc.id, set())),
+                    "orphans": {}, "deleted": 0, "failed": 0,
+                    "error": f"skipped ({skip_reason})"}
+        request_options = {}
+        if capability_cache is not None:
+            try:
+                capabilities = capability_cache.get(wlc.dns_name)
+                request_options = {"use_fields": capabilities.fields,
+                                   "use_yang_patch": capabilities.yang_patch}
+            except RequestException as err:
+                emit("wlc.capabilities", level="error", wlc=wlc.name, error=str(err),
+                     text=f"Reading the capabilities of WLC '{wlc.name}' failed: {err}")
+        return reconcile_wlc(request_session=session_pool.get(wlc.dns_name),
+                             wlc_name=wlc.name,
+                             expected_macs=expected_macs.get(wlc.id, set()),
+                             dry_run=dry_run,
+                             batch_size=batch_size,
+                             **request_options)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        outcomes = executor.map(reconcile_one, sorted(wlcs.values(), key=lambda wlc: wlc.name))
+        return list(outcomes)
+
+
+def print_reconcile_summary(outcomes, dry_run=False):
+    """
+    Print one summary line per reconciled WLC.
+
+    :param outcomes: List of outcome dicts from reconcile_wlcs()
+    :param dry_run: Whether the run only reported orphans
+    :return: None
+    """
+    flush_events()
+    print("*" * 78)
+    print(f"{'WLC':<30} {'Expected':>8} {'Orphans':>8} {'Deleted':>8} {'Failed':>7}  Status")
+    for outcome in outcomes:
+        orphan_count = sum(outcome["orphans"].values())
+        if outcome["error"]:
+            status = f"ERROR: {outcome['error']}"
+        elif outcome["failed"]:
+            status = "FAILED"
+        else:
+            status = "DRY RUN" if dry_run else "OK"
+        print(f"{outcome['wlc']:<30} {outcome['expected']:>8} {orphan_count:>8} "
+              f"{outcome['deleted']:>8} {outcome['failed']:>7}  {status}")
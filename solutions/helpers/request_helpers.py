@@ -1,10 +1,276 @@
 """
 Request helper functions
+
+WLC sessions never wait forever: every request has a connect and read
+timeout.  With a RequestSessionPool, each WLC also has a circuit breaker,
+and the whole run may have a deadline:
+
+    closed     requests are sent; consecutive connection failures, timeouts,
+               and 5xx responses are counted
+    open       after too many consecutive failures, requests fail at once
+               with CircuitOpenError instead of waiting for the controller
+    half-open  once the reset timeout passed, a single probe request is
+               let through; success closes the breaker, failure opens it
+               again
+
+Once the RunDeadline has passed, requests fail at once with
+DeadlineExceededError, and request timeouts never reach past it.  Both
+errors are RequestExceptions, so existing error handling - such as
+@http_exceptions - skips the work quickly.  Skipped requests and deferred
+APs are kept by the pool for print_deferred_report().
+
+With a RestconfReadCache, GET requests are conditional: a 304 Not Modified
+answer is returned to the caller as the stored 200 response.
 """
+import threading
+import time
 from urllib3 import disable_warnings
 from requests_toolbelt import sessions
 from requests.auth import HTTPBasicAuth
-from requests.exceptions import RequestException
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import HTTPError, RequestException, Timeout
+from .events import emit, flush_events
+
+# (connect, read) timeout in seconds of every WLC request
+DEFAULT_TIMEOUT = (5.0, 30.0)
+
+# Consecutive failures that open a WLC's circuit breaker
+DEFAULT_FAILURE_THRESHOLD = 3
+# Seconds an open circuit breaker waits before letting a probe through
+DEFAULT_RESET_TIMEOUT = 30.0
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(RequestException):
+    """
+    A request was not sent because the circuit breaker of its host is open.
+    """
+
+
+class DeadlineExceededError(RequestException):
+    """
+    A request was not sent because the run deadline has passed.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one WLC host.  Safe to share between threads.
+    """
+    def __init__(self, host, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        """
+        :param host: WLC host name, used in errors and the event log
+        :param failure_threshold: Consecutive failures that open the breaker
+        :param reset_timeout: Seconds the breaker stays open before a probe
+        :param clock: Monotonic clock function
+        """
+        self.host = host
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state, reason=""):
+        """
+        Change state and log the transition.  Called with the lock held.
+        """
+        if state == self.state:
+            return
+        self.state = state
+        if state == CIRCUIT_OPEN:
+            self._opened_at = self.clock()
+            self.times_opened += 1
+        emit("wlc.circuit", level="error" if state == CIRCUIT_OPEN else "info",
+             wlc_host=self.host, state=state, failures=self.failures, reason=reason,
+             text=f"WLC {self.host}: circuit {state}{' - ' + reason if reason else ''}")
+
+    def allow_request(self):
+        """
+        Check whether a request may be sent, and reserve the probe when a
+        half-open breaker lets one through.
+
+        :raises CircuitOpenError: If the breaker is open, or a probe is
+            already in flight
+        """
+        with self._lock:
+            if self.state == CIRCUIT_OPEN and \
+                    self.clock() - self._opened_at >= self.reset_timeout:
+                self._set_state(CIRCUIT_HALF_OPEN, "probing")
+            if self.state == CIRCUIT_CLOSED:
+                return
+            if self.state == CIRCUIT_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+        raise CircuitOpenError(f"Circuit breaker of WLC {self.host} is {self.state}")
+
+    def available(self):
+        """
+        :return: True if a request would currently be let through, without
+            reserving a probe
+        """
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                return self.clock() - self._opened_at >= self.reset_timeout
+            return not (self.state == CIRCUIT_HALF_OPEN and self._probe_in_flight)
+
+    def record_success(self):
+        """
+        Record a request the controller answered.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+            self.failures = 0
+            self._set_state(CIRCUIT_CLOSED, "request succeeded")
+
+    def record_failure(self, error):
+        """
+        Record a connection failure, timeout, or server error.
+
+        :param error: The exception of the failed request
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._probe_in_flight = False
+                # Re-open, restarting the reset timeout
+                self.state = CIRCUIT_CLOSED
+                self._set_state(CIRCUIT_OPEN, f"probe failed: {error}")
+            elif self.state == CIRCUIT_CLOSED and self.failures >= self.failure_threshold:
+                self._set_state(CIRCUIT_OPEN, f"{self.failures} consecutive failures, "
+                                              f"last: {error}")
+
+
+class RunDeadline:
+    """
+    Wall clock budget of a whole run.
+    """
+    def __init__(self, seconds, clock=time.monotonic):
+        """
+        :param seconds: Seconds from now until the deadline
+        :param clock: Monotonic clock function
+        """
+        self.seconds = seconds
+        self.clock = clock
+        self._deadline = clock() + seconds
+
+    def remaining(self):
+        """
+        :return: Seconds left, never negative
+        """
+        return max(0.0, self._deadline - self.clock())
+
+    def expired(self):
+        """
+        :return: True once the deadline has passed
+        """
+        return self.remaining() <= 0
+
+
+def _is_controller_failure(error):
+    """
+    :param error: Exception of a request
+    :return: True for errors that mean the controller is unreachable or
+        unwell; client errors such as a 404 for a missing entry are answers
+    """
+    if isinstance(error, HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (RequestsConnectionError, Timeout))
+
+
+class ResilientSession(sessions.BaseUrlSession):
+    """
+    Base URL session with a default timeout, an optional circuit breaker
+    and run deadline checked before every request, and an optional
+    conditional-GET read cache.
+    """
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, circuit_breaker=None,
+                 deadline=None, on_rejected=None, read_cache=None):
+        """
+        :param base_url: Base URL of every request
+        :param timeout: Default (connect, read) timeout in seconds
+        :param circuit_breaker: Optional CircuitBreaker of the host
+        :param deadline: Optional RunDeadline
+        :param on_rejected: Optional callable(method, url, error) for
+            requests that were not sent
+        :param read_cache: Optional RestconfReadCache for GET requests
+        """
+        super().__init__(base_url=base_url)
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker
+        self.deadline = deadline
+        self.on_rejected = on_rejected
+        self.read_cache = read_cache
+        # Cleared when the WLC rejects a YANG Patch request, see reconcile
+        self.yang_patch_supported = True
+
+    def _reject(self, method, url, error):
+        if self.on_rejected is not None:
+            self.on_rejected(method, url, error)
+        raise error
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        if self.read_cache is None or method.upper() != "GET":
+            return self._send(method, url, *args, **kwargs)
+
+        full_url = self.create_url(url)
+        cached = self.read_cache.get(full_url)
+        if cached is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **cached.validators()}
+        try:
+            response = self._send(method, url, *args, **kwargs)
+        except HTTPError as err:
+            if err.response is not None and err.response.status_code == 404:
+                self.read_cache.discard(full_url)
+            raise
+        if response.status_code == 304 and cached is not None:
+            self.read_cache.record(cached)
+            return cached.to_response(response)
+        self.read_cache.record()
+        self.read_cache.store(full_url, response)
+        return response
+
+    def _send(self, method, url, *args, **kwargs):
+        timeout = kwargs.get("timeout") or self.timeout
+        if self.deadline is not None:
+            remaining = self.deadline.remaining()
+            if remaining <= 0:
+                self._reject(method, url, DeadlineExceededError(
+                    f"Run deadline of {self.deadline.seconds}s passed"))
+            # Never wait past the deadline
+            connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) \
+                else (timeout, timeout)
+            timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+        kwargs["timeout"] = timeout
+
+        if self.circuit_breaker is None:
+            return super().request(method, url, *args, **kwargs)
+        try:
+            self.circuit_breaker.allow_request()
+        except CircuitOpenError as err:
+            self._reject(method, url, err)
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except RequestException as err:
+            if _is_controller_failure(err):
+                self.circuit_breaker.record_failure(err)
+            else:
+                self.circuit_breaker.record_success()
+            raise
+        except BaseException:
+            # Release a half-open probe on anything else, e.g. KeyboardInterrupt
+            self.circuit_breaker.record_success()
+            raise
+        self.circuit_breaker.record_success()
+        return response
 
 
 def http_exceptions(func):
@@ -22,13 +288,16 @@ def http_exceptions(func):
         try:
             wrapper_result = func(*args, **kwargs)
         except RequestException as err:
-            print(f"Error processing HTTP request: {err}")
+            emit("http.error", level="error", error=str(err),
+                 text=f"Error processing HTTP request: {err}")
             wrapper_result = False
         return wrapper_result
     return wrapper
 
 
-def create_request_session(host, username, password, tls_verify=True):
+def create_request_session(host, username, password, tls_verify=True, timeout=DEFAULT_TIMEOUT,
+                           circuit_breaker=None, deadline=None, on_rejected=None,
+                           read_cache=None):
     """
     Create a requests session object for WLC RESTCONF operations
 
@@ -36,6 +305,12 @@ def create_request_session(host, username, password, tls_verify=True):
     :param username: Username for basic auth
     :param password: Password for basic auth
     :param tls_verify: Perform TLS validation?
+    :param timeout: Default (connect, read) timeout in seconds
+    :param circuit_breaker: Optional CircuitBreaker of the host
+    :param deadline: Optional RunDeadline
+    :param on_rejected: Optional callable(method, url, error) for requests
+        not sent because of the breaker or deadline
+    :param read_cache: Optional RestconfReadCache making GETs conditional
     :return: HTTP Baseurl session object
     """
     def assert_status_hook(response, **kwargs):  # pylint: disable=unused-argument
@@ -54,7 +329,9 @@ def create_request_session(host, username, password, tls_verify=True):
     # Set the base URL for the session
     baseurl = f"https://{host}/restconf/"
 
-    request_session = sessions.BaseUrlSession(base_url=baseurl)
+    request_session = ResilientSession(base_url=baseurl, timeout=timeout,
+                                       circuit_breaker=circuit_breaker, deadline=deadline,
+                                       on_rejected=on_rejected, read_cache=read_cache)
     request_session.verify = tls_verify
     if not tls_verify:
         disable_warnings()
@@ -72,3 +349,168 @@ def create_request_session(host, username, password, tls_verify=True):
     request_session.hooks["response"] = [assert_status_hook]
 
     return request_session
+
+
+class RequestSessionPool:
+    """
+    Pool of WLC RESTCONF sessions keyed by WLC host.
+
+    Creating a session per AP means a fresh TCP and TLS handshake for every
+    request.  The pool hands out one session per WLC so connections are
+    re-used across APs (and across pods when several are processed at once).
+
+    Each WLC host gets a CircuitBreaker, and every session shares the
+    optional RunDeadline and RestconfReadCache.  Requests that were not
+    sent, and work deferred by the callers, are recorded for
+    print_deferred_report().
+    """
+    def __init__(self, username, password, tls_verify=True, timeout=DEFAULT_TIMEOUT,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, deadline=None, read_cache=None):
+        """
+        :param username: Username for basic auth
+        :param password: Password for basic auth
+        :param tls_verify: Perform TLS validation?
+        :param timeout: Default (connect, read) timeout in seconds
+        :param failure_threshold: Consecutive failures that open a WLC's
+            circuit breaker
+        :param reset_timeout: Seconds an open breaker waits before a probe
+        :param deadline: Optional RunDeadline of the whole run
+        :param read_cache: Optional RestconfReadCache making GETs conditional
+        """
+        self.username = username
+        self.password = password
+        self.tls_verify = tls_verify
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.deadline = deadline
+        self.read_cache = read_cache
+        self._sessions = {}
+        self._breakers = {}
+        # (host, reason) -> requests not sent
+        self._rejected = {}
+        # List of (kind, name, host, reason) of work the callers deferred
+        self._deferred = []
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        """
+        :param host: WLC host
+        :return: CircuitBreaker of the host, created on first use
+        """
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(host,
+                                                      failure_threshold=self.failure_threshold,
+                                                      reset_timeout=self.reset_timeout)
+            return self._breakers[host]
+
+    def skip_reason(self, host):
+        """
+        Check whether work for a WLC host should be skipped instead of
+        attempted.
+
+        :param host: WLC host
+        :return: "deadline" or "circuit open", or None if the work may run
+        """
+        if self.deadline is not None and self.deadline.expired():
+            return "deadline"
+        if not self.breaker(host).available():
+            return "circuit open"
+        return None
+
+    def defer(self, kind, name, host, reason):
+        """
+        Record work that was skipped, for the deferred work report.
+
+        :param kind: Kind of work, e.g. "ap"
+        :param name: Name of the work item, e.g. the AP name
+        :param host: WLC host the work was for
+        :param reason: Why the work was skipped, e.g. from skip_reason()
+        :return: None
+        """
+        emit("work.deferred", level="error", kind=kind, name=name, wlc_host=host, reason=reason,
+             text=f"\tSkipping {kind} {name} on WLC {host}: {reason}")
+        with self._lock:
+            self._deferred.append((kind, name, host, reason))
+
+    def _record_rejected(self, host, error):
+        reason = "deadline" if isinstance(error, DeadlineExceededError) else "circuit open"
+        with self._lock:
+            self._rejected[(host, reason)] = self._rejected.get((host, reason), 0) + 1
+
+    def deferred_report(self):
+        """
+        :return: Dict with "breakers" (host -> state, failures, and times
+            opened), "rejected" ((host, reason) -> requests not sent), and
+            "deferred" (list of (kind, name, host, reason))
+        """
+        with self._lock:
+            return {"breakers": {host: {"state": breaker.state, "failures": breaker.failures,
+                                        "times_opened": breaker.times_opened}
+                                 for host, breaker in self._breakers.items()},
+                    "rejected": dict(self._rejected),
+                    "deferred": list(self._deferred)}
+
+    def get(self, host):
+        """
+        Get the RESTCONF session for a WLC host, creating it on first use.
+
+        :param host: WLC host to establish baseurl session
+        :return: HTTP Baseurl session object
+        """
+        circuit_breaker = self.breaker(host)
+        with self._lock:
+            if host not in self._sessions:
+                self._sessions[host] = create_request_session(
+                    host=host, username=self.username, password=self.password,
+                    tls_verify=self.tls_verify, timeout=self.timeout,
+                    circuit_breaker=circuit_breaker, deadline=self.deadline,
+                    on_rejected=lambda method, url, error: self._record_rejected(host, error),
+                    read_cache=self.read_cache)
+            return self._sessions[host]
+
+    def close(self):
+        """
+        Close every pooled session.
+
+        :return: None
+        """
+        with self._lock:
+            for request_session in self._sessions.values():
+                request_session.close()
+            self._sessions.clear()
+
+
+def print_deferred_report(session_pool):
+    """
+    Print the WLCs whose circuit breaker opened, the requests not sent, and
+    the work deferred during the run.  Prints nothing for a clean run.
+
+    :param session_pool: RequestSessionPool of the run
+    :return: True if anything was skipped or a breaker opened
+    """
+    report = session_pool.deferred_report()
+    tripped = {host: breaker for host, breaker in report["breakers"].items()
+               if breaker["times_opened"]}
+    if not (tripped or report["rejected"] or report["deferred"]):
+        return False
+
+    flush_events()
+    print("*" * 78)
+    print("Deferred work report")
+    if session_pool.deadline is not None and session_pool.deadline.expired():
+        print(f"    Run deadline of {session_pool.deadline.seconds}s passed")
+    for host, breaker in sorted(tripped.items()):
+        print(f"    WLC {host}: circuit {breaker['state']}, opened {breaker['times_opened']} "
+              f"time(s)")
+    for (host, reason), count in sorted(report["rejected"].items()):
+        print(f"    WLC {host}: {count} request(s) not sent ({reason})")
+    deferred_by_reason = {}
+    for kind, name, host, reason in report["deferred"]:
+        deferred_by_reason.setdefault((kind, host, reason), []).append(name)
+    for (kind, host, reason), names in sorted(deferred_by_reason.items()):
+        print(f"    {len(names)} {kind}(s) deferred on WLC {host} ({reason}): "
+              f"{', '.join(sorted(names)[:20])}{' ...' if len(names) > 20 else ''}")
+    return True
@@ -0,0 +1,203 @@
+"""
+Conditional-GET cache of WLC RESTCONF reads.
+
+RESTCONF servers send an ETag and/or Last-Modified validator with the data
+they return (RFC 8040, section 3.4.1).  The cache stores each GET response
+with its validators on disk, and the next GET of the same URL - in the same
+run or a later one - carries If-None-Match and If-Modified-Since.  When the
+data has not changed the controller answers 304 Not Modified without a body,
+and the session hands the caller the stored response instead, so repeated
+validation runs against unchanged controllers transfer headers only.
+
+    <cache dir>/<host>/<sha256 of the URL>.json
+
+Only responses with a validator are stored; a response without one, or a
+404, drops what was stored for the URL.  A controller that ignores the
+validators simply answers 200 again, so the cache never serves stale data.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from urllib.parse import urlsplit
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from .events import flush_events
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                                os.path.expanduser("~/.cache")),
+                                 "devwks-2275", "restconf")
+
+# Response headers kept with the body; the rest describe the transfer
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+@dataclass(slots=True, frozen=True)
+class CachedResponse:
+    """
+    A stored RESTCONF GET response and its validators.
+    """
+    url: str
+    etag: str | None
+    last_modified: str | None
+    headers: dict
+    body: str
+
+    def validators(self):
+        """
+        :return: Dict of conditional request headers for revalidation
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self, not_modified):
+        """
+        Build the 200 response the controller would have sent.
+
+        :param not_modified: The 304 response of the revalidation; its
+            headers take precedence over the stored ones
+        :return: requests Response
+        """
+        response = Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response._content = self.body.encode("utf-8")  # pylint: disable=protected-access
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.headers.update({name: value for name, value in not_modified.headers.items()
+                                 if name.lower() != "content-length"})
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        return response
+
+
+class RestconfReadCache:
+    """
+    In-memory and on-disk store of RESTCONF GET responses, keyed by URL.
+    Safe to share between threads and sessions.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        :param cache_dir: Directory of the on-disk cache
+        """
+        self.cache_dir = cache_dir
+        self.revalidated = 0
+        self.downloaded = 0
+        self.bytes_saved = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _file_name(self, url):
+        host = re.sub(r"[^A-Za-z0-9._-]", "_", urlsplit(url).netloc)
+        return os.path.join(self.cache_dir, host,
+                            f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, url):
+        """
+        :param url: Full request URL
+        :return: CachedResponse, or None if nothing is stored for the URL
+        """
+        with self._lock:
+            if url in self._entries:
+                return self._entries[url]
+        try:
+            with open(self._file_name(url), "r", encoding="utf-8") as cache_file:
+                entry = CachedResponse(**json.load(cache_file))
+        except (OSError, ValueError, TypeError):
+            entry = None
+        # A hash collision would hand out another URL's data
+        if entry is not None and entry.url != url:
+            entry = None
+        with self._lock:
+            self._entries[url] = entry
+        return entry
+
+    def store(self, url, response):
+        """
+        Store a 200 response that carries a validator, or drop the stored
+        response of the URL if it has none.
+
+        :param url: Full request URL
+        :param response: requests Response of a GET
+        :return: CachedResponse, or None if the response was not stored
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            self.discard(url)
+            return None
+        try:
+            body = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            self.discard(url)
+            return None
+        entry = CachedResponse(url=url, etag=etag, last_modified=last_modified,
+                               headers={name: response.headers[name] for name in STORED_HEADERS
+                                        if name in response.headers},
+                               body=body)
+        file_name = self._file_name(url)
+        try:
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            # Write a temporary file first so concurrent runs never read a
+            # partially written cache file
+            temp_file_name = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_file_name, "w", encoding="utf-8") as cache_file:
+                json.dump(asdict(entry), cache_file)
+            os.replace(temp_file_name, file_name)
+        except OSError:
+            # Still useful in memory for the rest of the run
+            pass
+        with self._lock:
+            self._entries[url] = entry
+        return entry
+
+    def discard(self, url):
+        """
+        Forget the stored response of a URL.
+
+        :param url: Full request URL
+        :return: None
+        """
+        with self._lock:
+            self._entries[url] = None
+        try:
+            os.unlink(self._file_name(url))
+        except OSError:
+            pass
+
+    def record(self, entry=None):
+        """
+        Count a cached GET: a revalidated entry, or a full download.
+
+        :param entry: The CachedResponse served for a 304, or None
+        :return: None
+        """
+        with self._lock:
+            if entry is None:
+                self.downloaded += 1
+            else:
+                self.revalidated += 1
+                self.bytes_saved += len(entry.body)
+
+
+def print_read_cache_summary(read_cache):
+    """
+    Print how many RESTCONF reads were answered from the cache.  Prints
+    nothing if no cached GET was made.
+
+    :param read_cache: RestconfReadCache of the run
+    :return: None
+    """
+    if not read_cache.revalidated + read_cache.downloaded:
+        return
+    flush_events()
+    print(f"RESTCONF read cache: {read_cache.revalidated} not modified, "
+          f"{read_cache.downloaded} downloaded, "
+          f"{read_cache.bytes_saved / 1024:.1f} kB not transferred")
@@ -0,0 +1,320 @@
+"""
+Fleet-wide RF analytics over the AP radio interfaces in NetBox.
+
+Radio interfaces are loaded once into column arrays (band, channel, width,
+tx power, enabled, location), and every statistic is computed over the whole
+fleet with NumPy array operations instead of looping over NetBox records:
+
+    - channel histogram and 20MHz channel utilization per band
+    - co-channel radios per location
+    - tx power distribution per band
+    - radios outside the channel policy of rf_channel_map
+"""
+from dataclasses import dataclass
+import numpy as np
+from .channel_planner import planning_channels
+from .netbox_reads import fetch_ap_devices, fetch_records
+from .rf_channel_map import (allowed_channel_numbers_24ghz,
+                             allowed_channel_width_5ghz,
+                             default_channel_width_24ghz)
+
+# Band codes stored in the band column
+BAND_24GHZ = 24
+BAND_5GHZ = 5
+BAND_NAMES = {BAND_24GHZ: "2.4", BAND_5GHZ: "5"}
+
+# Out-of-policy radios listed per reason in the printed report
+DEFAULT_REPORT_LIMIT = 10
+
+
+@dataclass(slots=True, frozen=True)
+class RadioArrays:
+    """
+    Column arrays of the AP radio interfaces, one element per radio.
+    Locations are stored as indexes into location_names.
+    """
+    device_names: np.ndarray
+    interface_names: np.ndarray
+    location_names: tuple
+    location: np.ndarray
+    band: np.ndarray
+    channel: np.ndarray
+    width: np.ndarray
+    tx_power: np.ndarray
+    enabled: np.ndarray
+
+    def __len__(self):
+        return len(self.band)
+
+
+def parse_rf_channel_columns(rf_channel_values):
+    """
+    Split NetBox RF channel strings such as "5g-38-5190-40" into band,
+    channel, and width arrays.  The channel is the NetBox (center) channel.
+
+    :param rf_channel_values: Sequence of NetBox rf_channel values
+    :return: Tuple of (band, channel, width) int arrays.  Unknown bands are 0.
+    """
+    columns = np.array([str(value).split("-") for value in rf_channel_values],
+                       dtype=str).reshape(-1, 4)
+    band_names = columns[:, 0]
+    band = np.select([band_names == "2.4g", band_names == "5g"], [BAND_24GHZ, BAND_5GHZ], 0)
+    channel = columns[:, 1].astype(np.int16)
+    width = columns[:, 3].astype(np.int16)
+    return band.astype(np.int8), channel, width
+
+
+def radio_arrays_from_netbox(interfaces, device_locations):
+    """
+    Build RadioArrays from NetBox radio interfaces.  Interfaces without an
+    RF channel, or of devices not in device_locations, are skipped.
+
+    :param interfaces: Iterable of pynetbox interface Records
+    :param device_locations: Dict of device ID to (device name, location name)
+    :return: RadioArrays
+    """
+    device_names, interface_names, location_columns = [], [], []
+    rf_channels, tx_powers, enabled_states = [], [], []
+    for interface in interfaces:
+        device_details = device_locations.get(interface.device.id)
+        if device_details is None or not interface.rf_channel:
+            continue
+        device_names.append(device_details[0])
+        location_columns.append(device_details[1])
+        interface_names.append(interface.name)
+        rf_channels.append(interface.rf_channel.value)
+        tx_powers.append(np.nan if interface.tx_power is None else interface.tx_power)
+        enabled_states.append(bool(interface.enabled))
+
+    location_names, location = np.unique(np.asarray(location_columns, dtype=str),
+                                         return_inverse=True)
+    band, channel, width = parse_rf_channel_columns(rf_channels)
+    return RadioArrays(device_names=np.asarray(device_names, dtype=object),
+                       interface_names=np.asarray(interface_names, dtype=object),
+                       location_names=tuple(location_names.tolist()),
+                       location=location.astype(np.int32),
+                       band=band,
+                       channel=channel,
+                       width=width,
+                       tx_power=np.asarray(tx_powers, dtype=np.float32),
+                       enabled=np.asarray(enabled_states, dtype=bool))
+
+
+def load_radio_arrays(netbox_api, pod_number=None):
+    """
+    Load the radio interfaces of all APs (or one workshop pod) from NetBox.
+
+    :param netbox_api: pynetbox API object reference
+    :param pod_number: Optional workshop pod number to limit the APs to
+    :return: RadioArrays
+    """
+    device_locations = {
+        device.id: (device.name, device.location.name if device.location else "")
+        for device in fetch_ap_devices(netbox_api, pod_number=pod_number,
+                                       fields=("id", "name", "location"))
+    }
+    return radio_arrays_from_netbox(
+        fetch_records(netbox_api.dcim.interfaces, rf_role="ap",
+                      fields=("id", "name", "device", "rf_channel", "tx_power", "enabled")),
+        device_locations)
+
+
+def channel_histogram(radios):
+    """
+    Count the radios on each band, channel, and width.
+
+    :param radios: RadioArrays
+    :return: List of dicts with band, channel, width, and radios, sorted by
+        band and channel
+    """
+    keys = np.stack([radios.band.astype(np.int32), radios.channel, radios.width], axis=1)
+    unique_keys, counts = np.unique(keys, axis=0, return_counts=True)
+    return [{"band": BAND_NAMES.get(int(band), str(band)), "channel": int(channel),
+             "width": int(width), "radios": int(count)}
+            for (band, channel, width), count in zip(unique_keys, counts)]
+
+
+def channel_utilization(radios):
+    """
+    Count the radios occupying each 20MHz channel, so a 40MHz radio counts
+    on both of its 20MHz channels.  Only enabled, in-policy radios count.
+
+    :param radios: RadioArrays
+    :return: Dict of band name to dict of 20MHz channel to radio count
+    """
+    in_policy = radios.enabled & ~out_of_policy_mask(radios)
+    utilization = {}
+    for band in (BAND_24GHZ, BAND_5GHZ):
+        band_mask = in_policy & (radios.band == band)
+        band_utilization = utilization.setdefault(BAND_NAMES[band], {})
+        for width in np.unique(radios.width[band_mask]):
+            width_mask = band_mask & (radios.width == width)
+            channels = planning_channels(BAND_NAMES[band],
+                                         None if band == BAND_24GHZ else int(width))
+            on_channel = np.bincount(radios.channel[width_mask].astype(np.int64))
+            for channel in np.nonzero(on_channel)[0]:
+                for occupied in channels[int(channel)]:
+                    band_utilization[occupied] = \
+                        band_utilization.get(occupied, 0) + int(on_channel[channel])
+        utilization[BAND_NAMES[band]] = dict(sorted(band_utilization.items()))
+    return utilization
+
+
+def co_channel_by_location(radios):
+    """
+    Count, per location, the enabled radios sharing a band and channel with
+    another radio of the same location, and the co-channel radio pairs.
+
+    :param radios: RadioArrays
+    :return: Dict of location name to dict of radios, co_channel_radios, and
+        co_channel_pairs
+    """
+    enabled = radios.enabled
+    location = radios.location[enabled].astype(np.int64)
+    channel_key = radios.band[enabled].astype(np.int64) * 1000 + radios.channel[enabled]
+    keys = location * 1_000_000 + channel_key
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    key_locations = unique_keys // 1_000_000
+
+    location_count = len(radios.location_names)
+    radio_totals = np.bincount(radios.location, minlength=location_count)
+    shared = counts > 1
+    co_channel_radios = np.bincount(key_locations[shared], weights=counts[shared],
+                                    minlength=location_count)
+    co_channel_pairs = np.bincount(key_locations, weights=counts * (counts - 1) // 2,
+                                   minlength=location_count)
+    return {location_name: {"radios": int(radio_totals[index]),
+                            "co_channel_radios": int(co_channel_radios[index]),
+                            "co_channel_pairs": int(co_channel_pairs[index])}
+            for index, location_name in enumerate(radios.location_names)}
+
+
+def tx_power_distribution(radios):
+    """
+    Summarize the tx power of the radios per band.
+
+    :param radios: RadioArrays
+    :return: Dict of band name to dict of radios, min, p10, median, p90,
+        max, mean, and a histogram of tx power to radio count
+    """
+    distribution = {}
+    for band, band_name in BAND_NAMES.items():
+        tx_power = radios.tx_power[(radios.band == band) & ~np.isnan(radios.tx_power)]
+        if tx_power.size == 0:
+            continue
+        p10, median, p90 = np.percentile(tx_power, (10, 50, 90))
+        power_levels, counts = np.unique(tx_power, return_counts=True)
+        distribution[band_name] = {
+            "radios": int(tx_power.size),
+            "min": float(tx_power.min()),
+            "p10": float(p10),
+            "median": float(median),
+            "p90": float(p90),
+            "max": float(tx_power.max()),
+            "mean": round(float(tx_power.mean()), 2),
+            "histogram": {int(level): int(count) for level, count in zip(power_levels, counts)},
+        }
+    return distribution
+
+
+def out_of_policy_masks(radios):
+    """
+    Flag radios whose band, channel, or width is not allowed by the
+    rf_channel_map tables.
+
+    :param radios: RadioArrays
+    :return: Dict of reason to boolean mask over the radios
+    """
+    is_24ghz = radios.band == BAND_24GHZ
+    is_5ghz = radios.band == BAND_5GHZ
+
+    bad_width = (is_24ghz & (radios.width != default_channel_width_24ghz)) | \
+        (is_5ghz & ~np.isin(radios.width, allowed_channel_width_5ghz))
+
+    # Allowed channels depend on the width for 5GHz: bonded channels must not
+    # overlap a denied channel
+    allowed_channel = is_24ghz & np.isin(radios.channel, allowed_channel_numbers_24ghz)
+    for width in allowed_channel_width_5ghz:
+        width_mask = is_5ghz & (radios.width == width)
+        allowed_channel |= width_mask & np.isin(radios.channel,
+                                                list(planning_channels("5", width)))
+
+    return {"unsupported_band": ~(is_24ghz | is_5ghz),
+            "channel_width_not_allowed": bad_width & (is_24ghz | is_5ghz),
+            "channel_not_allowed": ~allowed_channel & ~bad_width & (is_24ghz | is_5ghz)}
+
+
+def out_of_policy_mask(radios):
+    """
+    :param radios: RadioArrays
+    :return: Boolean mask of the radios failing any policy check
+    """
+    masks = list(out_of_policy_masks(radios).values())
+    return np.logical_or.reduce(masks) if len(radios) else np.zeros(0, dtype=bool)
+
+
+def build_rf_report(radios, report_limit=DEFAULT_REPORT_LIMIT):
+    """
+    Compute every fleet RF statistic into a report dict.
+
+    :param radios: RadioArrays
+    :param report_limit: Out-of-policy radios listed per reason
+    :return: Report dict, JSON serializable
+    """
+    out_of_policy = {}
+    for reason, mask in out_of_policy_masks(radios).items():
+        radio_indexes = np.flatnonzero(mask)
+        out_of_policy[reason] = {
+            "radios": int(len(radio_indexes)),
+            "examples": [{"device": radios.device_names[index],
+                          "interface": radios.interface_names[index],
+                          "band": BAND_NAMES.get(int(radios.band[index]), "unknown"),
+                          "channel": int(radios.channel[index]),
+                          "width": int(radios.width[index])}
+                         for index in radio_indexes[:report_limit]],
+        }
+
+    return {"radios": len(radios),
+            "enabled": int(radios.enabled.sum()),
+            "channels": channel_histogram(radios),
+            "channel_utilization": channel_utilization(radios),
+            "co_channel_by_location": co_channel_by_location(radios),
+            "tx_power": tx_power_distribution(radios),
+            "out_of_policy": out_of_policy}
+
+
+def print_rf_report(report):
+    """
+    Print an RF report built by build_rf_report().
+
+    :param report: Report dict
+    :return: None
+    """
+    print("*" * 78)
+    print(f"Radios: {report['radios']}  Enabled: {report['enabled']}")
+
+    print("\n20MHz channel utilization (enabled, in-policy radios):")
+    for band_name, band_utilization in report["channel_utilization"].items():
+        channel_text = "  ".join(f"{channel}:{count}"
+                                 for channel, count in band_utilization.items())
+        print(f"  {band_name + 'GHz':<7} {channel_text or '-'}")
+
+    print("\nCo-channel radios per location:")
+    for location_name, counts in report["co_channel_by_location"].items():
+        print(f"  {location_name or '(no location)':<30} {counts['radios']:>7} radios  "
+              f"{counts['co_channel_radios']:>7} co-channel  "
+              f"{counts['co_channel_pairs']:>9} pairs")
+
+    print("\nTX power:")
+    for band_name, power in report["tx_power"].items():
+        print(f"  {band_name + 'GHz':<7} min {power['min']:g}  p10 {power['p10']:g}  "
+              f"median {power['median']:g}  p90 {power['p90']:g}  max {power['max']:g}  "
+              f"mean {power['mean']:g}")
+
+    print("\nOut of policy:")
+    for reason, details in report["out_of_policy"].items():
+        print(f"  {reason:<30} {details['radios']}")
+        for example in details["examples"]:
+            print(f"      {example['device']} {example['interface']}: "
+                  f"{example['band']}GHz channel {example['channel']} "
+                  f"width {example['width']}")
@@ -198,12 +198,18 @@ def get_rf_channel_value(radio_dict):
         to be parsed.
     :return: Formatted string that can be imported to NetBox as a "rf_channel"
         value.
+    :raises ValueError: If the channel has no NetBox channel at the width
     """
 
     rf_band = radio_dict.get("band")
     channel_width = radio_dict.get("rf_channel_width")
     channel_number = radio_dict.get("channel")
 
+    # CSV values are strings; compare channels and widths as numbers
+    channel_number = int(channel_number)
+    if channel_width:
+        channel_width = int(channel_width)
+
     # netbox_rf_band = str(rf_band).replace(".", "")
     netbox_rf_band = str(rf_band)
 
@@ -212,6 +218,7 @@ def get_rf_channel_value(radio_dict):
         netbox_channel_number = int(channel_number)
     else:
         if channel_width in netbox_channel_width_translation:
+            netbox_channel_number = None
             for channel_tuple, translated_channel in \
                     netbox_channel_width_translation[channel_width].items():
                 if channel_number in channel_tuple:
@@ -219,8 +226,11 @@ def get_rf_channel_value(radio_dict):
                     break
         else:
             netbox_channel_number = channel_number
+    if netbox_channel_number not in channel_center_frequencies:
+        raise ValueError(f"Channel {channel_number} is not a valid {channel_width}MHz "
+                         f"channel in the {netbox_rf_band}GHz band")
     netbox_rf_channel = f"{netbox_rf_band}g-{netbox_channel_number}-" \
-                        f"{int(channel_center_frequencies[int(netbox_channel_number)])}-" \
+                        f"{int(channel_center_frequencies[netbox_channel_number])}-" \
                         f"{channel_width}"
     radio_dict.update({"rf_channel": netbox_rf_channel})
     radio_dict.pop("band")
@@ -248,6 +258,7 @@ def parse_netbox_rf_channel(netbox_rf_channel):
     radio_band, radio_channel, _, channel_width = netbox_rf_channel.split('-')
 
     radio_band = re.sub(r'[^0-9]', '', radio_band)
+    radio_channel = int(radio_channel)
 
     if radio_band == "24":
         wifi_channel = radio_channel
@@ -262,3 +273,37 @@ def parse_netbox_rf_channel(netbox_rf_channel):
                     "channel": wifi_channel}
 
     return radio_params
+
+
+def get_netbox_rf_channel(radio_band, wlc_channel, channel_width):
+    """
+    The reverse of parse_netbox_rf_channel(): given the band, channel, and
+    width a WLC reports for a radio, build the NetBox "rf_channel" value.
+    The WLC reports the first 20MHz channel of a bonded 40-160MHz channel;
+    NetBox holds the center channel.  2.4GHz channels keep the 22MHz width
+    used for NetBox, whatever width the WLC reports.
+
+    :param radio_band: Radio band without the 'g', "24" or "5"
+    :param wlc_channel: Channel number reported by the WLC
+    :param channel_width: Channel width in MHz reported by the WLC
+    :return: Formatted NetBox "rf_channel" string, or None if the channel and
+        width do not map to a NetBox channel
+    """
+    wlc_channel = int(wlc_channel)
+    if radio_band == "24":
+        netbox_rf_band, channel_width = "2.4", default_channel_width_24ghz
+        netbox_channel_number = wlc_channel
+    elif channel_width == 20:
+        netbox_rf_band, netbox_channel_number = radio_band, wlc_channel
+    else:
+        netbox_rf_band, netbox_channel_number = radio_band, None
+        for channel_tuple, translated_channel in \
+                netbox_channel_width_translation.get(channel_width, {}).items():
+            if wlc_channel in channel_tuple:
+                netbox_channel_number = translated_channel
+                break
+
+    if netbox_channel_number not in channel_center_frequencies:
+        return None
+    return f"{netbox_rf_band}g-{netbox_channel_number}-" \
+           f"{int(channel_center_frequencies[netbox_channel_number])}-{channel_width}"
@@ -0,0 +1,402 @@
+"""
+Fair, priority ordered scheduling of AP provisioning across WLCs.
+
+A plain loop over APs lets one large site on one controller hold up every
+other controller, and urgent changes wait behind routine work.  Instead,
+provisioning work is queued per WLC and ordered by priority:
+
+    new       the AP has no configuration on the WLC yet
+    changed   the AP joined, but its radios differ from NetBox
+    refresh   the AP already matches NetBox; provisioned again as a refresh
+
+Each worker thread has a home WLC queue, spread round-robin across the
+controllers.  A worker takes the next task of its home queue unless another
+WLC has more urgent work waiting, and steals from other queues when its own
+is empty or busy.  No WLC is ever sent more than a per-controller limit of
+concurrent tasks, so a large site can use idle workers without flooding
+its controller.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from requests.exceptions import RequestException
+from .capabilities import STRATEGY_BATCHED_MERGE
+from .convergence import ap_converged, fetch_ap_oper_data, index_ap_oper_data, percentile
+from .events import emit, flush_events
+from .reconcile import RECONCILE_TABLES, fetch_wlc_keys
+from .wlc_helpers import provision_ap_on_pooled_wlc, provision_aps_batched
+
+PRIORITY_NEW = 0
+PRIORITY_CHANGED = 1
+PRIORITY_REFRESH = 2
+PRIORITY_NAMES = {PRIORITY_NEW: "new", PRIORITY_CHANGED: "changed", PRIORITY_REFRESH: "refresh"}
+
+DEFAULT_WORKERS = 8
+# Concurrent tasks per WLC; controllers apply config changes one at a time,
+# so more parallel requests mostly queue on the controller
+DEFAULT_PER_WLC_LIMIT = 2
+
+# The table every provisioned AP has an entry in
+AP_TAGS_TABLE = next(table for table in RECONCILE_TABLES if table.name == "ap-tags")
+
+
+@dataclass(slots=True)
+class ScheduledTask:
+    """
+    One unit of provisioning work queued for a WLC.
+    """
+    queue: str
+    priority: int
+    work: object
+    label: str = ""
+    queued: float = 0.0
+    started: float | None = None
+    finished: float | None = None
+    result: object = None
+    error: str | None = None
+    stolen: bool = False
+
+
+@dataclass(slots=True)
+class SchedulerStats:
+    """
+    Outcome of a FairScheduler run.
+    """
+    tasks: int = 0
+    failed: int = 0
+    steals: int = 0
+    seconds: float = 0.0
+    # Priority -> list of seconds from queueing to completion
+    latencies: dict = field(default_factory=dict)
+    # Queue -> dict of tasks, failed, and peak concurrent tasks
+    queues: dict = field(default_factory=dict)
+
+
+class FairScheduler:
+    """
+    Per-queue priority heaps served by a pool of worker threads with work
+    stealing and a per-queue concurrency limit.
+    """
+    def __init__(self, workers=DEFAULT_WORKERS, per_queue_limit=DEFAULT_PER_WLC_LIMIT,
+                 clock=time.monotonic):
+        """
+        :param workers: Worker threads
+        :param per_queue_limit: Maximum tasks of one queue running at a time
+        :param clock: Monotonic clock function
+        """
+        self.workers = max(1, workers)
+        self.per_queue_limit = max(1, per_queue_limit)
+        self.clock = clock
+        # Queue -> heap of (priority, sequence, ScheduledTask)
+        self._queues = {}
+        self._running = {}
+        self._peaks = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._tasks = []
+        self._steals = 0
+
+    def submit(self, queue, priority, work, label=""):
+        """
+        Queue a task.  Tasks may be submitted before and while the scheduler
+        runs; run() returns once every queue is empty.
+
+        :param queue: Queue name, e.g. the WLC DNS name
+        :param priority: PRIORITY_NEW, PRIORITY_CHANGED, or PRIORITY_REFRESH;
+            lower runs first
+        :param work: Callable without arguments doing the work
+        :param label: Name of the task, used in the event log
+        :return: ScheduledTask
+        """
+        task = ScheduledTask(queue=queue, priority=priority, work=work, label=label,
+                             queued=self.clock())
+        with self._condition:
+            heapq.heappush(self._queues.setdefault(queue, []),
+                           (priority, next(self._sequence), task))
+            self._running.setdefault(queue, 0)
+            self._tasks.append(task)
+            self._condition.notify()
+        return task
+
+    def _next_task(self, home_queue):
+        """
+        Pick the next task for a worker, or None when all work is done.
+        Called with the condition held.
+        """
+        while True:
+            ready = [queue for queue, heap in self._queues.items()
+                     if heap and self._running[queue] < self.per_queue_limit]
+            if ready:
+                # Most urgent, then oldest, head of the queues with spare capacity
+                best_queue = min(ready, key=lambda queue: self._queues[queue][0][:2])
+                if home_queue in ready and \
+                        self._queues[home_queue][0][0] <= self._queues[best_queue][0][0]:
+                    best_queue = home_queue
+                task = heapq.heappop(self._queues[best_queue])[2]
+                task.stolen = best_queue != home_queue
+                self._steals += task.stolen
+                self._running[best_queue] += 1
+                self._peaks[best_queue] = max(self._peaks.get(best_queue, 0),
+                                              self._running[best_queue])
+                return task
+            if not any(self._queues.values()) and not any(self._running.values()):
+                return None
+            # Work is queued on busy WLCs, or running tasks may submit more
+            self._condition.wait()
+
+    def _worker(self, home_queue):
+        while True:
+            with self._condition:
+                task = self._next_task(home_queue)
+            if task is None:
+                return
+            task.started = self.clock()
+            try:
+                task.result = task.work()
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                # A failed task must not take its worker down with it
+                task.error = f"{type(err).__name__}: {err}"
+            task.finished = self.clock()
+            with self._condition:
+                self._running[task.queue] -= 1
+                self._condition.notify_all()
+
+    def run(self):
+        """
+        Run queued tasks until every queue is empty.
+
+        :return: SchedulerStats
+        """
+        start_time = self.clock()
+        with self._condition:
+            queues = sorted(self._queues)
+        # Spread the home queues of the workers round-robin across the queues
+        home_queues = [queues[index % len(queues)] if queues else None
+                       for index in range(self.workers)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for home_queue in home_queues:
+                executor.submit(self._worker, home_queue)
+
+        stats = SchedulerStats(tasks=len(self._tasks), steals=self._steals,
+                               seconds=self.clock() - start_time)
+        for task in self._tasks:
+            stats.failed += task_failed(task)
+            stats.latencies.setdefault(task.priority, []).append(task.finished - task.queued)
+            queue_stats = stats.queues.setdefault(
+                task.queue, {"tasks": 0, "failed": 0, "peak": self._peaks.get(task.queue, 0)})
+            queue_stats["tasks"] += 1
+            queue_stats["failed"] += task_failed(task)
+        return stats
+
+
+def task_failed(task):
+    """
+    :param task: Finished ScheduledTask
+    :return: True if the task raised, returned False, or returned a dict
+        with a False value; None values mark deferred work, not failures
+    """
+    if task.error is not None or task.result is False:
+        return True
+    return isinstance(task.result, dict) and False in task.result.values()
+
+
+def classify_aps(request_session, access_points, use_fields=True):
+    """
+    Give each AP a provisioning priority from the WLC's current state, read
+    with two bulk requests: the AP tag table, and the AP operational data.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param access_points: AccessPoint records associated with the WLC
+    :param use_fields: Use RESTCONF "fields" requests
+    :return: Dict of AP MAC to priority.  If the WLC state cannot be read,
+        every AP is treated as changed.
+    """
+    try:
+        configured_macs = fetch_wlc_keys(request_session, AP_TAGS_TABLE, use_fields=use_fields)
+        ap_states = index_ap_oper_data(fetch_ap_oper_data(request_session, use_fields))
+    except RequestException:
+        return {ap.mac: PRIORITY_CHANGED for ap in access_points}
+
+    priorities = {}
+    for ap in access_points:
+        if ap.mac not in configured_macs:
+            priorities[ap.mac] = PRIORITY_NEW
+        elif ap.mac in ap_states and not ap_converged(ap, ap_states[ap.mac]):
+            priorities[ap.mac] = PRIORITY_CHANGED
+        else:
+            # Configured, and either matching NetBox or not joined yet
+            priorities[ap.mac] = PRIORITY_REFRESH
+    return priorities
+
+
+def _provision_ap_work(session_pool, wlc, ap):
+    def work():
+        # None marks the AP as deferred rather than failed
+        return {ap.mac: provision_ap_on_pooled_wlc(session_pool, ap, wlc_name=wlc.name,
+                                                   wlc_host=wlc.dns_name)}
+    return work
+
+
+def _provision_batch_work(session_pool, wlc, batch, batch_size):
+    def work():
+        if skip_reason := session_pool.skip_reason(wlc.dns_name):
+            for ap in batch:
+                session_pool.defer("ap", ap.name, wlc.dns_name, skip_reason)
+            return dict.fromkeys((ap.mac for ap in batch), None)
+        return provision_aps_batched(request_session=session_pool.get(wlc.dns_name),
+                                     access_points=batch,
+                                     batch_size=batch_size,
+                                     wlc_name=wlc.name)
+    return work
+
+
+def schedule_provisioning(access_points, wlc_resolver, session_pool, capability_cache=None,
+                          batch=False, workers=DEFAULT_WORKERS,
+                          per_wlc_limit=DEFAULT_PER_WLC_LIMIT):
+    """
+    Provision APs on their associated WLCs through a FairScheduler.  With
+    batch set, WLCs that support batched merge requests get one task per
+    batch of APs of the same priority; otherwise every AP gets its own task.
+
+    :param access_points: AccessPoint records to provision; APs without a
+        MAC address are reported as failed and not scheduled
+    :param wlc_resolver: WlcResolver used to look up associated WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param capability_cache: Optional CapabilityCache of the WLC capabilities
+    :param batch: With a capability cache, provision in batches where the
+        WLC supports it
+    :param workers: Worker threads shared by all WLCs
+    :param per_wlc_limit: Maximum tasks running on one WLC at a time
+    :return: Tuple of (dict of (WLC DNS name, AP MAC) to True if the AP was
+        provisioned on that WLC, False if it failed, or None if it was
+        deferred because of the circuit breaker or run deadline, dict of AP
+        MAC to finish time relative to the start, SchedulerStats)
+    """
+    start_time = time.monotonic()
+    access_points = list(access_points)
+    for ap in access_points:
+        if not ap.mac:
+            # Without its MAC address the AP cannot be configured on a WLC
+            emit("ap.error", level="error", ap=ap.name, error="no MAC address",
+                 text=f"\tAP {ap.name} has no MAC address in NetBox, not provisioned")
+            emit("ap.done", text="*" * 78, ap=ap.name, ap_mac=None, status="FAILED")
+    access_points = [ap for ap in access_points if ap.mac]
+    aps_by_wlc = {}
+    for ap in access_points:
+        for wlc_id in ap.wlc_ids:
+            aps_by_wlc.setdefault(wlc_resolver.resolve(wlc_id), []).append(ap)
+
+    def wlc_strategy(wlc):
+        if capability_cache is None:
+            return None
+        try:
+            return capability_cache.get(wlc.dns_name)
+        except RequestException as err:
+            emit("wlc.capabilities", level="error", wlc=wlc.name, error=str(err),
+                 text=f"Reading the capabilities of WLC '{wlc.name}' failed, "
+                      f"provisioning one AP at a time: {err}")
+            return None
+
+    def classify_wlc(wlc):
+        capabilities = wlc_strategy(wlc)
+        use_fields = capabilities.fields if capabilities else False
+        priorities = classify_aps(session_pool.get(wlc.dns_name), aps_by_wlc[wlc], use_fields)
+        return wlc, capabilities, priorities
+
+    # Classification reads two bulk tables per WLC; read all WLCs at once
+    with ThreadPoolExecutor(max_workers=max(1, min(len(aps_by_wlc), workers))) as executor:
+        classified = list(executor.map(classify_wlc,
+                                       sorted(aps_by_wlc, key=lambda wlc: wlc.name)))
+
+    scheduler = FairScheduler(workers=workers, per_queue_limit=per_wlc_limit)
+    # AP MAC -> tasks still to finish, to emit "ap.done" once per AP
+    remaining_tasks = {ap.mac: 0 for ap in access_points}
+    ap_results = {ap.mac: True for ap in access_points}
+    task_macs = []
+    for wlc, capabilities, priorities in classified:
+        counts = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        for ap in aps_by_wlc[wlc]:
+            counts[PRIORITY_NAMES[priorities[ap.mac]]] += 1
+        emit("sched.classify", wlc=wlc.name, **counts,
+             text=f"WLC '{wlc.name}': {counts['new']} new, {counts['changed']} changed, "
+                  f"{counts['refresh']} refresh")
+
+        if batch and capabilities is not None and \
+                capabilities.strategy == STRATEGY_BATCHED_MERGE:
+            for priority in PRIORITY_NAMES:
+                same_priority = [ap for ap in aps_by_wlc[wlc] if priorities[ap.mac] == priority]
+                for batch_start in range(0, len(same_priority), capabilities.batch_size):
+                    batch = same_priority[batch_start:batch_start + capabilities.batch_size]
+                    task = scheduler.submit(
+                        wlc.dns_name, priority,
+                        _provision_batch_work(session_pool, wlc, batch, capabilities.batch_size),
+                        label=f"{len(batch)} APs")
+                    task_macs.append((wlc, task, batch))
+        else:
+            for ap in aps_by_wlc[wlc]:
+                task = scheduler.submit(wlc.dns_name, priorities[ap.mac],
+                                        _provision_ap_work(session_pool, wlc, ap),
+                                        label=ap.name)
+                task_macs.append((wlc, task, [ap]))
+        for ap in aps_by_wlc[wlc]:
+            remaining_tasks[ap.mac] += 1
+
+    stats = scheduler.run()
+
+    provisioned = {}
+    finish_times = {}
+    for wlc, task, task_aps in sorted(task_macs, key=lambda entry: entry[1].finished):
+        task_result = task.result if isinstance(task.result, dict) else {}
+        if task.error:
+            emit("sched.error", level="error", wlc=wlc.name, task=task.label, error=task.error,
+                 text=f"\tProvisioning {task.label} on WLC '{wlc.name}' failed: {task.error}")
+        for ap in task_aps:
+            ap_result = task_result.get(ap.mac, False)
+            if ap_result is not None:
+                ap_result = bool(ap_result)
+            provisioned[(wlc.dns_name, ap.mac)] = ap_result
+            # A failure on any WLC fails the AP; otherwise deferral defers it
+            if ap_result is False or ap_results[ap.mac] is False:
+                ap_results[ap.mac] = False
+            elif ap_result is None:
+                ap_results[ap.mac] = None
+            finish_times[ap.mac] = max(finish_times.get(ap.mac, 0.0),
+                                       task.finished - start_time)
+            remaining_tasks[ap.mac] -= 1
+            if not remaining_tasks[ap.mac]:
+                emit("ap.done", text="*" * 78, ap=ap.name, ap_mac=ap.mac,
+                     priority=PRIORITY_NAMES[task.priority],
+                     status={True: "OK", False: "FAILED", None: "DEFERRED"}[ap_results[ap.mac]])
+    return provisioned, finish_times, stats
+
+
+def print_scheduler_summary(stats):
+    """
+    Print the task latency percentiles per priority and the load of each WLC.
+
+    :param stats: SchedulerStats
+    :return: None
+    """
+    def seconds_text(seconds):
+        return "-" if seconds is None else f"{seconds:.1f}"
+
+    flush_events()
+    print("*" * 78)
+    print(f"{'Priority':<10} {'Tasks':>6} {'p50 s':>7} {'p90 s':>7} {'p99 s':>7} {'max s':>7}")
+    for priority, priority_name in PRIORITY_NAMES.items():
+        latencies = stats.latencies.get(priority, [])
+        print(f"{priority_name:<10} {len(latencies):>6} "
+              f"{seconds_text(percentile(latencies, 50)):>7} "
+              f"{seconds_text(percentile(latencies, 90)):>7} "
+              f"{seconds_text(percentile(latencies, 99)):>7} "
+              f"{seconds_text(max(latencies, default=None)):>7}")
+    print(f"{'WLC':<32} {'Tasks':>6} {'Failed':>7} {'Peak':>5}")
+    for queue, queue_stats in sorted(stats.queues.items()):
+        print(f"{queue:<32} {queue_stats['tasks']:>6} {queue_stats['failed']:>7} "
+              f"{queue_stats['peak']:>5}")
+    print(f"Tasks: {stats.tasks}  Failed: {stats.failed}  Stolen: {stats.steals}  "
+          f"Elapsed: {stats.seconds:.2f}s")
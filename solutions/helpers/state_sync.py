@@ -0,0 +1,234 @@
+"""
+Sync the radio channels and tx power the WLCs actually run back to NetBox.
+
+With DCA or DTP enabled on a controller, the channel and power of a radio
+drift from what the import wrote to NetBox.  Each controller is read with
+one bulk AP operational data request (the same snapshot the convergence
+check uses), every NetBox radio of its joined APs is compared with it, and
+the differences are written back with one bulk interface update per batch:
+
+    - rf_channel: the WLC channel and width, translated back to the NetBox
+      center channel value
+    - rf_channel_width: for 5GHz radios; 2.4GHz radios keep NetBox's 22MHz
+    - tx_power: the WLC tx power level
+
+An AP is compared with the first WLC, in primary, secondary, tertiary
+order, it has joined.  Disabled radios, radios without an RF channel in
+NetBox, and values the WLC does not report are left alone.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pynetbox import RequestError
+from requests.exceptions import RequestException
+from .convergence import fetch_ap_oper_data, index_ap_oper_data
+from .events import emit, flush_events
+from .inventory import access_point_from_netbox
+from .netbox_reads import AP_INTERFACE_FIELDS, fetch_ap_devices, fetch_interfaces_by_device
+from .profiling import profile_phase
+from .rf_channel_map import get_netbox_rf_channel, parse_netbox_rf_channel
+
+DEFAULT_UPDATE_BATCH_SIZE = 200
+
+SYNC_INTERFACE_FIELDS = AP_INTERFACE_FIELDS + ("rf_channel_width",)
+
+
+@dataclass(slots=True, frozen=True)
+class RadioDrift:
+    """
+    A NetBox radio interface whose values differ from what its WLC runs.
+    "changes" holds the NetBox interface attributes to write.
+    """
+    wlc_name: str
+    ap_name: str
+    radio: str
+    interface_id: int
+    netbox_rf_channel: str
+    netbox_tx_power: int | None
+    changes: dict
+
+
+def radio_changes(interface, radio_state):
+    """
+    Compare a NetBox radio interface with the WLC operational state of the
+    radio.
+
+    :param interface: pynetbox interface Record with an RF channel
+    :param radio_state: Radio state dict from index_ap_oper_data()
+    :return: Dict of NetBox interface attributes to change; empty if NetBox
+        matches the WLC or the WLC values do not map to NetBox values
+    """
+    netbox_rf_channel = interface.rf_channel.value
+    radio_band = parse_netbox_rf_channel(netbox_rf_channel)["radio_band"]
+    changes = {}
+
+    if radio_state["channel"] is not None and radio_state["channel_width"] is not None:
+        wlc_rf_channel = get_netbox_rf_channel(radio_band, radio_state["channel"],
+                                               radio_state["channel_width"])
+        if wlc_rf_channel is not None and wlc_rf_channel != netbox_rf_channel:
+            changes["rf_channel"] = wlc_rf_channel
+        netbox_width = int(float(interface.rf_channel_width)) \
+            if interface.rf_channel_width not in (None, "") else None
+        if wlc_rf_channel is not None and radio_band != "24" and \
+                netbox_width != radio_state["channel_width"]:
+            changes["rf_channel_width"] = radio_state["channel_width"]
+
+    if radio_state["tx_power"] is not None and radio_state["tx_power"] != interface.tx_power:
+        changes["tx_power"] = radio_state["tx_power"]
+    return changes
+
+
+def find_radio_drift(wlc_name, ap, radio_interfaces, radio_states):
+    """
+    :param wlc_name: Name of the WLC the AP joined
+    :param ap: AccessPoint
+    :param radio_interfaces: Dict of radio name to NetBox interface Record
+    :param radio_states: Dict of slot ID to radio state for the AP
+    :return: List of RadioDrift, one per radio that differs
+    """
+    drift = []
+    for radio in ap.radios:
+        interface = radio_interfaces.get(radio.name)
+        radio_state = radio_states.get(radio.slot_id)
+        if not radio.enabled or interface is None or radio_state is None:
+            continue
+        if changes := radio_changes(interface, radio_state):
+            drift.append(RadioDrift(wlc_name=wlc_name, ap_name=ap.name, radio=radio.name,
+                                    interface_id=interface.id,
+                                    netbox_rf_channel=interface.rf_channel.value,
+                                    netbox_tx_power=interface.tx_power,
+                                    changes=changes))
+    return drift
+
+
+@profile_phase("netbox_write")
+def write_radio_drift(netbox_api, drift, batch_size=DEFAULT_UPDATE_BATCH_SIZE):
+    """
+    Write the WLC values of drifted radios to NetBox, one bulk interface
+    update per batch.
+
+    :param netbox_api: pynetbox API object reference
+    :param drift: List of RadioDrift
+    :param batch_size: Interfaces per bulk update
+    :return: Tuple of (interfaces updated, interfaces failed)
+    """
+    updated = failed = 0
+    for batch_start in range(0, len(drift), batch_size):
+        batch = drift[batch_start:batch_start + batch_size]
+        try:
+            netbox_api.dcim.interfaces.update([{"id": radio_drift.interface_id,
+                                                **radio_drift.changes}
+                                               for radio_drift in batch])
+            updated += len(batch)
+            emit("sync.update", interfaces=len(batch), status="OK",
+                 text=f"\tUpdated {len(batch)} radio interfaces in NetBox")
+        except RequestError as err:
+            failed += len(batch)
+            emit("sync.update", level="error", interfaces=len(batch), status="FAILED",
+                 error=str(err),
+                 text=f"\tFAILED to update {len(batch)} radio interfaces in NetBox: {err}")
+    return updated, failed
+
+
+def sync_radio_state(netbox_api, wlc_resolver, session_pool, pod_numbers=None, dry_run=False,
+                     max_concurrency=4, batch_size=DEFAULT_UPDATE_BATCH_SIZE,
+                     capability_cache=None):
+    """
+    Update the radio channels and tx power in NetBox from the WLCs the APs
+    of the selected pods are associated with.
+
+    :param netbox_api: pynetbox API object reference
+    :param wlc_resolver: WlcResolver used to look up WLCs
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param pod_numbers: Pods whose APs are synced; None for all APs
+    :param dry_run: Only report the differences; change nothing
+    :param max_concurrency: Maximum number of WLCs read at the same time
+    :param batch_size: Interfaces per bulk NetBox update
+    :param capability_cache: Optional CapabilityCache; decides per WLC
+        whether "fields" requests are used
+    :return: Outcome dict with "drift" (list of RadioDrift), "aps",
+        "not_joined" (AP names), "wlc_errors" (WLC name to error),
+        "updated", and "failed"
+    """
+    ap_devices = [device for pod_number in (pod_numbers or [None])
+                  for device in fetch_ap_devices(netbox_api, pod_number=pod_number)]
+    interfaces_by_device = fetch_interfaces_by_device(netbox_api,
+                                                      (device.id for device in ap_devices),
+                                                      fields=SYNC_INTERFACE_FIELDS)
+    access_points, radio_interfaces = [], {}
+    for device in ap_devices:
+        interfaces = sorted(interfaces_by_device.get(device.id, ()),
+                            key=lambda interface: interface.id)
+        access_points.append(access_point_from_netbox(device, interfaces))
+        radio_interfaces[device.id] = {interface.name: interface for interface in interfaces
+                                       if interface.rf_channel}
+
+    wlcs = {wlc.id: wlc for wlc in map(wlc_resolver.resolve,
+                                       {wlc_id for ap in access_points for wlc_id in ap.wlc_ids})}
+
+    def read_one(wlc):
+        if skip_reason := session_pool.skip_reason(wlc.dns_name):
+            session_pool.defer("sync", wlc.name, wlc.dns_name, skip_reason)
+            return wlc.id, None, f"skipped ({skip_reason})"
+        use_fields = True
+        try:
+            if capability_cache is not None:
+                use_fields = capability_cache.get(wlc.dns_name).fields
+            oper_data = fetch_ap_oper_data(session_pool.get(wlc.dns_name), use_fields=use_fields)
+        except RequestException as err:
+            emit("sync.error", level="error", wlc=wlc.name, error=str(err),
+                 text=f"\tFAILED to read the AP operational data of WLC '{wlc.name}': {err}")
+            return wlc.id, None, str(err)
+        ap_states = index_ap_oper_data(oper_data)
+        emit("sync.read", wlc=wlc.name, joined=len(ap_states),
+             text=f"\tRead the radio state of {len(ap_states)} APs from WLC '{wlc.name}'")
+        return wlc.id, ap_states, None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        wlc_reads = list(executor.map(read_one, sorted(wlcs.values(), key=lambda wlc: wlc.name)))
+    ap_states_by_wlc = {wlc_id: ap_states for wlc_id, ap_states, _ in wlc_reads
+                        if ap_states is not None}
+
+    outcome = {"drift": [], "aps": len(access_points), "not_joined": [],
+               "wlc_errors": {wlcs[wlc_id].name: error for wlc_id, _, error in wlc_reads
+                              if error},
+               "updated": 0, "failed": 0}
+    for ap in access_points:
+        joined_wlc_id = next((wlc_id for wlc_id in ap.wlc_ids
+                              if ap.mac in ap_states_by_wlc.get(wlc_id, {})), None)
+        if joined_wlc_id is None:
+            outcome["not_joined"].append(ap.name)
+            continue
+        for radio_drift in find_radio_drift(wlcs[joined_wlc_id].name, ap,
+                                            radio_interfaces[ap.id],
+                                            ap_states_by_wlc[joined_wlc_id][ap.mac]):
+            outcome["drift"].append(radio_drift)
+            emit("sync.drift", wlc=radio_drift.wlc_name, ap=radio_drift.ap_name,
+                 radio=radio_drift.radio, changes=radio_drift.changes,
+                 text=f"\t{radio_drift.ap_name} {radio_drift.radio}: "
+                      + ", ".join(f"{name} -> {value}"
+                                  for name, value in radio_drift.changes.items()))
+
+    if not dry_run:
+        outcome["updated"], outcome["failed"] = write_radio_drift(netbox_api, outcome["drift"],
+                                                                  batch_size=batch_size)
+    return outcome
+
+
+def print_sync_summary(outcome, dry_run=False):
+    """
+    Print the totals of a radio state sync.
+
+    :param outcome: Outcome dict from sync_radio_state()
+    :param dry_run: Whether the run only reported the differences
+    :return: None
+    """
+    flush_events()
+    print("*" * 78)
+    print(f"APs checked: {outcome['aps']}, not joined to any WLC: {len(outcome['not_joined'])}")
+    print(f"Radios differing from their WLC: {len(outcome['drift'])}")
+    if dry_run:
+        print("Dry run: NetBox was not changed")
+    else:
+        print(f"Radio interfaces updated: {outcome['updated']}, failed: {outcome['failed']}")
+    for wlc_name, error in sorted(outcome["wlc_errors"].items()):
+        print(f"WLC {wlc_name}: ERROR: {error}")
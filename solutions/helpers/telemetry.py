@@ -0,0 +1,320 @@
+"""
+Collect AP and radio state pushed by the WLCs instead of polling for it.
+
+Controllers (or a telemetry gateway in front of them, e.g. one turning
+gRPC dial-out into JSON) connect to the collector over TCP and send one
+JSON message per line, each a periodic snapshot of the YANG AP
+operational data of one WLC:
+
+    {"wlc": "wlc-1", "access-point-oper-data": {"ap-name-mac-map": [...],
+                                                "radio-oper-data": [...]}}
+
+The snapshot has the shape of the RESTCONF "access-point-oper-data"
+response, so it is indexed exactly like a convergence poll.  The index is
+keyed by AP Ethernet MAC, so validating any number of APs against the
+latest state is a dict lookup per AP with no WLC requests at all.
+
+TelemetrySimulator pushes snapshots built from NetBox AP records, for
+testing the collector and validations without controllers.
+"""
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from .convergence import index_ap_oper_data
+from .events import emit
+from .validation import evaluate_ap_oper_state
+
+DEFAULT_LISTEN_HOST = "127.0.0.1"
+DEFAULT_LISTEN_PORT = 57500
+DEFAULT_PUSH_INTERVAL = 5.0
+
+
+@dataclass(slots=True, frozen=True)
+class TelemetryEntry:
+    """
+    The latest state of one AP, as reported by a WLC.
+    """
+    wlc_name: str
+    radio_states: dict
+    received: float
+
+
+class TelemetryIndex:
+    """
+    Latest pushed AP state, keyed by AP Ethernet MAC.  Safe to share between
+    threads.
+
+    Each message replaces everything its WLC reported before, so an AP that
+    left a WLC disappears from the index with the next snapshot of that WLC.
+    """
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._entries = {}
+        self._macs_by_wlc = {}
+        self._updated = threading.Condition()
+        self.messages = 0
+
+    def __len__(self):
+        with self._updated:
+            return len(self._entries)
+
+    def update(self, wlc_name, oper_data):
+        """
+        Replace the state reported by a WLC with a new snapshot.
+
+        :param wlc_name: Name of the reporting WLC
+        :param oper_data: "access-point-oper-data" dict
+        :return: Number of APs in the snapshot
+        """
+        ap_states = index_ap_oper_data(oper_data)
+        received = self._clock()
+        with self._updated:
+            for ap_mac in self._macs_by_wlc.get(wlc_name, set()) - set(ap_states):
+                if self._entries.get(ap_mac) and self._entries[ap_mac].wlc_name == wlc_name:
+                    del self._entries[ap_mac]
+            for ap_mac, radio_states in ap_states.items():
+                self._entries[ap_mac] = TelemetryEntry(wlc_name=wlc_name,
+                                                       radio_states=radio_states,
+                                                       received=received)
+            self._macs_by_wlc[wlc_name] = set(ap_states)
+            self.messages += 1
+            self._updated.notify_all()
+        return len(ap_states)
+
+    def get(self, ap_mac, max_age=None):
+        """
+        :param ap_mac: Normalized AP Ethernet MAC
+        :param max_age: Optional seconds after which a state is too old
+        :return: TelemetryEntry, or None if the AP was not reported (recently)
+        """
+        with self._updated:
+            entry = self._entries.get(ap_mac)
+        if entry is None or (max_age is not None and self._clock() - entry.received > max_age):
+            return None
+        return entry
+
+    def wait_for(self, ap_macs, timeout):
+        """
+        Block until every AP was reported or the timeout passed.
+
+        :param ap_macs: Iterable of normalized AP Ethernet MACs
+        :param timeout: Seconds to wait
+        :return: Set of the MACs still not reported
+        """
+        ap_macs = set(ap_macs)
+        deadline = self._clock() + timeout
+        with self._updated:
+            while missing := ap_macs - self._entries.keys():
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return missing
+                self._updated.wait(remaining)
+            return set()
+
+
+class _TelemetryHandler(socketserver.StreamRequestHandler):
+    """
+    Read JSON Lines messages from one WLC connection into the index.
+    """
+    def handle(self):
+        peer = f"{self.client_address[0]}:{self.client_address[1]}"
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                wlc_name = message["wlc"]
+                ap_count = self.server.index.update(wlc_name,
+                                                    message["access-point-oper-data"])
+            except (ValueError, KeyError, TypeError, AttributeError) as err:
+                emit("telemetry.error", level="error", peer=peer, error=str(err),
+                     text=f"\tInvalid telemetry message from {peer}: {err}")
+                continue
+            emit("telemetry.update", wlc=wlc_name, aps=ap_count, peer=peer,
+                 text=f"\tTelemetry from WLC '{wlc_name}': {ap_count} APs")
+
+
+class TelemetryCollector(socketserver.ThreadingTCPServer):
+    """
+    TCP server receiving pushed AP state into a TelemetryIndex, one thread
+    per connected WLC.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host=DEFAULT_LISTEN_HOST, port=DEFAULT_LISTEN_PORT, index=None):
+        """
+        :param host: Address to listen on
+        :param port: TCP port to listen on; 0 picks a free port
+        :param index: TelemetryIndex to update; a new one by default
+        """
+        self.index = index if index is not None else TelemetryIndex()
+        self._thread = None
+        super().__init__((host, port), _TelemetryHandler)
+
+    def start(self):
+        """
+        Serve in a background thread.
+
+        :return: (host, port) the collector listens on
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="telemetry-collector",
+                                        daemon=True)
+        self._thread.start()
+        emit("telemetry.listen", host=self.server_address[0], port=self.server_address[1],
+             text=f"Telemetry collector listening on "
+                  f"{self.server_address[0]}:{self.server_address[1]}")
+        return self.server_address[:2]
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+
+        :return: None
+        """
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+
+
+def simulated_oper_data(access_points, drift=0.0, rng=random):
+    """
+    Build the "access-point-oper-data" a WLC would report for APs running
+    their NetBox radio settings.
+
+    :param access_points: Iterable of AccessPoint records
+    :param drift: Fraction of radios reported with a different tx power
+        level, as after DTP changed them
+    :param rng: Random number generator for the drift
+    :return: "access-point-oper-data" dict
+    """
+    oper_data = {"ap-name-mac-map": [], "radio-oper-data": []}
+    for ap in access_points:
+        if not ap.mac:
+            continue
+        # The radio MAC base differs from the Ethernet MAC in the first octet
+        radio_mac = f"{int(ap.mac[:2], 16) ^ 0x02:02x}{ap.mac[2:]}"
+        oper_data["ap-name-mac-map"].append({"wtp-name": ap.name, "wtp-mac": radio_mac,
+                                             "eth-mac": ap.mac})
+        for radio in ap.radios:
+            tx_power = radio.tx_power
+            if tx_power is not None and rng.random() < drift:
+                tx_power = tx_power % 8 + 1
+            channel_width = 20 if radio.radio_band == "24" else radio.channel_width
+            oper_data["radio-oper-data"].append({
+                "wtp-mac": radio_mac,
+                "radio-slot-id": radio.slot_id,
+                "admin-state": "enabled" if radio.enabled else "disabled",
+                "oper-state": "radio-up" if radio.enabled else "radio-down",
+                "phy-ht-cfg": {"cfg-data": {"curr-freq": radio.channel,
+                                            "chan-width": f"chan-width-{channel_width}-mhz"}},
+                "radio-band-info": [{"phy-tx-pwr-cfg": {"cfg-data": {
+                    "current-tx-power-level": tx_power}}}],
+            })
+    return oper_data
+
+
+class TelemetrySimulator:
+    """
+    Push periodic AP state snapshots of one simulated WLC to a collector.
+    """
+    def __init__(self, collector_address, wlc_name, access_points,
+                 interval=DEFAULT_PUSH_INTERVAL, drift=0.0, seed=None):
+        """
+        :param collector_address: (host, port) of the collector
+        :param wlc_name: Name of the simulated WLC
+        :param access_points: AccessPoint records joined to the WLC
+        :param interval: Seconds between snapshots
+        :param drift: Fraction of radios reported with a different tx power
+        :param seed: Optional random seed for the drift
+        """
+        self.collector_address = collector_address
+        self.wlc_name = wlc_name
+        self.access_points = list(access_points)
+        self.interval = interval
+        self.drift = drift
+        self._rng = random.Random(seed)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def push(self, connection):
+        """
+        Send one snapshot over an open connection.
+
+        :param connection: Connected socket
+        :return: None
+        """
+        message = {"wlc": self.wlc_name,
+                   "access-point-oper-data": simulated_oper_data(self.access_points,
+                                                                 drift=self.drift,
+                                                                 rng=self._rng)}
+        connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+    def run(self):
+        """
+        Push snapshots until stopped.
+
+        :return: None
+        """
+        with socket.create_connection(self.collector_address) as connection:
+            while not self._stopped.is_set():
+                self.push(connection)
+                self._stopped.wait(self.interval)
+
+    def start(self):
+        """
+        Push snapshots in a background thread.
+
+        :return: None
+        """
+        self._thread = threading.Thread(target=self.run, name=f"telemetry-sim-{self.wlc_name}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop pushing and wait for the background thread.
+
+        :return: None
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def evaluate_telemetry(access_points, index, wlc_names=None, max_age=None):
+    """
+    Validate APs against the latest telemetry, without any WLC requests.
+
+    :param access_points: Iterable of AccessPoint records
+    :param index: TelemetryIndex
+    :param wlc_names: Optional dict of NetBox WLC ID to name, used to name
+        the primary WLC of APs that were not reported
+    :param max_age: Optional seconds after which reported state is ignored
+    :return: List of CheckResult
+    """
+    wlc_names = wlc_names or {}
+    results = []
+    for ap in access_points:
+        entry = index.get(ap.mac, max_age=max_age) if ap.mac else None
+        if entry is None:
+            wlc_name = wlc_names.get(ap.wlc_ids[0]) if ap.wlc_ids else None
+            ap_results = evaluate_ap_oper_state(wlc_name, ap, None)
+        else:
+            ap_results = evaluate_ap_oper_state(entry.wlc_name, ap, entry.radio_states)
+        failed = [result for result in ap_results if not result.passed]
+        emit("telemetry.check", ap=ap.name, ap_mac=ap.mac, wlc=ap_results[0].wlc_name,
+             status="FAILED" if failed else "OK", checks=len(ap_results), failed=len(failed),
+             **({"level": "error"} if failed else {}),
+             text=f"\t{ap.name:<30}... " + (
+                 "FAILED: " + ", ".join(f"{result.radio + ' ' if result.radio else ''}"
+                                        f"{result.label} (reported {result.actual})"
+                                        for result in failed)
+                 if failed else "OK"))
+        results.extend(ap_results)
+    return results
@@ -0,0 +1,287 @@
+"""
+CSV to NetBox payload transform for the AP importer.
+
+Mapping CSV columns to device and interface attributes, and translating the
+radio settings to NetBox "rf_channel" values, is pure CPU work with no
+NetBox access.  For large files it is split into chunks of rows that are
+transformed in a process pool, while the importer keeps talking to NetBox.
+Results are returned in CSV order.
+
+Rows may hold CSV strings or the typed values of the JSON Lines, Parquet,
+and Arrow formats.  WLC names are kept as names here; resolving them to
+NetBox device IDs is left to the importer, which has the NetBox client.
+"""
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from .input_formats import read_records
+from .profiling import profile_phase, profiling_active
+from .rf_channel_map import get_rf_channel_value
+
+# Rows per chunk handed to a worker process.  Inputs of a single chunk are
+# transformed in the calling process, as a pool would only add overhead.
+DEFAULT_CHUNK_SIZE = 2000
+
+# Map CSV columns to DCIM attributes
+DEVICE_KEY_FIELD_MAP = {
+    "device_name": "name",
+    "serial": "serial",
+    "asset_tag": "asset_tag",
+    "device_type": "device_type",
+    "device_role": "role",
+    "platform": "platform",
+    "site": "site",
+    "location": "location",
+}
+
+# Map CSV columns to DCIM custom fields
+DEVICE_CUSTOM_FIELD_MAP = {
+    "primary_wlc": "wlc_primary_association",
+    "secondary_wlc": "wlc_secondary_association",
+    "tertiary_wlc": "wlc_tertiary_association",
+}
+
+# DCIM key fields will NOT use a NetBox object reference via "slug" value
+DCIM_NATIVE_FIELDS = ("name", "serial", "asset_tag")
+
+# Anything in this list will be checked against the CSV row values by
+# appending the expected field name to an interface prefix.
+VALID_INTERFACE_NAMES = ("wired", "wired1", "wired2", "radio0", "radio1", "radio2", "radio3")
+
+INTERFACE_KEY_FIELD_MAP = {
+    "mac": "mac_address",
+    "band": "band",
+    "channel_number": "channel",
+    "rf_role": "rf_role",
+    "tx_power": "tx_power",
+    "channel_width": "rf_channel_width",
+    "enabled": "enabled"
+}
+
+TRUE_VALUES = ("true", "1", "yes")
+
+
+def has_value(value):
+    """
+    :param value: Row value
+    :return: True unless the value is empty.  False and 0 are values.
+    """
+    return value is not None and value != ""
+
+
+@dataclass(slots=True, frozen=True)
+class TransformedRow:
+    """
+    NetBox payloads of one CSV row.  Row numbers count the header as line 1.
+    """
+    row: int
+    device_name: str | None
+    device_details: dict = field(default_factory=dict)
+    # Custom field name -> (CSV column, WLC name)
+    wlc_names: dict = field(default_factory=dict)
+    # Interface name -> interface attributes, without the NetBox ID
+    interfaces: dict = field(default_factory=dict)
+    error: str | None = None
+    # Hash of the payloads, see payload_fingerprint()
+    fingerprint: str | None = None
+
+
+def payload_fingerprint(device_details, wlc_names, interfaces):
+    """
+    Hash the NetBox payloads of a row, to detect unchanged rows on the next
+    import.  See fingerprints.FingerprintStore.
+
+    :param device_details: Device attributes dict from map_device_fields()
+    :param wlc_names: Dict of custom field to (CSV column, WLC name)
+    :param interfaces: Dict of interface name to interface attributes
+    :return: Hex SHA-256 digest of the payloads
+    """
+    payload = json.dumps([device_details, wlc_names, interfaces], sort_keys=True,
+                         separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def map_device_fields(csv_row, workshop_pod_number):
+    """
+    Map a CSV row to NetBox device attributes.  The row is not modified.
+
+    :param csv_row: Dict of one CSV row
+    :param workshop_pod_number: Workshop Pod Number for device custom field
+    :return: Tuple of (device attributes dict, dict of WLC association custom
+        field to (CSV column, WLC name))
+    """
+    # For each expected / valid CSV field and associated DCIM field, check if
+    # there is a CSV value.  If the associated DCIM field is a key field, use
+    # the raw value and don't set the value to the NetBox 'slug'
+    device_details = {}
+    for csv_field, dcim_object_attr in DEVICE_KEY_FIELD_MAP.items():
+        if has_value(csv_attr := csv_row.get(csv_field)):
+            if dcim_object_attr in DCIM_NATIVE_FIELDS:
+                device_details[dcim_object_attr] = str(csv_attr)
+            else:
+                device_details[dcim_object_attr] = {"slug": str(csv_attr)}
+
+    # Set the custom field value for workshop_pod_number; the WLC
+    # associations are added once the WLC names are resolved to IDs
+    device_details["custom_fields"] = {"workshop_pod_number": int(workshop_pod_number)}
+
+    wlc_names = {dcim_custom_object_attr: (csv_field, csv_row[csv_field])
+                 for csv_field, dcim_custom_object_attr in DEVICE_CUSTOM_FIELD_MAP.items()
+                 if csv_row.get(csv_field)}
+
+    return device_details, wlc_names
+
+
+def map_interface_fields(csv_row):
+    """
+    Map the interface columns of a CSV row to NetBox interface attributes.
+    Radio settings are translated to a NetBox "rf_channel" value, tx power
+    to a number, and enabled to a boolean.  The row is not modified.
+
+    :param csv_row: Dict of one CSV row
+    :return: Dict of interface name to interface attributes, for every
+        interface with at least one CSV value
+    :raises ValueError: If a tx power or radio channel is not a number, or a
+        radio channel is not a known channel at its width
+    """
+    interfaces = {}
+    for interface_name in VALID_INTERFACE_NAMES:
+        interface_details = {}
+        for csv_field, dcim_object_attr in INTERFACE_KEY_FIELD_MAP.items():
+            if has_value(csv_attr := csv_row.get(f"{interface_name}_{csv_field}")):
+                interface_details[dcim_object_attr] = csv_attr
+        if not interface_details:
+            continue
+
+        if "tx_power" in interface_details:
+            interface_details["tx_power"] = int(interface_details["tx_power"])
+        if not isinstance(enabled := interface_details.get("enabled", False), bool):
+            interface_details["enabled"] = str(enabled).lower() in TRUE_VALUES
+        # Typed files may hold the band as a number, e.g. 5 or 2.4
+        if not isinstance(band := interface_details.get("band", ""), str):
+            interface_details["band"] = f"{band:g}"
+
+        # Is this a radio interface? If so, convert the RF params to a value
+        # that NetBox expects.
+        if interface_name.startswith("radio") and "channel" in interface_details:
+            get_rf_channel_value(interface_details)
+            if rf_channel_width := interface_details.get("rf_channel_width"):
+                interface_details["rf_channel_width"] = int(rf_channel_width)
+
+        interfaces[interface_name] = interface_details
+    return interfaces
+
+
+def transform_row(row_number, csv_row, workshop_pod_number):
+    """
+    Transform one CSV row to its NetBox payloads.
+
+    :param row_number: Line number of the row in the CSV file
+    :param csv_row: Dict of one CSV row
+    :param workshop_pod_number: Workshop Pod Number for device custom field
+    :return: TransformedRow; a row that cannot be transformed has the
+        error set and no payloads
+    """
+    device_name = csv_row.get("device_name")
+    try:
+        device_details, wlc_names = map_device_fields(csv_row, workshop_pod_number)
+        interfaces = map_interface_fields(csv_row)
+    except (KeyError, TypeError, ValueError) as err:
+        return TransformedRow(row=row_number, device_name=device_name,
+                              error=f"{type(err).__name__}: {err}")
+    return TransformedRow(row=row_number, device_name=device_name,
+                          device_details=device_details, wlc_names=wlc_names,
+                          interfaces=interfaces,
+                          fingerprint=payload_fingerprint(device_details, wlc_names, interfaces))
+
+
+def transform_chunk(first_row_number, csv_rows, workshop_pod_number):
+    """
+    Transform a chunk of consecutive CSV rows.  Runs in a worker process.
+
+    :param first_row_number: Line number of the first row of the chunk
+    :param csv_rows: List of CSV row dicts
+    :param workshop_pod_number: Workshop Pod Number for device custom field
+    :return: List of TransformedRow field tuples, in the order of the rows.
+        Plain tuples are much cheaper to send back to the parent process
+        than dataclass instances.
+    """
+    row_fields = []
+    for row_number, csv_row in enumerate(csv_rows, start=first_row_number):
+        transformed = transform_row(row_number, csv_row, workshop_pod_number)
+        row_fields.append((transformed.row, transformed.device_name, transformed.device_details,
+                           transformed.wlc_names, transformed.interfaces, transformed.error,
+                           transformed.fingerprint))
+    return row_fields
+
+
+def transform_rows(csv_rows, workshop_pod_number, chunk_size=DEFAULT_CHUNK_SIZE,
+                   max_workers=None):
+    """
+    Transform CSV rows to NetBox payloads, chunks of rows at a time in a
+    process pool.  Rows are read lazily, and only a few chunks per worker
+    are in flight at any time, so memory use does not grow with the input.
+
+    :param csv_rows: Iterable of CSV row dicts, e.g. a csv.DictReader
+    :param workshop_pod_number: Workshop Pod Number for device custom field
+    :param chunk_size: Rows per chunk
+    :param max_workers: Worker processes; default: one per CPU.  1 transforms
+        every row in the calling process, as does a profiled run.
+    :return: Generator of TransformedRow, in the order of the rows
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    row_iterator = iter(csv_rows)
+    # Line 1 is the CSV header
+    next_row_number = 2
+
+    def next_chunk():
+        nonlocal next_row_number
+        chunk = list(islice(row_iterator, chunk_size))
+        first_row_number, next_row_number = next_row_number, next_row_number + len(chunk)
+        return first_row_number, chunk
+
+    first_chunk = next_chunk()
+    second_chunk = next_chunk()
+    # Worker processes are invisible to the profiler
+    if max_workers == 1 or profiling_active() or not second_chunk[1]:
+        pending_chunks = [first_chunk, second_chunk]
+        while (chunk_rows := pending_chunks.pop(0) if pending_chunks else next_chunk())[1]:
+            with profile_phase("transform"):
+                transformed_rows = [transform_row(row_number, csv_row, workshop_pod_number)
+                                    for row_number, csv_row in enumerate(chunk_rows[1],
+                                                                         start=chunk_rows[0])]
+            yield from transformed_rows
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque(executor.submit(transform_chunk, *chunk_rows, workshop_pod_number)
+                          for chunk_rows in (first_chunk, second_chunk))
+        while in_flight:
+            # Keep every worker busy, with one chunk queued behind it
+            while len(in_flight) < 2 * max_workers and (chunk_rows := next_chunk())[1]:
+                in_flight.append(executor.submit(transform_chunk, *chunk_rows,
+                                                 workshop_pod_number))
+            for row_fields in in_flight.popleft().result():
+                yield TransformedRow(*row_fields)
+
+
+def transform_input_file(input_file, workshop_pod_number, file_format=None,
+                         chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None):
+    """
+    Transform every row of an inventory file to NetBox payloads.
+
+    :param input_file: Path of the CSV, JSON Lines, Parquet, or Arrow file
+    :param workshop_pod_number: Workshop Pod Number for device custom field
+    :param file_format: One of input_formats.INPUT_FORMATS, or None to use
+        the file extension
+    :param chunk_size: Rows per chunk
+    :param max_workers: Worker processes; default: one per CPU
+    :return: Generator of TransformedRow, in the order of the rows
+    :raises FileNotFoundError: If the file does not exist
+    """
+    yield from transform_rows(read_records(input_file, file_format), workshop_pod_number,
+                              chunk_size=chunk_size, max_workers=max_workers)
@@ -0,0 +1,299 @@
+"""
+Validation engine for WLC AP configuration.
+
+WLC slot configs are indexed by slot ID (and AP MAC for bulk data) so each
+NetBox radio is matched with a dict lookup instead of a scan of every slot.
+Every check produces a CheckResult, so results can be printed, totalled per
+AP, per WLC, and fleet-wide, or written as JSON / JUnit-XML reports.
+"""
+import json
+import time
+from dataclasses import dataclass, asdict
+from xml.etree import ElementTree
+from .inventory import normalize_mac
+
+WIRELESS_DEFAULTS = {
+    "5": {
+        "tx_power": 1,
+        "channel": 36,
+        "channel_width": 20,
+        "admin_state": True,
+    },
+    "24": {
+        "tx_power": 1,
+        "channel": 1,
+        "channel_width": 22,  # Actual SHOULD be 20; this is for NetBox map
+        "admin_state": True,
+    }
+}
+
+# Check identifiers and the labels used when printing results
+CHECK_LABELS = {
+    "ap_name": "AP name present in config DB",
+    "ap_joined": "AP joined",
+    "radio_config": "Radio config present",
+    "channel": "Channel {expected}",
+    "channel_width": "Channel width {expected}",
+    "tx_power": "TX Power {expected}",
+    "dca_disabled": "DCA Disabled",
+    "dtp_disabled": "DTP Disabled",
+    "admin_state": "Admin state",
+}
+
+# Checks that print the configured value on failure
+VALUE_CHECKS = ("channel", "channel_width", "tx_power")
+
+
+@dataclass(slots=True, frozen=True)
+class CheckResult:
+    """
+    Outcome of a single check of one AP (and radio) on one WLC.
+    """
+    wlc_name: str | None
+    ap_name: str | None
+    ap_mac: str | None
+    radio: str | None
+    check: str
+    expected: object
+    actual: object
+    passed: bool
+
+    @property
+    def label(self):
+        """
+        Human readable check name, e.g. "Channel 36"
+        """
+        return CHECK_LABELS.get(self.check, self.check).format(expected=self.expected)
+
+
+def index_slot_configs(slot_configs):
+    """
+    Index a list of WLC "ap-specific-slot-config" entries by slot ID.
+
+    :param slot_configs: List of slot config dicts from the WLC
+    :return: Dict of slot ID to slot config dict
+    """
+    return {slot_config.get("slot-id"): slot_config for slot_config in slot_configs or ()}
+
+
+def index_by_ap_mac(ap_configs, key):
+    """
+    Index a bulk list of WLC AP config entries by normalized AP MAC.
+    Entries whose key is not a MAC address are left out.
+
+    :param ap_configs: List of AP config dicts from the WLC
+    :param key: Name of the leaf holding the AP MAC, e.g. "ap-eth-mac-addr"
+    :return: Dict of AP MAC to AP config dict
+    """
+    configs_by_mac = {}
+    for ap_config in ap_configs or ():
+        try:
+            ap_mac = normalize_mac(ap_config.get(key))
+        except ValueError:
+            continue
+        if ap_mac:
+            configs_by_mac[ap_mac] = ap_config
+    return configs_by_mac
+
+
+def index_ap_specific_configs(ap_specific_configs):
+    """
+    Index a bulk list of WLC "ap-specific-config" entries by normalized AP
+    MAC, then by slot ID.
+
+    :param ap_specific_configs: List of ap-specific-config dicts from the WLC
+    :return: Dict of AP MAC to dict of slot ID to slot config dict
+    """
+    return {
+        ap_mac: index_slot_configs(
+            ap_config.get("ap-specific-slot-configs", {}).get("ap-specific-slot-config")
+        )
+        for ap_mac, ap_config in index_by_ap_mac(ap_specific_configs,
+                                                 "ap-ethernet-mac-addr").items()
+    }
+
+
+def evaluate_ap_name(wlc_name, ap_name, ap_mac, spec_config):
+    """
+    Check the WLC "ap-spec-config" entry of an AP against the NetBox name.
+
+    :param wlc_name: Name of the WLC being validated
+    :param ap_name: AP name expected on the WLC
+    :param ap_mac: AP Ethernet MAC address
+    :param spec_config: ap-spec-config dict from the WLC, or None if absent
+    :return: CheckResult
+    """
+    actual_name = spec_config.get("ap-host-name") if spec_config else None
+    passed = bool(spec_config) and \
+        str(spec_config.get("ap-eth-mac-addr", "")).upper() == str(ap_mac).upper() and \
+        str(actual_name).upper() == str(ap_name).upper()
+    return CheckResult(wlc_name=wlc_name, ap_name=ap_name, ap_mac=ap_mac, radio=None,
+                       check="ap_name", expected=ap_name, actual=actual_name,
+                       passed=passed)
+
+
+def evaluate_ap_radios(wlc_name, ap_name, ap_mac, ap_radios, slot_configs_by_id):
+    """
+    Check every radio of an AP against the indexed WLC slot configs.
+
+    :param wlc_name: Name of the WLC being validated
+    :param ap_name: AP name, used to label results
+    :param ap_mac: AP Ethernet MAC address
+    :param ap_radios: Iterable of ApRadio records
+    :param slot_configs_by_id: Dict of slot ID to WLC slot config dict
+    :return: List of CheckResult
+    """
+    results = []
+    for radio in ap_radios:
+        def add_result(check, expected, actual, passed, radio_name=radio.name):
+            results.append(CheckResult(wlc_name=wlc_name, ap_name=ap_name, ap_mac=ap_mac,
+                                       radio=radio_name, check=check, expected=expected,
+                                       actual=actual, passed=passed))
+
+        wlc_radio = slot_configs_by_id.get(radio.slot_id)
+        if wlc_radio is None:
+            add_result("radio_config", radio.slot_id, None, False)
+            continue
+
+        defaults = WIRELESS_DEFAULTS[radio.radio_band]
+        wlc_radio_params = wlc_radio.get(f"radio-params-{radio.radio_band}ghz", {})
+
+        wlc_channel = int(wlc_radio_params.get("channel", defaults["channel"]))
+        wlc_channel_width = int(wlc_radio_params.get("channel-width", defaults["channel_width"]))
+        wlc_tx_power = int(wlc_radio_params.get("transmit-power", defaults["tx_power"]))
+        wlc_admin_state = wlc_radio_params.get("admin-state", defaults["admin_state"])
+
+        # DCA and DTP enabled by default...
+        wlc_dca_enabled = wlc_radio_params.get("dca", True)
+        wlc_dtp_enabled = wlc_radio_params.get("dtp", True)
+
+        add_result("channel", radio.channel, wlc_channel, radio.channel == wlc_channel)
+        add_result("channel_width", radio.channel_width, wlc_channel_width,
+                   radio.channel_width == wlc_channel_width)
+        add_result("tx_power", radio.tx_power, wlc_tx_power, radio.tx_power == wlc_tx_power)
+        add_result("dca_disabled", False, wlc_dca_enabled, not wlc_dca_enabled)
+        add_result("dtp_disabled", False, wlc_dtp_enabled, not wlc_dtp_enabled)
+        add_result("admin_state", radio.enabled, wlc_admin_state,
+                   radio.enabled is wlc_admin_state)
+    return results
+
+
+def evaluate_ap_oper_state(wlc_name, ap, radio_states):
+    """
+    Check an AP against the operational state a WLC reports for it, e.g.
+    from streamed telemetry.  Values the WLC does not report are not
+    checked, and neither are the radios disabled in NetBox.
+
+    :param wlc_name: Name of the WLC reporting the state
+    :param ap: AccessPoint
+    :param radio_states: Dict of slot ID to radio state dict, as indexed by
+        convergence.index_ap_oper_data(), or None if the AP has not joined
+    :return: List of CheckResult
+    """
+    def result(check, expected, actual, passed, radio_name=None):
+        return CheckResult(wlc_name=wlc_name, ap_name=ap.name, ap_mac=ap.mac, radio=radio_name,
+                           check=check, expected=expected, actual=actual, passed=passed)
+
+    results = [result("ap_joined", True, radio_states is not None, radio_states is not None)]
+    if radio_states is None:
+        return results
+    for radio in ap.radios:
+        radio_state = radio_states.get(radio.slot_id)
+        if radio_state is None:
+            results.append(result("radio_config", radio.slot_id, None, False, radio.name))
+            continue
+        if not radio.enabled:
+            continue
+        for setting in VALUE_CHECKS:
+            # 2.4GHz width is reported as 20MHz but kept as 22 for NetBox
+            if setting == "channel_width" and radio.radio_band == "24":
+                continue
+            if (wlc_value := radio_state.get(setting)) is not None:
+                expected = getattr(radio, setting)
+                results.append(result(setting, expected, wlc_value, expected == wlc_value,
+                                      radio.name))
+    return results
+
+
+def _new_totals():
+    return {"checks": 0, "passed": 0, "failed": 0}
+
+
+def summarize_results(results):
+    """
+    Total check results per AP, per WLC, and for the whole fleet.  An AP
+    (or WLC) fails if any of its checks failed.
+
+    :param results: Iterable of CheckResult
+    :return: Dict with "fleet", "wlcs", and "access_points" totals
+    """
+    ap_totals = {}
+    wlc_totals = {}
+    fleet_totals = _new_totals()
+    for result in results:
+        outcome = "passed" if result.passed else "failed"
+        for totals in (ap_totals.setdefault(result.ap_name, _new_totals()),
+                       wlc_totals.setdefault(result.wlc_name, _new_totals()),
+                       fleet_totals):
+            totals["checks"] += 1
+            totals[outcome] += 1
+
+    fleet_totals.update({
+        "access_points": len(ap_totals),
+        "access_points_failed": sum(1 for t in ap_totals.values() if t["failed"]),
+        "wlcs": len(wlc_totals),
+        "wlcs_failed": sum(1 for t in wlc_totals.values() if t["failed"]),
+    })
+    return {"fleet": fleet_totals, "wlcs": wlc_totals, "access_points": ap_totals}
+
+
+def write_json_report(results, report_file):
+    """
+    Write the check results and their totals to a JSON file.
+
+    :param results: List of CheckResult
+    :param report_file: Output file path
+    :return: None
+    """
+    report = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "summary": summarize_results(results),
+              "results": [asdict(result) for result in results]}
+    with open(report_file, "w", encoding="utf-8") as json_file:
+        json.dump(report, json_file, indent=2, default=str)
+
+
+def write_junit_report(results, report_file):
+    """
+    Write the check results as JUnit-XML: one test suite per WLC and one
+    test case per check.
+
+    :param results: List of CheckResult
+    :param report_file: Output file path
+    :return: None
+    """
+    summary = summarize_results(results)
+    testsuites = ElementTree.Element("testsuites",
+                                     name="wlc-ap-validation",
+                                     tests=str(summary["fleet"]["checks"]),
+                                     failures=str(summary["fleet"]["failed"]))
+    suites = {}
+    for result in results:
+        wlc_name = str(result.wlc_name)
+        if wlc_name not in suites:
+            suites[wlc_name] = ElementTree.SubElement(
+                testsuites, "testsuite", name=wlc_name,
+                tests=str(summary["wlcs"][result.wlc_name]["checks"]),
+                failures=str(summary["wlcs"][result.wlc_name]["failed"]))
+
+        test_name = f"{result.radio} {result.label}" if result.radio else result.label
+        testcase = ElementTree.SubElement(suites[wlc_name], "testcase",
+                                          classname=f"{wlc_name}.{result.ap_name}",
+                                          name=test_name)
+        if not result.passed:
+            failure = ElementTree.SubElement(testcase, "failure",
+                                             message=f"expected {result.expected}, "
+                                                     f"configured {result.actual}")
+            failure.text = f"AP {result.ap_name} ({result.ap_mac}) on WLC {wlc_name}"
+
+    ElementTree.ElementTree(testsuites).write(report_file, encoding="utf-8",
+                                              xml_declaration=True)
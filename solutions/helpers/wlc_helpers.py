@@ -1,9 +1,13 @@
 """
 Helper functions for WLC configuration from NetBox data
 """
+import threading
 from jinja2 import Environment, FileSystemLoader, select_autoescape
+from requests.exceptions import RequestException
+from .events import emit
+from .profiling import profile_phase
 from .request_helpers import http_exceptions
-from .rf_channel_map import parse_netbox_rf_channel
+from .inventory import AccessPoint, WirelessController, WLC_ASSOCIATION_FIELDS, as_ap_radios
 
 
 # Initialize Jinja2 environment and load the XML template
@@ -15,36 +19,92 @@ template_env = Environment(
 )
 
 
-def get_ap_wlc_associations(netbox_api, netbox_ap_object):
+class WlcResolver:
+    """
+    Cache of NetBox WLC device IDs to WirelessController records.
+
+    Every AP references its WLCs by NetBox device ID, and many APs share the
+    same WLCs - resolve each controller once and re-use the result.  A single
+    resolver may be shared by several threads (for example, when processing
+    multiple workshop pods concurrently).
+    """
+    def __init__(self, netbox_api):
+        """
+        :param netbox_api: pynetbox API object reference
+        """
+        self.netbox_api = netbox_api
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, netbox_wlc_id):
+        """
+        Get the WLC name and DNS hostname for a NetBox WLC device ID.
+
+        :param netbox_wlc_id: NetBox device ID of the WLC
+        :return: WirelessController record
+        :raises ValueError: If the WLC has no primary IPv4 address
+        """
+        with self._lock:
+            if netbox_wlc_id in self._cache:
+                return self._cache[netbox_wlc_id]
+
+        wlc_object = self.netbox_api.dcim.devices.get(id=netbox_wlc_id)
+        if not wlc_object.primary_ip4:
+            raise ValueError(f"WLC '{wlc_object.name}' has no primary IPv4 address in NetBox")
+        wlc_mgmt_ip = self.netbox_api.ipam.ip_addresses.get(address=str(wlc_object.primary_ip4))
+        wlc_record = WirelessController(id=wlc_object.id,
+                                        name=wlc_object.name,
+                                        dns_name=wlc_mgmt_ip.dns_name)
+
+        with self._lock:
+            self._cache[netbox_wlc_id] = wlc_record
+        return wlc_record
+
+    def resolve_name(self, wlc_name):
+        """
+        Get the WLC record for a NetBox WLC device name.
+
+        :param wlc_name: NetBox device name of the WLC (case-sensitive)
+        :return: WirelessController record, or None if there is no such device
+        """
+        wlc_object = self.netbox_api.dcim.devices.get(name=wlc_name)
+        return self.resolve(wlc_object.id) if wlc_object else None
+
+
+def get_ap_wlc_associations(netbox_api, netbox_ap_object, wlc_resolver=None):
     """
     Get the list of WLCs to associate an access point with. Return a list of
     dicts containing the WLC name and DNS hostname
 
     :param netbox_api: pynetbox API object reference
-    :param netbox_ap_object: Access point object reference from NetBox
+    :param netbox_ap_object: Access point object reference from NetBox, or
+        an AccessPoint record
+    :param wlc_resolver: Optional WlcResolver to cache WLC lookups
     :return: List of dicts containing WLCs and DNS hostnames for association
     """
-    associated_wlc_list = []
-    for association_type in ["wlc_primary_association",
-                             "wlc_secondary_association",
-                             "wlc_tertiary_association"]:
+    if wlc_resolver is None:
+        wlc_resolver = WlcResolver(netbox_api)
 
-        netbox_wlc_id = netbox_ap_object.custom_fields.get(association_type)
-        if netbox_wlc_id:
-            wlc_object = netbox_api.dcim.devices.get(id=netbox_wlc_id["id"])
-            wlc_mgmt_ip = netbox_api.ipam.ip_addresses.get(address=str(wlc_object.primary_ip4))
-            wlc_dns_name = wlc_mgmt_ip.dns_name
+    if isinstance(netbox_ap_object, AccessPoint):
+        netbox_wlc_ids = netbox_ap_object.wlc_ids
+    else:
+        netbox_wlc_ids = [netbox_ap_object.custom_fields[association_type]["id"]
+                          for association_type in WLC_ASSOCIATION_FIELDS
+                          if netbox_ap_object.custom_fields.get(association_type)]
 
-            ap_association = {"wlc_name": wlc_object.name,
-                              "wlc_dns": wlc_dns_name}
+    associated_wlc_list = []
+    for netbox_wlc_id in netbox_wlc_ids:
+        wlc_record = wlc_resolver.resolve(netbox_wlc_id)
+        ap_association = {"wlc_name": wlc_record.name,
+                          "wlc_dns": wlc_record.dns_name}
 
-            associated_wlc_list.append(ap_association)
+        associated_wlc_list.append(ap_association)
 
     return associated_wlc_list
 
 
 @http_exceptions
-def provision_ap_on_wlc(request_session, ap_name, ap_mac):
+def provision_ap_on_wlc(request_session, ap_name, ap_mac, wlc_name=None):
     """
     Perform initial AP provisioning on a WLC. This enables the hostname to
     be assigned on AP association.
@@ -52,35 +112,42 @@ def provision_ap_on_wlc(request_session, ap_name, ap_mac):
     :param request_session: Request session reference to RESTCONF endpoint
     :param ap_name: AP name to be assigned
     :param ap_mac: AP Ethernet MAC address
-    :return: None
+    :param wlc_name: Name of the WLC, used in the event log
+    :return: True if the AP and its tags were provisioned, otherwise False
     """
     wlc_tag_template = template_env.get_template("ap_tags.j2")
     wlc_host_template = template_env.get_template("provision_ap_hostname.j2")
 
-    ap_template = wlc_host_template.render(ap_name=ap_name, ap_mac=ap_mac)
+    with profile_phase("render"):
+        ap_template = wlc_host_template.render(ap_name=ap_name, ap_mac=ap_mac)
     radio_cfg_url = "data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data"
-    restconf_result = request_session.patch(url=radio_cfg_url,
-                                            data=ap_template)
-    if restconf_result.ok:
-        print("OK")
-    else:
-        print("FAILED")
-
+    with profile_phase("push"):
+        restconf_result = request_session.patch(url=radio_cfg_url,
+                                                data=ap_template)
+    provisioned = restconf_result.ok
+    emit("ap.associate", status="OK" if restconf_result.ok else "FAILED",
+         text=f"\tAssociating AP with WLC '{wlc_name}'... "
+              f"{'OK' if restconf_result.ok else 'FAILED'}",
+         ap=ap_name, ap_mac=ap_mac, wlc=wlc_name)
 
     # Assign default tags
-    ap_tag_template = wlc_tag_template.render(ap_mac=ap_mac)
+    with profile_phase("render"):
+        ap_tag_template = wlc_tag_template.render(ap_mac=ap_mac)
     radio_cfg_url = "data/Cisco-IOS-XE-wireless-ap-cfg:ap-cfg-data"
-    restconf_result = request_session.patch(url=radio_cfg_url,
-                                            data=ap_tag_template)
-    print("\tAssigning default tags to AP... ", end="")
-    if restconf_result.ok:
-        print("OK")
-    else:
-        print("FAILED")
+    with profile_phase("push"):
+        restconf_result = request_session.patch(url=radio_cfg_url,
+                                                data=ap_tag_template)
+    emit("ap.tags", status="OK" if restconf_result.ok else "FAILED",
+         text=f"\tAssigning default tags to AP... "
+              f"{'OK' if restconf_result.ok else 'FAILED'}",
+         ap=ap_name, ap_mac=ap_mac, wlc=wlc_name)
+
+    return provisioned and restconf_result.ok
 
 
 @http_exceptions
-def provision_ap_radios(request_session, ap_name, ap_mac, ap_interfaces):
+def provision_ap_radios(request_session, ap_name, ap_mac, ap_radios=None, wlc_name=None,
+                        ap_interfaces=None):
     """
     Pre-provision AP radio interfaces on a WLC. When the AP associates,
     radio configs here will be applied on startup.
@@ -88,25 +155,110 @@ def provision_ap_radios(request_session, ap_name, ap_mac, ap_interfaces):
     :param request_session: Request session reference to RESTCONF endpoint
     :param ap_name: AP name to be assigned
     :param ap_mac: AP Ethernet MAC address
-    :param ap_interfaces: NetBox object list reference to radio interfaces
-    :return: None
+    :param ap_radios: Iterable of ApRadio records, or of the AP's NetBox
+        interfaces
+    :param wlc_name: Name of the WLC, used in the event log
+    :param ap_interfaces: NetBox object list reference to the AP interfaces;
+        an alternative to ap_radios
+    :return: True if every radio was provisioned, otherwise False
     """
     wlc_interface_template = template_env.get_template("provision_ap_radios.j2")
-    for interface in ap_interfaces:
-        if str(interface.name).lower().startswith('radio'):
-            print(f"\tConfiguring interface: {interface}... ", end="")
-            interface_rf_details = parse_netbox_rf_channel(interface.rf_channel.value)
-
-            # pylint: disable=line-too-long
+    provisioned = True
+    for radio in as_ap_radios(ap_radios if ap_radios is not None else ap_interfaces or ()):
+        # The radio channel is already translated for the WLC, so the
+        # record provides both the interface and RF details to the template.
+        with profile_phase("render"):
             interface_template = wlc_interface_template.render(ap_name=ap_name,
                                                                ap_mac=ap_mac,
-                                                               interface=interface,
-                                                               interface_rf_details=interface_rf_details)
-            # print(interface_template)
-            radio_cfg_url = "data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data"
+                                                               interface=radio,
+                                                               interface_rf_details=radio)
+        # print(interface_template)
+        radio_cfg_url = "data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data"
+        with profile_phase("push"):
             restconf_result = request_session.patch(url=radio_cfg_url,
                                                     data=interface_template)
-            if restconf_result.ok:
-                print("OK")
-            else:
-                print("FAILED")
+        emit("radio.provision", status="OK" if restconf_result.ok else "FAILED",
+             text=f"\tConfiguring interface: {radio.name}... "
+                  f"{'OK' if restconf_result.ok else 'FAILED'}",
+             ap=ap_name, ap_mac=ap_mac, wlc=wlc_name, radio=radio.name)
+        provisioned &= restconf_result.ok
+
+    return provisioned
+
+
+def provision_ap_on_pooled_wlc(session_pool, ap, wlc_name, wlc_host):
+    """
+    Provision an AP and its radios on one WLC with the pooled session of the
+    WLC, unless work for the WLC is skipped because its circuit breaker is
+    open or the run deadline passed.
+
+    :param session_pool: RequestSessionPool providing WLC RESTCONF sessions
+    :param ap: AccessPoint record to provision
+    :param wlc_name: Name of the WLC, used in the event log
+    :param wlc_host: WLC host, the key of its pooled session
+    :return: True if provisioned, False if not, None if deferred
+    """
+    if skip_reason := session_pool.skip_reason(wlc_host):
+        session_pool.defer("ap", ap.name, wlc_host, skip_reason)
+        return None
+    wlc_session = session_pool.get(wlc_host)
+    try:
+        # Provision the AP using RESTCONF
+        provisioned = bool(provision_ap_on_wlc(request_session=wlc_session,
+                                               ap_name=ap.name,
+                                               ap_mac=ap.mac,
+                                               wlc_name=wlc_name))
+        # Provision the AP radios using RESTCONF
+        provisioned &= bool(provision_ap_radios(request_session=wlc_session,
+                                                ap_name=ap.name,
+                                                ap_mac=ap.mac,
+                                                ap_radios=ap.radios,
+                                                wlc_name=wlc_name))
+    except RequestException as err:
+        emit("ap.error", level="error", ap=ap.name, wlc=wlc_name, error=str(err),
+             text=f"\tProvisioning AP {ap.name} on WLC '{wlc_name}' failed: {err}")
+        provisioned = False
+    return provisioned
+
+
+def provision_aps_batched(request_session, access_points, batch_size, wlc_name=None):
+    """
+    Provision many APs on a WLC with merge PATCH requests carrying a batch of
+    APs each: one request for the host names and radio settings, and one for
+    the default tags.  A failed batch only fails the APs in that batch.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :param access_points: AccessPoint records to provision
+    :param batch_size: APs per request
+    :param wlc_name: Name of the WLC, used in the event log
+    :return: Dict of AP MAC to True if the AP was provisioned, otherwise False
+    """
+    radio_cfg_template = template_env.get_template("provision_ap_batch.j2")
+    ap_tags_template = template_env.get_template("ap_tags_batch.j2")
+    access_points = [ap for ap in access_points if ap.mac]
+
+    provisioned = {}
+    for batch_start in range(0, len(access_points), batch_size):
+        batch = access_points[batch_start:batch_start + batch_size]
+        with profile_phase("render"):
+            radio_cfg_payload = radio_cfg_template.render(access_points=batch)
+            ap_tags_payload = ap_tags_template.render(access_points=batch)
+        try:
+            with profile_phase("push"):
+                request_session.patch(url="data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data",
+                                      data=radio_cfg_payload)
+                request_session.patch(url="data/Cisco-IOS-XE-wireless-ap-cfg:ap-cfg-data",
+                                      data=ap_tags_payload)
+            batch_error = None
+        except RequestException as err:
+            batch_error = str(err)
+
+        emit("ap.batch", status="FAILED" if batch_error else "OK",
+             **({"level": "error", "error": batch_error} if batch_error else {}),
+             text=f"\tProvisioning {len(batch)} APs on WLC '{wlc_name}'... "
+                  f"{'FAILED: ' + batch_error if batch_error else 'OK'}",
+             wlc=wlc_name, access_points=len(batch))
+        for ap in batch:
+            provisioned[ap.mac] = batch_error is None
+
+    return provisioned
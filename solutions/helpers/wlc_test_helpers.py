@@ -1,25 +1,22 @@
 """
 Helper functions for WLC configuration tests from NetBox data
 """
-from requests.exceptions import RequestException
+from requests.exceptions import HTTPError, RequestException
+from .events import emit, flush_events
+from .inventory import as_ap_radios
+from .profiling import profile_phase
 from .request_helpers import http_exceptions
-from .rf_channel_map import parse_netbox_rf_channel
-
-
-WIRELESS_DEFAULTS = {
-    "5": {
-        "tx_power": 1,
-        "channel": 36,
-        "channel_width": 20,
-        "admin_state": True,
-    },
-    "24": {
-        "tx_power": 1,
-        "channel": 1,
-        "channel_width": 22,  # Actual SHOULD be 20; this is for NetBox map
-        "admin_state": True,
-    }
-}
+from .validation import (VALUE_CHECKS,
+                         CheckResult,
+                         evaluate_ap_name,
+                         evaluate_ap_radios,
+                         index_ap_specific_configs,
+                         index_by_ap_mac,
+                         index_slot_configs,
+                         summarize_results,
+                         write_json_report,
+                         write_junit_report)
+
 
 BASE_NODE = "data/Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data"
 
@@ -30,52 +27,146 @@ LEVEL_3_TEST = "                {test_name:<22}... "
 LEVEL_4_TEST = "                    {test_name:<18}... "
 
 
+def check_result_status(result):
+    """
+    Status text printed after a check name, e.g. "OK" or "FAILED".
+
+    :param result: CheckResult
+    :return: Status text
+    """
+    if result.passed:
+        return "OK"
+    if result.check in VALUE_CHECKS:
+        return f"Configured: {result.actual}. FAILED"
+    if result.check == "radio_config":
+        return "FAILED - slot not configured"
+    return "FAILED"
+
+
+def emit_radio_results(results):
+    """
+    Emit radio check results grouped by radio, in the nested test format.
+
+    :param results: List of CheckResult for the radios of one AP
+    :return: None
+    """
+    current_radio = None
+    for result in results:
+        radio_text = ""
+        if result.radio != current_radio:
+            current_radio = result.radio
+            radio_text = LEVEL_2_TEST.format(test_name=current_radio) + "\n"
+
+        emit("check", status="OK" if result.passed else "FAILED",
+             text=f"{radio_text}{LEVEL_3_TEST.format(test_name=result.label)}"
+                  f"{check_result_status(result)}",
+             ap=result.ap_name, ap_mac=result.ap_mac, wlc=result.wlc_name,
+             radio=result.radio, check=result.check,
+             expected=result.expected, actual=result.actual)
+
+
+def report_ap_name(wlc_name, ap_name, ap_mac, spec_config):
+    """
+    Check and print the AP name entry read from a WLC.
+
+    :param wlc_name: Name of the WLC, used to label the results
+    :param ap_name: AP name expected on the WLC
+    :param ap_mac: AP Ethernet MAC address
+    :param spec_config: ap-spec-config dict from the WLC, or None if absent
+    :return: List containing the CheckResult
+    """
+    result = evaluate_ap_name(wlc_name=wlc_name, ap_name=ap_name, ap_mac=ap_mac,
+                              spec_config=spec_config)
+    if result.passed:
+        status_text = "OK"
+    elif spec_config is None:
+        status_text = "FAILED - AP not present"
+    else:
+        status_text = "FAILED - AP MAC mismatch!"
+    emit("check", status="OK" if result.passed else "FAILED",
+         text=LEVEL_1_TEST.format(test_name="AP name present in config DB") + status_text,
+         ap=ap_name, ap_mac=ap_mac, wlc=wlc_name, check=result.check,
+         expected=result.expected, actual=result.actual)
+
+    return [result]
+
+
+def report_ap_radios(wlc_name, ap_name, ap_mac, ap_radios, slot_configs_by_id):
+    """
+    Check and print the radio configuration read from a WLC.
+
+    :param wlc_name: Name of the WLC, used to label the results
+    :param ap_name: AP name, used to label the results
+    :param ap_mac: AP Ethernet MAC address
+    :param ap_radios: Iterable of ApRadio records
+    :param slot_configs_by_id: Dict of slot ID to WLC slot config dict, or
+        None if the WLC has no radio config for the AP
+    :return: List of CheckResult
+    """
+    radio_test_text = LEVEL_1_TEST.format(test_name="Testing radio configuration")
+    if slot_configs_by_id is None:
+        emit("check", status="FAILED", ap=ap_name, ap_mac=ap_mac, wlc=wlc_name,
+             check="radio_config", text=f"{radio_test_text}FAILED - no radio config present")
+        return [CheckResult(wlc_name=wlc_name, ap_name=ap_name, ap_mac=ap_mac, radio=None,
+                            check="radio_config", expected=True, actual=None, passed=False)]
+
+    emit("radio.test", text=radio_test_text, ap=ap_name, ap_mac=ap_mac, wlc=wlc_name)
+    results = evaluate_ap_radios(wlc_name=wlc_name,
+                                 ap_name=ap_name,
+                                 ap_mac=ap_mac,
+                                 ap_radios=ap_radios,
+                                 slot_configs_by_id=slot_configs_by_id)
+    emit_radio_results(results)
+    return results
+
+
 @http_exceptions
-def validate_ap_name(request_session, ap_name, ap_mac):
+@profile_phase("validate")
+def validate_ap_name(request_session, ap_name, ap_mac, wlc_name=None):
     """
     Test that the supplied AP name and MAC are configured on the WLC.
 
     :param request_session: Request session reference to RESTCONF endpoint
     :param ap_name: AP name to be assigned
     :param ap_mac: AP Ethernet MAC address
-    :return: None
+    :param wlc_name: Name of the WLC, used to label the results
+    :return: List containing the CheckResult
     """
-    print(LEVEL_1_TEST.format(test_name="AP name present in config DB"), end="")
     validation_url = f"{BASE_NODE}/ap-spec-configs/ap-spec-config={ap_mac}"
     try:
         restconf_result = request_session.get(url=validation_url)
-        if restconf_result.ok:
-            # The YANG node is a list, but the AP was specified so the first element
-            # _should_ be the only returned item.
-            model_result = restconf_result.json()\
-                ["Cisco-IOS-XE-wireless-radio-cfg:ap-spec-config"][0]
+        # The YANG node is a list, but the AP was specified so the first element
+        # _should_ be the only returned item.
+        model_result = restconf_result.json()\
+            ["Cisco-IOS-XE-wireless-radio-cfg:ap-spec-config"][0]
 
     except RequestException:
-        print("FAILED - AP not present")
+        model_result = None
+
+    return report_ap_name(wlc_name=wlc_name, ap_name=ap_name, ap_mac=ap_mac,
+                          spec_config=model_result)
 
-    else:
-        # Make sure the name and MAC match for a successful result
-        if ((model_result["ap-eth-mac-addr"].upper() == ap_mac.upper()) and
-                (model_result["ap-host-name"].upper() == ap_name.upper())):
-            print("OK")
-        else:
-            print("FAILED - AP MAC mismatch!")
 
 @http_exceptions
-def validate_ap_radios(request_session, ap_mac, ap_interfaces):
+@profile_phase("validate")
+def validate_ap_radios(request_session, ap_mac, ap_radios=None, ap_name=None, wlc_name=None,
+                       ap_interfaces=None):
     """
-    Iterate over each radio interface and verify the channel, width,
-    transmit power, and DCA/DTP parameters match the desired state.
+    Verify the channel, width, transmit power, and DCA/DTP parameters of
+    each radio match the desired state.
 
     :param request_session: Request session reference to RESTCONF endpoint
     :param ap_mac: AP Ethernet MAC address
-    :param ap_interfaces: NetBox object list reference to radio interfaces
-    :return: None
+    :param ap_radios: Iterable of ApRadio records, or of the AP's NetBox
+        interfaces
+    :param ap_name: AP name, used to label the results
+    :param wlc_name: Name of the WLC, used to label the results
+    :param ap_interfaces: NetBox object list reference to the AP interfaces;
+        an alternative to ap_radios
+    :return: List of CheckResult
     """
-    # pylint: disable=too-many-locals, too-many-branches
+    ap_radios = as_ap_radios(ap_radios if ap_radios is not None else ap_interfaces or ())
     validation_url = f"{BASE_NODE}/ap-specific-configs/ap-specific-config={ap_mac}"
-    radio_interfaces = [r for r in ap_interfaces if r.name.startswith("radio")]
-    print(LEVEL_1_TEST.format(test_name="Testing radio configuration"), end="")
     try:
         restconf_result = request_session.get(url=validation_url)
 
@@ -84,89 +175,75 @@ def validate_ap_radios(request_session, ap_mac, ap_interfaces):
         wlc_radio_config = restconf_result.json()\
             ["Cisco-IOS-XE-wireless-radio-cfg:ap-specific-config"][0]\
             ["ap-specific-slot-configs"]["ap-specific-slot-config"]
+        slot_configs_by_id = index_slot_configs(wlc_radio_config)
 
     except RequestException:
-        print("FAILED - no radio config present")
+        slot_configs_by_id = None
 
-    else:
-        print()
-        for interface in radio_interfaces:
-            radio_slot_id = None
-            print(LEVEL_2_TEST.format(test_name=interface.name))
-
-            # Get the NetBox radio info
-            nb_radio_details = parse_netbox_rf_channel(interface.rf_channel.value)
-            nb_radio_details.update({"enabled": interface.enabled})
-            radio_slot_id = interface.name.replace("radio", "")
-
-            for wlc_radio in wlc_radio_config:
-                ap_slot_freq = nb_radio_details['radio_band']
-                if wlc_radio.get("slot-id", False) == int(radio_slot_id):
-                    radio_leaf_name = f"radio-params-{ap_slot_freq}ghz"
-                    wlc_radio_params = wlc_radio[radio_leaf_name]
-
-                    wlc_radio_channel = wlc_radio_params.get(
-                        "channel", WIRELESS_DEFAULTS[ap_slot_freq]["channel"]
-                    )
-                    wlc_channel_width = wlc_radio_params.get(
-                        "channel-width", WIRELESS_DEFAULTS[ap_slot_freq]["channel_width"]
-                    )
-                    wlc_tx_power = wlc_radio_params.get(
-                        "transmit-power", WIRELESS_DEFAULTS[ap_slot_freq]["tx_power"]
-                    )
-                    wlc_admin_state = wlc_radio_params.get(
-                        "admin-state", WIRELESS_DEFAULTS[ap_slot_freq]["admin_state"]
-                    )
-
-                    # DCA and DTP enabled by default...
-                    wlc_dtp_enabled = wlc_radio_params.get("dtp", True)
-                    wlc_dca_enabled = wlc_radio_params.get("dca", True)
-
-                    print(LEVEL_3_TEST.format(
-                        test_name=f"Channel {nb_radio_details['channel']}"), end=""
-                    )
-                    if int(nb_radio_details.get("channel", 999)) == int(wlc_radio_channel):
-                        print("OK")
-                    else:
-                        print(f"Configured: {wlc_radio_channel}. FAILED")
-
-                    print(LEVEL_3_TEST.format(
-                        test_name=f"Channel width {nb_radio_details['channel_width']}"), end=""
-                    )
-                    if int(nb_radio_details.get("channel_width", 20)) == int(wlc_channel_width):
-                        print("OK")
-                    else:
-                        print(f"Configured: {wlc_channel_width}. FAILED")
-
-                    print(LEVEL_3_TEST.format(
-                        test_name=f"TX Power {interface.tx_power}"), end=""
-                    )
-                    if int(interface.tx_power) == int(wlc_tx_power):
-                        print("OK")
-                    else:
-                        print(f"Configured: {wlc_tx_power}. FAILED")
-
-                    print(LEVEL_3_TEST.format(
-                        test_name="DCA Disabled"), end=""
-                    )
-                    if not wlc_dca_enabled:
-                        print("OK")
-                    else:
-                        print("FAILED")
-
-                    print(LEVEL_3_TEST.format(
-                        test_name="DTP Disabled"), end=""
-                    )
-                    if not wlc_dtp_enabled:
-                        print("OK")
-                    else:
-                        print("FAILED")
-
-                    print(LEVEL_3_TEST.format(
-                        test_name="Admin state"), end=""
-                    )
-                    if nb_radio_details.get("enabled", True) is wlc_admin_state:
-                        print("OK")
-                    else:
-                        print("FAILED")
-                    break
+    return report_ap_radios(wlc_name=wlc_name, ap_name=ap_name, ap_mac=ap_mac,
+                            ap_radios=ap_radios, slot_configs_by_id=slot_configs_by_id)
+
+
+def _fetch_wlc_ap_list(request_session, container, list_name):
+    """
+    Read a whole WLC AP config list with one request.  An empty list is not
+    present at all and reads as a 404.
+    """
+    try:
+        restconf_result = request_session.get(url=f"{BASE_NODE}/{container}")
+    except HTTPError as err:
+        if err.response is not None and err.response.status_code == 404:
+            return []
+        raise
+    return restconf_result.json()\
+        .get(f"Cisco-IOS-XE-wireless-radio-cfg:{container}", {}).get(list_name, [])
+
+
+@profile_phase("validate")
+def fetch_wlc_ap_configs(request_session):
+    """
+    Read the AP name and radio configuration of every AP on a WLC, with one
+    request per config list instead of two per AP.
+
+    :param request_session: Request session reference to RESTCONF endpoint
+    :return: Tuple of (dict of AP MAC to ap-spec-config dict, dict of AP MAC
+        to dict of slot ID to slot config dict), keyed by normalized MAC
+    :raises RequestException: If a list cannot be read
+    """
+    return (index_by_ap_mac(_fetch_wlc_ap_list(request_session, "ap-spec-configs",
+                                               "ap-spec-config"),
+                            "ap-eth-mac-addr"),
+            index_ap_specific_configs(_fetch_wlc_ap_list(request_session, "ap-specific-configs",
+                                                         "ap-specific-config")))
+
+
+def print_validation_summary(results):
+    """
+    Print the fleet-wide totals of a set of check results.
+
+    :param results: List of CheckResult
+    :return: None
+    """
+    flush_events()
+    fleet_totals = summarize_results(results)["fleet"]
+    print(f"Checks: {fleet_totals['checks']}  Passed: {fleet_totals['passed']}  "
+          f"Failed: {fleet_totals['failed']}  "
+          f"APs failed: {fleet_totals['access_points_failed']}/{fleet_totals['access_points']}  "
+          f"WLCs failed: {fleet_totals['wlcs_failed']}/{fleet_totals['wlcs']}")
+
+
+def write_validation_reports(results, json_report=None, junit_report=None):
+    """
+    Write the requested JSON and/or JUnit-XML reports of the check results.
+
+    :param results: List of CheckResult
+    :param json_report: JSON report file path, or None to skip
+    :param junit_report: JUnit-XML report file path, or None to skip
+    :return: None
+    """
+    if json_report:
+        write_json_report(results, json_report)
+        print(f"JSON report written to {json_report}")
+    if junit_report:
+        write_junit_report(results, junit_report)
+        print(f"JUnit-XML report written to {junit_report}")
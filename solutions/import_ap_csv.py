@@ -1,15 +1,19 @@
 """
 Import a CSV file into NetBox for Wireless Devices.
 """
-import csv
 import argparse
 import os
 import pathlib
+import sys
 from dotenv import dotenv_values
 import pynetbox
-from helpers import (generate_device_details,
-                     update_interfaces,
-                     create_or_update_device)
+from helpers import (FingerprintStore,
+                     default_store_file,
+                     import_csv_file,
+                     preflight_csv_file,
+                     print_preflight_report,
+                     add_profile_arguments,
+                     start_profiling_from_args)
 
 # Read the environment variables created by the "prepare_lab.sh" script
 SCRIPT_PATH = pathlib.PurePath(os.path.dirname(os.path.abspath(__file__)))
@@ -36,43 +40,79 @@ if __name__ == "__main__":
         dest="csv_file",
         default="netbox-import.csv",
         action="store",
-        help="CSV file to import.  Default: netbox-import.csv",
+        help="CSV, JSON Lines, Parquet, or Arrow file to import.  "
+             "Default: netbox-import.csv",
+    )
+    parser.add_argument(
+        "--input-format",
+        dest="input_format",
+        choices=("csv", "jsonl", "parquet", "arrow"),
+        help="Input file format.  Default: from the file extension, csv if unknown",
+    )
+    parser.add_argument(
+        "--skip-preflight",
+        dest="skip_preflight",
+        action="store_true",
+        help="Import without validating the whole CSV file first",
+    )
+    parser.add_argument(
+        "--preflight-only",
+        dest="preflight_only",
+        action="store_true",
+        help="Only validate the CSV file; do not import it",
+    )
+    parser.add_argument(
+        "--transform-workers",
+        dest="transform_workers",
+        type=int,
+        help="Processes transforming CSV rows to NetBox payloads.  Default: one per CPU",
     )
 
+    parser.add_argument(
+        "--full-import",
+        dest="full_import",
+        action="store_true",
+        help="Import every row, including rows unchanged since the last import",
+    )
+    parser.add_argument(
+        "--fingerprint-file",
+        dest="fingerprint_file",
+        help="Fingerprints of the imported rows.  Default: a file per NetBox and pod "
+             "under ~/.cache/devwks-2275/fingerprints",
+    )
+
+    add_profile_arguments(parser)
     script_args = parser.parse_known_args()[0]
+    start_profiling_from_args(script_args, "import")
 
     # Set the CSV file to open based on the --csv-file parameter or its default
     csv_file = script_args.csv_file
 
     try:
-        with open(csv_file, "r", encoding="utf-8-sig") as csvfile:
-            reader = csv.DictReader(csvfile)
-
-            print("*" * 78)
-            for row in reader:
-                # Uncomment the following lines if more detail is desired:
-                # print("Reading CSV row:")
-                # for column_heading, column_value in row.items():
-                #     print(f"{column_heading} = {column_value}")
-                # print()
-
-                # Generate the expected payload dictionary based on the CSV row
-                device_detail = generate_device_details(netbox_api=netbox,
-                                                        csv_row=row,
-                                                        workshop_pod_number=POD_NUMBER)
-
-                # Create or update with the generated device details
-                current_device = create_or_update_device(netbox_api=netbox,
-                                                         device_detail_dict=device_detail)
-                if current_device is not None:
-                    # The device was created or updated, now update the
-                    # interface details.
-                    print("\t\tUpdating interfaces for this device...")
-                    update_interfaces(netbox_api=netbox,
-                                      device_object=current_device,
-                                      csv_row=row)
+        # Validate the whole file before the first device is touched, and
+        # reuse the WLC IDs looked up by the pre-flight check for the import
+        wlc_ids = None
+        if not script_args.skip_preflight:
+            preflight_report = preflight_csv_file(netbox_api=netbox, csv_file=csv_file,
+                                                  file_format=script_args.input_format)
+            print_preflight_report(preflight_report)
+            if preflight_report.errors:
+                sys.exit("Pre-flight check failed, nothing was imported.")
+            wlc_ids = preflight_report.wlc_ids
 
-                print("*" * 78)
+        if not script_args.preflight_only:
+            import_csv_file(netbox_api=netbox,
+                            csv_file=csv_file,
+                            workshop_pod_number=POD_NUMBER,
+                            wlc_ids=wlc_ids,
+                            transform_workers=script_args.transform_workers,
+                            file_format=script_args.input_format,
+                            fingerprint_store=FingerprintStore(
+                                script_args.fingerprint_file
+                                or default_store_file(NETBOX_URL, POD_NUMBER),
+                                refresh=script_args.full_import))
 
     except FileNotFoundError as err:
         print(f"Unable to open CSV file for import: {err}")
+    except ImportError as err:
+        sys.exit(str(err))
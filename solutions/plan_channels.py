@@ -0,0 +1,176 @@
+"""
+Plan the radio channels of an AP import .csv file for low co-channel
+interference, and write the planned CSV for the importer.
+
+AP neighbors come from either a positions CSV (device_name,x,y[,floor] in
+meters) or a neighbor list CSV (device_name,neighbor[,weight]).
+"""
+import argparse
+import csv
+import sys
+from helpers.profiling import add_profile_arguments, start_profiling_from_args
+from helpers.channel_planner import (DEFAULT_FLOOR_HEIGHT,
+                                     DEFAULT_INTERFERENCE_RADIUS,
+                                     build_adjacency_neighbors,
+                                     build_position_neighbors,
+                                     plan_csv_rows)
+
+DEFAULT_CSV_FILE = "netbox-import.csv"
+
+
+def read_positions_file(positions_file):
+    """
+    Read AP positions from a CSV file with device_name, x, y, and optional
+    floor columns.
+
+    :param positions_file: Positions CSV file
+    :return: Dict of device name to (x, y) or (x, y, floor)
+    """
+    positions = {}
+    with open(positions_file, 'r', encoding='utf-8-sig') as csvfile:
+        for row in csv.DictReader(csvfile):
+            position = (float(row["x"]), float(row["y"]))
+            if row.get("floor") not in (None, ""):
+                position += (float(row["floor"]),)
+            positions[row["device_name"]] = position
+    return positions
+
+
+def read_neighbors_file(neighbors_file):
+    """
+    Read neighboring AP pairs from a CSV file with device_name, neighbor,
+    and optional weight columns.
+
+    :param neighbors_file: Neighbor list CSV file
+    :return: List of (device name, neighbor name, weight) tuples
+    """
+    with open(neighbors_file, 'r', encoding='utf-8-sig') as csvfile:
+        return [(row["device_name"], row["neighbor"], row.get("weight"))
+                for row in csv.DictReader(csvfile)]
+
+
+def plan_csv_file(csv_file, output_file, positions_file=None, neighbors_file=None,
+                  radius=DEFAULT_INTERFERENCE_RADIUS, floor_height=DEFAULT_FLOOR_HEIGHT,
+                  channel_width_5ghz=20):
+    """
+    Plan the channels of an AP import CSV file and write the planned file.
+
+    :param csv_file: AP import CSV file to plan
+    :param output_file: Planned CSV output file (may be the same file)
+    :param positions_file: AP positions CSV file
+    :param neighbors_file: Neighbor list CSV file, used without positions
+    :param radius: Interference radius in meters, for positions
+    :param floor_height: Distance between floors in meters, for positions
+    :param channel_width_5ghz: Channel width for 5GHz radios
+    :return: List of per-radio plan summaries from plan_csv_rows()
+    """
+    with open(csv_file, 'r', encoding='utf-8-sig') as csvfile:
+        csv_reader = csv.DictReader(csvfile)
+        fieldnames = csv_reader.fieldnames
+        csv_rows = list(csv_reader)
+
+    device_names = [row["device_name"] for row in csv_rows]
+    if positions_file:
+        neighbors = build_position_neighbors(read_positions_file(positions_file),
+                                             radius=radius, floor_height=floor_height)
+    else:
+        neighbors = build_adjacency_neighbors(read_neighbors_file(neighbors_file),
+                                              ap_names=device_names)
+
+    # APs without a position or neighbors are still planned, without constraints
+    for device_name in device_names:
+        neighbors.setdefault(device_name, [])
+
+    plan_summary = plan_csv_rows(csv_rows, neighbors, channel_width_5ghz=channel_width_5ghz)
+
+    with open(output_file, 'w', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(csv_rows)
+
+    return plan_summary
+
+
+def print_plan_summary(plan_summary):
+    """
+    Print the result of each planned radio and band.
+
+    :param plan_summary: List of per-radio plan summaries
+    :return: None
+    """
+    print("*" * 78)
+    for plan in plan_summary:
+        width_text = f", {plan['width']}MHz" if plan["width"] else ""
+        print(f"  {plan['radio']} ({plan['band']}GHz{width_text}): "
+              f"{plan['access_points']} APs planned, "
+              f"{plan['overlapping_pairs']} overlapping neighbor pairs "
+              f"(weight {plan['overlap_weight']:.2f})")
+
+
+def add_plan_arguments(arg_parser):
+    """
+    Add the channel planning options to an argument parser.
+
+    :param arg_parser: argparse.ArgumentParser
+    :return: None
+    """
+    arg_parser.add_argument("-c", "--csv-file",
+                        dest="csv_file",
+                        default=DEFAULT_CSV_FILE,
+                        help=f"AP import CSV file to plan.  Default: {DEFAULT_CSV_FILE}")
+    arg_parser.add_argument("-o", "--output-file",
+                        dest="output_file",
+                        help="Planned CSV output file.  Default: overwrite the CSV file")
+    neighbor_source = arg_parser.add_mutually_exclusive_group(required=True)
+    neighbor_source.add_argument("--positions",
+                                 dest="positions_file",
+                                 help="CSV file of AP positions: device_name,x,y[,floor]")
+    neighbor_source.add_argument("--neighbors",
+                                 dest="neighbors_file",
+                                 help="CSV file of AP neighbors: device_name,neighbor[,weight]")
+    arg_parser.add_argument("--radius",
+                        default=DEFAULT_INTERFERENCE_RADIUS,
+                        type=float,
+                        help="Interference radius in meters.  "
+                             f"Default: {DEFAULT_INTERFERENCE_RADIUS}")
+    arg_parser.add_argument("--floor-height",
+                        dest="floor_height",
+                        default=DEFAULT_FLOOR_HEIGHT,
+                        type=float,
+                        help=f"Distance between floors in meters.  Default: {DEFAULT_FLOOR_HEIGHT}")
+    arg_parser.add_argument("--width-5ghz",
+                        dest="channel_width_5ghz",
+                        default=20,
+                        type=int,
+                        help="Channel width for 5GHz radios.  Default: 20")
+
+
+def run_plan(script_args):
+    """
+    Plan a CSV file from parsed command line arguments and print the summary.
+
+    :param script_args: Parsed arguments from add_plan_arguments()
+    :return: None
+    """
+    try:
+        plan_summary = plan_csv_file(csv_file=script_args.csv_file,
+                                     output_file=script_args.output_file or script_args.csv_file,
+                                     positions_file=script_args.positions_file,
+                                     neighbors_file=script_args.neighbors_file,
+                                     radius=script_args.radius,
+                                     floor_height=script_args.floor_height,
+                                     channel_width_5ghz=script_args.channel_width_5ghz)
+    except (FileNotFoundError, KeyError, ValueError) as err:
+        sys.exit(f"Unable to plan channels: {err}")
+    print_plan_summary(plan_summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plan AP radio channels for low co-channel interference",
+    )
+    add_plan_arguments(parser)
+    add_profile_arguments(parser)
+    plan_args = parser.parse_known_args()[0]
+    start_profiling_from_args(plan_args, "plan")
+    run_plan(plan_args)
@@ -0,0 +1,26 @@
+"""
+Configure or test the access points of several workshop pods in one run.
+
+All pods share a single NetBox client, WLC resolver, and WLC session pool, and
+are processed concurrently up to a global concurrency limit.
+
+This is the "configure" and "test" subcommand of workshop.py under its
+original name; every option of the subcommand is accepted:
+
+    run_pods.py test -p 1-40 --junit-report results.xml
+"""
+import argparse
+from workshop import main
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Configure or test the APs of multiple workshop pods.  Other "
+                    "options are those of 'workshop.py configure' / 'workshop.py test'",
+    )
+    parser.add_argument("action",
+                        choices=("configure", "test"),
+                        help="Action to run for each pod")
+    script_args, workshop_args = parser.parse_known_args()
+
+    main([script_args.action] + workshop_args)
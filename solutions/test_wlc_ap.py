@@ -2,15 +2,22 @@
 Example script to read wireless access points from NetBox and test the
 WLC configuration
 """
+import argparse
 import os
 import pathlib
 import sys
 from dotenv import dotenv_values
 import pynetbox
-from helpers import (create_request_session,
-                     get_ap_wlc_associations,
-                     validate_ap_name,
-                     validate_ap_radios)
+from helpers import (RequestSessionPool,
+                     WlcResolver,
+                     create_netbox_api,
+                     test_pod,
+                     print_validation_summary,
+                     print_read_cache_summary,
+                     RestconfReadCache,
+                     write_validation_reports,
+                     add_profile_arguments,
+                     start_profiling_from_args)
 
 # Read the environment variables created by the "prepare_lab.sh" script
 SCRIPT_PATH = pathlib.PurePath(os.path.dirname(os.path.abspath(__file__)))
@@ -25,52 +32,56 @@ NETBOX_URL = WORKSHOP_ENV["NETBOX_URL"]
 # Set the NetBox token to the environment variable created during setup.
 NETBOX_TOKEN = WORKSHOP_ENV["NETBOX_TOKEN"]
 
-# Initialize the pynetbox API object
-netbox = pynetbox.api(url=NETBOX_URL, token=NETBOX_TOKEN)
-
 # Collect WLC username and password from environment
 WLC_USERNAME = WORKSHOP_ENV["WLC_USERNAME"]
 WLC_PASSWORD = WORKSHOP_ENV["WLC_PASSWORD"]
 
-# Initialize the pynetbox API object
+# Initialize the pynetbox API object; list pages are fetched concurrently
 try:
-    netbox = pynetbox.api(url=NETBOX_URL, token=NETBOX_TOKEN)
+    netbox = create_netbox_api(url=NETBOX_URL, token=NETBOX_TOKEN)
 except pynetbox.RequestError:
     sys.exit("Unable to connect to NetBox.  Terminating.")
 
 if __name__ == "__main__":
-    try:
-        access_points = netbox.dcim.devices.filter(role="ap",
-                                                   cf_workshop_pod_number=POD_NUMBER)
-    except pynetbox.RequestError:
-        print("NetBox error happened when trying to query APs. Terminating.")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json-report",
+                        dest="json_report",
+                        help="Write the test results to a JSON report file")
+    parser.add_argument("--junit-report",
+                        dest="junit_report",
+                        help="Write the test results to a JUnit-XML report file")
+    parser.add_argument("--stream",
+                        action="store_true",
+                        help="Test the APs page by page as they are read from NetBox "
+                             "instead of reading the whole pod first")
+    parser.add_argument("--no-read-cache",
+                        action="store_true",
+                        dest="no_read_cache",
+                        help="Download the WLC configuration again instead of revalidating "
+                             "the cached copy")
+    add_profile_arguments(parser)
+    script_args = parser.parse_known_args()[0]
+    start_profiling_from_args(script_args, "test")
 
     print("*" * 78)
 
-    if len(access_points) == 0:
-        print("FAILED: No access points have been defined in NetBox - nothing to test!\n")
-    else:
-        for ap in access_points:
-            print(f"Testing AP {ap.name} association to WLC... ")
-            ap_interfaces = netbox.dcim.interfaces.filter(device_id=ap.id)
-            ap_mgmt_interface = netbox.dcim.interfaces.get(device_id=ap.id, mgmt_only=True)
-            ap_mgmt_mac = ap_mgmt_interface.mac_address
-
-            wlc_associations = get_ap_wlc_associations(netbox_api=netbox,
-                                                       netbox_ap_object=ap)
-
-            for wlc in wlc_associations:
-                wlc_session = create_request_session(host=wlc["wlc_dns"],
-                                                     username=WLC_USERNAME,
-                                                     password=WLC_PASSWORD)
-
-                print(f"    Testing WLC '{wlc['wlc_name']}'... ")
-                validate_ap_name(request_session=wlc_session,
-                                 ap_name=ap.name,
-                                 ap_mac=ap_mgmt_mac)
+    # Revalidate the WLC data of earlier runs instead of downloading it again
+    read_cache = None if script_args.no_read_cache else RestconfReadCache()
+    try:
+        pod_outcome = test_pod(netbox_api=netbox,
+                               pod_number=POD_NUMBER,
+                               wlc_resolver=WlcResolver(netbox),
+                               session_pool=RequestSessionPool(username=WLC_USERNAME,
+                                                               password=WLC_PASSWORD,
+                                                               read_cache=read_cache),
+                               stream=script_args.stream)
+    except pynetbox.RequestError:
+        sys.exit("NetBox error happened when trying to query APs. Terminating.")
 
-                validate_ap_radios(request_session=wlc_session,
-                                   ap_mac=ap_mgmt_mac,
-                                   ap_interfaces=ap_interfaces)
+    if read_cache is not None:
+        print_read_cache_summary(read_cache)
 
-            print("*" * 78)
+    print_validation_summary(pod_outcome["results"])
+    write_validation_reports(pod_outcome["results"],
+                             json_report=script_args.json_report,
+                             junit_report=script_args.junit_report)
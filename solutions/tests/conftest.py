@@ -0,0 +1,11 @@
+"""
+Make the workshop scripts and the helpers package importable from the tests,
+as they are when the scripts run from the solutions directory.
+"""
+import os
+import sys
+
+SOLUTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if SOLUTIONS_DIR not in sys.path:
+    sys.path.insert(0, SOLUTIONS_DIR)
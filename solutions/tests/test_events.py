@@ -0,0 +1,34 @@
+"""
+Event log text output.
+"""
+import io
+import time
+from helpers.events import EventLog, TextSink
+
+
+def test_unbuffered_text_is_written_at_once():
+    stream = io.StringIO()
+    EventLog([TextSink(stream=stream)]).emit("ap.start", text="Processing AP ap1...")
+    assert stream.getvalue() == "Processing AP ap1...\n"
+
+
+def test_buffered_text_is_written_after_flush_interval():
+    stream = io.StringIO()
+    event_log = EventLog([TextSink(stream=stream, buffer_size=64 * 1024, flush_interval=0.05)])
+    event_log.emit("ap.start", text="Processing AP ap1...")
+    assert stream.getvalue() == ""
+
+    # Nothing else is emitted, as while waiting for APs to converge
+    deadline = time.monotonic() + 5
+    while not stream.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stream.getvalue() == "Processing AP ap1...\n"
+
+
+def test_flush_writes_buffered_text_once():
+    stream = io.StringIO()
+    event_log = EventLog([TextSink(stream=stream, buffer_size=64 * 1024, flush_interval=0.05)])
+    event_log.emit("ap.start", text="Processing AP ap1...")
+    event_log.flush()
+    time.sleep(0.1)
+    assert stream.getvalue() == "Processing AP ap1...\n"
@@ -0,0 +1,32 @@
+"""
+The helpers package exports: the lazy exports must resolve, and the
+TYPE_CHECKING imports static tools read must list the same names.
+"""
+import ast
+import os
+import pytest
+import helpers
+from conftest import SOLUTIONS_DIR
+
+
+def type_checking_imports():
+    """
+    :return: Dict of exported name to helper module, from the TYPE_CHECKING
+        block of helpers/__init__.py
+    """
+    with open(os.path.join(SOLUTIONS_DIR, "helpers", "__init__.py"), encoding="utf-8") as init:
+        module = ast.parse(init.read())
+    type_checking = next(node for node in module.body if isinstance(node, ast.If)
+                         and getattr(node.test, "id", None) == "TYPE_CHECKING")
+    return {alias.name: node.module for node in type_checking.body
+            for alias in node.names}
+
+
+def test_type_checking_imports_match_lazy_exports():
+    # pylint: disable=protected-access
+    assert type_checking_imports() == helpers._LAZY_EXPORTS
+
+
+@pytest.mark.parametrize("name", helpers.__all__)
+def test_export_resolves(name):
+    assert getattr(helpers, name) is not None
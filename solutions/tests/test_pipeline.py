@@ -0,0 +1,38 @@
+"""
+Streaming provisioning from NetBox pages to per-WLC push queues.
+"""
+from helpers import pipeline
+from helpers.inventory import AccessPoint, WirelessController
+
+WLC = WirelessController(id=1, name="wlc1", dns_name="wlc1.example")
+
+
+class FakeWlcResolver:
+    """
+    Resolves WLC 1; WLC 2 has no primary IP in NetBox.
+    """
+    def resolve(self, netbox_wlc_id):
+        if netbox_wlc_id != WLC.id:
+            raise ValueError("WLC 'wlc2' has no primary IPv4 address in NetBox")
+        return WLC
+
+
+def test_unresolvable_wlc_fails_only_its_ap(monkeypatch):
+    access_points = [AccessPoint(id=1, name="ap1", mac="00:11:22:33:44:01", radios=(),
+                                 wlc_ids=(1,)),
+                     AccessPoint(id=2, name="ap2", mac="00:11:22:33:44:02", radios=(),
+                                 wlc_ids=(2,)),
+                     AccessPoint(id=3, name="ap3", mac="00:11:22:33:44:03", radios=(),
+                                 wlc_ids=(1,))]
+    pushed = []
+    monkeypatch.setattr(pipeline, "iter_pod_inventory",
+                        lambda *args, **kwargs: iter([access_points]))
+    monkeypatch.setattr(pipeline, "provision_ap_on_pooled_wlc",
+                        lambda session_pool, ap, **kwargs: pushed.append(ap.name) or True)
+
+    outcome = pipeline.configure_pod_streaming(netbox_api=None, pod_number=1,
+                                               wlc_resolver=FakeWlcResolver(),
+                                               session_pool=None)
+
+    assert (outcome["access_points"], outcome["failed"]) == (3, 1)
+    assert sorted(pushed) == ["ap1", "ap3"]
@@ -0,0 +1,54 @@
+"""
+Batched reconcile deletes and the fallback for WLCs without YANG Patch.
+"""
+from types import SimpleNamespace
+import pytest
+from requests import HTTPError
+from helpers.reconcile import RECONCILE_TABLES, delete_entries
+
+WLC_KEYS = ["00:11:22:33:44:01", "00:11:22:33:44:02", "00:11:22:33:44:03"]
+
+
+class FakeWlcSession:
+    """
+    Answers YANG Patch requests with a fixed status and accepts DELETEs.
+    """
+    def __init__(self, patch_status=None):
+        self.patch_status = patch_status
+        self.patches = 0
+        self.deletes = 0
+        self.yang_patch_supported = True
+
+    def patch(self, url, json, headers):  # pylint: disable=unused-argument,redefined-outer-name
+        self.patches += 1
+        if self.patch_status:
+            raise HTTPError(response=SimpleNamespace(status_code=self.patch_status))
+
+    def delete(self, url):  # pylint: disable=unused-argument
+        self.deletes += 1
+
+
+def test_yang_patch_deletes_in_batches():
+    wlc_session = FakeWlcSession()
+    assert delete_entries(wlc_session, RECONCILE_TABLES[0], WLC_KEYS, batch_size=2) == (3, [])
+    assert (wlc_session.patches, wlc_session.deletes) == (2, 0)
+
+
+def test_unsupported_yang_patch_falls_back_per_session():
+    wlc_session = FakeWlcSession(patch_status=415)
+    assert delete_entries(wlc_session, RECONCILE_TABLES[0], WLC_KEYS, batch_size=2) == (3, [])
+    # The second batch skips YANG Patch on the session that rejected it
+    assert (wlc_session.patches, wlc_session.deletes) == (1, 3)
+    assert not wlc_session.yang_patch_supported
+
+    other_session = FakeWlcSession()
+    delete_entries(other_session, RECONCILE_TABLES[0], WLC_KEYS)
+    assert (other_session.patches, other_session.deletes) == (1, 0)
+
+
+def test_rejected_yang_patch_is_an_error():
+    wlc_session = FakeWlcSession(patch_status=400)
+    with pytest.raises(HTTPError):
+        delete_entries(wlc_session, RECONCILE_TABLES[0], WLC_KEYS)
+    assert wlc_session.yang_patch_supported
+    assert wlc_session.deletes == 0
@@ -0,0 +1,33 @@
+"""
+NetBox "rf_channel" values built from CSV radio settings.
+"""
+import pytest
+from helpers.rf_channel_map import get_rf_channel_value
+from helpers.transform import transform_row
+
+
+@pytest.mark.parametrize("radio, rf_channel", [
+    ({"band": "2.4", "channel": "6"}, "2.4g-6-2437-22"),
+    ({"band": "5", "channel": "36", "rf_channel_width": "20"}, "5g-36-5180-20"),
+    ({"band": "5", "channel": "36", "rf_channel_width": "40"}, "5g-38-5190-40"),
+])
+def test_rf_channel_value(radio, rf_channel):
+    assert get_rf_channel_value(radio) == rf_channel
+
+
+@pytest.mark.parametrize("radio", [
+    # Channel 165 is not part of a 40MHz channel
+    {"band": "5", "channel": "165", "rf_channel_width": "40"},
+    {"band": "5", "channel": "200", "rf_channel_width": "20"},
+])
+def test_unmapped_channel_raises_value_error(radio):
+    with pytest.raises(ValueError):
+        get_rf_channel_value(radio)
+
+
+def test_unmapped_channel_fails_only_its_row():
+    transformed = transform_row(2, {"device_name": "ap1", "radio1_band": "5",
+                                    "radio1_channel_number": "165",
+                                    "radio1_channel_width": "40"}, 1)
+    assert transformed.device_name == "ap1"
+    assert transformed.error.startswith("ValueError: Channel 165")
@@ -0,0 +1,48 @@
+"""
+Scheduled provisioning of the APs of several pods.
+"""
+import pytest
+from helpers import pod_helpers
+from helpers.events import EventLog, set_event_log
+from helpers.inventory import AccessPoint
+
+
+class RecordingSink:
+    """
+    Keeps every event.
+    """
+    def __init__(self):
+        self.events = []
+
+    def write(self, event, text):  # pylint: disable=unused-argument
+        self.events.append(event)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(name="events")
+def fixture_events():
+    sink = RecordingSink()
+    previous_log = set_event_log(EventLog([sink]))
+    yield sink.events
+    set_event_log(previous_log)
+
+
+def test_aps_without_mac_are_reported_and_fail_their_pod(monkeypatch, events):
+    access_points = [AccessPoint(id=1, name="ap1", mac=None, radios=(), wlc_ids=(1,)),
+                     AccessPoint(id=2, name="ap2", mac=None, radios=(), wlc_ids=(1,))]
+    monkeypatch.setattr(pod_helpers, "load_pod_inventory", lambda *args: access_points)
+
+    pod_results, stats = pod_helpers.configure_pods_scheduled(
+        netbox_api=None, pod_numbers=[1], wlc_resolver=None, session_pool=None)
+
+    assert stats.tasks == 0
+    assert (pod_results[0]["access_points"], pod_results[0]["failed"]) == (2, 2)
+    assert pod_results[0]["status"] == "FAILED"
+    assert [(event["event"], event["ap"]) for event in events
+            if event.get("status") == "FAILED" or event.get("level") == "error"] == [
+        ("ap.error", "ap1"), ("ap.done", "ap1"), ("ap.error", "ap2"), ("ap.done", "ap2")]
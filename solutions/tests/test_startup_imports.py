@@ -0,0 +1,84 @@
+"""
+Startup import checks for workshop.py.
+
+Every check runs in a fresh interpreter, so modules imported by the test
+run itself do not hide an eager import.  "--help" must not import any
+heavy dependency, and each subcommand may only import the heavy modules it
+actually uses.
+"""
+import json
+import subprocess
+import sys
+import pytest
+from conftest import SOLUTIONS_DIR
+from workshop import SUBCOMMAND_IMPORTS
+
+HEAVY_MODULES = ("pynetbox", "numpy", "pyarrow", "jinja2")
+
+# Heavy modules each subcommand needs; anything else is an eager import
+ALLOWED_HEAVY_MODULES = {
+    "generate": set(),
+    "plan": set(),
+    "import": {"pynetbox"},
+    "export": {"pynetbox"},
+    "configure": {"pynetbox", "jinja2"},
+    "test": {"pynetbox", "jinja2"},
+    "reconcile": {"pynetbox", "jinja2"},
+    "sync": {"pynetbox", "jinja2"},
+    "telemetry": {"pynetbox"},
+    "capabilities": {"pynetbox"},
+    "analytics": {"pynetbox", "numpy"},
+    "daemon": {"pynetbox", "jinja2"},
+}
+
+# Runs workshop.py with the given arguments and reports the heavy modules
+# imported by the time it exits
+RUN_WORKSHOP = """
+import runpy, sys, json
+sys.argv = ["workshop.py"] + {argv!r}
+try:
+    runpy.run_path("workshop.py", run_name="__main__")
+except SystemExit:
+    pass
+sys.stdout = sys.__stdout__
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+IMPORT_MODULES = """
+import sys, json
+import {modules}
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+
+def heavy_modules_imported(code):
+    """
+    :param code: Python code printing a JSON list as its last output line
+    :return: Set of the heavy modules the code reported
+    """
+    result = subprocess.run([sys.executable, "-c", code], cwd=SOLUTIONS_DIR,
+                            capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def test_every_subcommand_has_an_allowance():
+    assert set(ALLOWED_HEAVY_MODULES) == set(SUBCOMMAND_IMPORTS)
+
+
+def test_help_imports_no_heavy_module():
+    assert heavy_modules_imported(RUN_WORKSHOP.format(argv=["--help"],
+                                                      heavy=HEAVY_MODULES)) == set()
+
+
+@pytest.mark.parametrize("subcommand", sorted(SUBCOMMAND_IMPORTS))
+def test_subcommand_help_imports_no_heavy_module(subcommand):
+    assert heavy_modules_imported(RUN_WORKSHOP.format(argv=[subcommand, "--help"],
+                                                      heavy=HEAVY_MODULES)) == set()
+
+
+@pytest.mark.parametrize("subcommand", sorted(SUBCOMMAND_IMPORTS))
+def test_subcommand_imports_only_needed_heavy_modules(subcommand):
+    imported = heavy_modules_imported(IMPORT_MODULES.format(
+        modules=SUBCOMMAND_IMPORTS[subcommand], heavy=HEAVY_MODULES))
+    assert imported <= ALLOWED_HEAVY_MODULES[subcommand], \
+        f"'{subcommand}' eagerly imports {sorted(imported - ALLOWED_HEAVY_MODULES[subcommand])}"
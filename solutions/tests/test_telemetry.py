@@ -0,0 +1,114 @@
+"""
+Telemetry collector, simulator, and index tests.  The collector listens on a
+free local port and the simulator pushes snapshots to it over TCP, as a WLC
+(or telemetry gateway) would.
+"""
+import pytest
+from helpers.inventory import AccessPoint, ApRadio
+from helpers.telemetry import (TelemetryCollector, TelemetryIndex, TelemetrySimulator,
+                               evaluate_telemetry, simulated_oper_data)
+
+WAIT_TIMEOUT = 5.0
+
+
+def make_access_point(number):
+    """
+    :param number: AP number, unique per test
+    :return: AccessPoint record with a 2.4 GHz and a 5 GHz radio
+    """
+    return AccessPoint(id=number,
+                       name=f"pod1-ap{number:03d}",
+                       mac=f"00:11:22:33:44:{number:02x}",
+                       radios=(ApRadio(name="radio0", slot_id=0, radio_band="24", channel=6,
+                                       channel_width=20, tx_power=3, enabled=True),
+                               ApRadio(name="radio1", slot_id=1, radio_band="5", channel=36,
+                                       channel_width=40, tx_power=4, enabled=True)),
+                       wlc_ids=(100,))
+
+
+@pytest.fixture(name="access_points")
+def fixture_access_points():
+    return [make_access_point(number) for number in range(1, 6)]
+
+
+@pytest.fixture(name="collector")
+def fixture_collector():
+    collector = TelemetryCollector(port=0)
+    collector.start()
+    yield collector
+    collector.stop()
+
+
+def run_simulator(collector, access_points, drift):
+    """
+    Push snapshots until the collector has every AP, then stop.
+
+    :return: Set of the AP MACs never reported
+    """
+    simulator = TelemetrySimulator(collector.server_address[:2], "wlc-1", access_points,
+                                   interval=0.05, drift=drift, seed=1)
+    simulator.start()
+    try:
+        return collector.index.wait_for((ap.mac for ap in access_points), WAIT_TIMEOUT)
+    finally:
+        simulator.stop()
+
+
+def failed_checks(results):
+    return {(result.ap_name, result.radio, result.check)
+            for result in results if not result.passed}
+
+
+def test_collector_receives_simulated_snapshots(collector, access_points):
+    assert run_simulator(collector, access_points, drift=0.0) == set()
+    assert len(collector.index) == len(access_points)
+    assert collector.index.get(access_points[0].mac).wlc_name == "wlc-1"
+    assert failed_checks(evaluate_telemetry(access_points, collector.index)) == set()
+
+
+def test_drifted_tx_power_fails_validation(collector, access_points):
+    assert run_simulator(collector, access_points, drift=1.0) == set()
+    assert failed_checks(evaluate_telemetry(access_points, collector.index)) == {
+        (ap.name, radio.name, "tx_power") for ap in access_points for radio in ap.radios}
+
+
+def test_unreported_ap_fails_join_check(collector, access_points):
+    assert run_simulator(collector, access_points[:-1], drift=0.0) == set()
+    missing_ap = access_points[-1]
+    assert collector.index.wait_for([missing_ap.mac], 0.1) == {missing_ap.mac}
+    results = evaluate_telemetry(access_points, collector.index, wlc_names={100: "wlc-1"})
+    assert failed_checks(results) == {(missing_ap.name, None, "ap_joined")}
+    assert [result.wlc_name for result in results if not result.passed] == ["wlc-1"]
+
+
+def test_snapshot_replaces_previous_state_of_wlc(access_points):
+    index = TelemetryIndex()
+    index.update("wlc-1", simulated_oper_data(access_points))
+    index.update("wlc-1", simulated_oper_data(access_points, drift=1.0))
+    assert len(index) == len(access_points)
+    assert failed_checks(evaluate_telemetry(access_points, index)) == {
+        (ap.name, radio.name, "tx_power") for ap in access_points for radio in ap.radios}
+
+
+def test_snapshot_drops_aps_no_longer_reported(access_points):
+    index = TelemetryIndex()
+    index.update("wlc-1", simulated_oper_data(access_points))
+    index.update("wlc-2", simulated_oper_data(access_points[-1:]))
+    index.update("wlc-1", simulated_oper_data(access_points[1:-1]))
+
+    assert index.get(access_points[0].mac) is None
+    assert index.get(access_points[1].mac).wlc_name == "wlc-1"
+    # The AP moved to another WLC; a snapshot of the old WLC must not drop it
+    assert index.get(access_points[-1].mac).wlc_name == "wlc-2"
+    assert len(index) == len(access_points) - 1
+
+
+def test_max_age_ignores_stale_state(access_points):
+    now = [0.0]
+    index = TelemetryIndex(clock=lambda: now[0])
+    index.update("wlc-1", simulated_oper_data(access_points))
+    now[0] = 30.0
+    assert index.get(access_points[0].mac, max_age=60) is not None
+    assert index.get(access_points[0].mac, max_age=10) is None
+    assert failed_checks(evaluate_telemetry(access_points, index, max_age=10)) == {
+        (ap.name, None, "ap_joined") for ap in access_points}
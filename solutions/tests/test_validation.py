@@ -0,0 +1,104 @@
+"""
+Validation checks, and test_pod validating APs against WLC configuration
+read in bulk.
+"""
+from types import SimpleNamespace
+import pytest
+from requests import HTTPError
+from helpers import pod_helpers
+from helpers.inventory import AccessPoint, ApRadio, WirelessController
+from helpers.validation import evaluate_ap_radios
+
+RADIOS = (ApRadio(name="radio0", slot_id=0, radio_band="24", channel=6, channel_width=22,
+                  tx_power=3, enabled=True),
+          ApRadio(name="radio1", slot_id=1, radio_band="5", channel=36, channel_width=20,
+                  tx_power=4, enabled=True))
+
+
+def slot_config(radio):
+    return {"slot-id": radio.slot_id,
+            f"radio-params-{radio.radio_band}ghz": {
+                "channel": radio.channel, "channel-width": radio.channel_width,
+                "transmit-power": radio.tx_power, "dca": False, "dtp": False,
+                "admin-state": radio.enabled}}
+
+
+class FakeWlcSession:
+    """
+    Answers the bulk AP config reads of test_pod and counts them.
+    """
+    def __init__(self, access_points):
+        self.urls = []
+        self.tables = {
+            "ap-spec-configs": {"ap-spec-config": [
+                {"ap-eth-mac-addr": ap.mac.upper(), "ap-host-name": ap.name}
+                for ap in access_points]},
+            "ap-specific-configs": {"ap-specific-config": [
+                {"ap-ethernet-mac-addr": ap.mac,
+                 "ap-specific-slot-configs": {"ap-specific-slot-config": [
+                     slot_config(radio) for radio in ap.radios]}}
+                for ap in access_points]},
+        }
+
+    def get(self, url):
+        self.urls.append(url)
+        table = url.rsplit("/", 1)[-1]
+        if not self.tables[table]:
+            raise HTTPError(response=SimpleNamespace(status_code=404))
+        return SimpleNamespace(json=lambda: {
+            f"Cisco-IOS-XE-wireless-radio-cfg:{table}": self.tables[table]})
+
+
+class FakeSessionPool:
+    def __init__(self, wlc_session):
+        self.wlc_session = wlc_session
+
+    def skip_reason(self, host):  # pylint: disable=unused-argument
+        return None
+
+    def get(self, host):  # pylint: disable=unused-argument
+        return self.wlc_session
+
+
+class FakeWlcResolver:
+    def resolve(self, netbox_wlc_id):
+        return WirelessController(id=netbox_wlc_id, name="wlc-1", dns_name="wlc-1.lab")
+
+
+@pytest.fixture(name="access_points")
+def fixture_access_points():
+    return [AccessPoint(id=number, name=f"pod1-ap{number:03d}",
+                        mac=f"00:11:22:33:44:{number:02x}", radios=RADIOS, wlc_ids=(100,))
+            for number in range(1, 21)]
+
+
+def run_test_pod(monkeypatch, access_points, wlc_session):
+    monkeypatch.setattr(pod_helpers, "load_pod_inventory",
+                        lambda netbox_api, pod_number: access_points)
+    return pod_helpers.test_pod(netbox_api=None, pod_number=1,
+                                wlc_resolver=FakeWlcResolver(),
+                                session_pool=FakeSessionPool(wlc_session))
+
+
+def test_missing_slot_fails_radio_config():
+    results = evaluate_ap_radios("wlc-1", "ap1", "00:11:22:33:44:55", RADIOS,
+                                 {0: slot_config(RADIOS[0])})
+    assert [(result.radio, result.check) for result in results if not result.passed] == [
+        ("radio1", "radio_config")]
+
+
+def test_test_pod_reads_each_wlc_once(monkeypatch, access_points):
+    wlc_session = FakeWlcSession(access_points[:-1])
+    outcome = run_test_pod(monkeypatch, access_points, wlc_session)
+
+    assert len(wlc_session.urls) == 2
+    assert outcome["access_points"] == len(access_points)
+    assert outcome["failed"] == 1
+    assert {(result.ap_name, result.check) for result in outcome["results"]
+            if not result.passed} == {(access_points[-1].name, "ap_name"),
+                                      (access_points[-1].name, "radio_config")}
+
+
+def test_test_pod_empty_wlc(monkeypatch, access_points):
+    outcome = run_test_pod(monkeypatch, access_points, FakeWlcSession([]))
+    assert outcome["failed"] == len(access_points)
@@ -0,0 +1,119 @@
+"""
+WLC provisioning and validation helpers called the way the workshop
+exercises call them: with the AP's pynetbox interface Records.
+"""
+import json
+from types import SimpleNamespace
+import pytest
+from conftest import SOLUTIONS_DIR
+from helpers import pod_helpers
+from helpers.inventory import AccessPoint, ApRadio
+from helpers.wlc_helpers import provision_ap_radios, provision_aps_batched
+from helpers.wlc_test_helpers import validate_ap_radios
+
+AP_MAC = "00:11:22:33:44:55"
+
+
+class FakeWlcSession:
+    """
+    Stores the slot configs PATCHed to it and returns them on GET.
+    """
+    def __init__(self):
+        self.slot_configs = []
+
+    def patch(self, url, data):  # pylint: disable=unused-argument
+        ap_config = json.loads(data)["Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data"][
+            "ap-specific-configs"]["ap-specific-config"][0]
+        self.slot_configs.extend(ap_config["ap-specific-slot-configs"]["ap-specific-slot-config"])
+        return SimpleNamespace(ok=True)
+
+    def get(self, url):  # pylint: disable=unused-argument
+        return SimpleNamespace(ok=True, json=lambda: {
+            "Cisco-IOS-XE-wireless-radio-cfg:ap-specific-config": [
+                {"ap-specific-slot-configs": {"ap-specific-slot-config": self.slot_configs}}]})
+
+
+def netbox_interface(name, rf_channel=None, tx_power=None, mgmt_only=False, mac_address=None):
+    return SimpleNamespace(name=name, mgmt_only=mgmt_only, mac_address=mac_address,
+                           rf_channel=SimpleNamespace(value=rf_channel) if rf_channel else None,
+                           tx_power=tx_power, enabled=True)
+
+
+@pytest.fixture(name="ap_interfaces")
+def fixture_ap_interfaces():
+    return [netbox_interface("wired0", mgmt_only=True, mac_address=AP_MAC),
+            netbox_interface("radio0", rf_channel="2.4g-6-2437-22", tx_power=3),
+            netbox_interface("radio1", rf_channel="5g-36-5180-20", tx_power=4)]
+
+
+@pytest.fixture(autouse=True)
+def templates_dir(monkeypatch):
+    # The template loader reads "templates" relative to the working directory
+    monkeypatch.chdir(SOLUTIONS_DIR)
+
+
+def test_provision_and_validate_netbox_interfaces(ap_interfaces):
+    wlc_session = FakeWlcSession()
+    assert provision_ap_radios(request_session=wlc_session, ap_name="ap1", ap_mac=AP_MAC,
+                               ap_interfaces=ap_interfaces)
+    assert [slot_config["slot-id"] for slot_config in wlc_session.slot_configs] == [0, 1]
+
+    results = validate_ap_radios(request_session=wlc_session, ap_mac=AP_MAC,
+                                 ap_interfaces=ap_interfaces)
+    assert {result.radio for result in results} == {"radio0", "radio1"}
+    assert all(result.passed for result in results)
+
+
+def test_radio_records_and_interfaces_are_equivalent(ap_interfaces):
+    ap_radios = [ApRadio(name="radio0", slot_id=0, radio_band="24", channel=6,
+                         channel_width=22, tx_power=3, enabled=True),
+                 ApRadio(name="radio1", slot_id=1, radio_band="5", channel=36,
+                         channel_width=20, tx_power=4, enabled=True)]
+    from_records, from_interfaces = FakeWlcSession(), FakeWlcSession()
+    provision_ap_radios(from_records, "ap1", AP_MAC, ap_radios)
+    provision_ap_radios(from_interfaces, "ap1", AP_MAC, ap_interfaces)
+    assert from_records.slot_configs == from_interfaces.slot_configs
+
+
+def test_batch_payload_omits_unset_tx_power():
+    class RecordingSession:
+        def __init__(self):
+            self.payloads = []
+
+        def patch(self, url, data):  # pylint: disable=unused-argument
+            self.payloads.append(json.loads(data))
+            return SimpleNamespace(ok=True)
+
+    radios = (ApRadio(name="radio0", slot_id=0, radio_band="24", channel=6,
+                      channel_width=22, tx_power=None, enabled=True),
+              ApRadio(name="radio1", slot_id=1, radio_band="5", channel=36,
+                      channel_width=20, tx_power=4, enabled=True))
+    wlc_session = RecordingSession()
+    assert provision_aps_batched(wlc_session, [AccessPoint(id=1, name="ap1", mac=AP_MAC,
+                                                           radios=radios)], batch_size=10)
+
+    slot_configs = wlc_session.payloads[0]["Cisco-IOS-XE-wireless-radio-cfg:radio-cfg-data"][
+        "ap-specific-configs"]["ap-specific-config"][0]["ap-specific-slot-configs"][
+        "ap-specific-slot-config"]
+    assert "transmit-power" not in slot_configs[0]["radio-params-24ghz"]
+    assert slot_configs[1]["radio-params-5ghz"]["transmit-power"] == 4
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_configure_pod_batches_only_when_asked(monkeypatch, batch):
+    access_point = AccessPoint(id=1, name="ap1", mac=AP_MAC, radios=(), wlc_ids=(1,))
+    batched_calls, per_ap_calls = [], []
+    monkeypatch.setattr(pod_helpers, "load_pod_inventory", lambda *args: [access_point])
+    monkeypatch.setattr(pod_helpers, "get_ap_wlc_associations",
+                        lambda **kwargs: [{"wlc_name": "wlc1", "wlc_dns": "wlc1.example"}])
+    monkeypatch.setattr(pod_helpers, "provision_batched_wlcs",
+                        lambda *args: batched_calls.append(args) or
+                        {("wlc1.example", AP_MAC): True})
+    monkeypatch.setattr(pod_helpers, "provision_ap_on_pooled_wlc",
+                        lambda *args, **kwargs: per_ap_calls.append(args) or True)
+
+    outcome = pod_helpers.configure_pod(netbox_api=None, pod_number=1, wlc_resolver=None,
+                                        session_pool=None, capability_cache=object(),
+                                        batch=batch)
+    assert outcome["failed"] == 0
+    assert (len(batched_calls), len(per_ap_calls)) == ((1, 0) if batch else (0, 1))
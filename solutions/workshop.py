@@ -0,0 +1,983 @@
+"""
+Single command line entry point for the workshop tasks:
+
+    workshop.py generate   Create an AP import .csv file with random AP data
+    workshop.py plan       Plan the AP channels of an import .csv file
+    workshop.py import     Import a CSV file into NetBox
+    workshop.py export     Export the APs in NetBox to an import file
+    workshop.py configure  Provision the APs from NetBox on their WLCs
+    workshop.py test       Validate the WLC configuration of the APs
+    workshop.py reconcile  Provision the APs, then remove APs no longer in NetBox
+    workshop.py sync       Update NetBox radio channels and tx power from the WLCs
+    workshop.py telemetry  Validate the APs against state pushed by the WLCs
+    workshop.py capabilities  Show the cached RESTCONF capabilities of the WLCs
+    workshop.py analytics  Report fleet-wide RF statistics of the AP radios
+    workshop.py daemon     Keep clients and caches warm and run submitted jobs
+
+"import", "configure", and "test" run as jobs of a running daemon with
+--daemon ADDRESS, instead of in the calling process.
+
+Each subcommand imports its dependencies (pynetbox, jinja2, requests) and
+creates its clients only when it runs, so invoking a light subcommand - or
+just asking for --help - does not pay for the heavy ones.
+"""
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+SCRIPT_PATH = pathlib.PurePath(os.path.dirname(os.path.abspath(__file__)))
+WORKSHOP_ENV_FILE = os.path.join(SCRIPT_PATH.parent, "workshop-env")
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_BENCHMARK_RUNS = 5
+# Match helpers.scheduler; not imported so --help stays light
+DEFAULT_SCHEDULER_WORKERS = 8
+DEFAULT_PER_WLC_LIMIT = 2
+# Match helpers.request_helpers.DEFAULT_TIMEOUT
+DEFAULT_REQUEST_TIMEOUT = 30.0
+# Match helpers.daemon.DEFAULT_DAEMON_ADDRESS
+DEFAULT_DAEMON_ADDRESS = "127.0.0.1:8275"
+
+# Modules imported by each subcommand, used by the startup benchmark
+SUBCOMMAND_IMPORTS = {
+    "generate": "generate_csv",
+    "plan": "plan_channels",
+    "import": "pynetbox, helpers.import_helpers",
+    "export": "pynetbox, helpers.export",
+    "configure": "pynetbox, helpers.pod_helpers",
+    "test": "pynetbox, helpers.pod_helpers",
+    "reconcile": "pynetbox, helpers.pod_helpers, helpers.reconcile",
+    "sync": "pynetbox, helpers.pod_helpers, helpers.state_sync",
+    "telemetry": "pynetbox, helpers.netbox_reads, helpers.telemetry",
+    "capabilities": "pynetbox, helpers.capabilities, helpers.netbox_reads",
+    "analytics": "pynetbox, helpers.rf_analytics",
+    "daemon": "pynetbox, helpers.daemon, helpers.pod_helpers",
+}
+
+
+def load_workshop_env():
+    """
+    Read the environment variables created by the "prepare_lab.sh" script.
+    Values from the workshop-env file win over the process environment.
+
+    :return: Dict of workshop environment variables
+    """
+    from dotenv import dotenv_values  # pylint: disable=import-outside-toplevel
+
+    workshop_env = dict(os.environ)
+    workshop_env.update({k: v for k, v in dotenv_values(WORKSHOP_ENV_FILE).items()
+                         if v is not None})
+    return workshop_env
+
+
+def get_required_env(workshop_env, *names):
+    """
+    Get the required workshop environment variables, or terminate with a
+    message naming the missing ones.
+
+    :param workshop_env: Dict of workshop environment variables
+    :param names: Variable names to return
+    :return: Tuple of variable values in the requested order
+    """
+    missing_names = [name for name in names if not workshop_env.get(name)]
+    if missing_names:
+        sys.exit(f"Missing workshop environment variables: {', '.join(missing_names)}. "
+                 "Did you run prepare_lab.sh?")
+    return tuple(workshop_env[name] for name in names)
+
+
+def create_netbox_api(workshop_env):
+    """
+    Initialize the pynetbox API object from the workshop environment.  List
+    pages are fetched concurrently.
+
+    :param workshop_env: Dict of workshop environment variables
+    :return: pynetbox API object
+    """
+    # pylint: disable=import-outside-toplevel
+    from helpers.netbox_reads import create_netbox_api as create_threaded_netbox_api
+
+    netbox_url, netbox_token = get_required_env(workshop_env, "NETBOX_URL", "NETBOX_TOKEN")
+    return create_threaded_netbox_api(url=netbox_url, token=netbox_token)
+
+
+def run_generate(script_args):
+    """
+    Handler for the "generate" subcommand.
+    """
+    from generate_csv import generate_csv_file  # pylint: disable=import-outside-toplevel
+
+    generate_options = {"ap_count": script_args.device_count,
+                        "plan_channels": script_args.plan_channels,
+                        "positions_file": script_args.positions_file,
+                        "output_format": script_args.output_format}
+    if script_args.output_file:
+        generate_options["output_file"] = script_args.output_file
+    generate_csv_file(**generate_options)
+
+
+def run_plan_channels(script_args):
+    """
+    Handler for the "plan" subcommand.
+    """
+    from plan_channels import run_plan  # pylint: disable=import-outside-toplevel
+
+    run_plan(script_args)
+
+
+def run_import(script_args):
+    """
+    Handler for the "import" subcommand.
+    """
+    # pylint: disable=import-outside-toplevel
+    from helpers.fingerprints import FingerprintStore, default_store_file
+    from helpers.import_helpers import import_csv_file
+    from helpers.preflight import preflight_csv_file, print_preflight_report
+
+    workshop_env = load_workshop_env()
+    pod_number, netbox_url = get_required_env(workshop_env, "POD_NUMBER", "NETBOX_URL")
+    netbox = create_netbox_api(workshop_env)
+    try:
+        wlc_ids = None
+        if not script_args.skip_preflight:
+            preflight_report = preflight_csv_file(netbox_api=netbox,
+                                                  csv_file=script_args.csv_file,
+                                                  file_format=script_args.input_format)
+            print_preflight_report(preflight_report)
+            if preflight_report.errors:
+                sys.exit("Pre-flight check failed, nothing was imported.")
+            wlc_ids = preflight_report.wlc_ids
+
+        if not script_args.preflight_only:
+            import_csv_file(netbox_api=netbox,
+                            csv_file=script_args.csv_file,
+                            workshop_pod_number=pod_number,
+                            wlc_ids=wlc_ids,
+                            transform_workers=script_args.transform_workers,
+                            file_format=script_args.input_format,
+                            fingerprint_store=FingerprintStore(
+                                script_args.fingerprint_file
+                                or default_store_file(netbox_url, pod_number),
+                                refresh=script_args.full_import))
+    except FileNotFoundError as err:
+        print(f"Unable to open CSV file for import: {err}")
+    except ImportError as err:
+        sys.exit(str(err))
+
+
+def run_export(script_args):
+    """
+    Handler for the "export" subcommand.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pynetbox import RequestError
+    from helpers.export import export_inventory
+
+    netbox = create_netbox_api(load_workshop_env())
+    try:
+        export_inventory(netbox_api=netbox,
+                         output_file=script_args.output_file,
+                         pod_number=script_args.pod,
+                         file_format=script_args.output_format,
+                         page_size=script_args.page_size)
+    except RequestError as err:
+        sys.exit(f"NetBox error happened during the export: {err}")
+    except ImportError as err:
+        sys.exit(str(err))
+
+
+def create_session_pool(script_args, wlc_username, wlc_password):
+    """
+    Create the WLC session pool of a pod subcommand, with the request
+    timeout and run deadline from the command line.  "test" makes its reads
+    conditional unless --no-read-cache was given.
+    """
+    # pylint: disable=import-outside-toplevel
+    from helpers.request_helpers import DEFAULT_TIMEOUT, RequestSessionPool, RunDeadline
+
+    read_cache = None
+    if script_args.command == "test" and not script_args.no_read_cache:
+        from helpers.restconf_cache import RestconfReadCache
+        read_cache = RestconfReadCache()
+    return RequestSessionPool(username=wlc_username,
+                              password=wlc_password,
+                              timeout=(DEFAULT_TIMEOUT[0],
+                                       script_args.request_timeout or DEFAULT_TIMEOUT[1]),
+                              deadline=RunDeadline(script_args.deadline)
+                              if script_args.deadline else None,
+                              read_cache=read_cache)
+
+
+def run_pod_action(script_args):
+    """
+    Handler for the "configure" and "test" subcommands.  A single pod prints
+    the detailed output only; a pod list also prints the per-pod summary.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pynetbox import RequestError
+    from helpers.capabilities import CapabilityCache
+    from helpers.pod_helpers import parse_pod_list, run_pods, print_pod_summary
+    from helpers.request_helpers import print_deferred_report
+    from helpers.wlc_helpers import WlcResolver
+
+    workshop_env = load_workshop_env()
+    wlc_username, wlc_password = get_required_env(workshop_env,
+                                                  "WLC_USERNAME", "WLC_PASSWORD")
+    pod_spec = script_args.pods or get_required_env(workshop_env, "POD_NUMBER")[0]
+    try:
+        pod_numbers = parse_pod_list(pod_spec)
+    except ValueError as err:
+        sys.exit(f"Invalid pod list '{pod_spec}': {err}")
+
+    netbox = create_netbox_api(workshop_env)
+    wlc_resolver = WlcResolver(netbox)
+    session_pool = create_session_pool(script_args, wlc_username, wlc_password)
+    wait_for_aps = script_args.command == "configure" and script_args.wait
+    capability_cache = None
+    if script_args.command == "configure":
+        capability_cache = CapabilityCache(session_pool,
+                                           refresh=script_args.refresh_capabilities)
+
+    print("*" * 78)
+    run_start = time.perf_counter()
+    try:
+        if script_args.command == "configure" and script_args.schedule:
+            from helpers.pod_helpers import configure_pods_scheduled
+            from helpers.scheduler import print_scheduler_summary
+            pod_results, scheduler_stats = configure_pods_scheduled(
+                netbox_api=netbox,
+                pod_numbers=pod_numbers,
+                wlc_resolver=wlc_resolver,
+                session_pool=session_pool,
+                capability_cache=capability_cache,
+                batch=script_args.batch,
+                workers=script_args.workers,
+                per_wlc_limit=script_args.per_wlc_limit)
+            print_scheduler_summary(scheduler_stats)
+        else:
+            pod_action = script_args.command
+            action_options = {"capability_cache": capability_cache,
+                              "batch": script_args.batch} if capability_cache else None
+            if script_args.stream:
+                # Streaming pushes every AP on its own; "test" streams its reads
+                pod_action, action_options = {"configure": ("stream", None),
+                                              "test": ("test", {"stream": True})}[pod_action]
+            pod_results = run_pods(pod_action=pod_action,
+                                   netbox_api=netbox,
+                                   pod_numbers=pod_numbers,
+                                   wlc_resolver=wlc_resolver,
+                                   session_pool=session_pool,
+                                   max_concurrency=script_args.max_concurrency,
+                                   action_options=action_options)
+        if len(pod_numbers) > 1:
+            print_pod_summary(pod_results, time.perf_counter() - run_start)
+
+        if wait_for_aps:
+            from helpers.convergence import wait_for_convergence, print_convergence_summary
+            from helpers.netbox_reads import load_pod_inventory
+            print_convergence_summary(wait_for_convergence(
+                access_points=[ap for pod_number in pod_numbers
+                               for ap in load_pod_inventory(netbox, pod_number)],
+                wlc_resolver=wlc_resolver,
+                session_pool=session_pool,
+                deadline_seconds=script_args.wait_timeout,
+                capability_cache=capability_cache))
+    except RequestError:
+        sys.exit("NetBox error happened when trying to query APs. Terminating.")
+    finally:
+        session_pool.close()
+        print_deferred_report(session_pool)
+
+    if script_args.command == "test":
+        from helpers.restconf_cache import print_read_cache_summary
+        from helpers.wlc_test_helpers import (print_validation_summary,
+                                              write_validation_reports)
+        if session_pool.read_cache is not None:
+            print_read_cache_summary(session_pool.read_cache)
+        check_results = [r for pod_result in pod_results for r in pod_result.get("results", [])]
+        print_validation_summary(check_results)
+        write_validation_reports(check_results,
+                                 json_report=script_args.json_report,
+                                 junit_report=script_args.junit_report)
+
+
+def run_reconcile(script_args):
+    """
+    Handler for the "reconcile" subcommand.  Provision the APs of the pods,
+    then remove WLC entries of APs that are no longer in NetBox.  A dry run
+    changes nothing and only reports the orphaned entries.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pynetbox import RequestError
+    from helpers.capabilities import CapabilityCache
+    from helpers.pod_helpers import parse_pod_list, run_pods, print_pod_summary
+    from helpers.reconcile import reconcile_wlcs, print_reconcile_summary
+    from helpers.request_helpers import print_deferred_report
+    from helpers.wlc_helpers import WlcResolver
+
+    workshop_env = load_workshop_env()
+    wlc_username, wlc_password = get_required_env(workshop_env,
+                                                  "WLC_USERNAME", "WLC_PASSWORD")
+    pod_spec = script_args.pods or get_required_env(workshop_env, "POD_NUMBER")[0]
+    try:
+        pod_numbers = parse_pod_list(pod_spec)
+    except ValueError as err:
+        sys.exit(f"Invalid pod list '{pod_spec}': {err}")
+
+    netbox = create_netbox_api(workshop_env)
+    wlc_resolver = WlcResolver(netbox)
+    session_pool = create_session_pool(script_args, wlc_username, wlc_password)
+    capability_cache = CapabilityCache(session_pool, refresh=script_args.refresh_capabilities)
+
+    print("*" * 78)
+    run_start = time.perf_counter()
+    try:
+        if not script_args.dry_run:
+            pod_results = run_pods(pod_action="configure",
+                                   netbox_api=netbox,
+                                   pod_numbers=pod_numbers,
+                                   wlc_resolver=wlc_resolver,
+                                   session_pool=session_pool,
+                                   max_concurrency=script_args.max_concurrency,
+                                   action_options={"capability_cache": capability_cache,
+                                                   "batch": script_args.batch})
+            print_pod_summary(pod_results, time.perf_counter() - run_start)
+
+        outcomes = reconcile_wlcs(netbox_api=netbox,
+                                  wlc_resolver=wlc_resolver,
+                                  session_pool=session_pool,
+                                  pod_numbers=pod_numbers,
+                                  wlc_names=script_args.wlc_names,
+                                  dry_run=script_args.dry_run,
+                                  max_concurrency=script_args.max_concurrency,
+                                  capability_cache=capability_cache)
+    except RequestError:
+        sys.exit("NetBox error happened when trying to query APs. Terminating.")
+    finally:
+        session_pool.close()
+        print_deferred_report(session_pool)
+
+    print_reconcile_summary(outcomes, dry_run=script_args.dry_run)
+
+
+def run_sync(script_args):
+    """
+    Handler for the "sync" subcommand.  Update the radio channels and tx
+    power of the APs in NetBox from what their WLCs run.  A dry run changes
+    nothing and only reports the differences.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pynetbox import RequestError
+    from helpers.capabilities import CapabilityCache
+    from helpers.pod_helpers import parse_pod_list
+    from helpers.request_helpers import print_deferred_report
+    from helpers.state_sync import sync_radio_state, print_sync_summary
+    from helpers.wlc_helpers import WlcResolver
+
+    workshop_env = load_workshop_env()
+    wlc_username, wlc_password = get_required_env(workshop_env,
+                                                  "WLC_USERNAME", "WLC_PASSWORD")
+    pod_spec = script_args.pods or get_required_env(workshop_env, "POD_NUMBER")[0]
+    try:
+        pod_numbers = parse_pod_list(pod_spec)
+    except ValueError as err:
+        sys.exit(f"Invalid pod list '{pod_spec}': {err}")
+
+    netbox = create_netbox_api(workshop_env)
+    session_pool = create_session_pool(script_args, wlc_username, wlc_password)
+    capability_cache = CapabilityCache(session_pool, refresh=script_args.refresh_capabilities)
+
+    print("*" * 78)
+    try:
+        outcome = sync_radio_state(netbox_api=netbox,
+                                   wlc_resolver=WlcResolver(netbox),
+                                   session_pool=session_pool,
+                                   pod_numbers=pod_numbers,
+                                   dry_run=script_args.dry_run,
+                                   max_concurrency=script_args.max_concurrency,
+                                   batch_size=script_args.batch_size,
+                                   capability_cache=capability_cache)
+    except RequestError:
+        sys.exit("NetBox error happened when trying to query APs. Terminating.")
+    finally:
+        session_pool.close()
+        print_deferred_report(session_pool)
+
+    print_sync_summary(outcome, dry_run=script_args.dry_run)
+
+
+def run_telemetry(script_args):
+    """
+    Handler for the "telemetry" subcommand.  Collect the AP state the WLCs
+    push until every AP of the pods reported or the wait time passed, then
+    validate the APs against it.  With --simulate, the WLCs are simulated
+    from the NetBox data.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pynetbox import RequestError
+    from helpers.netbox_reads import load_pod_inventory
+    from helpers.pod_helpers import parse_pod_list
+    from helpers.telemetry import TelemetryCollector, TelemetrySimulator, evaluate_telemetry
+    from helpers.wlc_helpers import WlcResolver
+    from helpers.wlc_test_helpers import print_validation_summary, write_validation_reports
+
+    workshop_env = load_workshop_env()
+    pod_spec = script_args.pods or get_required_env(workshop_env, "POD_NUMBER")[0]
+    try:
+        pod_numbers = parse_pod_list(pod_spec)
+    except ValueError as err:
+        sys.exit(f"Invalid pod list '{pod_spec}': {err}")
+    host, _, port = script_args.listen.rpartition(":")
+
+    netbox = create_netbox_api(workshop_env)
+    wlc_resolver = WlcResolver(netbox)
+    try:
+        access_points = [ap for pod_number in pod_numbers
+                         for ap in load_pod_inventory(netbox, pod_number)]
+        wlcs = {wlc_id: wlc_resolver.resolve(wlc_id)
+                for ap in access_points for wlc_id in ap.wlc_ids[:1]}
+    except RequestError:
+        sys.exit("NetBox error happened when trying to query APs. Terminating.")
+
+    print("*" * 78)
+    try:
+        collector = TelemetryCollector(host=host or "127.0.0.1", port=int(port))
+    except (OSError, ValueError) as err:
+        sys.exit(f"Unable to listen on '{script_args.listen}': {err}")
+    simulators = []
+    try:
+        collector_address = collector.start()
+        if script_args.simulate:
+            for wlc_id, wlc in sorted(wlcs.items(), key=lambda item: item[1].name):
+                simulator = TelemetrySimulator(
+                    collector_address, wlc.name,
+                    [ap for ap in access_points if ap.wlc_ids[:1] == (wlc_id,)],
+                    drift=script_args.simulate_drift)
+                simulator.start()
+                simulators.append(simulator)
+        missing = collector.index.wait_for((ap.mac for ap in access_points if ap.mac),
+                                           timeout=script_args.wait)
+        if missing:
+            print(f"{len(missing)} APs were not reported within {script_args.wait:g}s")
+        check_results = evaluate_telemetry(access_points, collector.index,
+                                           wlc_names={wlc_id: wlc.name
+                                                      for wlc_id, wlc in wlcs.items()})
+    finally:
+        for simulator in simulators:
+            simulator.stop()
+        collector.stop()
+
+    print_validation_summary(check_results)
+    write_validation_reports(check_results,
+                             json_report=script_args.json_report,
+                             junit_report=script_args.junit_report)
+
+
+def run_capabilities(script_args):
+    """
+    Handler for the "capabilities" subcommand.  Print the RESTCONF
+    capabilities and provisioning strategy of the WLCs the APs of the pods
+    are associated with, discovering them where the cache is cold.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pynetbox import RequestError
+    from requests.exceptions import RequestException
+    from helpers.capabilities import CapabilityCache
+    from helpers.netbox_reads import load_pod_inventory
+    from helpers.pod_helpers import parse_pod_list
+    from helpers.request_helpers import RequestSessionPool
+    from helpers.wlc_helpers import WlcResolver
+
+    workshop_env = load_workshop_env()
+    wlc_username, wlc_password = get_required_env(workshop_env,
+                                                  "WLC_USERNAME", "WLC_PASSWORD")
+    pod_spec = script_args.pods or get_required_env(workshop_env, "POD_NUMBER")[0]
+    try:
+        pod_numbers = parse_pod_list(pod_spec)
+    except ValueError as err:
+        sys.exit(f"Invalid pod list '{pod_spec}': {err}")
+
+    netbox = create_netbox_api(workshop_env)
+    wlc_resolver = WlcResolver(netbox)
+    session_pool = RequestSessionPool(username=wlc_username, password=wlc_password)
+    capability_cache = CapabilityCache(session_pool, refresh=script_args.refresh_capabilities)
+
+    print("*" * 78)
+    try:
+        wlcs = {wlc_resolver.resolve(wlc_id) for pod_number in pod_numbers
+                for ap in load_pod_inventory(netbox, pod_number)
+                for wlc_id in ap.wlc_ids}
+        for wlc in sorted(wlcs, key=lambda wlc: wlc.name):
+            try:
+                capability_cache.get(wlc.dns_name)
+            except RequestException as err:
+                print(f"WLC {wlc.dns_name}: FAILED to read capabilities: {err}")
+    except RequestError:
+        sys.exit("NetBox error happened when trying to query APs. Terminating.")
+    finally:
+        session_pool.close()
+
+
+def run_analytics(script_args):
+    """
+    Handler for the "analytics" subcommand.
+    """
+    # pylint: disable=import-outside-toplevel
+    import json
+    try:
+        from helpers.rf_analytics import load_radio_arrays, build_rf_report, print_rf_report
+    except ImportError as err:
+        sys.exit(f"RF analytics requires NumPy ({err}).  Install it with: pip install numpy")
+
+    radios = load_radio_arrays(create_netbox_api(load_workshop_env()),
+                               pod_number=script_args.pod)
+    report = build_rf_report(radios, report_limit=script_args.limit)
+    print_rf_report(report)
+    if script_args.json_report:
+        with open(script_args.json_report, "w", encoding="utf-8") as json_file:
+            json.dump(report, json_file, indent=2)
+        print(f"JSON report written to {script_args.json_report}")
+
+
+def run_daemon(script_args):
+    """
+    Handler for the "daemon" subcommand.  Serve jobs until interrupted.
+    """
+    # pylint: disable=import-outside-toplevel
+    from helpers.daemon import WorkshopDaemon, serve_daemon
+
+    workshop_env = load_workshop_env()
+    get_required_env(workshop_env, "NETBOX_URL", "NETBOX_TOKEN", "WLC_USERNAME", "WLC_PASSWORD")
+    daemon = WorkshopDaemon(workshop_env)
+    try:
+        serve_daemon(daemon, address=script_args.listen)
+    except OSError as err:
+        sys.exit(f"Unable to listen on '{script_args.listen}': {err}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+
+
+def run_daemon_client(script_args):
+    """
+    Run an "import", "configure", or "test" subcommand as a job of a running
+    daemon, following its output and printing its results here.
+    """
+    # pylint: disable=import-outside-toplevel
+    from helpers.daemon import DaemonClient
+
+    command = script_args.command
+    if command == "import":
+        if script_args.fingerprint_file:
+            sys.exit("--fingerprint-file is not supported with --daemon")
+        options = {"csv_file": os.path.abspath(script_args.csv_file),
+                   "input_format": script_args.input_format,
+                   "skip_preflight": script_args.skip_preflight,
+                   "preflight_only": script_args.preflight_only,
+                   "full_import": script_args.full_import,
+                   "transform_workers": script_args.transform_workers}
+    else:
+        if command == "configure" and (script_args.schedule or script_args.wait):
+            sys.exit("--schedule and --wait are not supported with --daemon")
+        options = {"pods": script_args.pods,
+                   "stream": script_args.stream,
+                   "max_concurrency": script_args.max_concurrency}
+        if command == "configure":
+            options["batch"] = script_args.batch
+
+    try:
+        job = DaemonClient(script_args.daemon).run(
+            command, options, log_stream=sys.stdout if script_args.output == "text" else None)
+    except (OSError, RuntimeError) as err:
+        sys.exit(f"Workshop daemon at '{script_args.daemon}' failed: {err}")
+    if job["status"] == "failed":
+        sys.exit(f"Job {job['id']} failed: {job['error']}")
+
+    result = job["result"]
+    if command == "import" and result["preflight"]:
+        from helpers.preflight import PreflightIssue, PreflightReport, print_preflight_report
+        preflight = result["preflight"]
+        report = PreflightReport(csv_file=preflight["csv_file"], rows=preflight["rows"],
+                                 issues=[PreflightIssue(**issue)
+                                         for issue in preflight["issues"]])
+        print_preflight_report(report)
+        if report.errors:
+            sys.exit("Pre-flight check failed, nothing was imported.")
+    elif command != "import":
+        from helpers.pod_helpers import print_pod_summary
+        if len(result["pods"]) > 1:
+            print_pod_summary(result["pods"], job["finished"] - job["started"])
+    if command == "test":
+        from helpers.validation import CheckResult
+        from helpers.wlc_test_helpers import print_validation_summary, write_validation_reports
+        check_results = [CheckResult(**check) for check in result["results"]]
+        print_validation_summary(check_results)
+        write_validation_reports(check_results,
+                                 json_report=script_args.json_report,
+                                 junit_report=script_args.junit_report)
+
+
+def run_startup_benchmark(script_args):
+    """
+    Handler for the "bench-startup" subcommand.  Measure, in fresh
+    interpreters, how long the imports of each subcommand take.
+    """
+    print(f"{'Subcommand':<12} {'Median ms':>10} {'Min ms':>8}")
+    for subcommand, module_names in SUBCOMMAND_IMPORTS.items():
+        timings = []
+        for _ in range(script_args.runs):
+            start_time = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {module_names}"],
+                           cwd=str(SCRIPT_PATH), check=True)
+            timings.append((time.perf_counter() - start_time) * 1000)
+        timings.sort()
+        print(f"{subcommand:<12} {timings[len(timings) // 2]:>10.1f} {timings[0]:>8.1f}")
+
+
+def build_parser():
+    """
+    Build the argument parser with one sub-parser per subcommand.
+
+    :return: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description="DEVWKS-2275 workshop tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Output options shared by the subcommands that talk to NetBox / WLCs
+    output_parser = argparse.ArgumentParser(add_help=False)
+    output_parser.add_argument("--output",
+                               choices=("text", "progress", "none"),
+                               default="text",
+                               help="Console output: verbose text, a compact progress "
+                                    "line, or nothing.  Default: text")
+    output_parser.add_argument("--event-log",
+                               dest="event_log",
+                               help="Also write every event to this JSON Lines file")
+
+    # Light module without dependencies; pyarrow is only imported when used
+    from helpers.input_formats import INPUT_FORMATS  # pylint: disable=import-outside-toplevel
+
+    generate_parser = subparsers.add_parser(
+        "generate", help="Create an AP import .csv file with random AP data")
+    generate_parser.add_argument("-o", "--output-file",
+                                 dest="output_file",
+                                 help="Output file name.  Default: scripts/netbox-import.csv")
+    generate_parser.add_argument("-c", "--count",
+                                 default=2,
+                                 dest="device_count",
+                                 type=int,
+                                 help="Number of devices to create")
+    generate_parser.add_argument("--plan-channels",
+                                 action="store_true",
+                                 dest="plan_channels",
+                                 help="Plan channels for low co-channel interference "
+                                      "instead of picking them at random")
+    generate_parser.add_argument("--positions-file",
+                                 dest="positions_file",
+                                 help="Save the generated AP positions to this CSV file")
+    generate_parser.add_argument("--format",
+                                 choices=INPUT_FORMATS,
+                                 dest="output_format",
+                                 help="Output file format.  Default: from the output file "
+                                      "extension, csv if unknown")
+    generate_parser.set_defaults(handler=run_generate)
+
+    plan_parser = subparsers.add_parser(
+        "plan", help="Plan the AP channels of an import .csv file")
+    # Imported here as the planner is light; its helpers have no dependencies
+    from plan_channels import add_plan_arguments  # pylint: disable=import-outside-toplevel
+    add_plan_arguments(plan_parser)
+    plan_parser.set_defaults(handler=run_plan_channels)
+
+    import_parser = subparsers.add_parser(
+        "import", help="Import a CSV file into NetBox", parents=[output_parser])
+    import_parser.add_argument("-c", "--csv-file",
+                               dest="csv_file",
+                               default="netbox-import.csv",
+                               help="CSV, JSON Lines, Parquet, or Arrow file to import.  "
+                                    "Default: netbox-import.csv")
+    import_parser.add_argument("--input-format",
+                               choices=INPUT_FORMATS,
+                               dest="input_format",
+                               help="Input file format.  Default: from the file extension, "
+                                    "csv if unknown")
+    preflight_options = import_parser.add_mutually_exclusive_group()
+    preflight_options.add_argument("--skip-preflight",
+                                   dest="skip_preflight",
+                                   action="store_true",
+                                   help="Import without validating the whole CSV file first")
+    preflight_options.add_argument("--preflight-only",
+                                   dest="preflight_only",
+                                   action="store_true",
+                                   help="Only validate the CSV file; do not import it")
+    import_parser.add_argument("--transform-workers",
+                               dest="transform_workers",
+                               type=int,
+                               help="Processes transforming CSV rows to NetBox payloads.  "
+                                    "Default: one per CPU")
+    import_parser.add_argument("--full-import",
+                               action="store_true",
+                               dest="full_import",
+                               help="Import every row, including rows unchanged since the "
+                                    "last import")
+    import_parser.add_argument("--fingerprint-file",
+                               dest="fingerprint_file",
+                               help="Fingerprints of the imported rows.  Default: a file per "
+                                    "NetBox and pod under ~/.cache/devwks-2275/fingerprints")
+    import_parser.add_argument("--daemon",
+                               help="Run as a job of the workshop daemon at this host:port "
+                                    "or Unix socket path")
+    import_parser.set_defaults(handler=run_import)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export the APs in NetBox to an import file", parents=[output_parser])
+    export_parser.add_argument("-o", "--output-file",
+                               dest="output_file",
+                               default="netbox-export.csv",
+                               help="Output file name.  Default: netbox-export.csv")
+    export_parser.add_argument("--format",
+                               choices=INPUT_FORMATS,
+                               dest="output_format",
+                               help="Output file format.  Default: from the output file "
+                                    "extension, csv if unknown")
+    export_parser.add_argument("-p", "--pod",
+                               dest="pod",
+                               help="Only export the APs of this pod.  Default: all APs")
+    export_parser.add_argument("--page-size",
+                               dest="page_size",
+                               default=1000,
+                               type=int,
+                               help="Devices read per NetBox request.  Default: 1000")
+    export_parser.set_defaults(handler=run_export)
+
+    for command, command_help in (("configure", "Provision the APs on their WLCs"),
+                                  ("test", "Validate the WLC configuration of the APs"),
+                                  ("reconcile", "Provision the APs, then remove APs no "
+                                                "longer in NetBox from their WLCs"),
+                                  ("sync", "Update the radio channels and tx power in "
+                                           "NetBox from the WLCs")):
+        pod_parser = subparsers.add_parser(command, help=command_help,
+                                           parents=[output_parser])
+        pod_parser.add_argument("-p", "--pods",
+                                dest="pods",
+                                help="Pod list or range, e.g. '1-40' or '1,3,5-8'. "
+                                     "Default: POD_NUMBER from workshop-env")
+        pod_parser.add_argument("-j", "--max-concurrency",
+                                dest="max_concurrency",
+                                default=DEFAULT_MAX_CONCURRENCY,
+                                type=int,
+                                help="Maximum number of pods processed at the same "
+                                     f"time.  Default: {DEFAULT_MAX_CONCURRENCY}")
+        pod_parser.add_argument("--request-timeout",
+                                dest="request_timeout",
+                                type=float,
+                                help="Seconds to wait for a WLC response.  Default: "
+                                     f"{DEFAULT_REQUEST_TIMEOUT:g}")
+        pod_parser.add_argument("--deadline",
+                                type=float,
+                                help="Seconds the whole run may take; work left at the "
+                                     "deadline is skipped and reported")
+        if command in ("configure", "test"):
+            pod_parser.add_argument("--daemon",
+                                    help="Run as a job of the workshop daemon at this "
+                                         "host:port or Unix socket path")
+        if command == "test":
+            pod_parser.add_argument("--stream",
+                                    action="store_true",
+                                    help="Test the APs page by page as they are read from "
+                                         "NetBox instead of reading the whole pod first")
+            pod_parser.add_argument("--json-report",
+                                    dest="json_report",
+                                    help="Write the test results to a JSON report file")
+            pod_parser.add_argument("--junit-report",
+                                    dest="junit_report",
+                                    help="Write the test results to a JUnit-XML report file")
+            pod_parser.add_argument("--no-read-cache",
+                                    action="store_true",
+                                    dest="no_read_cache",
+                                    help="Download the WLC configuration again instead of "
+                                         "revalidating the cached copy")
+        if command in ("configure", "reconcile", "sync"):
+            pod_parser.add_argument("--refresh-capabilities",
+                                    action="store_true",
+                                    dest="refresh_capabilities",
+                                    help="Discover the WLC capabilities again instead of "
+                                         "using the cache")
+        if command in ("configure", "reconcile"):
+            pod_parser.add_argument("--batch",
+                                    action="store_true",
+                                    help="Provision the APs of WLCs with a known software "
+                                         "version in batches of merge requests instead of "
+                                         "one AP at a time")
+        if command == "configure":
+            provision_mode = pod_parser.add_mutually_exclusive_group()
+            provision_mode.add_argument("--stream",
+                                        action="store_true",
+                                        help="Push the APs to their WLCs as they are read "
+                                             "from NetBox, through bounded per-WLC queues")
+            provision_mode.add_argument("--schedule",
+                                        action="store_true",
+                                        help="Provision all pods through one fair scheduler: "
+                                             "a queue per WLC, new APs before changed radios "
+                                             "before refreshes")
+            pod_parser.add_argument("--workers",
+                                    default=DEFAULT_SCHEDULER_WORKERS,
+                                    type=int,
+                                    help="With --schedule: worker threads shared by all "
+                                         f"WLCs.  Default: {DEFAULT_SCHEDULER_WORKERS}")
+            pod_parser.add_argument("--per-wlc-limit",
+                                    dest="per_wlc_limit",
+                                    default=DEFAULT_PER_WLC_LIMIT,
+                                    type=int,
+                                    help="With --schedule: maximum tasks running on one "
+                                         f"WLC at a time.  Default: {DEFAULT_PER_WLC_LIMIT}")
+            pod_parser.add_argument("--wait",
+                                    action="store_true",
+                                    help="Wait for the APs to join and apply their radio "
+                                         "settings")
+            pod_parser.add_argument("--wait-timeout",
+                                    dest="wait_timeout",
+                                    default=600,
+                                    type=int,
+                                    help="Seconds to wait for convergence.  Default: 600")
+        if command == "reconcile":
+            pod_parser.add_argument("--wlc",
+                                    action="append",
+                                    default=[],
+                                    dest="wlc_names",
+                                    help="Also reconcile this WLC, even without APs left "
+                                         "in NetBox.  May be repeated")
+            pod_parser.add_argument("--dry-run",
+                                    action="store_true",
+                                    dest="dry_run",
+                                    help="Only report orphaned WLC entries; change nothing")
+            pod_parser.set_defaults(handler=run_reconcile)
+        elif command == "sync":
+            pod_parser.add_argument("--dry-run",
+                                    action="store_true",
+                                    dest="dry_run",
+                                    help="Only report radios that differ from their WLC; "
+                                         "change nothing")
+            pod_parser.add_argument("--batch-size",
+                                    dest="batch_size",
+                                    default=200,
+                                    type=int,
+                                    help="Radio interfaces per bulk NetBox update.  "
+                                         "Default: 200")
+            pod_parser.set_defaults(handler=run_sync)
+        else:
+            pod_parser.set_defaults(handler=run_pod_action)
+
+    telemetry_parser = subparsers.add_parser(
+        "telemetry", help="Validate the APs against state pushed by the WLCs",
+        parents=[output_parser])
+    telemetry_parser.add_argument("-p", "--pods",
+                                  dest="pods",
+                                  help="Pod list or range, e.g. '1-40' or '1,3,5-8'. "
+                                       "Default: POD_NUMBER from workshop-env")
+    telemetry_parser.add_argument("--listen",
+                                  default="127.0.0.1:57500",
+                                  help="Address and port the WLCs push telemetry to.  "
+                                       "Default: 127.0.0.1:57500")
+    telemetry_parser.add_argument("--wait",
+                                  default=60.0,
+                                  type=float,
+                                  help="Seconds to wait for every AP to be reported.  "
+                                       "Default: 60")
+    telemetry_parser.add_argument("--simulate",
+                                  action="store_true",
+                                  help="Push telemetry from simulated WLCs built from the "
+                                       "NetBox data")
+    telemetry_parser.add_argument("--simulate-drift",
+                                  dest="simulate_drift",
+                                  default=0.0,
+                                  type=float,
+                                  help="With --simulate: fraction of radios reported with "
+                                       "a different tx power.  Default: 0")
+    telemetry_parser.add_argument("--json-report",
+                                  dest="json_report",
+                                  help="Write the test results to a JSON report file")
+    telemetry_parser.add_argument("--junit-report",
+                                  dest="junit_report",
+                                  help="Write the test results to a JUnit-XML report file")
+    telemetry_parser.set_defaults(handler=run_telemetry)
+
+    capabilities_parser = subparsers.add_parser(
+        "capabilities", help="Show the cached RESTCONF capabilities of the WLCs",
+        parents=[output_parser])
+    capabilities_parser.add_argument("-p", "--pods",
+                                     dest="pods",
+                                     help="Pod list or range, e.g. '1-40' or '1,3,5-8'. "
+                                          "Default: POD_NUMBER from workshop-env")
+    capabilities_parser.add_argument("--refresh",
+                                     action="store_true",
+                                     dest="refresh_capabilities",
+                                     help="Discover the WLC capabilities again instead of "
+                                          "using the cache")
+    capabilities_parser.set_defaults(handler=run_capabilities)
+
+    analytics_parser = subparsers.add_parser(
+        "analytics", help="Report fleet-wide RF statistics of the AP radios")
+    analytics_parser.add_argument("-p", "--pod",
+                                  dest="pod",
+                                  help="Only include the APs of this pod.  Default: all APs")
+    analytics_parser.add_argument("-n", "--limit",
+                                  default=10,
+                                  type=int,
+                                  help="Out-of-policy radios listed per reason.  Default: 10")
+    analytics_parser.add_argument("--json-report",
+                                  dest="json_report",
+                                  help="Write the full report to a JSON file")
+    analytics_parser.set_defaults(handler=run_analytics)
+
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Keep NetBox and WLC clients warm and run submitted jobs",
+        parents=[output_parser])
+    daemon_parser.add_argument("--listen",
+                               default=DEFAULT_DAEMON_ADDRESS,
+                               help="host:port, or the path of a Unix socket, to serve the "
+                                    f"job API on.  Default: {DEFAULT_DAEMON_ADDRESS}")
+    daemon_parser.set_defaults(handler=run_daemon)
+
+    benchmark_parser = subparsers.add_parser(
+        "bench-startup", help="Measure the import time of each subcommand")
+    benchmark_parser.add_argument("-n", "--runs",
+                                  default=DEFAULT_BENCHMARK_RUNS,
+                                  type=int,
+                                  help="Number of fresh interpreters per subcommand")
+    benchmark_parser.set_defaults(handler=run_startup_benchmark)
+
+    # Every subcommand can be profiled; the profiler needs no dependencies
+    from helpers.profiling import add_profile_arguments  # pylint: disable=import-outside-toplevel
+    for subparser in subparsers.choices.values():
+        add_profile_arguments(subparser)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Parse the command line and run the subcommand.
+
+    :param argv: Optional argument list; default: sys.argv[1:]
+    :return: None
+    """
+    # pylint: disable=import-outside-toplevel
+    cli_args = build_parser().parse_args(argv)
+    if hasattr(cli_args, "output"):
+        from helpers.events import configure_event_log
+        configure_event_log(output=cli_args.output, jsonl_file=cli_args.event_log)
+    if cli_args.profile:
+        from helpers.profiling import start_profiling_from_args
+        start_profiling_from_args(cli_args, cli_args.command)
+    if getattr(cli_args, "daemon", None):
+        cli_args.handler = run_daemon_client
+    cli_args.handler(cli_args)
+
+
+if __name__ == "__main__":
+    main()